@@ -1,4 +1,4 @@
-from flask import Flask, render_template, request, redirect, url_for, jsonify, session, flash
+from flask import Flask, render_template, request, redirect, url_for, jsonify, session, flash, Response, g
 import os
 import pandas as pd
 import numpy as np
@@ -6,6 +6,24 @@ import joblib
 import pickle
 from datetime import datetime
 import uuid
+import time
+import json
+import itertools
+from utils.admission import AdmissionController, AdmissionRejected
+from utils.alerts import build_alerts
+from utils.database import DETAIL_COLUMNS, DatabaseManager
+from utils.data_processor import iter_csv_chunks, scale_features, validate_csv_headers
+from utils.drift import DriftMonitor, load_reference
+from utils.explain import ForestExplainer
+from utils.heavy_hitters import DIMENSIONS, MEASURES, TrafficHeavyHitters
+from utils.ingest import (CONTENT_TYPES, INGEST_INTRUSIONS, INGEST_ROWS, IngestError, UnsupportedEncoding,
+                          authenticate, batch_summary, get_decompressor, iter_flow_batches, parse_tokens)
+from utils.instrumentation import REGISTRY, timed, render_metrics
+from utils.jobs import JobManager, JobQueueFull
+from utils.prefilter import Prefilter, score_undecided
+from utils.profiler import PROFILER
+from utils.scheduler import InferenceScheduler, SchedulerFull
+from utils.streaming import RESULT_FORMATS, MIMETYPES, stream_results, summarize_intrusions
 
 app = Flask(__name__)
 app.secret_key = os.urandom(24)  # Secret key for session management
@@ -18,16 +36,68 @@ with open(os.path.join(model_dir, 'optimal_threshold.txt'), 'r') as f:
     threshold = float(f.read().strip())
 selected_features = pd.read_csv(os.path.join(model_dir, 'selected_features.csv'), header=None)[0].tolist()
 
+# Per-alert explanations (top contributing features of each flagged row)
+explainer = ForestExplainer(model, selected_features)
+
 # Mock user database (replace with real database in production)
 users = {
     'admin@example.com': {
         'password': 'admin123',
-        'name': 'Admin'
+        'name': 'Admin',
+        'role': 'admin'
     }
 }
 
-# Mock alerts database (replace with real database in production)
-alerts = []
+# Alert database (time-partitioned SQLite, one connection per thread)
+db = DatabaseManager(os.path.join(os.path.dirname(__file__), 'ids_database.db'))
+ALERT_PAGE_LIMIT = 1000
+
+# Top talkers of every scored flow (sliding windows, fixed memory), stored
+# in the metrics table every minute for /api/top-talkers history
+traffic = TrafficHeavyHitters(db=db, component='app')
+
+# Feature drift of scored traffic against the reference profile saved with
+# the model by profile_features.py (disabled without one)
+drift_reference = load_reference(model_dir, selected_features)
+drift = DriftMonitor(drift_reference, db=db, component='app') if drift_reference is not None else None
+
+# Allowlist/blocklist rules checked before scoring, reloaded from the
+# settings table when they change (see /admin/prefilter)
+prefilter = Prefilter(db=db)
+
+# Request instrumentation (exposed by /metrics)
+REQUEST_SECONDS = REGISTRY.histogram(
+    'ids_http_request_duration_seconds', 'HTTP request latency by endpoint', ('endpoint',)
+)
+REQUESTS_IN_FLIGHT = REGISTRY.gauge(
+    'ids_http_requests_in_flight', 'HTTP requests currently being handled', ('endpoint',)
+)
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    REQUESTS_IN_FLIGHT.labels(request.endpoint or 'unknown').inc()
+    g.profiled = PROFILER.begin_request(request.path)
+
+@app.after_request
+def finish_request_profile(response):
+    # Keep sampling until a streamed body has been fully sent
+    if g.get('profiled'):
+        response.call_on_close(PROFILER.end_request)
+        g.profiled = False
+    return response
+
+@app.teardown_request
+def stop_request_timer(exc=None):
+    if 'request_start' in g:
+        endpoint = request.endpoint or 'unknown'
+        REQUEST_SECONDS.labels(endpoint).observe(time.perf_counter() - g.request_start)
+        REQUESTS_IN_FLIGHT.labels(endpoint).dec()
+    if g.get('profiled'):
+        PROFILER.end_request()
+
+def is_admin():
+    return users.get(session.get('user'), {}).get('role') == 'admin'
 
 @app.route('/')
 def index():
@@ -78,7 +148,7 @@ def dashboard():
     if 'user' not in session:
         return redirect(url_for('login'))
     
-    return render_template('dashboard.html', alerts=alerts)
+    return render_template('dashboard.html', alerts=db.get_alerts(limit=100))
 
 @app.route('/about')
 def about():
@@ -98,6 +168,128 @@ def manual_input():
     
     return render_template('manual_input.html', features=selected_features)
 
+def predict_scaled(X_scaled):
+    """
+    Score scaled rows with the forest and apply the threshold.
+    
+    Returns:
+        tuple: (results, predictions) as 0/1 decisions and confidence scores
+    """
+    with timed('predict_proba', rows=X_scaled.shape[0]):
+        predictions = model.predict_proba(X_scaled)[:, 1]
+    with timed('threshold'):
+        results = (predictions >= threshold).astype(int)
+    return results, predictions
+
+# All inference goes through the scheduler: manual predictions are
+# 'interactive' and file uploads/jobs 'bulk', scored in slices that let
+# interactive requests in between
+scheduler = InferenceScheduler(predict_scaled)
+
+# Admission control in front of the scoring endpoints: per-client row rate
+# limits and a global in-flight row budget. Degraded-mode sampling is off
+# unless IDS_DEGRADED_SAMPLE_RATE is set (e.g. 0.1)
+degraded_sample_rate = os.environ.get('IDS_DEGRADED_SAMPLE_RATE')
+admission = AdmissionController(sample_rate=float(degraded_sample_rate) if degraded_sample_rate else None)
+
+def rejected(e):
+    return jsonify({'error': str(e)}), e.status, e.headers()
+
+def admitted_predict(X_scaled, data, client, priority):
+    """
+    Score a batch of an admitted client against the in-flight row budget.
+    
+    Rows decided by the prefilter rules are not scored. In degraded mode
+    only the sampled rows are scored; the others are reported as safe with
+    a NaN confidence.
+    """
+    def score(X_scaled, data):
+        keep = admission.sample(client, data)
+        if keep is None:
+            with admission.scoring(X_scaled.shape[0]):
+                return scheduler.predict(X_scaled, priority)
+        results = np.zeros(X_scaled.shape[0], dtype=int)
+        predictions = np.full(X_scaled.shape[0], np.nan)
+        if keep.any():
+            with admission.scoring(int(np.count_nonzero(keep))):
+                results[keep], predictions[keep] = scheduler.predict(X_scaled[keep], priority)
+        return results, predictions
+    
+    decisions, _ = prefilter.evaluate_frame(data)
+    results, predictions = score_undecided(decisions, score, X_scaled, data)
+    admission.record(client, data, results)
+    return results, predictions
+
+def observe_scored(data):
+    """
+    Count scored rows in the top talkers and the drift monitor.
+    """
+    traffic.update_frame(data)
+    if drift is not None:
+        with timed('drift', rows=data.shape[0]):
+            drift.update(data)
+
+def store_file_alerts(data, results, predictions, offset=0, X_scaled=None):
+    """
+    Store alerts for the intrusion rows of a scored file or chunk.
+    """
+    observe_scored(data)
+    with timed('alert_build', rows=int(np.count_nonzero(results))):
+        batch = build_alerts(data, results, predictions, 'File Upload', offset, X_scaled, explainer)
+    if len(batch):
+        with timed('alert_store', rows=len(batch)):
+            db.add_alerts(batch)
+
+def score_file_chunks(file_path, chunksize=100000, client=None):
+    """
+    Score an uploaded CSV chunk by chunk, storing alerts as it goes.
+    
+    Chunks of a request's client go through admission control; background
+    jobs (no client) are already limited by the job queue.
+    
+    Yields:
+        tuple: (results, predictions) for each chunk
+    """
+    offset = 0
+    for X_scaled, data in iter_csv_chunks(file_path, selected_features, scaler, chunksize):
+        if client is None:
+            decisions, _ = prefilter.evaluate_frame(data)
+            results, predictions = score_undecided(decisions, lambda X: scheduler.predict(X, 'bulk'), X_scaled)
+        else:
+            results, predictions = admitted_predict(X_scaled, data, client, 'bulk')
+        store_file_alerts(data, results, predictions, offset, X_scaled)
+        offset += len(results)
+        yield results, predictions
+
+def stream_file_results(file_path, fmt, client):
+    """
+    Generate the streamed body for /predict-file and remove the temp file afterwards.
+    """
+    try:
+        yield from stream_results(score_file_chunks(file_path, client=client), fmt)
+    finally:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+# Background analysis jobs: one worker so interactive requests keep the CPU;
+# smaller chunks let request threads in between chunks
+JOB_CHUNKSIZE = 20000
+JOB_PAGE_LIMIT = 10000
+jobs = JobManager(
+    lambda file_path: score_file_chunks(file_path, JOB_CHUNKSIZE),
+    os.path.join('temp', 'jobs'),
+    max_workers=1
+)
+
+def get_user_job(job_id):
+    """
+    Get a job visible to the logged-in user (admins see every job).
+    """
+    job = jobs.get(job_id)
+    if job is None or (job.owner != session.get('user') and not is_admin()):
+        return None
+    return job
+
 @app.route('/predict-file', methods=['POST'])
 def predict_file():
     if 'user' not in session:
@@ -110,56 +302,81 @@ def predict_file():
     if file.filename == '':
         return jsonify({'error': 'No file selected'}), 400
     
+    # Response format: 'json' (default), 'ndjson' or 'csv' (streamed), 'intrusions'
+    fmt = request.args.get('format', 'json')
+    if fmt not in RESULT_FORMATS:
+        return jsonify({'error': f'Unsupported format: {fmt}'}), 400
+    
+    client = session['user']
+    try:
+        admission.admit(client)
+    except AdmissionRejected as e:
+        return rejected(e)
+    
     try:
         # Save the file temporarily
         file_path = os.path.join('temp', f"{uuid.uuid4()}.csv")
         os.makedirs(os.path.dirname(file_path), exist_ok=True)
         file.save(file_path)
         
+        if fmt != 'json':
+            is_valid, missing_features = validate_csv_headers(file_path, selected_features)
+            if not is_valid:
+                os.remove(file_path)
+                return jsonify({'error': f'Missing feature: {missing_features[0]}'}), 400
+            
+            if fmt == 'intrusions':
+                try:
+                    summary = summarize_intrusions(score_file_chunks(file_path, client=client))
+                finally:
+                    if os.path.exists(file_path):
+                        os.remove(file_path)
+                return jsonify(summary)
+            
+            # Stream results chunk by chunk; the temp file is removed once the stream ends
+            return Response(stream_file_results(file_path, fmt, client), mimetype=MIMETYPES[fmt])
+        
         # Read and process the file
-        data = pd.read_csv(file_path)
+        with timed('parse') as stage:
+            data = pd.read_csv(file_path)
+            stage.rows = data.shape[0]
         # Ensure all required features are present
-        for feature in selected_features:
-            if feature not in data.columns:
-                return jsonify({'error': f'Missing feature: {feature}'}), 400
+        with timed('validate'):
+            missing_features = [f for f in selected_features if f not in data.columns]
+        if missing_features:
+            return jsonify({'error': f'Missing feature: {missing_features[0]}'}), 400
         
         # Extract selected features
         X = data[selected_features]
         
         # Scale the features
-        X_scaled = scaler.transform(X)
+        with timed('scale', rows=X.shape[0]):
+            X_scaled = scaler.transform(X)
         
-        # Make predictions
-        predictions = model.predict_proba(X_scaled)[:, 1]
-        
-        # Apply threshold
-        results = (predictions >= threshold).astype(int)
+        # Make predictions and apply threshold
+        results, predictions = admitted_predict(X_scaled, data, client, 'bulk')
         
         # Store alerts for intrusions
-        if 1 in results:
-            for i, result in enumerate(results):
-                if result == 1:
-                    alert = {
-                        'id': str(uuid.uuid4()),
-                        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                        'source': 'File Upload',
-                        'confidence': float(predictions[i]),
-                        'details': data.iloc[i].to_dict()
-                    }
-                    alerts.append(alert)
+        store_file_alerts(data, results, predictions, X_scaled=X_scaled)
         
         # Clean up
         os.remove(file_path)
         
-        # Return results
-        return jsonify({
-            'total': len(results),
-            'intrusions': int(sum(results)),
-            'safe': int(len(results) - sum(results)),
-            'results': [{'index': i, 'is_intrusion': bool(result), 'confidence': float(predictions[i])} 
-                        for i, result in enumerate(results)]
-        })
+        # Return results (rows skipped in degraded mode have no confidence)
+        with timed('serialize', rows=len(results)):
+            skipped = np.isnan(predictions)
+            confidences = np.where(skipped, None, predictions).tolist() if skipped.any() else predictions.tolist()
+            return jsonify({
+                'total': len(results),
+                'intrusions': int(sum(results)),
+                'safe': int(len(results) - sum(results)),
+                'skipped': int(np.count_nonzero(skipped)),
+                'results': [{'index': i, 'is_intrusion': bool(result), 'confidence': confidence}
+                            for i, (result, confidence) in enumerate(zip(results.tolist(), confidences))]
+            })
     
+    except SchedulerFull as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -168,6 +385,12 @@ def predict_manual():
     if 'user' not in session:
         return jsonify({'error': 'Unauthorized'}), 401
     
+    client = session['user']
+    try:
+        admission.admit(client, rows=1)
+    except AdmissionRejected as e:
+        return rejected(e)
+    
     try:
         # Get input data
         data = {}
@@ -178,16 +401,22 @@ def predict_manual():
             data[feature] = float(value)
         
         # Convert to DataFrame
-        df = pd.DataFrame([data])
+        with timed('parse', rows=1):
+            df = pd.DataFrame([data])
         
         # Scale the features
-        X_scaled = scaler.transform(df)
-        
-        # Make prediction
-        prediction = model.predict_proba(X_scaled)[0, 1]
+        with timed('scale', rows=1):
+            X_scaled = scaler.transform(df)
         
-        # Apply threshold
-        result = int(prediction >= threshold)
+        # Make prediction and apply threshold (never sampled), unless a
+        # prefilter rule on destination_port decides the row
+        decisions, _ = prefilter.evaluate_frame(df)
+        with admission.scoring(1):
+            results, predictions = score_undecided(decisions, lambda X: scheduler.predict(X, 'interactive'), X_scaled)
+        admission.record(client, df, results, charge=False)
+        observe_scored(df)
+        prediction = predictions[0]
+        result = int(results[0])
         
         # Store alert if intrusion
         if result == 1:
@@ -196,9 +425,9 @@ def predict_manual():
                 'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
                 'source': 'Manual Input',
                 'confidence': float(prediction),
-                'details': data
+                'details': dict(data, explanation=explainer.top_features(X_scaled)[0])
             }
-            alerts.append(alert)
+            db.add_alert(alert)
         
         # Return result
         return jsonify({
@@ -207,15 +436,323 @@ def predict_manual():
             'threshold': float(threshold)
         })
     
+    except SchedulerFull as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/jobs', methods=['GET', 'POST'])
+def file_jobs():
+    if 'user' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    if request.method == 'GET':
+        return jsonify([job.progress() for job in jobs.list_jobs(session['user'])])
+    
+    if 'file' not in request.files:
+        return jsonify({'error': 'No file uploaded'}), 400
+    
+    file = request.files['file']
+    if file.filename == '':
+        return jsonify({'error': 'No file selected'}), 400
+    
+    try:
+        # Save the file temporarily; the job removes it when done
+        file_path = os.path.join('temp', f"{uuid.uuid4()}.csv")
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        file.save(file_path)
+        
+        is_valid, missing_features = validate_csv_headers(file_path, selected_features)
+        if not is_valid:
+            os.remove(file_path)
+            return jsonify({'error': f'Missing feature: {missing_features[0]}'}), 400
+        
+        try:
+            job = jobs.submit(file_path, session['user'])
+        except JobQueueFull as e:
+            os.remove(file_path)
+            return jsonify({'error': str(e)}), 503, {'Retry-After': '30'}
+        
+        return jsonify(job.progress()), 202, {'Location': url_for('file_job', job_id=job.id)}
+    
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/jobs/<job_id>', methods=['GET', 'DELETE'])
+def file_job(job_id):
+    if 'user' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    job = get_user_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    if request.method == 'DELETE':
+        jobs.cancel(job_id)
+    
+    return jsonify(job.progress())
+
+@app.route('/jobs/<job_id>/results')
+def file_job_results(job_id):
+    if 'user' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    job = get_user_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    try:
+        offset = max(int(request.args.get('offset', 0)), 0)
+        limit = min(max(int(request.args.get('limit', 1000)), 0), JOB_PAGE_LIMIT)
+    except ValueError:
+        return jsonify({'error': 'offset and limit must be integers'}), 400
+    intrusions_only = request.args.get('intrusions_only', 'false').lower() in ('1', 'true', 'yes')
+    
+    progress = job.progress()
+    progress.update({
+        'offset': offset,
+        'limit': limit,
+        'results': jobs.results(job_id, offset, limit, intrusions_only)
+    })
+    return jsonify(progress)
+
+# Machine clients (sensors) authenticate to /api/ingest with a bearer token:
+# IDS_INGEST_TOKENS="sensor-a:token-a,sensor-b:token-b"
+ingest_tokens = parse_tokens(os.environ.get('IDS_INGEST_TOKENS'))
+INGEST_BATCH_ROWS = 50000
+
+def ingest_batches(sensor, batches):
+    """
+    Score ingested flow batches, store their alerts and generate the
+    NDJSON response: one summary line per batch, then a totals line.
+    """
+    offset = 0
+    intrusions = 0
+    skipped = 0
+    client = f'sensor:{sensor}'
+    try:
+        for number, data in enumerate(batches):
+            # The stream was admitted once; each batch is held back while the
+            # sensor is over its rate, which also slows the reading of its body
+            wait = admission.throttle(client)
+            if wait:
+                time.sleep(wait)
+            with timed('scale', rows=data.shape[0]):
+                X_scaled = scale_features(data[selected_features], scaler)
+            results, predictions = admitted_predict(X_scaled, data, client, 'streaming')
+            observe_scored(data)
+            with timed('alert_build', rows=int(np.count_nonzero(results))):
+                batch = build_alerts(data, results, predictions, f'Sensor {sensor}', offset, X_scaled, explainer)
+            if len(batch):
+                with timed('alert_store', rows=len(batch)):
+                    db.add_alerts(batch)
+            
+            summary = batch_summary(number, offset, results, predictions)
+            INGEST_ROWS.labels(sensor).inc(summary['rows'])
+            INGEST_INTRUSIONS.labels(sensor).inc(summary['intrusions'])
+            offset += summary['rows']
+            intrusions += summary['intrusions']
+            skipped += summary['skipped']
+            yield json.dumps(summary) + '\n'
+        yield json.dumps({'done': True, 'rows': offset, 'intrusions': intrusions, 'skipped': skipped}) + '\n'
+    except (ValueError, SchedulerFull) as e:
+        # Headers are already sent: report the failure (an IngestError, or a
+        # value the scaler or model refuses), and the rows scored before it,
+        # in the last line
+        yield json.dumps({'done': False, 'error': str(e), 'rows': offset, 'intrusions': intrusions,
+                          'skipped': skipped}) + '\n'
+    except AdmissionRejected as e:
+        # Over the in-flight budget: the sensor resends from row `rows` after
+        # retry_after seconds
+        yield json.dumps({'done': False, 'error': str(e), 'retry_after': int(e.headers()['Retry-After']),
+                          'rows': offset, 'intrusions': intrusions, 'skipped': skipped}) + '\n'
+
+@app.route('/api/ingest', methods=['POST'])
+def ingest():
+    sensor = authenticate(request.headers.get('Authorization'), ingest_tokens)
+    if sensor is None:
+        return jsonify({'error': 'Unauthorized'}), 401, {'WWW-Authenticate': 'Bearer'}
+    try:
+        admission.admit(f'sensor:{sensor}')
+    except AdmissionRejected as e:
+        return rejected(e)
+    
+    fmt = CONTENT_TYPES.get(request.mimetype)
+    if fmt is None:
+        return jsonify({'error': f'Unsupported Content-Type: {request.mimetype}'}), 415
+    try:
+        decompressor = get_decompressor(request.headers.get('Content-Encoding'))
+    except UnsupportedEncoding as e:
+        return jsonify({'error': str(e)}), 415
+    
+    # Parsed and scored batch by batch while the body is still being received;
+    # the first batch is parsed up front so header errors get a 400
+    batches = iter_flow_batches(request.stream, fmt, selected_features, decompressor, INGEST_BATCH_ROWS)
+    try:
+        first = next(batches, None)
+    except IngestError as e:
+        return jsonify({'error': str(e)}), 400
+    if first is not None:
+        batches = itertools.chain([first], batches)
+    return Response(ingest_batches(sensor, batches), mimetype='application/x-ndjson')
+
+def alert_query(args):
+    """
+    Build DatabaseManager.get_alerts arguments from /api/alerts query parameters.
+    
+    Detail fields filter on one value or a comma-separated list
+    (destination_port=22,443) or on a range (min_psh_flag_count=1).
+    """
+    truthy = ('1', 'true', 'yes')
+    query = {
+        'offset': max(int(args.get('offset', 0)), 0),
+        'limit': min(max(int(args.get('limit', 100)), 0), ALERT_PAGE_LIMIT),
+        'start_time': args.get('start'),
+        'end_time': args.get('end'),
+        'include_archived': args.get('include_archived', 'false').lower() in truthy
+    }
+    if 'resolved' in args:
+        query['resolved'] = args['resolved'].lower() in truthy
+    for name in ('min_confidence', 'max_confidence'):
+        if name in args:
+            query[name] = float(args[name])
+    
+    detail_filters = {}
+    for column in DETAIL_COLUMNS:
+        if column in args:
+            values = [float(value) for value in args[column].split(',')]
+            detail_filters[column] = values[0] if len(values) == 1 else values
+        elif f'min_{column}' in args or f'max_{column}' in args:
+            low, high = args.get(f'min_{column}'), args.get(f'max_{column}')
+            detail_filters[column] = (None if low is None else float(low), None if high is None else float(high))
+    query['detail_filters'] = detail_filters
+    return query
+
 @app.route('/api/alerts')
 def get_alerts():
     if 'user' not in session:
         return jsonify({'error': 'Unauthorized'}), 401
     
-    return jsonify(alerts)
+    try:
+        query = alert_query(request.args)
+    except ValueError:
+        return jsonify({'error': 'Invalid filter value'}), 400
+    
+    return jsonify(db.get_alerts(**query))
+
+@app.route('/api/top-talkers')
+def top_talkers():
+    if 'user' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    # Live top lists of this server's scored flows, or with component= the
+    # latest snapshot another component (e.g. 'NetFlow collector') stored
+    component = request.args.get('component', 'app')
+    if component != 'app':
+        for metric in db.get_metrics('heavy_hitters', limit=100):
+            if (metric['details'] or {}).get('component') == component:
+                return jsonify(dict(metric['details'], timestamp=metric['timestamp']))
+        return jsonify({'error': f'No snapshot from {component}'}), 404
+    
+    try:
+        k = min(max(int(request.args.get('k', 10)), 1), 100)
+        window = float(request.args.get('window', 300))
+        if not 0 < window <= 86400:
+            raise ValueError
+    except ValueError:
+        return jsonify({'error': 'Invalid k or window'}), 400
+    measures = [request.args['measure']] if 'measure' in request.args else list(MEASURES)
+    dimensions = [request.args['dimension']] if 'dimension' in request.args else list(DIMENSIONS)
+    if not set(measures) <= set(MEASURES) or not set(dimensions) <= set(DIMENSIONS):
+        return jsonify({'error': f'dimension must be one of {DIMENSIONS}, measure one of {MEASURES}'}), 400
+    
+    return jsonify({
+        'component': component,
+        'window_seconds': window,
+        'top': {dimension: {measure: traffic.top(dimension, measure, k, window) for measure in measures}
+                for dimension in dimensions}
+    })
+
+@app.route('/api/drift')
+def feature_drift():
+    if 'user' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    if drift is None:
+        return jsonify({'error': 'No drift reference profile in the model directory'}), 404
+    
+    # Current window with per-feature scores, and the stored windows
+    try:
+        limit = min(max(int(request.args.get('limit', 24)), 1), 1000)
+    except ValueError:
+        return jsonify({'error': 'Invalid limit'}), 400
+    history = [{'timestamp': metric['timestamp'], 'max_psi': metric['value'],
+                'level': (metric['details'] or {}).get('level'), 'drifted': (metric['details'] or {}).get('drifted')}
+               for metric in db.get_metrics('feature_drift', limit=limit)]
+    return jsonify({'current': drift.report(), 'history': history})
+
+@app.route('/metrics')
+def metrics():
+    # Prometheus text format; scraped by monitoring, so no session is required
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/admin/profiler', methods=['GET', 'POST', 'DELETE'])
+def admin_profiler():
+    if 'user' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    if not is_admin():
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    if request.method == 'POST':
+        params = request.get_json(silent=True) or request.form
+        try:
+            requests_limit = params.get('requests')
+            seconds = params.get('seconds')
+            PROFILER.arm(
+                route=params.get('route', '/predict-file'),
+                max_requests=int(requests_limit) if requests_limit is not None else None,
+                duration=float(seconds) if seconds is not None else None,
+                interval=float(params.get('interval_ms', 5)) / 1000.0
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    elif request.method == 'DELETE':
+        PROFILER.disarm()
+    
+    return jsonify(PROFILER.status())
+
+@app.route('/admin/profiler/stacks')
+def admin_profiler_stacks():
+    if 'user' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    if not is_admin():
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    # Collapsed stacks, ready for flamegraph.pl or speedscope
+    return Response(
+        PROFILER.collapsed(),
+        mimetype='text/plain',
+        headers={'Content-Disposition': 'attachment; filename=profile.collapsed'}
+    )
+
+@app.route('/admin/prefilter', methods=['GET', 'POST', 'DELETE'])
+def admin_prefilter():
+    if 'user' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    if not is_admin():
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    # Rules are stored in the settings table, where every process using
+    # them (app, collector, flow tracker) picks the change up
+    if request.method == 'POST':
+        rules = request.get_json(silent=True)
+        try:
+            prefilter.save(rules.get('rules') if isinstance(rules, dict) else rules)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    elif request.method == 'DELETE':
+        prefilter.save([])
+    
+    return jsonify(dict(prefilter.status(), rule_list=prefilter.rules.rules))
 
 @app.route('/monitor')
 def monitor():
@@ -223,10 +760,15 @@ def monitor():
         return jsonify({'error': 'Unauthorized'}), 401
     
     # Get monitoring status
+    last_alerts = db.get_alerts(limit=1)
     status = {
         'status': 'active',
-        'packets_analyzed': len(alerts),
-        'last_alert': alerts[-1] if alerts else None,
+        'packets_analyzed': db.count_alerts(),
+        'last_alert': last_alerts[0] if last_alerts else None,
+        'admission': admission.status(),
+        'prefilter': prefilter.status(),
+        'drift': drift.status() if drift is not None else None,
+        'top_talkers': {dimension: traffic.top(dimension, 'flows', 5, 300)['top'] for dimension in DIMENSIONS},
         'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     }
     
@@ -0,0 +1,48 @@
+"""
+Archive alert partitions older than the retention window.
+
+Alerts are stored in one table per day (or week). Partitions whose period
+ended more than --retention-days ago are written to compressed columnar
+.npz files under the archive directory and dropped from the database; they
+stay queryable with DatabaseManager.get_alerts(include_archived=True).
+Run it periodically (e.g. daily from cron).
+
+Usage:
+    python archive_alerts.py --db ids_database.db --retention-days 30 [--vacuum] [--list]
+"""
+
+import argparse
+import os
+
+from utils.database import DatabaseManager
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default='ids_database.db', help='SQLite database file')
+    parser.add_argument('--retention-days', type=int, default=30, help='Days of alerts kept in the database')
+    parser.add_argument('--archive-dir', help='Archive directory (default: alert_archive/ next to the database)')
+    parser.add_argument('--vacuum', action='store_true', help='Shrink the database file after archiving')
+    parser.add_argument('--list', action='store_true', help='Only list the partitions')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        parser.error(f"Database not found: {args.db}")
+    db = DatabaseManager(args.db, archive_dir=args.archive_dir)
+
+    if not args.list:
+        size = os.path.getsize(args.db)
+        archived = db.archive_partitions(args.retention_days, vacuum=args.vacuum)
+        for partition in archived:
+            print(f"{partition['partition']}: {partition['rows']} alerts -> {partition['path']} "
+                  f"({partition['bytes'] / 1024:.1f} KiB)")
+        print(f"Archived {len(archived)} partitions; database {size / 2**20:.1f} -> "
+              f"{os.path.getsize(args.db) / 2**20:.1f} MiB")
+
+    print(f"\n{'partition':<20}{'period':<26}{'live rows':>12}{'archived rows':>15}")
+    for partition in db.get_partitions():
+        print(f"{partition['name']:<20}{partition['period_start'] + ' .. ' + partition['period_end']:<26}"
+              f"{partition['rows']:>12}{partition['archived_rows'] or 0:>15}")
+    db.close_connection()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+Benchmark scoring under overload with and without admission control.
+
+--clients clients submit --batch-rows batches at a fixed total of
+--offered-rate rows/s for --seconds, whether or not earlier batches were
+answered: an attack spike where client 0 sends attack traffic and the
+others benign flows, offered faster than the CPU can score. Each batch goes
+through the app's path: admit, count against the in-flight budget, sample
+in degraded mode, score through the scheduler, record. Three setups run:
+no admission control (everything queues), admission control (rate limits
+and in-flight budget) and admission control with degraded-mode sampling. Reports batch latency of
+accepted work, how fast rejections come back, rows scored and shed, and
+whether the intrusions of a flagged client were all still scored.
+
+Usage:
+    python benchmarks/admission.py --clients 8 --seconds 10
+"""
+
+import argparse
+import threading
+import time
+
+import numpy as np
+
+from common import load_pipeline, make_flows, report
+from utils.admission import AdmissionController, AdmissionRejected
+from utils.scheduler import InferenceScheduler, SchedulerFull
+
+def percentile(samples, q):
+    return f"{np.percentile(samples, q) * 1000:.0f}" if samples else '-'
+
+def run(predict_scaled, batches, labels, args, admission):
+    scheduler = InferenceScheduler(predict_scaled, max_queued={'bulk': 1000})
+    stop = time.perf_counter() + args.seconds
+    lock = threading.Lock()
+    stats = {'latencies': [], 'rejections': [], 'scored': 0, 'shed': 0, 'attacks': 0, 'attacks_found': 0}
+
+    def score(client, X_scaled, data):
+        if admission is None:
+            return scheduler.predict(X_scaled, 'bulk')
+        with admission.scoring(len(X_scaled)):
+            keep = admission.sample(client, data)
+            if keep is None:
+                results, predictions = scheduler.predict(X_scaled, 'bulk')
+            else:
+                results = np.zeros(len(X_scaled), dtype=int)
+                predictions = np.full(len(X_scaled), np.nan)
+                if keep.any():
+                    results[keep], predictions[keep] = scheduler.predict(X_scaled[keep], 'bulk')
+        admission.record(client, data, results)
+        return results, predictions
+
+    def request(i, name, X_scaled, data):
+        start = time.perf_counter()
+        try:
+            if admission is not None:
+                admission.admit(name)
+            results, predictions = score(name, X_scaled, data)
+        except (AdmissionRejected, SchedulerFull):
+            with lock:
+                stats['rejections'].append(time.perf_counter() - start)
+            return
+        with lock:
+            stats['latencies'].append(time.perf_counter() - start)
+            skipped = int(np.count_nonzero(np.isnan(predictions)))
+            stats['scored'] += len(results) - skipped
+            stats['shed'] += skipped
+            if i == 0:
+                stats['attacks'] += int(labels.sum())
+                stats['attacks_found'] += int(np.count_nonzero(results[labels == 1]))
+
+    def client(i):
+        # Open loop: a new batch every interval whether or not the last one
+        # was answered. Client 0 is the attacker; the others send benign flows
+        name = f'client-{i}'
+        X_scaled, data = batches[min(i, 1)]
+        interval = args.batch_rows * args.clients / args.offered_rate
+        requests = []
+        next_start = time.perf_counter() + interval * i / args.clients
+        while next_start < stop:
+            time.sleep(max(next_start - time.perf_counter(), 0))
+            thread = threading.Thread(target=request, args=(i, name, X_scaled, data))
+            thread.start()
+            requests.append(thread)
+            next_start += interval
+        for thread in requests:
+            thread.join()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(args.clients)]
+    begin = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats['seconds'] = time.perf_counter() - begin
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--batch-rows', type=int, default=20000)
+    parser.add_argument('--offered-rate', type=float, default=600000, help='Rows/s submitted by all clients')
+    parser.add_argument('--client-rate', type=float, default=20000, help='Rows/s each client may submit')
+    parser.add_argument('--max-inflight-rows', type=int, default=80000)
+    parser.add_argument('--sample-rate', type=float, default=0.1)
+    parser.add_argument('--trees', type=int, default=50)
+    args = parser.parse_args()
+
+    model, scaler, threshold, selected_features, _ = load_pipeline(n_estimators=args.trees)
+    data, labels = make_flows(selected_features, args.batch_rows * 2, seed=5)
+    attack = data.iloc[:args.batch_rows]
+    benign = data[labels == 0].iloc[:args.batch_rows]
+    batches = [(scaler.transform(attack), attack), (scaler.transform(benign), benign)]
+    labels = labels[:args.batch_rows]
+
+    def predict_scaled(X):
+        predictions = model.predict_proba(X)[:, 1]
+        return (predictions >= threshold).astype(int), predictions
+
+    setups = (
+        ('no admission control', None),
+        ('admission control', AdmissionController(args.client_rate, args.batch_rows, args.max_inflight_rows)),
+        ('admission + degraded mode', AdmissionController(args.client_rate, args.batch_rows, args.max_inflight_rows,
+                                                          sample_rate=args.sample_rate, seed=0)),
+    )
+    table = []
+    for name, admission in setups:
+        stats = run(predict_scaled, batches, labels, args, admission)
+        found = f"{stats['attacks_found'] / stats['attacks']:.1%}" if stats['attacks'] else '-'
+        table.append((name, len(stats['latencies']), percentile(stats['latencies'], 50),
+                      percentile(stats['latencies'], 99), len(stats['rejections']),
+                      percentile(stats['rejections'], 99), f"{stats['scored'] / stats['seconds']:,.0f}",
+                      f"{stats['shed']:,}", found))
+
+    print(f"{args.clients} clients x {args.batch_rows:,}-row batches, {args.offered_rate:,.0f} rows/s offered "
+          f"for {args.seconds:.0f}s; limits {args.client_rate:,.0f} rows/s per client, "
+          f"{args.max_inflight_rows:,} rows in flight")
+    report(table, ('setup', 'accepted', 'p50 ms', 'p99 ms', 'rejected', 'reject p99 ms', 'rows/s scored',
+                   'rows shed', 'attacker flows flagged'))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""
+Benchmark alert filters pushed into SQL against decoding every details blob.
+
+--rows alerts over --days days are written through DatabaseManager (one
+partition per day, detail fields promoted to indexed columns). Each filter
+is then answered three ways: the previous approach (read every row,
+json.loads its details and filter in Python, timed on --scan-sample rows and
+extrapolated), json_extract in the WHERE clause (no index), and
+get_alerts with the filter on the promoted columns.
+
+Usage:
+    python benchmarks/alert_filters.py --rows 10000000 --days 30
+"""
+
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from common import report
+from utils.alerts import build_alerts
+from utils.database import ALERT_SELECT, DatabaseManager, alert_conditions
+
+FILTERS = [
+    ('port 22, confidence >= 0.9', {'min_confidence': 0.9, 'detail_filters': {'destination_port': 22}}),
+    ('ports 80/443 with PSH, last day', {'detail_filters': {'destination_port': [80, 443], 'psh_flag_count': (1, None)},
+                                         'start_time': 'LAST_DAY'}),
+    ('URG flag set', {'detail_filters': {'urg_flag_count': (1, None)}}),
+    ('confidence 0.95-0.99, last day', {'min_confidence': 0.95, 'max_confidence': 0.99, 'start_time': 'LAST_DAY'}),
+]
+
+def make_details(rng, num_rows):
+    return pd.DataFrame({
+        'destination_port': rng.choice([22, 53, 80, 443, 3389, 8080], num_rows, p=[.05, .15, .3, .4, .05, .05]),
+        'fwd_psh_flags': rng.binomial(1, 0.1, num_rows),
+        'fin_flag_count': rng.binomial(1, 0.3, num_rows),
+        'psh_flag_count': rng.binomial(1, 0.2, num_rows),
+        'ack_flag_count': rng.binomial(1, 0.6, num_rows),
+        'urg_flag_count': rng.binomial(1, 0.001, num_rows),
+        'flow_duration': rng.exponential(1e5, num_rows).round(),
+        'flow_packets/s': rng.exponential(500, num_rows).round(3)
+    })
+
+def fill(db, num_rows, days, end):
+    rng = np.random.default_rng(0)
+    batches = days * 24
+    per_batch = num_rows // batches
+    start = end - timedelta(days=days)
+    for hour in range(batches):
+        details = make_details(rng, per_batch)
+        batch = build_alerts(details, np.ones(per_batch, dtype=bool), rng.uniform(0.7, 1.0, per_batch),
+                             'File Upload', offset=hour * per_batch)
+        batch.timestamp = (start + timedelta(hours=hour)).strftime('%Y-%m-%d %H:%M:%S')
+        db.add_alerts(batch)
+    return per_batch * batches
+
+def python_scan(conn, kwargs, limit, sample):
+    """Previous approach: decode every row's details and filter in Python."""
+    conditions = alert_conditions(kwargs.get('min_confidence'), kwargs.get('max_confidence'),
+                                  kwargs.get('detail_filters'))
+    start_time = kwargs.get('start_time')
+    matches = []
+    scanned = 0
+    for table, in conn.execute('SELECT name FROM alert_partitions ORDER BY period_start DESC').fetchall():
+        for row in conn.execute(f'SELECT {ALERT_SELECT} FROM {table} LIMIT ?', (sample - scanned,)):
+            scanned += 1
+            alert = dict(row)
+            alert['details'] = json.loads(alert['details'])
+            if start_time and alert['timestamp'] < start_time:
+                continue
+            if all(matches_condition(alert, column, operator, value) for column, operator, value in conditions):
+                matches.append(alert)
+        if scanned >= sample:
+            break
+    matches.sort(key=lambda alert: alert['timestamp'], reverse=True)
+    return scanned, matches[:limit]
+
+def matches_condition(alert, column, operator, value):
+    actual = alert['confidence'] if column == 'confidence' else alert['details'].get(column)
+    if actual is None:
+        return False
+    if operator == '=':
+        return actual == value
+    if operator == 'in':
+        return actual in value
+    return actual >= value if operator == '>=' else actual <= value
+
+def json_extract_query(conn, kwargs, limit):
+    clauses, params = [], []
+    for column, operator, value in alert_conditions(kwargs.get('min_confidence'), kwargs.get('max_confidence'),
+                                                    kwargs.get('detail_filters')):
+        expression = column if column == 'confidence' else f"json_extract(details, '$.{column}')"
+        if operator == 'in':
+            clauses.append(f"{expression} IN ({', '.join('?' * len(value))})")
+            params.extend(value)
+        else:
+            clauses.append(f'{expression} {operator} ?')
+            params.append(value)
+    if kwargs.get('start_time'):
+        clauses.append('timestamp >= ?')
+        params.append(kwargs['start_time'])
+    tables = [table for table, in conn.execute('SELECT name FROM alert_partitions').fetchall()]
+    union = ' UNION ALL '.join(f'SELECT {ALERT_SELECT} FROM {table}' for table in tables)
+    rows = conn.execute(f"SELECT * FROM ({union}) WHERE {' AND '.join(clauses)} ORDER BY timestamp DESC LIMIT ?",
+                        params + [limit]).fetchall()
+    return [dict(row, details=json.loads(row['details'])) for row in rows]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000000)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--limit', type=int, default=1000, help='Alerts returned per query')
+    parser.add_argument('--scan-sample', type=int, default=500000, help='Rows decoded for the Python scan')
+    args = parser.parse_args()
+
+    logging.getLogger('utils.database').setLevel(logging.WARNING)
+    logging.getLogger('utils.alerts').setLevel(logging.WARNING)
+
+    end = datetime(2026, 1, 1)
+    last_day = (end - timedelta(days=1)).strftime('%Y-%m-%d %H:%M:%S')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'alerts.db')
+        db = DatabaseManager(path)
+        start = time.perf_counter()
+        num_rows = fill(db, args.rows, args.days, end)
+        fill_seconds = time.perf_counter() - start
+        conn = db.get_connection()
+        print(f"{num_rows:,} alerts in {args.days} partitions written in {fill_seconds:.1f}s "
+              f"({num_rows / fill_seconds:,.0f} alerts/s), database {os.path.getsize(path) / 2**30:.2f} GiB")
+
+        rows = []
+        for name, kwargs in FILTERS:
+            kwargs = {key: (last_day if value == 'LAST_DAY' else value) for key, value in kwargs.items()}
+
+            start = time.perf_counter()
+            scanned, _ = python_scan(conn, kwargs, args.limit, args.scan_sample)
+            scan_seconds = (time.perf_counter() - start) * num_rows / scanned
+
+            start = time.perf_counter()
+            expected = json_extract_query(conn, kwargs, args.limit)
+            extract_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            alerts = db.get_alerts(limit=args.limit, **kwargs)
+            indexed_seconds = time.perf_counter() - start
+
+            assert sorted(alert['id'] for alert in alerts) == sorted(alert['id'] for alert in expected) or \
+                [alert['timestamp'] for alert in alerts] == [alert['timestamp'] for alert in expected]
+            rows.append((name, len(alerts), f"{scan_seconds:.2f}", f"{extract_seconds:.3f}",
+                         f"{indexed_seconds:.4f}", f"{scan_seconds / indexed_seconds:,.0f}x"))
+
+        report(rows, ('filter', 'alerts', 'python scan s (extrapolated)', 'json_extract s', 'indexed s', 'speedup'))
+        db.close_connection()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+Benchmark time-partitioned alert storage against the single alerts table.
+
+--rows alerts spread over --days days are written both to one unpartitioned
+table (the previous schema) and through DatabaseManager, which partitions
+them by day. Reports the latency of the dashboard queries (latest alerts,
+one day's alerts, a week of statistics), the cost of enforcing a retention
+window (DELETE + VACUUM, which loses the old alerts, against
+archive_partitions, which compresses them first) and the size of the
+archived data.
+
+Usage:
+    python benchmarks/alert_partitions.py --rows 500000 --days 60
+"""
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from common import report
+from utils.database import ALERTS_TABLE_SQL, DatabaseManager
+
+def best_time(fn, repeats=3):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+def make_rows(num_rows, days, end):
+    rng = np.random.default_rng(0)
+    offsets = np.sort(rng.uniform(0, days * 86400, num_rows))
+    start = end - timedelta(days=days)
+    ports = rng.choice([22, 80, 443, 3389, 8080], num_rows)
+    confidence = rng.uniform(0.7, 1.0, num_rows)
+    return [
+        (str(uuid.uuid4()), (start + timedelta(seconds=float(offset))).strftime('%Y-%m-%d %H:%M:%S'),
+         'File Upload', float(conf), json.dumps({'destination_port': int(port), 'flow_duration': float(offset % 997)}), None)
+        for offset, port, conf in zip(offsets, ports, confidence)
+    ]
+
+def legacy_get_alerts(conn, limit=100, start_time=None, end_time=None):
+    query, params = 'SELECT * FROM alerts', []
+    if start_time:
+        query += ' WHERE timestamp >= ? AND timestamp <= ?'
+        params = [start_time, end_time]
+    rows = conn.execute(query + ' ORDER BY timestamp DESC LIMIT ?', params + [limit]).fetchall()
+    return [dict(row, details=json.loads(row['details'])) for row in rows]
+
+def legacy_stats(conn, start_time):
+    conn.execute('SELECT COUNT(*), SUM(is_resolved), AVG(confidence), COUNT(DISTINCT source) '
+                 'FROM alerts WHERE timestamp >= ?', (start_time,)).fetchone()
+    return conn.execute('SELECT source, COUNT(*) FROM alerts WHERE timestamp >= ? GROUP BY source',
+                        (start_time,)).fetchall()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=500000)
+    parser.add_argument('--days', type=int, default=60)
+    parser.add_argument('--retention-days', type=int, default=30)
+    args = parser.parse_args()
+
+    logging.getLogger('utils.database').setLevel(logging.WARNING)
+    logging.getLogger('utils.alert_archive').setLevel(logging.WARNING)
+
+    now = datetime(2026, 1, 1)
+    rows = make_rows(args.rows, args.days, now)
+    day_start = (now - timedelta(days=1)).strftime('%Y-%m-%d %H:%M:%S')
+    week_start = (now - timedelta(days=7)).strftime('%Y-%m-%d %H:%M:%S')
+    end_time = now.strftime('%Y-%m-%d %H:%M:%S')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, 'legacy.db')
+        legacy = sqlite3.connect(legacy_path)
+        legacy.row_factory = sqlite3.Row
+        legacy.execute(ALERTS_TABLE_SQL.format(table='alerts').replace('FOREIGN KEY (user_id) REFERENCES users(id)', 'CHECK (1)'))
+        legacy.executemany('INSERT INTO alerts (id, timestamp, source, confidence, details, user_id) '
+                           'VALUES (?, ?, ?, ?, ?, ?)', rows)
+        legacy.commit()
+
+        partitioned_path = os.path.join(tmp, 'partitioned.db')
+        db = DatabaseManager(partitioned_path)
+        db.add_alerts([
+            {'id': row[0], 'timestamp': row[1], 'source': row[2], 'confidence': row[3], 'details': json.loads(row[4])}
+            for row in rows
+        ])
+
+        results = []
+        for name, legacy_fn, partitioned_fn in [
+            ('latest 100 alerts', lambda: legacy_get_alerts(legacy),
+             lambda: db.get_alerts(limit=100)),
+            ('last day, 1000 alerts', lambda: legacy_get_alerts(legacy, 1000, day_start, end_time),
+             lambda: db.get_alerts(limit=1000, start_time=day_start, end_time=end_time)),
+            ('last week stats', lambda: legacy_stats(legacy, week_start),
+             lambda: db.get_alert_stats(start_time=week_start)),
+        ]:
+            legacy_seconds, _ = best_time(legacy_fn)
+            partitioned_seconds, _ = best_time(partitioned_fn)
+            results.append((name, f"{legacy_seconds * 1000:.1f}", f"{partitioned_seconds * 1000:.1f}",
+                            f"{legacy_seconds / partitioned_seconds:.1f}x"))
+
+        cutoff = (now - timedelta(days=args.retention_days)).strftime('%Y-%m-%d')
+        legacy_size, partitioned_size = os.path.getsize(legacy_path), os.path.getsize(partitioned_path)
+        start = time.perf_counter()
+        legacy.execute('DELETE FROM alerts WHERE timestamp < ?', (cutoff,))
+        legacy.commit()
+        legacy.execute('VACUUM')
+        legacy_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        archived = db.archive_partitions(args.retention_days, now=now, vacuum=True)
+        partitioned_seconds = time.perf_counter() - start
+        # The single table deletes the old alerts; the partitions are archived first
+        results.append((f'retention ({args.retention_days} days) + VACUUM', f"{legacy_seconds * 1000:.1f}",
+                        f"{partitioned_seconds * 1000:.1f}", f"{legacy_seconds / partitioned_seconds:.1f}x"))
+
+        archived_rows = sum(partition['rows'] for partition in archived)
+        archived_bytes = sum(partition['bytes'] for partition in archived)
+        seconds, matches = best_time(lambda: db.get_alerts(limit=1000, start_time=cutoff[:8] + '01',
+                                                            end_time=cutoff[:8] + '01 23:59:59', include_archived=True))
+
+        print(f"{args.rows:,} alerts over {args.days} days; databases {legacy_size / 2**20:.1f} MiB "
+              f"(single table) / {partitioned_size / 2**20:.1f} MiB (partitioned)")
+        print(f"Archived {archived_rows:,} alerts in {len(archived)} partitions to {archived_bytes / 2**20:.1f} MiB; "
+              f"one archived day ({len(matches)} alerts) read in {seconds * 1000:.1f} ms")
+        report(results, ('query', 'single table ms', 'partitioned ms', 'speedup'))
+        legacy.close()
+        db.close_connection()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Micro-benchmark alert materialization for heavily malicious uploads.
+
+Compares the per-row loop that /predict-file used (uuid4, strftime and
+data.iloc[i].to_dict() per intrusion) with utils.alerts.build_alerts, and
+per-alert DatabaseManager.add_alert calls with one add_alerts call.
+The per-row paths are slow, so by default they run on a sample and are
+extrapolated to the full row count.
+
+Usage:
+    python benchmarks/bulk_alerts.py --rows 1000000 --sample 50000
+"""
+
+import argparse
+import logging
+import os
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+import numpy as np
+
+from common import load_selected_features, MODEL_DIR, make_flows, report
+from utils.alerts import build_alerts
+from utils.database import DatabaseManager
+
+def legacy_alerts(data, results, predictions):
+    alerts = []
+    for i, result in enumerate(results):
+        if result == 1:
+            alerts.append({
+                'id': str(uuid.uuid4()),
+                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'source': 'File Upload',
+                'confidence': float(predictions[i]),
+                'details': data.iloc[i].to_dict()
+            })
+    return alerts
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000, help='Intrusion rows in the batch')
+    parser.add_argument('--sample', type=int, default=50000, help='Rows used for the per-row paths')
+    args = parser.parse_args()
+
+    # Keep per-alert log lines out of the timings
+    logging.getLogger('utils.database').setLevel(logging.WARNING)
+
+    selected_features = load_selected_features(MODEL_DIR)
+    data, _ = make_flows(selected_features, args.rows)
+    results = np.ones(args.rows, dtype=int)
+    predictions = np.random.uniform(0.8, 1.0, args.rows)
+    sample = min(args.sample, args.rows)
+    scale = args.rows / sample
+
+    rows = []
+    seconds, _ = timed(lambda: legacy_alerts(data.iloc[:sample], results[:sample], predictions[:sample]))
+    rows.append(('per-row loop (extrapolated)', f"{seconds * scale:.2f}", f"{args.rows / (seconds * scale):,.0f}"))
+
+    seconds, batch = timed(lambda: build_alerts(data, results, predictions, 'File Upload'))
+    rows.append(('build_alerts', f"{seconds:.2f}", f"{args.rows / seconds:,.0f}"))
+
+    seconds, _ = timed(batch.to_records)
+    rows.append(('AlertBatch.to_records', f"{seconds:.2f}", f"{args.rows / seconds:,.0f}"))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, 'legacy.db'))
+        records = legacy_alerts(data.iloc[:sample], results[:sample], predictions[:sample])
+        seconds, _ = timed(lambda: [db.add_alert(record) for record in records])
+        rows.append(('add_alert per alert (extrapolated)', f"{seconds * scale:.2f}", f"{args.rows / (seconds * scale):,.0f}"))
+        db.close_connection()
+
+        db = DatabaseManager(os.path.join(tmp, 'bulk.db'))
+        seconds, _ = timed(lambda: db.add_alerts(batch))
+        rows.append(('add_alerts (one call)', f"{seconds:.2f}", f"{args.rows / seconds:,.0f}"))
+        db.close_connection()
+
+    print(f"{args.rows:,} intrusion rows, {len(selected_features)} features")
+    report(rows, ('path', 'seconds', 'alerts/s'))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Benchmarks run against the model files in models/ when they are present.
+The repository only ships the selected features, threshold and model info
+(the forest itself is stored in Git LFS and the scaler is generated by
+create_scaler.py), so when the model or scaler cannot be loaded a small
+synthetic RandomForest is trained on generated traffic instead. The numbers
+are then only meaningful relative to each other.
+"""
+
+import os
+import sys
+import time
+import pickle
+import tracemalloc
+
+import joblib
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+MODEL_DIR = os.path.join(ROOT_DIR, 'models')
+
+from utils.data_processor import generate_sample_data, load_selected_features
+
+def make_flows(selected_features, num_rows, seed=0):
+    """
+    Generate labeled flows for benchmarking.
+
+    Args:
+        selected_features (list): Feature names
+        num_rows (int): Number of rows
+        seed (int): Random seed
+
+    Returns:
+        tuple: (DataFrame of features, numpy.ndarray of 0/1 labels)
+    """
+    np.random.seed(seed)
+    df = generate_sample_data(selected_features, num_rows).astype(np.float64)
+    # Attacks: short, fast flows to low ports with few backward packets
+    y = ((df['destination_port'] < 20000) & (df['flow_packets/s'] > 600)).to_numpy()
+    df.loc[y, 'bwd_packets/s'] *= 0.1
+    return df, y.astype(int)
+
+def load_pipeline(n_estimators=100, max_depth=None):
+    """
+    Load the shipped model, scaler and threshold, or build a synthetic stand-in.
+
+    Args:
+        n_estimators (int): Trees in the synthetic forest
+        max_depth (int, optional): Depth limit for the synthetic forest
+
+    Returns:
+        tuple: (model, scaler, threshold, selected_features, is_synthetic)
+    """
+    selected_features = load_selected_features(MODEL_DIR)
+    with open(os.path.join(MODEL_DIR, 'optimal_threshold.txt'), 'r') as f:
+        threshold = float(f.read().strip())
+
+    try:
+        model = joblib.load(os.path.join(MODEL_DIR, 'final_model_compressed.joblib'))
+        with open(os.path.join(MODEL_DIR, 'scaler.pkl'), 'rb') as f:
+            scaler = pickle.load(f)
+        return model, scaler, threshold, selected_features, False
+    except Exception as e:
+        print(f"[benchmark] Shipped model unavailable ({e.__class__.__name__}); using a synthetic forest")
+
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.preprocessing import StandardScaler
+
+    X, y = make_flows(selected_features, 20000, seed=42)
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(
+        n_estimators=n_estimators, max_depth=max_depth, min_samples_leaf=5,
+        n_jobs=1, random_state=42
+    )
+    model.fit(scaler.transform(X), y)
+    return model, scaler, threshold, selected_features, True
+
+def write_model_dir(path, model, scaler, threshold, selected_features):
+    """
+    Write a model directory that IntrusionDetector can load.
+
+    Args:
+        path (str): Target directory
+        model: Fitted classifier
+        scaler: Fitted scaler
+        threshold (float): Decision threshold
+        selected_features (list): Feature names
+
+    Returns:
+        str: The model directory path
+    """
+    os.makedirs(path, exist_ok=True)
+    joblib.dump(model, os.path.join(path, 'final_model_compressed.joblib'))
+    with open(os.path.join(path, 'scaler.pkl'), 'wb') as f:
+        pickle.dump(scaler, f)
+    with open(os.path.join(path, 'optimal_threshold.txt'), 'w') as f:
+        f.write(str(threshold))
+    pd.Series(selected_features).to_csv(
+        os.path.join(path, 'selected_features.csv'), header=False, index=False
+    )
+    with open(os.path.join(path, 'model_info.txt'), 'w') as f:
+        f.write(f"model_name: Benchmark\nmodel_type: {type(model).__name__}\n"
+                f"feature_count: {len(selected_features)}\n")
+    return path
+
+class Measure:
+    """
+    Context manager measuring wall time and peak traced memory.
+    """
+
+    def __init__(self, label, trace_memory=True):
+        self.label = label
+        self.trace_memory = trace_memory
+        self.seconds = 0.0
+        self.peak_bytes = 0
+
+    def __enter__(self):
+        if self.trace_memory:
+            tracemalloc.start()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self.start
+        if self.trace_memory:
+            _, self.peak_bytes = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        return False
+
+def report(rows, header):
+    """
+    Print benchmark rows as an aligned table.
+
+    Args:
+        rows (list): List of row tuples
+        header (tuple): Column titles
+    """
+    table = [tuple(str(c) for c in header)] + [tuple(str(c) for c in row) for row in rows]
+    widths = [max(len(row[i]) for row in table) for i in range(len(header))]
+    for row in table:
+        print('  '.join(cell.ljust(width) for cell, width in zip(row, widths)))
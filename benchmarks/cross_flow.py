@@ -0,0 +1,145 @@
+"""
+Benchmark the cross-flow scan and flood detectors: update rate, memory, accuracy.
+
+For each --sources count, that many benign sources open 1-5 flows each to
+a pool of servers and service ports; --scanners port scanners (--scan-ports
+ports each), as many host scanners (--scan-hosts hosts each) and as many
+flooded destinations (1.5x the flood threshold in flows) are mixed in. All
+flows fall in one window and are fed to CrossFlowDetector in batches of
+--batch-rows, as the collector and flow tracker do.
+
+Reported: flows/s through update(), sketch memory and traced peak memory
+(fixed, whatever the number of sources), alerts raised against the
+injected scanners and floods, and the mean relative error of their
+estimates at the end of the window.
+The exact alternative, per-key distinct counts with pandas over the same
+window, computed once rather than incrementally, is timed and measured
+for comparison; its memory grows with the number of sources.
+
+Usage:
+    python benchmarks/cross_flow.py --sources 100000 1000000
+"""
+
+import argparse
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+from common import Measure, report
+from utils.correlation import (DEFAULT_FLOOD_THRESHOLD, DEFAULT_HOST_THRESHOLD, DEFAULT_PORT_THRESHOLD,
+                               CrossFlowDetector)
+from utils.netflow import FLOW_DTYPE
+from utils.sketches import hash_addresses
+
+def addresses(values):
+    raw = np.zeros((len(values), 16), dtype=np.uint8)
+    raw[:, :4] = np.asarray(values, dtype='>u4').view(np.uint8).reshape(-1, 4)
+    return raw.view('V16').ravel()
+
+def make_traffic(sources, scanners, scan_ports, scan_hosts, flood_flows, seed=0):
+    """Flow records of one window; returns (records, {kind: set of attacker addresses})."""
+    rng = np.random.default_rng(seed)
+    counts = rng.integers(1, 6, sources)
+    src = np.repeat(0x0A000000 + np.arange(sources), counts)
+    dst = rng.integers(0xC0A80000, 0xC0A81000, len(src))
+    port = rng.choice([80, 443, 53, 22, 8080, 3306], len(src))
+
+    port_scanners = 0x0B000000 + np.arange(scanners)
+    host_scanners = 0x0B100000 + np.arange(scanners)
+    flooded = 0xC0A90000 + np.arange(scanners)
+    parts = [(src, dst, port)]
+    for scanner in port_scanners:
+        parts.append((np.full(scan_ports, scanner), np.full(scan_ports, dst[0]),
+                      rng.choice(np.arange(1, 65536), scan_ports, replace=False)))
+    for scanner in host_scanners:
+        parts.append((np.full(scan_hosts, scanner), 0xAC100000 + rng.choice(1 << 16, scan_hosts, replace=False),
+                      np.full(scan_hosts, 22)))
+    for target in flooded:
+        parts.append((rng.integers(0x64000000, 0x65000000, flood_flows), np.full(flood_flows, target),
+                      np.full(flood_flows, 80)))
+
+    src, dst, port = (np.concatenate(column) for column in zip(*parts))
+    order = rng.permutation(len(src))
+    records = np.zeros(len(src), dtype=FLOW_DTYPE)
+    records['src_addr'] = addresses(src[order])
+    records['dst_addr'] = addresses(dst[order])
+    records['dst_port'] = port[order]
+    records['ip_version'] = 4
+    expected = {'port scan': set(port_scanners.tolist()), 'host scan': set(host_scanners.tolist()),
+                'flood': set(flooded.tolist())}
+    return records, expected
+
+def address_values(column):
+    raw = np.ascontiguousarray(column).view(np.uint8).reshape(-1, 16)[:, :4].copy()
+    return raw.view('>u4').ravel().astype(np.uint32)
+
+def exact_counts(records):
+    """Exact per-source distinct ports and hosts and per-destination flows."""
+    frame = pd.DataFrame({'src': address_values(records['src_addr']), 'dst': address_values(records['dst_addr']),
+                          'port': records['dst_port']})
+    by_source = frame.groupby('src').agg(ports=('port', 'nunique'), hosts=('dst', 'nunique'))
+    return by_source, frame.groupby('dst').size()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sources', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--scanners', type=int, default=10)
+    parser.add_argument('--scan-ports', type=int, default=2 * DEFAULT_PORT_THRESHOLD)
+    parser.add_argument('--scan-hosts', type=int, default=2 * DEFAULT_HOST_THRESHOLD)
+    parser.add_argument('--batch-rows', type=int, default=20000)
+    args = parser.parse_args()
+
+    for name in ('utils.correlation', 'utils.alerts'):
+        logging.getLogger(name).setLevel(logging.ERROR)
+    flood_flows = int(1.5 * DEFAULT_FLOOD_THRESHOLD)
+
+    table = []
+    for sources in args.sources:
+        records, expected = make_traffic(sources, args.scanners, args.scan_ports, args.scan_hosts, flood_flows)
+        now = time.time()
+        found = {kind: set() for kind in expected}
+        with Measure('sketches') as measure:
+            detector = CrossFlowDetector()
+            for start in range(0, len(records), args.batch_rows):
+                batch = detector.update(records[start:start + args.batch_rows], now)
+                if batch is not None:
+                    for kind, group in batch.details.groupby('kind'):
+                        address = group['destination_ip' if kind == 'flood' else 'source_ip']
+                        found[kind].update(int.from_bytes(bytes(map(int, ip.split('.'))), 'big') for ip in address)
+
+        # Estimates at the end of the window against the injected counts
+        errors = []
+        for kind, sketch, truth in (('port scan', detector.ports, args.scan_ports),
+                                    ('host scan', detector.hosts, args.scan_hosts),
+                                    ('flood', detector.destination_flows, flood_flows)):
+            keys = hash_addresses(addresses(sorted(expected[kind])))
+            errors.extend(np.abs(sketch.estimate(keys) - truth) / truth)
+        # Timed again without tracing, which slows numpy allocations down
+        detector = CrossFlowDetector()
+        start_time = time.perf_counter()
+        for start in range(0, len(records), args.batch_rows):
+            detector.update(records[start:start + args.batch_rows], now)
+        seconds = time.perf_counter() - start_time
+
+        raised = sum(len(items) for items in found.values())
+        hits = sum(len(found[kind] & expected[kind]) for kind in expected)
+        table.append((f"{sources:,}", 'sketches', f"{len(records):,}", f"{len(records) / seconds:,.0f}",
+                      f"{detector.nbytes / 2**20:.1f}", f"{measure.peak_bytes / 2**20:.1f}",
+                      f"{hits}/{sum(map(len, expected.values()))}", f"{raised - hits}",
+                      f"{np.mean(errors):.1%}"))
+
+        with Measure('exact') as measure:
+            exact_counts(records)
+        start_time = time.perf_counter()
+        exact_counts(records)
+        seconds = time.perf_counter() - start_time
+        table.append((f"{sources:,}", 'exact (pandas)', f"{len(records):,}", f"{len(records) / seconds:,.0f}",
+                      '-', f"{measure.peak_bytes / 2**20:.1f}", '', '', ''))
+
+    report(table, ('sources', 'method', 'flows', 'flows/s', 'sketch MiB', 'peak MiB', 'detected', 'false alerts',
+                   'estimate error'))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark the feature drift monitor: per-row cost against scoring, and
+whether drift is picked up.
+
+A reference profile is built from --reference-rows synthetic flows. Batches
+of each --batch-rows size are then counted into a DriftMonitor window, once
+counting every row and once with the default per-batch sample, and the time
+is set against the model's scoring time for the same batch: the overhead
+the app adds to every scored batch.
+
+Drift detection is checked on three windows of --window-rows flows, fed in
+10,000-row batches: flows from the reference distribution, the same with
+flow_duration scaled by --shift, and with every destination_port moved to
+443. Reported: max PSI, max KS, level and the features flagged.
+
+Usage:
+    python benchmarks/drift.py --batch-rows 100 10000 --shift 3
+"""
+
+import argparse
+import logging
+import time
+
+from common import load_pipeline, make_flows, report
+from utils.drift import DEFAULT_BINS, DEFAULT_SAMPLE_ROWS, DriftMonitor, FeatureHistograms
+
+def best_time(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--reference-rows', type=int, default=200000)
+    parser.add_argument('--batch-rows', type=int, nargs='+', default=[100, 10000, 100000])
+    parser.add_argument('--window-rows', type=int, default=50000)
+    parser.add_argument('--bins', type=int, default=DEFAULT_BINS)
+    parser.add_argument('--shift', type=float, default=3.0)
+    args = parser.parse_args()
+
+    logging.getLogger('utils.drift').setLevel(logging.ERROR)
+    model, scaler, threshold, selected_features, _ = load_pipeline()
+    reference_data, _ = make_flows(selected_features, args.reference_rows, seed=1)
+    build_seconds, reference = best_time(lambda: FeatureHistograms.from_sample(reference_data, selected_features,
+                                                                                args.bins), repeat=1)
+    reference.update(reference_data)
+    print(f"Reference profile: {args.reference_rows:,} rows, {len(selected_features)} features, "
+          f"edges in {build_seconds * 1000:.0f} ms")
+
+    table = []
+    for batch_rows in args.batch_rows:
+        batch, _ = make_flows(selected_features, batch_rows, seed=2)
+        X_scaled = scaler.transform(batch[selected_features])
+        model_seconds, _ = best_time(lambda: model.predict_proba(X_scaled), repeat=3)
+        for label, sample_rows in (('every row', 0), (f'sample {DEFAULT_SAMPLE_ROWS:,}', DEFAULT_SAMPLE_ROWS)):
+            monitor = DriftMonitor(reference, snapshot_seconds=0, sample_rows=sample_rows)
+            drift_seconds, _ = best_time(lambda: monitor.update(batch), repeat=5)
+            table.append((f"{batch_rows:,}", label, f"{drift_seconds / batch_rows * 1e6:.2f}",
+                          f"{model_seconds / batch_rows * 1e6:.2f}", f"{drift_seconds / model_seconds:.1%}"))
+    report(table, ('batch rows', 'counted', 'drift us/row', 'model us/row', 'overhead'))
+
+    windows = []
+    live, _ = make_flows(selected_features, args.window_rows, seed=3)
+    windows.append(('reference distribution', live.copy()))
+    shifted = live.copy()
+    shifted['flow_duration'] *= args.shift
+    windows.append((f'flow_duration x{args.shift:g}', shifted))
+    shifted = live.copy()
+    shifted['destination_port'] = 443
+    windows.append(('destination_port = 443', shifted))
+
+    table = []
+    for label, data in windows:
+        monitor = DriftMonitor(reference, snapshot_seconds=0, seed=0)
+        for start in range(0, len(data), 10000):
+            monitor.update(data.iloc[start:start + 10000])
+        result = monitor.snapshot()
+        table.append((label, f"{result['max_psi']:.3f}", f"{result['max_ks']:.3f}", result['level'],
+                      ', '.join(result['drifted']) or '-'))
+    report(table, ('window', 'max PSI', 'max KS', 'level', 'drifted'))
+
+if __name__ == '__main__':
+    main()
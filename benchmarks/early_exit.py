@@ -0,0 +1,62 @@
+"""
+Benchmark early-exit forest scoring on the sample attack and benign CSVs.
+
+The sample CSVs are tiled to --rows rows each. For each file the full
+forest (predict_proba + threshold) is compared with AnytimeForest in the
+original tree order and in the decisive-first order from order_trees,
+reporting rows/sec, mean trees evaluated per row and decision mismatches.
+
+Usage:
+    python benchmarks/early_exit.py --rows 100000
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from common import ROOT_DIR, load_pipeline, make_flows, report
+from utils.anytime_forest import AnytimeForest, order_trees
+
+def best_time(fn, repeats=3):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--trees', type=int, default=100)
+    args = parser.parse_args()
+
+    model, scaler, threshold, selected_features, _ = load_pipeline(n_estimators=args.trees)
+    model.set_params(n_jobs=1)
+
+    calibration, _ = make_flows(selected_features, 20000, seed=7)
+    order = order_trees(model, scaler.transform(calibration), threshold)
+
+    rows = []
+    for name in ('sample_attack_data.csv', 'sample_network_data.csv'):
+        sample = pd.read_csv(os.path.join(ROOT_DIR, name))[selected_features]
+        data = pd.concat([sample] * (args.rows // len(sample) + 1), ignore_index=True).iloc[:args.rows]
+        X_scaled = scaler.transform(data)
+
+        seconds, scores = best_time(lambda: model.predict_proba(X_scaled)[:, 1])
+        expected = (scores >= threshold).astype(int)
+        rows.append((name, 'full forest', f"{len(data) / seconds:,.0f}", f"{len(model.estimators_):.2f}", 0))
+
+        for label, tree_order in (('early exit', None), ('early exit, ordered', order)):
+            scorer = AnytimeForest(model, threshold, tree_order)
+            seconds, (predictions, _, _, trees) = best_time(lambda: scorer.predict(X_scaled))
+            rows.append((name, label, f"{len(data) / seconds:,.0f}", f"{trees.mean():.2f}",
+                         int(np.count_nonzero(predictions != expected))))
+
+    report(rows, ('data', 'scorer', 'rows/s', 'trees/row', 'mismatches'))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark the float32 feature pipeline against the float64 one.
+
+A CSV of --rows generated flows (or --data) is parsed, scaled and scored by
+IntrusionDetector in both precisions, reporting the size of the parsed and
+scaled batch, peak traced memory, throughput of each stage, and the rows
+whose decision differs between the two paths (check_float32_exactness).
+Time and memory are measured in separate passes because tracemalloc slows
+down allocation-heavy code.
+
+Usage:
+    python benchmarks/float32_pipeline.py --rows 10000000
+"""
+
+import argparse
+import os
+import tempfile
+
+import numpy as np
+
+from common import Measure, load_pipeline, make_flows, report, write_model_dir
+from utils.data_processor import process_csv_file
+from utils.prediction import IntrusionDetector
+
+def write_flows_csv(path, selected_features, num_rows, chunk_rows=1000000):
+    """
+    Write generated flows to a CSV file chunk by chunk.
+    """
+    written = 0
+    while written < num_rows:
+        rows = min(chunk_rows, num_rows - written)
+        data, _ = make_flows(selected_features, rows, seed=written)
+        data.to_csv(path, mode='a' if written else 'w', header=not written, index=False)
+        written += rows
+
+def run(detector, path, float32, trace_memory):
+    with Measure('parse+scale', trace_memory) as prepare:
+        X_scaled, data = process_csv_file(path, detector.selected_features, detector.scaler, float32)
+    with Measure('score', trace_memory) as score:
+        detector.predict(X_scaled)
+    batch_bytes = int(data[detector.selected_features].memory_usage(index=False).sum()) + X_scaled.nbytes
+    return prepare, score, batch_bytes, data
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000000)
+    parser.add_argument('--trees', type=int, default=100)
+    parser.add_argument('--data', help='CSV to use instead of generated flows')
+    args = parser.parse_args()
+
+    model, scaler, threshold, selected_features, _ = load_pipeline(n_estimators=args.trees)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        detector = IntrusionDetector(write_model_dir(os.path.join(tmp, 'model'), model, scaler,
+                                                     threshold, selected_features))
+        path = args.data
+        if path is None:
+            path = os.path.join(tmp, 'flows.csv')
+            write_flows_csv(path, selected_features, args.rows)
+
+        rows = []
+        original = None
+        for label, float32 in (('float64', False), ('float32', True)):
+            prepare, score, batch_bytes, data = run(detector, path, float32, trace_memory=False)
+            prepare_mem, score_mem, _, data = run(detector, path, float32, trace_memory=True)
+            num_rows = len(data)
+            if not float32:
+                # The exactness check starts from the float64 parse
+                original = data[selected_features]
+            del data
+            rows.append((label, f"{batch_bytes / 2**20:,.0f} MiB",
+                         f"{max(prepare_mem.peak_bytes, score_mem.peak_bytes) / 2**20:,.0f} MiB",
+                         f"{num_rows / prepare.seconds:,.0f}", f"{num_rows / score.seconds:,.0f}",
+                         f"{num_rows / (prepare.seconds + score.seconds):,.0f}"))
+
+        report(rows, ('precision', 'batch', 'peak memory', 'parse+scale rows/s', 'score rows/s', 'total rows/s'))
+
+        result = detector.check_float32_exactness(original)
+        mismatches = result['mismatches']
+        print(f"\nExactness: {len(mismatches)} of {result['rows']} decisions differ; "
+              f"{result['confidence_changed']} confidences moved, by at most {result['max_confidence_delta']:.3g}")
+        if len(mismatches):
+            print(f"First differing rows: {np.asarray(mismatches[:20]).tolist()}")
+
+if __name__ == '__main__':
+    main()
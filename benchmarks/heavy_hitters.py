@@ -0,0 +1,112 @@
+"""
+Benchmark the Space-Saving top talkers: update rate, memory, recall.
+
+For each --keys count, --flows flows are drawn from that many sources
+with Zipf-distributed popularity (--skew) and fed in batches of
+--batch-rows, as the collector and flow tracker do, to:
+
+- one SpaceSaving summary (sources by flows);
+- TrafficHeavyHitters (sources, destinations and ports, by flows and by
+  bytes, in one-minute buckets), the tracker the servers keep.
+
+Reported: flows/s, memory of the summaries, recall of the exact top-k
+sources, the largest relative count error within the top-k, and whether
+every reported count was within its error bound of the exact count. The
+exact alternative, a pandas value_counts over the same flows, is timed
+and measured for comparison; its memory grows with the number of keys.
+
+Usage:
+    python benchmarks/heavy_hitters.py --keys 10000 1000000
+"""
+
+import argparse
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+from common import Measure, report
+from utils.heavy_hitters import DEFAULT_CAPACITY, SpaceSaving, TrafficHeavyHitters
+
+def make_flows(flows, keys, skew, seed=0):
+    """Zipf-distributed source keys, destinations, ports and byte counts."""
+    rng = np.random.default_rng(seed)
+    ranks = rng.zipf(skew, flows)
+    sources = (ranks - 1) % keys
+    # Scramble the ranks so heavy keys are not the small integers
+    sources = rng.permutation(keys)[sources].astype(np.uint64)
+    destinations = rng.integers(0, 4096, flows).astype(np.uint64)
+    ports = rng.choice([80, 443, 53, 22, 8080, 3306], flows)
+    flow_bytes = rng.lognormal(8, 2, flows)
+    return sources, destinations, ports, flow_bytes
+
+def accuracy(keys, counts, errors, exact, k):
+    """(recall of the exact top-k, largest relative error in it, bounds held)."""
+    truth = exact.nlargest(k)
+    found = dict(zip(keys[:k].tolist(), counts[:k].tolist()))
+    recall = len(set(truth.index) & set(found)) / k
+    worst = max(abs(found[key] - count) / count for key, count in truth.items() if key in found)
+    true = exact.reindex(keys.tolist(), fill_value=0).to_numpy()
+    bounded = bool(np.all((counts >= true) & (counts - errors <= true)))
+    return recall, worst, bounded
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--keys', type=int, nargs='+', default=[10000, 1000000])
+    parser.add_argument('--flows', type=int, default=2000000)
+    parser.add_argument('--skew', type=float, default=1.2)
+    parser.add_argument('--capacity', type=int, default=DEFAULT_CAPACITY)
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--batch-rows', type=int, default=20000)
+    args = parser.parse_args()
+
+    logging.getLogger('utils.heavy_hitters').setLevel(logging.ERROR)
+    table = []
+    for keys in args.keys:
+        sources, destinations, ports, flow_bytes = make_flows(args.flows, keys, args.skew)
+        exact = pd.Series(sources).value_counts()
+        batches = range(0, args.flows, args.batch_rows)
+
+        with Measure('space-saving') as measure:
+            summary = SpaceSaving(args.capacity)
+            for start in batches:
+                summary.update(sources[start:start + args.batch_rows])
+        start_time = time.perf_counter()
+        summary = SpaceSaving(args.capacity)
+        for start in batches:
+            summary.update(sources[start:start + args.batch_rows])
+        seconds = time.perf_counter() - start_time
+        recall, worst, bounded = accuracy(*summary.top(args.capacity), exact, args.top)
+        table.append((f"{keys:,}", 'SpaceSaving', f"{args.flows / seconds:,.0f}", f"{summary.nbytes / 2**20:.2f}",
+                      f"{measure.peak_bytes / 2**20:.1f}", f"{recall:.0%}", f"{worst:.2%}", 'yes' if bounded else 'NO'))
+
+        now = time.time()
+        start_time = time.perf_counter()
+        tracker = TrafficHeavyHitters(snapshot_seconds=0)
+        for start in batches:
+            end = start + args.batch_rows
+            tracker.update(sources[start:end], destinations[start:end], ports[start:end], flow_bytes[start:end],
+                           now + 60 * start / args.flows)
+        seconds = time.perf_counter() - start_time
+        top = tracker.top('source', 'flows', args.capacity, window=3600)['top']
+        recall, worst, bounded = accuracy(np.array([item['key'] for item in top], dtype=np.uint64),
+                                          np.array([item['count'] for item in top]),
+                                          np.array([item['error'] for item in top]), exact, args.top)
+        table.append((f"{keys:,}", 'TrafficHeavyHitters', f"{args.flows / seconds:,.0f}",
+                      f"{tracker.nbytes / 2**20:.2f}", '-', f"{recall:.0%}", f"{worst:.2%}",
+                      'yes' if bounded else 'NO'))
+
+        with Measure('exact') as measure:
+            pd.Series(sources).value_counts()
+        start_time = time.perf_counter()
+        pd.Series(sources).value_counts()
+        seconds = time.perf_counter() - start_time
+        table.append((f"{keys:,}", 'exact (pandas)', f"{args.flows / seconds:,.0f}", '-',
+                      f"{measure.peak_bytes / 2**20:.1f}", '', '', ''))
+
+    report(table, ('keys', 'method', 'flows/s', 'summary MiB', 'peak MiB', f'top-{args.top} recall',
+                   'max error', 'bounds held'))
+
+if __name__ == '__main__':
+    main()
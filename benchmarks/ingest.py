@@ -0,0 +1,171 @@
+"""
+Benchmark sensor ingestion throughput (/api/ingest) with a local load generator.
+
+--rows generated flows (--attack-share of them attacks, which are stored as
+alerts) are encoded once per body format (CSV, NDJSON objects, compact
+NDJSON arrays) and gzip-compressed. --clients threads then post them over
+HTTP, --requests times each, to a local server that runs the /api/ingest
+pipeline (stream decompression, batch parsing, scaling,
+'streaming' scheduler scoring, alert build and store into a temporary
+database, per-batch summaries). Reports flows/sec per format and the share
+of the time spent in each stage.
+
+With --url the bodies are posted to a running app instead (set --token to a
+sensor token from IDS_INGEST_TOKENS); the model is then only used to
+generate the flows.
+
+Usage:
+    python benchmarks/ingest.py --rows 100000 --requests 3
+    python benchmarks/ingest.py --url http://127.0.0.1:5000/api/ingest --token secret
+"""
+
+import argparse
+import gzip
+import http.client
+import itertools
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+import numpy as np
+from werkzeug.serving import make_server
+from werkzeug.wsgi import get_input_stream
+
+from common import load_pipeline, make_flows, report
+from utils.alerts import build_alerts
+from utils.data_processor import scale_features
+from utils.database import DatabaseManager
+from utils.ingest import CONTENT_TYPES, batch_summary, get_decompressor, iter_flow_batches
+from utils.scheduler import InferenceScheduler
+
+def encode_bodies(data, selected_features):
+    records = data[selected_features]
+    objects = records.to_json(orient='records', lines=True, double_precision=15)
+    arrays = '\n'.join(json.dumps(row) for row in records.to_numpy().tolist())
+    return {
+        'csv': records.to_csv(index=False).encode(),
+        'ndjson objects': objects.encode(),
+        'ndjson arrays': (json.dumps(selected_features) + '\n' + arrays + '\n').encode()
+    }
+
+def make_app(model, scaler, threshold, selected_features, db, batch_rows, stages):
+    """WSGI app running the /api/ingest pipeline of app.py, adding each stage's time to stages."""
+    def predict_scaled(X_scaled):
+        predictions = model.predict_proba(X_scaled)[:, 1]
+        return (predictions >= threshold).astype(int), predictions
+
+    scheduler = InferenceScheduler(predict_scaled)
+
+    def timed_stage(stage, fn, *args):
+        start = time.perf_counter()
+        result = fn(*args)
+        stages[stage] += time.perf_counter() - start
+        return result
+
+    def app(environ, start_response):
+        fmt = CONTENT_TYPES[environ['CONTENT_TYPE']]
+        decompressor = get_decompressor(environ.get('HTTP_CONTENT_ENCODING'))
+        batches = iter_flow_batches(get_input_stream(environ), fmt, selected_features, decompressor, batch_rows)
+        summaries, offset = [], 0
+        for number in itertools.count():
+            data = timed_stage('read + parse', next, batches, None)
+            if data is None:
+                break
+            X_scaled = timed_stage('scale', scale_features, data[selected_features], scaler)
+            results, predictions = timed_stage('score', scheduler.predict, X_scaled, 'streaming')
+            batch = timed_stage('alerts', build_alerts, data, results, predictions, 'Sensor benchmark', offset, X_scaled)
+            if len(batch):
+                timed_stage('alerts', db.add_alerts, batch)
+            summaries.append(json.dumps(batch_summary(number, offset, results, predictions)) + '\n')
+            offset += len(results)
+        start_response('200 OK', [('Content-Type', 'application/x-ndjson')])
+        return [''.join(summaries).encode()]
+
+    return app
+
+def post(url, token, body, content_type):
+    parts = urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=600)
+    conn.request('POST', parts.path, body=body, headers={
+        'Content-Type': content_type, 'Content-Encoding': 'gzip', 'Authorization': f'Bearer {token}'
+    })
+    response = conn.getresponse()
+    lines = response.read().decode().splitlines()
+    conn.close()
+    if response.status != 200:
+        raise RuntimeError(f"HTTP {response.status}: {lines}")
+    return sum(json.loads(line)['rows'] for line in lines if 'batch' in json.loads(line))
+
+def load(url, token, body, content_type, clients, requests):
+    rows = [0] * clients
+
+    def client(i):
+        for _ in range(requests):
+            rows[i] += post(url, token, body, content_type)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(rows), time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000, help='Flows per request')
+    parser.add_argument('--requests', type=int, default=3, help='Requests per client and format')
+    parser.add_argument('--clients', type=int, default=1)
+    parser.add_argument('--batch-rows', type=int, default=50000)
+    parser.add_argument('--attack-share', type=float, default=0.01, help='Share of attack flows (at most ~0.2)')
+    parser.add_argument('--trees', type=int, default=100)
+    parser.add_argument('--url', help='Post to a running app instead of the local server')
+    parser.add_argument('--token', default='benchmark')
+    args = parser.parse_args()
+
+    logging.getLogger('utils.database').setLevel(logging.WARNING)
+    logging.getLogger('utils.alerts').setLevel(logging.WARNING)
+
+    model, scaler, threshold, selected_features, _ = load_pipeline(n_estimators=args.trees)
+    data, labels = make_flows(selected_features, args.rows * 2, seed=4)
+    attacks = int(args.rows * args.attack_share)
+    index = np.concatenate([np.flatnonzero(labels)[:attacks], np.flatnonzero(labels == 0)[:args.rows - attacks]])
+    data = data.iloc[np.sort(index)]
+    bodies = encode_bodies(data, selected_features)
+    compressed = {name: gzip.compress(body, 6) for name, body in bodies.items()}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url, server, stages = args.url, None, Counter()
+        if url is None:
+            db = DatabaseManager(os.path.join(tmp, 'alerts.db'))
+            server = make_server('127.0.0.1', 0, make_app(model, scaler, threshold, selected_features, db,
+                                                          args.batch_rows, stages), threaded=True)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            url = f'http://127.0.0.1:{server.server_port}/api/ingest'
+
+        table = []
+        for name, body in compressed.items():
+            content_type = 'text/csv' if name == 'csv' else 'application/x-ndjson'
+            post(url, args.token, body, content_type)
+            stages.clear()
+            rows, seconds = load(url, args.token, body, content_type, args.clients, args.requests)
+            shares = ', '.join(f"{stage} {total / seconds:.0%}" for stage, total in
+                               sorted(stages.items(), key=lambda item: -item[1]) if total / seconds >= 0.02)
+            table.append((name, f"{len(bodies[name]) / 2**20:.1f} / {len(body) / 2**20:.1f}",
+                          f"{rows:,}", f"{seconds:.2f}", f"{rows / seconds:,.0f}", shares))
+
+        if server:
+            server.shutdown()
+            db.close_connection()
+
+    print(f"{args.clients} clients x {args.requests} requests x {args.rows:,} flows "
+          f"({args.attack_share:.0%} attacks), {args.trees} trees")
+    report(table, ('body', 'MiB raw / gzip', 'flows', 's', 'flows/s', 'time by stage'))
+
+if __name__ == '__main__':
+    main()
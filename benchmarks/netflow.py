@@ -0,0 +1,100 @@
+"""
+Benchmark the NetFlow/IPFIX collector: decode, feature mapping and scoring rates.
+
+--flows synthesized flow records are encoded as NetFlow v5, v9 and IPFIX.
+For each format the export packets are decoded in-process (decode rate),
+mapped onto the model's features and scored through FlowCollector
+(IntrusionDetector.predict with the benchmark model), then replayed over
+localhost UDP at --rate packets/s to a collector running in this process,
+which reports how many records arrived and were scored. UDP packets the
+collector could not read in time are lost, as they would be from a router.
+
+Usage:
+    python benchmarks/netflow.py --flows 300000 --rate 5000
+"""
+
+import argparse
+import asyncio
+import logging
+import socket
+import tempfile
+import threading
+import time
+
+from common import load_pipeline, report, write_model_dir
+from utils.collector import FlowCollector
+from utils.netflow import ENCODERS, NetflowDecoder, flow_features, generate_flow_records
+from utils.prediction import IntrusionDetector
+
+def best_time(fn, repeats=3):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def decode_all(packets):
+    decoder = NetflowDecoder()
+    return [decoder.decode(packet, '192.0.2.1') for packet in packets]
+
+def replay(detector, packets, rate, batch_rows):
+    """Send packets over UDP to an in-process collector; return its counters."""
+    collector = FlowCollector(detector, batch_rows=batch_rows, flush_seconds=0.5)
+    probe = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    probe.bind(('127.0.0.1', 0))
+    port = probe.getsockname()[1]
+    probe.close()
+
+    seconds = len(packets) / rate + 2
+    server = threading.Thread(target=asyncio.run, args=(collector.serve('127.0.0.1', port, 0, seconds),))
+    server.start()
+    time.sleep(0.5)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    start = time.perf_counter()
+    for i, packet in enumerate(packets):
+        delay = start + i / rate - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        sock.sendto(packet, ('127.0.0.1', port))
+    sock.close()
+    server.join()
+    return collector.snapshot()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--flows', type=int, default=300000)
+    parser.add_argument('--attack-share', type=float, default=0.01)
+    parser.add_argument('--batch-rows', type=int, default=20000)
+    parser.add_argument('--rate', type=float, default=5000, help='Replay packets/s')
+    parser.add_argument('--trees', type=int, default=100)
+    args = parser.parse_args()
+
+    for name in ('utils.prediction', 'utils.collector', 'utils.alerts'):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    model, scaler, threshold, selected_features, _ = load_pipeline(n_estimators=args.trees)
+    records, _ = generate_flow_records(args.flows, args.attack_share, seed=7)
+    with tempfile.TemporaryDirectory() as tmp:
+        write_model_dir(tmp, model, scaler, threshold, selected_features)
+        detector = IntrusionDetector(tmp)
+
+    table = []
+    for version, encode in ENCODERS.items():
+        packets = encode(records)
+        decode_seconds = best_time(lambda: decode_all(packets))
+        features_seconds = best_time(lambda: flow_features(records, selected_features))
+        collector = FlowCollector(detector, batch_rows=args.batch_rows)
+        score_seconds = best_time(lambda: collector.score(records), repeats=1)
+        totals = replay(detector, packets, args.rate, args.batch_rows)
+        table.append((f"v{version}", f"{len(packets):,}", f"{args.flows / decode_seconds:,.0f}",
+                      f"{args.flows / features_seconds:,.0f}", f"{args.flows / score_seconds:,.0f}",
+                      f"{totals['packets'] / len(packets):.1%}", f"{totals['scored']:,}"))
+
+    print(f"{args.flows:,} flows, {args.trees} trees, replay at {args.rate:,.0f} packets/s "
+          f"(~{args.rate * args.flows / len(packets):,.0f} flows/s)")
+    report(table, ('format', 'packets', 'decode flows/s', 'features flows/s', 'score flows/s',
+                   'replay received', 'replay scored'))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""
+Benchmark the allowlist/blocklist prefilter: rule evaluation rate and the
+scoring time it saves.
+
+--rules rules (a third block rules on source prefixes, the others allow
+rules on destination prefixes, some with port sets and ranges) with
+--prefixes prefixes each are compiled and evaluated over --rows flows:
+
+- records: FLOW_DTYPE-style 16-byte addresses, as the collector and flow
+  tracker see them;
+- frame: address strings and destination_port in a DataFrame, as uploads
+  and ingestion see them (includes parsing the address strings);
+- naive: the same rules checked per row with ipaddress, on a sample.
+
+Decisions of the vectorized path are checked against the naive one. The
+end-to-end rows then score a batch where --allowed of the flows go to
+allowlisted services, with and without the prefilter in front of the model.
+
+Usage:
+    python benchmarks/prefilter.py --rows 200000 --rules 8 64 --prefixes 1000
+"""
+
+import argparse
+import ipaddress
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+from common import load_pipeline, make_flows, report
+from utils.prefilter import ALLOW, BLOCK, PASS, Prefilter, score_undecided
+
+def make_rules(rules, prefixes, seed=0):
+    """Rules over random /24 (IPv4) prefixes."""
+    rng = np.random.default_rng(seed)
+    result = []
+    for number in range(rules):
+        networks = [str(ipaddress.IPv4Network((int(value) << 8, 24)))
+                    for value in rng.integers(0x0A0000, 0x0AFFFF, prefixes)]
+        if number % 3 == 0:
+            result.append({'name': f'block-{number}', 'action': 'block', 'source': networks})
+        elif number % 3 == 1:
+            result.append({'name': f'allow-{number}', 'action': 'allow', 'destination': networks,
+                           'ports': [53, 443, '8000-8100']})
+        else:
+            result.append({'name': f'allow-{number}', 'action': 'allow', 'destination': networks})
+    return result
+
+def make_addresses(rows, rng):
+    values = rng.integers(0x0A000000, 0x0B000000, rows).astype('>u4')
+    raw = np.zeros((rows, 16), dtype=np.uint8)
+    raw[:, :4] = values.view(np.uint8).reshape(-1, 4)
+    strings = [str(ipaddress.IPv4Address(int(value))) for value in values]
+    return raw.view('V16').ravel(), strings
+
+def naive(rules, source, destination, port):
+    """Per-row decision with ipaddress, block before allow."""
+    compiled = [(rule['action'],
+                 [ipaddress.ip_network(n) for n in rule.get('source', [])],
+                 [ipaddress.ip_network(n) for n in rule.get('destination', [])],
+                 rule.get('ports')) for rule in rules]
+    decisions = []
+    for src, dst, dport in zip(source, destination, port):
+        src, dst = ipaddress.ip_address(src), ipaddress.ip_address(dst)
+        actions = set()
+        for action, sources, destinations, ports in compiled:
+            if sources and not any(src in network for network in sources):
+                continue
+            if destinations and not any(dst in network for network in destinations):
+                continue
+            if ports and not any(low <= dport <= high for low, high in
+                                 ((int(p.split('-')[0]), int(p.split('-')[1])) if isinstance(p, str) else (p, p)
+                                  for p in ports)):
+                continue
+            actions.add(action)
+        decisions.append(BLOCK if 'block' in actions else ALLOW if 'allow' in actions else PASS)
+    return np.array(decisions)
+
+def best_time(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--rules', type=int, nargs='+', default=[8, 64])
+    parser.add_argument('--prefixes', type=int, default=1000)
+    parser.add_argument('--naive-rows', type=int, default=2000)
+    parser.add_argument('--allowed', type=float, default=0.6)
+    args = parser.parse_args()
+
+    logging.getLogger('utils.prefilter').setLevel(logging.WARNING)
+    rng = np.random.default_rng(1)
+    src_raw, src_text = make_addresses(args.rows, rng)
+    dst_raw, dst_text = make_addresses(args.rows, rng)
+    ports = rng.choice([22, 53, 80, 443, 8050, 9000], args.rows)
+    records = np.zeros(args.rows, dtype=[('src_addr', 'V16'), ('dst_addr', 'V16'), ('ip_version', 'u1'),
+                                         ('dst_port', 'u2')])
+    records['src_addr'], records['dst_addr'], records['ip_version'], records['dst_port'] = \
+        src_raw, dst_raw, 4, ports
+    frame = pd.DataFrame({'source_ip': src_text, 'destination_ip': dst_text, 'destination_port': ports})
+
+    table = []
+    for rules in args.rules:
+        rule_list = make_rules(rules, args.prefixes)
+        compile_seconds, prefilter = best_time(lambda: Prefilter(rule_list), repeat=1)
+        seconds, (decisions, _) = best_time(lambda: prefilter.evaluate_records(records))
+        table.append((rules, f"{rules * args.prefixes:,}", 'records', f"{args.rows / seconds:,.0f}",
+                      f"{compile_seconds * 1000:.0f}", f"{np.mean(decisions == ALLOW):.1%}",
+                      f"{np.mean(decisions == BLOCK):.1%}", ''))
+        seconds, (frame_decisions, _) = best_time(lambda: prefilter.evaluate_frame(frame))
+        table.append((rules, f"{rules * args.prefixes:,}", 'frame', f"{args.rows / seconds:,.0f}", '',
+                      '', '', 'yes' if np.array_equal(decisions, frame_decisions) else 'NO'))
+        sample = slice(0, args.naive_rows)
+        seconds, expected = best_time(lambda: naive(rule_list, src_text[sample], dst_text[sample], ports[sample]),
+                                      repeat=1)
+        table.append((rules, f"{rules * args.prefixes:,}", 'naive (ipaddress)', f"{args.naive_rows / seconds:,.0f}",
+                      '', '', '', 'yes' if np.array_equal(decisions[sample], expected) else 'NO'))
+    report(table, ('rules', 'prefixes', 'path', 'rows/s', 'compile ms', 'allowed', 'blocked', 'matches'))
+
+    # Scoring with a share of the traffic going to allowlisted services
+    model, scaler, threshold, selected_features, _ = load_pipeline()
+    data, _ = make_flows(selected_features, args.rows)
+    data['destination_port'] = np.where(rng.random(args.rows) < args.allowed, 443, 80)
+    X_scaled = scaler.transform(data[selected_features])
+    prefilter = Prefilter([{'name': 'internal-https', 'action': 'allow', 'ports': [443]}])
+
+    def predict(X):
+        scores = model.predict_proba(X)[:, 1]
+        return (scores >= threshold).astype(int), scores
+
+    model_seconds, _ = best_time(lambda: predict(X_scaled), repeat=1)
+    prefiltered_seconds, _ = best_time(
+        lambda: score_undecided(prefilter.evaluate_frame(data)[0], predict, X_scaled), repeat=1)
+    report([('model only', f"{args.rows:,}", f"{model_seconds:.2f}", f"{args.rows / model_seconds:,.0f}"),
+            ('prefilter + model', f"{int(np.count_nonzero(data['destination_port'] != 443)):,}",
+             f"{prefiltered_seconds:.2f}", f"{args.rows / prefiltered_seconds:,.0f}")],
+           ('path', 'rows scored', 'seconds', 'rows/s'))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark /predict-manual latency while a bulk upload is being scored.
+
+The manual-prediction path of app.py (one-row DataFrame, scale, predict,
+threshold) is timed from one thread while --bulk-threads threads keep
+scoring --chunk-rows chunks like score_file_chunks does. This runs three
+times: with no bulk load, with bulk and manual work calling the model
+directly (as before the scheduler), and with both going through
+InferenceScheduler as 'bulk' and 'interactive' work.
+
+Usage:
+    python benchmarks/priority_scheduler.py --requests 200
+"""
+
+import argparse
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from common import load_pipeline, make_flows, report
+from utils.scheduler import InferenceScheduler
+
+def percentile(samples, q):
+    return float(np.percentile(samples, q)) * 1000
+
+def run(predict_manual, predict_bulk, X_bulk, rows, args):
+    stop = threading.Event()
+    bulk_rows = [0]
+
+    def bulk():
+        while not stop.is_set():
+            predict_bulk(X_bulk)
+            bulk_rows[0] += X_bulk.shape[0]
+
+    threads = [threading.Thread(target=bulk, daemon=True) for _ in range(args.bulk_threads if predict_bulk else 0)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.2)
+
+    latencies = []
+    start = time.perf_counter()
+    for i in range(args.requests):
+        row = rows[i % len(rows)]
+        begin = time.perf_counter()
+        predict_manual(row)
+        latencies.append(time.perf_counter() - begin)
+        time.sleep(args.think_ms / 1000)
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return latencies, bulk_rows[0] / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--chunk-rows', type=int, default=100000)
+    parser.add_argument('--bulk-threads', type=int, default=2)
+    parser.add_argument('--think-ms', type=float, default=10)
+    parser.add_argument('--bulk-slice', type=int, default=None, help='Rows per bulk slice (scheduler default if omitted)')
+    parser.add_argument('--trees', type=int, default=100)
+    args = parser.parse_args()
+
+    model, scaler, threshold, selected_features, _ = load_pipeline(n_estimators=args.trees)
+    data, _ = make_flows(selected_features, args.chunk_rows, seed=1)
+    X_bulk = scaler.transform(data)
+    rows = [dict(zip(selected_features, values)) for values in data.head(100).to_numpy().tolist()]
+
+    def predict_scaled(X_scaled):
+        predictions = model.predict_proba(X_scaled)[:, 1]
+        return (predictions >= threshold).astype(int), predictions
+
+    def manual(predict):
+        def predict_manual(row):
+            X_scaled = scaler.transform(pd.DataFrame([row]))
+            results, predictions = predict(X_scaled)
+            return int(results[0]), float(predictions[0])
+        return predict_manual
+
+    scheduler = InferenceScheduler(predict_scaled, slice_rows={'bulk': args.bulk_slice} if args.bulk_slice else None)
+    scenarios = (
+        ('idle', manual(predict_scaled), None),
+        ('bulk load, direct', manual(predict_scaled), predict_scaled),
+        ('bulk load, scheduler', manual(lambda X: scheduler.predict(X, 'interactive')),
+         lambda X: scheduler.predict(X, 'bulk')),
+    )
+
+    table = []
+    for name, predict_manual, predict_bulk in scenarios:
+        latencies, bulk_rate = run(predict_manual, predict_bulk, X_bulk, rows, args)
+        table.append((name, f"{percentile(latencies, 50):.1f}", f"{percentile(latencies, 99):.1f}",
+                      f"{max(latencies) * 1000:.1f}", f"{bulk_rate:,.0f}"))
+
+    print(f"slots: {scheduler.slots}, bulk slice: {scheduler.slice_rows['bulk']} rows, "
+          f"bulk threads: {args.bulk_threads} x {args.chunk_rows} rows")
+    report(table, ('scenario', 'manual p50 ms', 'manual p99 ms', 'manual max ms', 'bulk rows/s'))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark /predict-file response construction: one JSON document versus
+streamed NDJSON/CSV and the intrusions-only summary.
+
+Reports time-to-first-byte, total time and peak traced memory for each
+response format over the same uploaded CSV.
+
+Usage:
+    python benchmarks/result_streaming.py --rows 1000000 --chunksize 100000
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from common import Measure, load_pipeline, make_flows, report
+from utils.data_processor import iter_csv_chunks
+from utils.streaming import stream_results, summarize_intrusions
+
+def score_chunks(file_path, model, scaler, threshold, selected_features, chunksize):
+    for X_scaled, _ in iter_csv_chunks(file_path, selected_features, scaler, chunksize):
+        predictions = model.predict_proba(X_scaled)[:, 1]
+        yield (predictions >= threshold).astype(int), predictions
+
+def current_response(file_path, model, scaler, threshold, selected_features):
+    data = pd.read_csv(file_path)
+    X_scaled = scaler.transform(data[selected_features])
+    predictions = model.predict_proba(X_scaled)[:, 1]
+    results = (predictions >= threshold).astype(int)
+    body = json.dumps({
+        'total': len(results),
+        'intrusions': int(sum(results)),
+        'safe': int(len(results) - sum(results)),
+        'results': [{'index': i, 'is_intrusion': bool(result), 'confidence': float(predictions[i])}
+                    for i, result in enumerate(results)]
+    })
+    yield body
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--chunksize', type=int, default=100000)
+    parser.add_argument('--trees', type=int, default=20)
+    args = parser.parse_args()
+
+    model, scaler, threshold, selected_features, _ = load_pipeline(n_estimators=args.trees)
+    model.set_params(n_jobs=1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        file_path = os.path.join(tmp, 'upload.csv')
+        df, _ = make_flows(selected_features, args.rows, seed=1)
+        df.to_csv(file_path, index=False)
+        del df
+        print(f"Upload: {args.rows} rows, {os.path.getsize(file_path) / 1e6:.1f} MB")
+
+        formats = {
+            'json (current)': lambda: current_response(file_path, model, scaler, threshold, selected_features),
+            'ndjson stream': lambda: stream_results(
+                score_chunks(file_path, model, scaler, threshold, selected_features, args.chunksize), 'ndjson'),
+            'csv stream': lambda: stream_results(
+                score_chunks(file_path, model, scaler, threshold, selected_features, args.chunksize), 'csv'),
+            'intrusions only': lambda: iter([json.dumps(summarize_intrusions(
+                score_chunks(file_path, model, scaler, threshold, selected_features, args.chunksize)))]),
+        }
+
+        rows = []
+        for name, make_body in formats.items():
+            # Time and memory are measured in separate passes because
+            # tracemalloc slows down every Python allocation
+            with Measure(name, trace_memory=False) as timing:
+                body = make_body()
+                first = next(body)
+                ttfb = time.perf_counter() - timing.start
+                size = len(first)
+                for piece in body:
+                    size += len(piece)
+            with Measure(name) as memory:
+                for piece in make_body():
+                    pass
+            rows.append((name, f"{ttfb:.3f}", f"{timing.seconds:.3f}",
+                         f"{memory.peak_bytes / 1e6:.1f}", f"{size / 1e6:.1f}"))
+
+    report(rows, ('format', 'ttfb_s', 'total_s', 'peak_mem_MB', 'body_MB'))
+
+if __name__ == '__main__':
+    main()
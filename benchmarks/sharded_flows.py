@@ -0,0 +1,132 @@
+"""
+Benchmark hash-sharded flow tracking: dispatch, flow table and end-to-end rates.
+
+--flows synthesized TCP connections (both directions, interleaved) are
+written to a temporary pcap and replayed through ShardedFlowTracker with
+each of --workers worker processes, scoring with the benchmark model and
+without an alert store. Also measured in-process: reading the capture,
+reading plus hashing and splitting it (the dispatcher's share of the work)
+and a single FlowTable with scoring (one worker's share).
+
+Every connection must land on one shard in both directions: the benchmark
+checks that no connection's packets are split across shards and that the
+number of flows is the same for every worker count. Throughput only scales
+with workers up to the number of free cores (and the dispatch rate);
+the core count is printed with the results.
+
+Usage:
+    python benchmarks/sharded_flows.py --flows 50000 --workers 1 2 4
+"""
+
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from common import load_pipeline, report, write_model_dir
+from utils.flow_table import FlowTable, flow_hash
+from utils.packets import generate_packets, read_packets, write_packets
+from utils.prediction import IntrusionDetector
+from utils.sharding import ShardedFlowTracker, score_flows, shard_of
+
+def best_time(fn, repeats=3):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def read_all(path):
+    for _ in read_packets(path):
+        pass
+
+def dispatch_all(path, workers):
+    """The dispatcher's work without the workers: read, hash, split."""
+    for packets in read_packets(path):
+        shards = shard_of(flow_hash(packets), workers)
+        order = np.argsort(shards, kind='stable')
+        bounds = np.searchsorted(shards[order], np.arange(workers + 1))
+        for shard in range(workers):
+            packets[order[bounds[shard]:bounds[shard + 1]]]
+
+def track_inline(path, detector, block_packets=65536):
+    """One worker's work in-process: a single flow table, scoring ended flows."""
+    table = FlowTable()
+    flows = 0
+    pending = []
+    for packets in read_packets(path):
+        pending.append(packets)
+        if sum(map(len, pending)) >= block_packets:
+            features, rows = table.update(np.concatenate(pending))
+            score_flows(detector, features, rows, 'benchmark')
+            flows += len(rows)
+            pending = []
+    if pending:
+        features, rows = table.update(np.concatenate(pending))
+        score_flows(detector, features, rows, 'benchmark')
+        flows += len(rows)
+    features, rows = table.flush()
+    score_flows(detector, features, rows, 'benchmark')
+    return flows + len(rows)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--flows', type=int, default=50000)
+    parser.add_argument('--attack-share', type=float, default=0.01)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--trees', type=int, default=100)
+    args = parser.parse_args()
+
+    for name in ('utils.prediction', 'utils.alerts'):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    model, scaler, threshold, selected_features, _ = load_pipeline(n_estimators=args.trees)
+    packets, connection, _ = generate_packets(args.flows, args.attack_share, seed=7)
+    count = len(packets)
+    with tempfile.TemporaryDirectory() as tmp:
+        model_dir = os.path.join(tmp, 'model')
+        os.makedirs(model_dir)
+        write_model_dir(model_dir, model, scaler, threshold, selected_features)
+        detector = IntrusionDetector(model_dir)
+        path = os.path.join(tmp, 'flows.pcap')
+        size = write_packets(path, packets)
+        print(f"{args.flows:,} connections, {count:,} packets ({size / 2**20:.0f} MiB pcap), "
+              f"{args.trees} trees, {os.cpu_count()} cores")
+
+        keys = flow_hash(packets)
+        for workers in args.workers:
+            shards = shard_of(keys, workers)
+            first = np.zeros(args.flows, dtype=np.int64)
+            first[connection[::-1]] = shards[::-1]
+            split = int((shards != first[connection]).sum())
+            if split:
+                raise SystemExit(f"{split:,} packets on a different shard than their connection ({workers} workers)")
+
+        table = [('read pcap', f"{count / best_time(lambda: read_all(path)):,.0f}", '', '')]
+        table.append(('read + hash + split', f"{count / best_time(lambda: dispatch_all(path, 4)):,.0f}", '', ''))
+        start = time.perf_counter()
+        flows = track_inline(path, detector)
+        seconds = time.perf_counter() - start
+        table.append(('1 table in-process', f"{count / seconds:,.0f}", f"{flows:,}", ''))
+
+        for workers in args.workers:
+            tracker = ShardedFlowTracker(model_dir, workers=workers)
+            tracker.start()
+            for block in read_packets(path):
+                tracker.submit(block)
+            totals = tracker.close()
+            if totals['errors'] or totals['flows'] != flows:
+                raise SystemExit(f"{workers} workers: {totals['flows']:,} flows, expected {flows:,} "
+                                 f"({totals['errors']})")
+            shard_packets = [stats['packets'] for stats in totals['shards']]
+            table.append((f"{workers} workers", f"{count / totals['seconds']:,.0f}", f"{totals['flows']:,}",
+                          f"{max(shard_packets) / np.mean(shard_packets):.3f}"))
+
+    report(table, ('stage', 'packets/s', 'flows', 'largest shard / mean'))
+
+if __name__ == '__main__':
+    main()
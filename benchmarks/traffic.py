@@ -0,0 +1,50 @@
+"""
+Benchmark the synthetic traffic generator against the sample data
+generator and pandas CSV output.
+
+For each --rows size: rows/s of generate_flows (default mix) and of
+generate_sample_data (as used by make_flows), then of encode_csv and
+DataFrame.to_csv on the generated flows, with the CSV size.
+
+Usage:
+    python benchmarks/traffic.py --rows 100000 1000000
+"""
+
+import argparse
+import logging
+import time
+
+from common import MODEL_DIR, make_flows, report
+from utils.data_processor import load_selected_features
+from utils.traffic import encode_csv, generate_flows
+
+def best_time(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    logging.getLogger('utils.data_processor').setLevel(logging.ERROR)
+    selected_features = load_selected_features(MODEL_DIR)
+    table = []
+    for rows in args.rows:
+        seconds, flows = best_time(lambda: generate_flows(rows, seed=0), args.repeat)
+        table.append((f"{rows:,}", 'generate_flows', f"{rows / seconds:,.0f}", '-'))
+        seconds, _ = best_time(lambda: make_flows(selected_features, rows), args.repeat)
+        table.append((f"{rows:,}", 'generate_sample_data', f"{rows / seconds:,.0f}", '-'))
+        seconds, data = best_time(lambda: encode_csv(flows), args.repeat)
+        table.append((f"{rows:,}", 'encode_csv', f"{rows / seconds:,.0f}", f"{len(data) / 2**20:,.1f}"))
+        seconds, data = best_time(lambda: flows.to_csv(index=False, float_format='%.3f').encode(), 1)
+        table.append((f"{rows:,}", 'DataFrame.to_csv', f"{rows / seconds:,.0f}", f"{len(data) / 2**20:,.1f}"))
+    report(table, ('rows', 'step', 'rows/s', 'CSV MiB'))
+
+if __name__ == '__main__':
+    main()
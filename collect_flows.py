@@ -0,0 +1,107 @@
+"""
+Collect NetFlow v5/v9 and IPFIX exports and score them with the IDS model.
+
+Point routers or switches (or replay_flows.py) at --port/udp. Records are
+scored in batches of --batch-rows (or after --flush-seconds) and intrusions
+are stored as alerts in --db, where the dashboard shows them. Receive,
+decode and score rates are logged every --report-seconds.
+
+Flow records carry per-flow counters only: the features the model needs
+that NetFlow cannot provide (inter-arrival statistics, packet length
+variance, window sizes; backward counters without RFC 5103 biflow export)
+are scored at their training mean and listed at startup. Expect lower
+accuracy than on CICFlowMeter features.
+
+Alongside the model, sources contacting more than --scan-ports distinct
+ports or --scan-hosts distinct hosts, and destinations receiving more than
+--flood-flows flows, within a --window-seconds window raise one aggregated
+alert each (--no-cross-flow to disable).
+
+The top sources, destinations and ports by flows and bytes are stored
+in the metrics table every minute for the dashboard's /api/top-talkers
+(--no-top-talkers to disable).
+
+Flows matching the allowlist or blocklist rules stored in --db (see the
+dashboard's /admin/prefilter) are decided without the model
+(--no-prefilter to ignore them).
+
+Usage:
+    python collect_flows.py --port 2055 --db ids_database.db
+    python collect_flows.py --port 2055 --no-db --duration 60
+"""
+
+import argparse
+import asyncio
+
+from utils.collector import DEFAULT_BATCH_ROWS, DEFAULT_FLUSH_SECONDS, DEFAULT_PORT, FlowCollector
+from utils.correlation import (DEFAULT_FLOOD_THRESHOLD, DEFAULT_HOST_THRESHOLD, DEFAULT_PORT_THRESHOLD,
+                               DEFAULT_WINDOW_SECONDS, CrossFlowDetector)
+from utils.database import DatabaseManager
+from utils.heavy_hitters import TrafficHeavyHitters
+from utils.netflow import feature_availability
+from utils.prediction import IntrusionDetector
+from utils.prefilter import Prefilter
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='0.0.0.0', help='Listen address')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='UDP port')
+    parser.add_argument('--model-dir', default='models', help='Model directory')
+    parser.add_argument('--db', default='ids_database.db', help='SQLite database file for alerts')
+    parser.add_argument('--no-db', action='store_true', help='Only count intrusions, do not store alerts')
+    parser.add_argument('--batch-rows', type=int, default=DEFAULT_BATCH_ROWS, help='Flow records scored together')
+    parser.add_argument('--flush-seconds', type=float, default=DEFAULT_FLUSH_SECONDS,
+                        help='Longest a record waits for its batch to fill')
+    parser.add_argument('--report-seconds', type=float, default=10, help='Rate logging interval (0 to disable)')
+    parser.add_argument('--duration', type=float, help='Stop after this many seconds')
+    parser.add_argument('--float32', action='store_true', help='Score in float32')
+    parser.add_argument('--no-cross-flow', action='store_true', help='Disable scan and flood detection')
+    parser.add_argument('--window-seconds', type=float, default=DEFAULT_WINDOW_SECONDS,
+                        help='Scan and flood detection window')
+    parser.add_argument('--scan-ports', type=int, default=DEFAULT_PORT_THRESHOLD,
+                        help='Distinct ports from one source that make a port scan')
+    parser.add_argument('--scan-hosts', type=int, default=DEFAULT_HOST_THRESHOLD,
+                        help='Distinct hosts from one source that make a host scan')
+    parser.add_argument('--flood-flows', type=int, default=DEFAULT_FLOOD_THRESHOLD,
+                        help='Flows to one destination that make a flood')
+    parser.add_argument('--no-top-talkers', action='store_true', help='Disable top-talker tracking')
+    parser.add_argument('--no-prefilter', action='store_true', help='Ignore the allowlist/blocklist rules in --db')
+    args = parser.parse_args()
+
+    detector = IntrusionDetector(args.model_dir, float32=args.float32)
+    availability = feature_availability(detector.selected_features, biflow=True)
+    print(f"{'feature':<28}source in flow records")
+    for feature, source in availability.items():
+        print(f"{feature:<28}{source}")
+
+    db = None if args.no_db else DatabaseManager(args.db)
+    correlator = None if args.no_cross_flow else CrossFlowDetector(
+        args.window_seconds, args.scan_ports, args.scan_hosts, args.flood_flows)
+    heavy_hitters = None if args.no_top_talkers else TrafficHeavyHitters(db=db, component='NetFlow collector')
+    prefilter = None if db is None or args.no_prefilter else Prefilter(db=db)
+    collector = FlowCollector(detector, db, batch_rows=args.batch_rows, flush_seconds=args.flush_seconds,
+                              correlator=correlator, heavy_hitters=heavy_hitters, prefilter=prefilter)
+    try:
+        asyncio.run(collector.serve(args.host, args.port, args.report_seconds, args.duration))
+    except KeyboardInterrupt:
+        collector.drain()
+    finally:
+        totals = collector.snapshot()
+        rates = collector.rates()
+        print(f"\n{totals['packets']:,} packets, {totals['records']:,} flows, {totals['scored']:,} scored, "
+              f"{totals['intrusions']:,} intrusions, {totals['cross_flow_alerts']:,} scan/flood alerts, "
+              f"{totals['dropped']:,} dropped")
+        if prefilter is not None:
+            status = prefilter.status()
+            print(f"{status['allowed']:,} allowlisted and {status['blocked']:,} blocklisted by "
+                  f"{status['rules']} prefilter rules")
+        if rates['decode_capacity'] and rates['score_capacity']:
+            print(f"decode {rates['decode_capacity']:,.0f} flows/s, score {rates['score_capacity']:,.0f} flows/s "
+                  f"(per second spent decoding / scoring)")
+        if heavy_hitters is not None:
+            heavy_hitters.snapshot()
+        if db is not None:
+            db.close_connection()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""
+Compact the RandomForest into a smaller forest under an accuracy budget.
+
+The labeled CSV is split into a fitting part and a held-out part. With
+--strategy select the forest keeps only its most decisive trees (ranked on
+the fitting part); with --strategy distill a smaller, shallower forest is
+trained on the original forest's decisions over the fitting part. The
+smallest candidate whose --metric (as reported by evaluate_model) on the
+held-out part drops by at most --max-drop is written as a new model version
+directory, together with compaction_report.json comparing size, load time,
+latency and metrics with the original model. --strategy auto tries both and
+keeps the smaller result.
+
+Usage:
+    python compact_forest.py --data labeled.csv [--strategy auto] [--metric f1_score] [--max-drop 0.001]
+"""
+
+import argparse
+import json
+import os
+import shutil
+from datetime import datetime
+
+import joblib
+import numpy as np
+
+from utils.anytime_forest import order_trees, save_tree_order
+from utils.compaction import distill_forest, forest_stats, select_trees
+from utils.data_processor import load_labeled_csv
+from utils.prediction import IntrusionDetector, compute_metrics
+
+METRICS = ('accuracy', 'precision', 'recall', 'f1_score', 'false_positive_rate', 'false_negative_rate', 'auc_roc')
+
+def write_version(output_dir, model_dir, forest, threshold, strategy, report):
+    """
+    Write a model version directory loadable by IntrusionDetector.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    joblib.dump(forest, os.path.join(output_dir, 'final_model_compressed.joblib'), compress=3)
+    for name in ('scaler.pkl', 'selected_features.csv'):
+        shutil.copy(os.path.join(model_dir, name), os.path.join(output_dir, name))
+    with open(os.path.join(output_dir, 'optimal_threshold.txt'), 'w') as f:
+        f.write(str(threshold))
+    with open(os.path.join(output_dir, 'model_info.txt'), 'w') as f:
+        f.write(f"model_name: Random Forest ({strategy} compaction)\n")
+        f.write(f"model_type: {type(forest).__name__}\n")
+        f.write(f"feature_count: {forest.n_features_in_}\n")
+        f.write(f"creation_date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        f.write(f"parent_model: {os.path.abspath(model_dir)}\n")
+        f.write(f"n_estimators: {len(forest.estimators_)}\n")
+    with open(os.path.join(output_dir, 'compaction_report.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', required=True, help='Labeled CSV (e.g. CICIDS2017) with the selected features')
+    parser.add_argument('--model-dir', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models'))
+    parser.add_argument('--output', help='Directory of the new model version (default: <model-dir>/versions/compact-<timestamp>)')
+    parser.add_argument('--strategy', choices=['auto', 'select', 'distill'], default='auto')
+    parser.add_argument('--metric', choices=[m for m in METRICS if m != 'auc_roc'], default='f1_score')
+    parser.add_argument('--max-drop', type=float, default=0.001,
+                        help='Allowed drop of the metric (increase for error rates) relative to the original model')
+    parser.add_argument('--holdout-fraction', type=float, default=0.3)
+    parser.add_argument('--label-column', default='label')
+    parser.add_argument('--dry-run', action='store_true', help='Report without writing the model version')
+    args = parser.parse_args()
+
+    detector = IntrusionDetector(args.model_dir)
+    forest, threshold = detector.model, detector.threshold
+
+    X, y, _ = load_labeled_csv(args.data, detector.selected_features, args.label_column)
+    X_scaled = detector.scaler.transform(X)
+    order = np.random.RandomState(42).permutation(len(y))
+    split = int(len(y) * (1 - args.holdout_fraction))
+    X_fit, X_holdout, y_holdout = X_scaled[order[:split]], X_scaled[order[split:]], y[order[split:]]
+
+    baseline_scores = forest.predict_proba(X_holdout)[:, 1]
+    baseline_metrics = compute_metrics(y_holdout, (baseline_scores >= threshold).astype(int), baseline_scores)
+
+    candidates = []
+    if args.strategy in ('auto', 'select'):
+        tree_order = order_trees(forest, X_fit, threshold)
+        compact, metrics = select_trees(forest, threshold, X_holdout, y_holdout,
+                                        args.metric, args.max_drop, tree_order)
+        candidates.append(('select', compact, metrics, threshold))
+    if args.strategy in ('auto', 'distill'):
+        compact, metrics, compact_threshold = distill_forest(forest, threshold, X_fit, X_holdout, y_holdout,
+                                                             args.metric, args.max_drop)
+        candidates.append(('distill', compact, metrics, compact_threshold))
+
+    strategy, compact, metrics, compact_threshold = min(
+        candidates, key=lambda c: sum(tree.tree_.node_count for tree in c[1].estimators_)
+    )
+    if compact is forest:
+        print(f"\nNo compacted forest keeps {args.metric} within {args.max_drop} of the original model")
+        return
+
+    before = forest_stats(forest, X_holdout)
+    after = forest_stats(compact, X_holdout)
+
+    print(f"\nStrategy: {strategy}, holdout rows: {len(y_holdout)}, budget: {args.metric} within {args.max_drop}")
+    print(f"{'':<22}{'original':>14}{'compact':>14}{'ratio':>10}")
+    for name in ('n_estimators', 'node_count', 'max_depth', 'compressed_bytes', 'load_seconds',
+                 'rows_per_second', 'single_row_ms'):
+        ratio = after[name] / before[name] if before[name] else float('nan')
+        print(f"{name:<22}{before[name]:>14,.4g}{after[name]:>14,.4g}{ratio:>10.3f}")
+    print(f"{'metric':<22}{'original':>14}{'compact':>14}{'delta':>10}")
+    # auc_roc is missing when the holdout has a single class
+    compared = [name for name in METRICS if name in metrics and name in baseline_metrics]
+    for name in compared:
+        delta = metrics[name] - baseline_metrics[name]
+        print(f"{name:<22}{baseline_metrics[name]:>14.4f}{metrics[name]:>14.4f}{delta:>+10.4f}")
+
+    if args.dry_run:
+        return
+
+    output_dir = args.output or os.path.join(
+        args.model_dir, 'versions', f"compact-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+    )
+    report = {
+        'strategy': strategy,
+        'metric': args.metric,
+        'max_drop': args.max_drop,
+        'holdout_rows': len(y_holdout),
+        'threshold': compact_threshold,
+        'original': {'stats': before, 'metrics': baseline_metrics},
+        'compact': {'stats': after, 'metrics': metrics},
+        'metric_deltas': {name: metrics[name] - baseline_metrics[name] for name in compared}
+    }
+    write_version(output_dir, args.model_dir, compact, compact_threshold, strategy, report)
+    if strategy == 'select':
+        # Kept trees are already most decisive first
+        save_tree_order(output_dir, range(len(compact.estimators_)))
+    print(f"\nCompacted model written to {output_dir}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Evaluate the model on a labeled dataset too large to load into memory.
+
+The CSV or Parquet dataset (e.g. the full CICIDS2017 corpus) is streamed in
+chunks, optionally scored by several worker threads, and the metrics of the
+README's model performance table are printed together with a per-label
+breakdown (detection rate of each attack type, false positive rate of
+benign traffic). --compare also runs the in-memory compute_metrics on the
+same file and prints the differences, for files small enough to load.
+
+Usage:
+    python evaluate_dataset.py --data cicids2017.csv --label-column " Label" [--workers 4]
+"""
+
+import argparse
+import json
+import os
+import time
+
+from utils.data_processor import load_labeled_csv
+from utils.prediction import IntrusionDetector, compute_metrics
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', required=True, help='Labeled CSV or Parquet dataset')
+    parser.add_argument('--model-dir', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models'))
+    parser.add_argument('--label-column', default='label')
+    parser.add_argument('--benign-label', default='BENIGN')
+    parser.add_argument('--chunksize', type=int, default=100000)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--bins', type=int, default=10000, help='Score histogram bins used for the AUC')
+    parser.add_argument('--float32', action='store_true', help='Score in float32')
+    parser.add_argument('--compare', action='store_true', help='Also compute the metrics in memory and print the differences')
+    parser.add_argument('--output', help='Write the metrics and breakdown as JSON to this file')
+    args = parser.parse_args()
+
+    detector = IntrusionDetector(args.model_dir, float32=args.float32)
+
+    start = time.perf_counter()
+    report = detector.evaluate_dataset(args.data, args.label_column, args.benign_label,
+                                       args.chunksize, args.workers, args.bins)
+    seconds = time.perf_counter() - start
+    metrics = report['metrics']
+
+    print(f"\nEvaluation Results: {metrics['rows']} rows in {seconds:.2f} seconds "
+          f"({metrics['rows'] / seconds:,.0f} rows/s, {args.workers} worker(s))")
+    if report['dropped_rows']:
+        print(f"{report['dropped_rows']:,} rows with infinite or missing values dropped")
+    for name in ('accuracy', 'precision', 'recall', 'f1_score', 'false_positive_rate',
+                 'false_negative_rate', 'specificity', 'auc_roc'):
+        if name in metrics:
+            print(f"{name:<22}{metrics[name]:.4f}")
+
+    print(f"\n{'label':<30}{'rows':>12}{'flagged':>12}{'rate':>10}")
+    for label, counts in report['labels'].items():
+        print(f"{label:<30}{counts['rows']:>12}{counts['flagged']:>12}{counts['flagged_rate']:>10.4f}")
+
+    if args.compare:
+        X, y, _ = load_labeled_csv(args.data, detector.selected_features, args.label_column, args.benign_label)
+        y_pred, y_scores = detector.predict(detector.scaler.transform(X))
+        in_memory = compute_metrics(y, y_pred, y_scores)
+        print(f"\n{'metric':<22}{'streaming':>12}{'in memory':>12}{'delta':>12}")
+        for name, value in in_memory.items():
+            print(f"{name:<22}{metrics[name]:>12.6f}{value:>12.6f}{metrics[name] - value:>+12.2e}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.output}")
+
+if __name__ == '__main__':
+    main()
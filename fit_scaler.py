@@ -0,0 +1,74 @@
+"""
+Fit the feature scaler on a training dataset too large to load into memory.
+
+The selected features of the CSV or Parquet dataset (e.g. the full
+CICIDS2017 corpus) are streamed in chunks by --workers processes, each
+reading its own part of the file, and reduced to per-feature means and
+variances that are merged exactly. Infinite and missing values are ignored
+per feature, or with --drop-incomplete every row containing one is dropped.
+The resulting StandardScaler is written to scaler.pkl in --model-dir (or
+--output). --compare also fits a StandardScaler in memory on the same file
+and prints the largest differences, for files small enough to load.
+
+Usage:
+    python fit_scaler.py --data cicids2017.csv [--workers 4] [--drop-incomplete]
+"""
+
+import argparse
+import os
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+from utils.data_processor import load_selected_features
+from utils.scaling import fit_scaler
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', required=True, help='Training CSV or Parquet dataset')
+    parser.add_argument('--model-dir', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models'))
+    parser.add_argument('--output', help='Scaler file to write (default: scaler.pkl in --model-dir)')
+    parser.add_argument('--chunksize', type=int, default=100000)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--drop-incomplete', action='store_true',
+                        help='Drop rows with any infinite or missing feature value')
+    parser.add_argument('--compare', action='store_true', help='Also fit in memory and print the differences')
+    args = parser.parse_args()
+
+    selected_features = load_selected_features(args.model_dir)
+    start = time.perf_counter()
+    scaler, moments = fit_scaler(args.data, selected_features, args.chunksize, args.workers, args.drop_incomplete)
+    seconds = time.perf_counter() - start
+    size = os.path.getsize(args.data)
+    print(f"\nScaler fitted on {moments.rows:,} rows ({size / 2**20:,.0f} MiB) in {seconds:.2f} seconds "
+          f"({moments.rows / seconds:,.0f} rows/s, {size / 2**20 / seconds:,.1f} MiB/s, {args.workers} worker(s))")
+    if args.drop_incomplete:
+        print(f"{moments.dropped_rows:,} rows with infinite or missing values dropped")
+
+    print(f"\n{'feature':<28}{'mean':>16}{'scale':>16}{'non-finite':>12}")
+    for j, feature in enumerate(selected_features):
+        print(f"{feature:<28}{scaler.mean_[j]:>16.6g}{scaler.scale_[j]:>16.6g}{moments.nonfinite[j]:>12,}")
+
+    if args.compare:
+        data = pd.read_csv(args.data, usecols=selected_features)[selected_features]
+        data = data.astype(np.float64).replace([np.inf, -np.inf], np.nan)
+        if args.drop_incomplete:
+            data = data.dropna()
+        in_memory = StandardScaler().fit(data)
+        print(f"\n{'attribute':<22}{'max relative difference':>26}")
+        for name in ('mean_', 'var_', 'scale_', 'n_samples_seen_'):
+            expected = np.asarray(getattr(in_memory, name), dtype=np.float64)
+            actual = np.asarray(getattr(scaler, name), dtype=np.float64)
+            difference = np.max(np.abs(actual - expected) / np.maximum(np.abs(expected), np.finfo(np.float64).tiny))
+            print(f"{name:<22}{difference:>26.3g}")
+
+    output = args.output or os.path.join(args.model_dir, 'scaler.pkl')
+    with open(output, 'wb') as f:
+        pickle.dump(scaler, f)
+    print(f"\nScaler saved to {output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""
+Generate synthetic CICIDS-shaped flows for load testing.
+
+--rows flows are drawn from a mixture of traffic profiles (--mix, e.g.
+web=0.6,dns=0.2,ddos=0.1,portscan=0.1; profiles: web, dns and bulk benign
+traffic, ddos, portscan, ssh-patator and ftp-patator attacks) with the
+CICFlowMeter relationships between the features kept in every row, and
+written as CSV (or Parquet, by extension) to --output. With --output -
+the CSV goes to stdout as it is generated, at --rate rows/s if given, to
+feed /api/ingest or another consumer as a stream. Chunks of --chunk-rows
+rows are generated and encoded by --workers processes.
+
+--pcap also writes the packets of --pcap-flows flows of the same mix, for
+the flow tracker (track_flows.py --pcap).
+
+Usage:
+    python generate_traffic.py --rows 10000000 --output flows.csv --workers 4
+    python generate_traffic.py --rows 1000000 --mix web=0.7,ddos=0.3 --output - --rate 50000 | gzip | \\
+        curl -sS -T - -H 'Authorization: Bearer <token>' -H 'Content-Type: text/csv' \\
+        -H 'Content-Encoding: gzip' http://localhost:5000/api/ingest
+    python generate_traffic.py --pcap flows.pcap --pcap-flows 100000
+"""
+
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from utils.packets import write_packets
+from utils.traffic import DEFAULT_MIX, encode_csv, flow_packets, generate_flows, parse_mix
+
+def make_chunk(rows, mix, seed, addresses, encode, decimals):
+    flows = generate_flows(rows, mix, seed, addresses)
+    return encode_csv(flows, decimals, header=False) if encode else flows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--mix', help='Profile weights, e.g. web=0.6,dns=0.2,ddos=0.1,portscan=0.1 '
+                                      f'(default {",".join(f"{k}={v}" for k, v in DEFAULT_MIX.items())})')
+    parser.add_argument('--output', help='CSV or Parquet file, or - for CSV on stdout')
+    parser.add_argument('--rate', type=float, default=0, help='Rows per second (0: as fast as possible)')
+    parser.add_argument('--chunk-rows', type=int, default=100000)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--decimals', type=int, default=3, help='Decimal places of float features in CSV')
+    parser.add_argument('--no-addresses', action='store_true', help='Leave out source_ip and destination_ip')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--pcap', help='Also write the packets of --pcap-flows flows to this capture')
+    parser.add_argument('--pcap-flows', type=int, default=100000)
+    parser.add_argument('--pcap-span', type=float, default=60.0, help='Seconds over which the pcap flows start')
+    args = parser.parse_args()
+    if not args.output and not args.pcap:
+        parser.error('give --output and/or --pcap')
+    try:
+        mix = parse_mix(args.mix) if args.mix else DEFAULT_MIX
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.pcap:
+        start = time.perf_counter()
+        flows = generate_flows(args.pcap_flows, mix, seed=args.seed)
+        packets, _ = flow_packets(flows, seed=args.seed, span=args.pcap_span)
+        size = write_packets(args.pcap, packets)
+        print(f"Wrote {len(packets):,} packets of {len(flows):,} flows ({size / 2**20:.1f} MiB) to {args.pcap} "
+              f"in {time.perf_counter() - start:.2f} seconds", file=sys.stderr)
+    if not args.output:
+        return
+
+    parquet = args.output.lower().endswith(('.parquet', '.pq'))
+    if parquet:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            parser.error('pyarrow is required to write Parquet files')
+    sizes = [min(args.chunk_rows, args.rows - offset) for offset in range(0, args.rows, args.chunk_rows)]
+    seeds = np.random.SeedSequence(args.seed).spawn(len(sizes))
+    tasks = [(rows, mix, seed, not args.no_addresses, not parquet, args.decimals) for rows, seed in zip(sizes, seeds)]
+
+    def chunks():
+        if args.workers <= 1:
+            for task in tasks:
+                yield make_chunk(*task)
+            return
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            pending = deque()
+            for task in tasks:
+                pending.append(executor.submit(make_chunk, *task))
+                if len(pending) >= 2 * args.workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    stream = sys.stdout.buffer if args.output == '-' else open(args.output, 'wb')
+    writer = None
+    written = 0
+    start = time.perf_counter()
+    try:
+        for rows, chunk in zip(sizes, chunks()):
+            if parquet:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                writer = writer or pq.ParquetWriter(stream, table.schema)
+                writer.write_table(table)
+            else:
+                if not written:
+                    stream.write(encode_csv(generate_flows(0, mix, addresses=not args.no_addresses)))
+                stream.write(chunk)
+                stream.flush()
+            written += rows
+            if args.rate:
+                delay = start + written / args.rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+    except BrokenPipeError:
+        # The consumer stopped reading; nothing left to write to
+        sys.stderr.close()
+        return
+    finally:
+        if writer is not None:
+            writer.close()
+        if stream is not sys.stdout.buffer:
+            stream.close()
+    seconds = time.perf_counter() - start
+    size = '' if args.output == '-' else f" ({os.path.getsize(args.output) / 2**20:,.0f} MiB)"
+    print(f"Wrote {written:,} flows{size} in {seconds:.2f} seconds ({written / seconds:,.0f} rows/s, "
+          f"{args.workers} worker(s))", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""
+Choose the evaluation order of the forest's trees for early-exit scoring.
+
+Trees are ranked on a calibration CSV by how decisively they agree with
+the whole forest's decision, and the order is saved as tree_order.json
+next to the model. IntrusionDetector(model_dir, use_early_exit=True)
+evaluates the trees in this order.
+
+Usage:
+    python order_trees.py --data calibration.csv [--max-rows 200000]
+"""
+
+import argparse
+import os
+
+import pandas as pd
+
+from utils.anytime_forest import AnytimeForest, order_trees, save_tree_order
+from utils.prediction import IntrusionDetector
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', required=True, help='CSV with the selected features (labels are not needed)')
+    parser.add_argument('--model-dir', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models'))
+    parser.add_argument('--max-rows', type=int, default=200000)
+    args = parser.parse_args()
+
+    detector = IntrusionDetector(args.model_dir)
+    data = pd.read_csv(args.data, usecols=detector.selected_features, nrows=args.max_rows)
+    X_scaled = detector.scaler.transform(data[detector.selected_features])
+
+    order = order_trees(detector.model, X_scaled, detector.threshold)
+
+    # Report the effect of the new order on the calibration data
+    for name, tree_order in (('original', None), ('decisive-first', order)):
+        _, _, _, trees = AnytimeForest(detector.model, detector.threshold, tree_order).predict(X_scaled)
+        print(f"{name:<15} mean trees evaluated per row: {trees.mean():.2f} of {len(order)}")
+
+    save_tree_order(args.model_dir, order)
+    print(f"Tree order saved to {args.model_dir}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Save the reference feature profile used for drift monitoring.
+
+Reads the selected features of a reference dataset (the training data, or
+traffic known to be representative) in chunks, places --bins bin edges
+per feature at quantiles of a random sample of --sample-rows rows, counts
+every row into those bins and saves the histograms as drift_reference.json
+next to the model. The app then compares the features of every scored
+batch with this profile (PSI and KS per feature, on /monitor and in the
+metrics table).
+
+With --compare, a second dataset is counted into the saved profile's bins
+and its drift scores are printed instead: a quick offline check of how far
+a capture is from the reference.
+
+Usage:
+    python profile_features.py --data training.csv [--benign-only --label-column label]
+    python profile_features.py --compare capture.csv
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.data_processor import binarize_labels, iter_column_chunks, load_selected_features
+from utils.drift import (DEFAULT_BINS, FeatureHistograms, compare_histograms, drift_level, load_reference,
+                         save_reference)
+
+def iter_chunks(path, features, args):
+    """Feature chunks of a dataset, benign rows only with --benign-only."""
+    columns = features + [args.label_column] if args.benign_only else features
+    for chunk in iter_column_chunks(path, columns, args.chunksize):
+        if args.benign_only:
+            chunk = chunk[binarize_labels(chunk[args.label_column], args.benign_label) == 0]
+        yield chunk[features]
+
+def sample_rows(chunks, size, seed=0):
+    """Uniform random sample of the rows of all chunks (one pass, fixed memory)."""
+    rng = np.random.default_rng(seed)
+    sample, keys = None, None
+    for chunk in chunks:
+        chunk_keys = rng.random(len(chunk))
+        if sample is not None:
+            chunk = pd.concat([sample, chunk], ignore_index=True)
+            chunk_keys = np.concatenate([keys, chunk_keys])
+        keep = np.argsort(chunk_keys)[:size]
+        sample, keys = chunk.iloc[keep].reset_index(drop=True), chunk_keys[keep]
+    return sample
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--data', help='Reference CSV or Parquet dataset')
+    source.add_argument('--compare', help='Dataset to compare with the saved profile')
+    parser.add_argument('--model-dir', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models'))
+    parser.add_argument('--bins', type=int, default=DEFAULT_BINS, help='Bins per feature')
+    parser.add_argument('--sample-rows', type=int, default=200000, help='Rows sampled to place the bin edges')
+    parser.add_argument('--chunksize', type=int, default=100000)
+    parser.add_argument('--benign-only', action='store_true', help='Profile only the benign rows')
+    parser.add_argument('--label-column', default='label')
+    parser.add_argument('--benign-label', default='BENIGN')
+    args = parser.parse_args()
+
+    features = load_selected_features(args.model_dir)
+    start = time.perf_counter()
+    if args.compare:
+        reference = load_reference(args.model_dir, features)
+        if reference is None:
+            parser.error(f"No drift reference in {args.model_dir}; create one with --data first")
+        current = reference.empty_copy()
+        for chunk in iter_chunks(args.compare, reference.features, args):
+            current.update(chunk)
+        scores = compare_histograms(reference, current)
+        print(f"{current.rows:,} rows compared in {time.perf_counter() - start:.1f}s")
+        print(f"{'feature':<28}{'PSI':>8}{'KS':>8}{'missing':>9}  level")
+        for feature, score in sorted(scores.items(), key=lambda item: -(item[1]['psi'] or 0)):
+            if score['psi'] is None:
+                print(f"{feature:<28}{'-':>8}{'-':>8}{'-':>9}  no data")
+                continue
+            print(f"{feature:<28}{score['psi']:>8.3f}{score['ks']:>8.3f}{score['missing']:>9.2%}  "
+                  f"{drift_level(score['psi'])}")
+        return
+
+    # Two passes: bin edges from a sample, then counts over every row
+    sample = sample_rows(iter_chunks(args.data, features, args), args.sample_rows)
+    histograms = FeatureHistograms.from_sample(sample, features, args.bins)
+    for chunk in iter_chunks(args.data, features, args):
+        histograms.update(chunk)
+    print(f"{histograms.rows:,} rows profiled in {time.perf_counter() - start:.1f}s")
+    print(f"{'feature':<28}{'bins':>6}{'missing':>9}")
+    for j, feature in enumerate(features):
+        print(f"{feature:<28}{len(histograms.edges[j]) + 1:>6}{histograms.missing[j] / max(histograms.rows, 1):>9.2%}")
+
+    save_reference(args.model_dir, histograms, {'data': os.path.basename(args.data), 'bins': args.bins,
+                                                'benign_only': args.benign_only})
+    print(f"Drift reference saved to {args.model_dir}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Replay NetFlow/IPFIX export packets to a collector over UDP.
+
+Sends the UDP payloads of a pcap capture of export traffic (for example
+tcpdump -i any -w exports.pcap udp port 2055), or synthesizes --flows flow
+records (--attack-share of them port-scan like) encoded as NetFlow v5, v9
+or IPFIX (--version 5, 9 or 10). Synthesized packets can be saved with
+--save for later replays. Packets go out at --rate packets/s (0: as fast as
+possible), --loops times.
+
+Usage:
+    python replay_flows.py --pcap exports.pcap --target 127.0.0.1:2055 --rate 2000
+    python replay_flows.py --flows 300000 --version 9 --target 127.0.0.1:2055
+    python replay_flows.py --flows 100000 --version 10 --save ipfix.pcap --count-only
+"""
+
+import argparse
+import socket
+import time
+
+from utils.netflow import ENCODERS, generate_flow_records
+from utils.pcap import read_pcap, udp_datagram, udp_frame, write_pcap
+
+def load_packets(path, port=None):
+    """UDP payloads of a capture (only those sent to port, if given)."""
+    packets = []
+    for _, linktype, frame in read_pcap(path):
+        datagram = udp_datagram(frame, linktype)
+        if datagram is not None and (port is None or datagram[1] == port):
+            packets.append(datagram[2])
+    return packets
+
+def send(packets, host, port, rate, loops):
+    sock = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_DGRAM)
+    sent = 0
+    start = time.perf_counter()
+    for _ in range(loops):
+        for packet in packets:
+            if rate:
+                delay = start + sent / rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            sock.sendto(packet, (host, port))
+            sent += 1
+    sock.close()
+    return sent, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pcap', help='Capture of export packets to replay')
+    parser.add_argument('--port-filter', type=int, help='Only replay datagrams sent to this port')
+    parser.add_argument('--flows', type=int, default=100000, help='Flow records to synthesize (without --pcap)')
+    parser.add_argument('--version', type=int, choices=sorted(ENCODERS), default=9, help='Export format')
+    parser.add_argument('--attack-share', type=float, default=0.01, help='Share of synthesized attack flows')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', help='Write the synthesized packets to this pcap file')
+    parser.add_argument('--target', default='127.0.0.1:2055', help='Collector host:port')
+    parser.add_argument('--rate', type=float, default=0, help='Packets per second (0: as fast as possible)')
+    parser.add_argument('--loops', type=int, default=1, help='Times to send the packets')
+    parser.add_argument('--count-only', action='store_true', help='Do not send anything')
+    args = parser.parse_args()
+
+    if args.pcap:
+        packets = load_packets(args.pcap, args.port_filter)
+        print(f"Loaded {len(packets):,} export packets from {args.pcap}")
+    else:
+        records, labels = generate_flow_records(args.flows, args.attack_share, seed=args.seed)
+        packets = ENCODERS[args.version](records)
+        print(f"Synthesized {len(records):,} flows ({int(labels.sum()):,} attacks) in {len(packets):,} "
+              f"v{args.version} packets ({sum(map(len, packets)) / 2**20:.1f} MiB)")
+        if args.save:
+            host, _, port = args.target.rpartition(':')
+            start = time.time()
+            frames = ((start + i * 0.001, udp_frame(packet, '192.0.2.1', '192.0.2.2', 40000, int(port)))
+                      for i, packet in enumerate(packets))
+            print(f"Wrote {write_pcap(args.save, frames):,} packets to {args.save}")
+
+    if args.count_only or not packets:
+        return
+    host, _, port = args.target.rpartition(':')
+    sent, seconds = send(packets, host.strip('[]'), int(port), args.rate, args.loops)
+    print(f"Sent {sent:,} packets in {seconds:.2f}s ({sent / seconds:,.0f} packets/s)")
+
+if __name__ == '__main__':
+    main()
@@ -101,26 +101,30 @@ document.addEventListener('DOMContentLoaded', function() {
                 const formData = new FormData();
                 formData.append('file', fileInput.files[0]);
                 
-                // Submit form
-                fetch('/predict-file', {
+                // Submit the file as a background job, then poll its progress
+                fetch('/jobs', {
                     method: 'POST',
                     body: formData
                 })
-                .then(response => {
-                    if (!response.ok) {
-                        return response.json().then(err => {
-                            throw new Error(err.error || 'Error analyzing file');
-                        });
-                    }
-                    return response.json();
+                .then(checkResponse)
+                .then(job => waitForJob(job.job_id))
+                .then(job => {
+                    // Only intrusion rows are needed for the results table
+                    return fetch(`/jobs/${job.job_id}/results?intrusions_only=true&limit=1000`)
+                        .then(checkResponse);
                 })
-                .then(data => {
+                .then(page => {
                     // Reset button
                     analyzeBtn.innerHTML = '<i class="fas fa-search"></i> Analyze Traffic';
                     analyzeBtn.disabled = false;
                     
                     // Display results
-                    displayResults(data);
+                    displayResults({
+                        total: page.rows,
+                        intrusions: page.intrusions,
+                        safe: page.safe,
+                        results: page.results
+                    });
                 })
                 .catch(error => {
                     // Reset button
@@ -133,6 +137,40 @@ document.addEventListener('DOMContentLoaded', function() {
             });
         }
         
+        // Parse a JSON response, turning error responses into exceptions
+        function checkResponse(response) {
+            if (!response.ok) {
+                return response.json().then(err => {
+                    throw new Error(err.error || 'Error analyzing file');
+                });
+            }
+            return response.json();
+        }
+        
+        // Poll a job until it finishes, showing its progress on the button
+        function waitForJob(jobId) {
+            return new Promise((resolve, reject) => {
+                const poll = () => {
+                    fetch(`/jobs/${jobId}`)
+                    .then(checkResponse)
+                    .then(job => {
+                        if (job.state === 'completed') {
+                            resolve(job);
+                        } else if (job.state === 'failed' || job.state === 'cancelled') {
+                            reject(new Error(job.error || `Analysis ${job.state}`));
+                        } else {
+                            const rate = Math.round(job.rows_per_second).toLocaleString();
+                            analyzeBtn.innerHTML = `<i class="fas fa-spinner fa-spin"></i> Analyzing... ` +
+                                `${job.rows.toLocaleString()} rows (${rate} rows/s)`;
+                            setTimeout(poll, 1000);
+                        }
+                    })
+                    .catch(reject);
+                };
+                poll();
+            });
+        }
+        
         // Display results
         function displayResults(data) {
             // Update summary counts
@@ -189,8 +227,9 @@ document.addEventListener('DOMContentLoaded', function() {
             intrusionTable.innerHTML = '';
             
             if (data.intrusions > 0) {
-                data.results.forEach((result, index) => {
+                data.results.forEach((result) => {
                     if (result.is_intrusion) {
+                        const index = result.index;
                         const tr = document.createElement('tr');
                         tr.innerHTML = `
                             <td>${index + 1}</td>
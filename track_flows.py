@@ -0,0 +1,103 @@
+"""
+Track flows from packets across several worker processes and score them.
+
+Packets come from pcap captures (--pcap, replayed as fast as they can be
+read) or a live interface (--interface, needs root or CAP_NET_RAW). The
+dispatcher sends each packet to one of --workers processes by a symmetric
+5-tuple hash, so both directions of a connection are tracked by the same
+worker. Every worker keeps its own flow table (CICFlowMeter-style
+features), ends flows on FIN/RST or the timeouts and scores them with its
+own copy of the model; intrusions are stored as alerts in --db. The ended
+flows of all workers are also checked for port scans, host scans and
+floods (see collect_flows.py; --no-cross-flow to disable) and counted in
+the top talkers stored for /api/top-talkers (--no-top-talkers to disable).
+Allowlist and blocklist rules stored in --db decide matching flows
+without the model (see collect_flows.py; --no-prefilter to ignore them).
+
+Usage:
+    python track_flows.py --pcap capture.pcap --workers 4 --db ids_database.db
+    sudo python track_flows.py --interface eth0 --workers 4 --duration 600
+"""
+
+import argparse
+
+from utils.correlation import (DEFAULT_FLOOD_THRESHOLD, DEFAULT_HOST_THRESHOLD, DEFAULT_PORT_THRESHOLD,
+                               DEFAULT_WINDOW_SECONDS, CrossFlowDetector)
+from utils.database import DatabaseManager
+from utils.heavy_hitters import TrafficHeavyHitters
+from utils.flow_table import DEFAULT_FLOW_TIMEOUT, DEFAULT_IDLE_TIMEOUT
+from utils.packets import capture_packets, read_packets
+from utils.prefilter import Prefilter
+from utils.sharding import DEFAULT_BATCH_FLOWS, DEFAULT_WORKERS, ShardedFlowTracker
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--pcap', nargs='+', help='Capture files to replay')
+    source.add_argument('--interface', help='Interface to capture from')
+    parser.add_argument('--duration', type=float, help='Stop a live capture after this many seconds')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Flow-tracking processes')
+    parser.add_argument('--model-dir', default='models', help='Model directory')
+    parser.add_argument('--db', default='ids_database.db', help='SQLite database file for alerts')
+    parser.add_argument('--no-db', action='store_true', help='Only count intrusions, do not store alerts')
+    parser.add_argument('--batch-flows', type=int, default=DEFAULT_BATCH_FLOWS, help='Ended flows scored together')
+    parser.add_argument('--flow-timeout', type=float, default=DEFAULT_FLOW_TIMEOUT, help='Seconds after which a flow is cut')
+    parser.add_argument('--idle-timeout', type=float, default=DEFAULT_IDLE_TIMEOUT,
+                        help='Seconds without packets after which a flow ends')
+    parser.add_argument('--float32', action='store_true', help='Score in float32')
+    parser.add_argument('--no-cross-flow', action='store_true', help='Disable scan and flood detection')
+    parser.add_argument('--window-seconds', type=float, default=DEFAULT_WINDOW_SECONDS,
+                        help='Scan and flood detection window')
+    parser.add_argument('--scan-ports', type=int, default=DEFAULT_PORT_THRESHOLD,
+                        help='Distinct ports from one source that make a port scan')
+    parser.add_argument('--scan-hosts', type=int, default=DEFAULT_HOST_THRESHOLD,
+                        help='Distinct hosts from one source that make a host scan')
+    parser.add_argument('--flood-flows', type=int, default=DEFAULT_FLOOD_THRESHOLD,
+                        help='Flows to one destination that make a flood')
+    parser.add_argument('--no-top-talkers', action='store_true', help='Disable top-talker tracking')
+    parser.add_argument('--no-prefilter', action='store_true', help='Ignore the allowlist/blocklist rules in --db')
+    args = parser.parse_args()
+
+    db = None if args.no_db else DatabaseManager(args.db)
+    correlator = None if args.no_cross_flow else CrossFlowDetector(
+        args.window_seconds, args.scan_ports, args.scan_hosts, args.flood_flows)
+    heavy_hitters = None if args.no_top_talkers else TrafficHeavyHitters(db=db, component='Flow tracker')
+    prefilter = None if db is None or args.no_prefilter else Prefilter(db=db)
+    tracker = ShardedFlowTracker(args.model_dir, workers=args.workers, db=db, batch_flows=args.batch_flows,
+                                 flow_timeout=args.flow_timeout, idle_timeout=args.idle_timeout,
+                                 float32=args.float32, correlator=correlator, heavy_hitters=heavy_hitters,
+                                 prefilter=prefilter)
+    tracker.start()
+    try:
+        if args.pcap:
+            for path in args.pcap:
+                for packets in read_packets(path):
+                    tracker.submit(packets)
+        else:
+            for packets in capture_packets(args.interface, duration=args.duration):
+                tracker.submit(packets)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        totals = tracker.close()
+        if heavy_hitters is not None:
+            heavy_hitters.snapshot()
+        if db is not None:
+            db.close_connection()
+
+    print(f"\n{totals['packets']:,} packets, {totals['flows']:,} flows, {totals['intrusions']:,} intrusions, "
+          f"{totals['cross_flow_alerts']:,} scan/flood alerts in {totals['seconds']:.2f}s "
+          f"({totals['packets'] / totals['seconds']:,.0f} packets/s, dispatch {totals['dispatch_seconds']:.2f}s)")
+    print(f"{'shard':<7}{'packets':>12}{'flows':>10}{'intrusions':>12}{'table s':>9}{'score s':>9}{'open max':>10}")
+    for stats in totals['shards']:
+        print(f"{stats['shard']:<7}{stats['packets']:>12,}{stats['flows']:>10,}{stats['intrusions']:>12,}"
+              f"{stats['table_seconds']:>9.2f}{stats['score_seconds']:>9.2f}{stats['max_open_flows']:>10,}")
+    if prefilter is not None:
+        status = prefilter.status()
+        print(f"{status['allowed']:,} allowlisted and {status['blocked']:,} blocklisted by "
+              f"{status['rules']} prefilter rules")
+    for shard, error in totals['errors']:
+        print(f"Worker {shard} failed: {error}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Train and calibrate the first stage of the two-stage cascade detector.
+
+The first stage (a logistic regression or a shallow tree on the selected
+features) is trained on a labeled CSV. Its uncertainty band around the
+forest's optimal threshold is calibrated on a held-out part of the training
+data so that at most --max-flip-rate of the forest's decisions per class
+change. The cascade is then compared with the forest alone on a separate
+held-out CSV, and the first stage is saved next to the model, where
+IntrusionDetector(model_dir, use_cascade=True) picks it up.
+
+Usage:
+    python train_cascade.py --train train.csv --holdout holdout.csv [--kind tree]
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from utils.cascade import calibrate_band, cascade_scores, save_cascade, train_first_stage
+from utils.data_processor import load_labeled_csv
+from utils.prediction import IntrusionDetector, compute_metrics
+
+def best_time(fn, repeats=3):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--train', required=True, help='Labeled CSV used to train and calibrate the first stage')
+    parser.add_argument('--holdout', required=True, help='Labeled CSV used for the report')
+    parser.add_argument('--model-dir', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models'))
+    parser.add_argument('--kind', choices=['logistic', 'tree'], default='logistic')
+    parser.add_argument('--max-depth', type=int, default=4)
+    parser.add_argument('--max-flip-rate', type=float, default=0.001,
+                        help='Tolerated fraction of forest decisions per class changed by the cascade')
+    parser.add_argument('--calibration-fraction', type=float, default=0.3)
+    parser.add_argument('--label-column', default='label')
+    parser.add_argument('--dry-run', action='store_true', help='Report without saving the cascade')
+    args = parser.parse_args()
+    if not 0 <= args.max_flip_rate < 1:
+        parser.error("--max-flip-rate must be at least 0 and below 1")
+
+    detector = IntrusionDetector(args.model_dir)
+    features = detector.selected_features
+
+    # Train on one part of the training data, calibrate on the rest
+    X, y, _ = load_labeled_csv(args.train, features, args.label_column)
+    X_scaled = detector.scaler.transform(X)
+    order = np.random.RandomState(42).permutation(len(y))
+    split = int(len(y) * (1 - args.calibration_fraction))
+    fit_rows, calibration_rows = order[:split], order[split:]
+
+    first_stage = train_first_stage(X_scaled[fit_rows], y[fit_rows], args.kind, args.max_depth)
+    first_scores = first_stage.predict_proba(X_scaled[calibration_rows])[:, 1]
+    forest_decisions = detector.model.predict_proba(X_scaled[calibration_rows])[:, 1] >= detector.threshold
+    lower, upper = calibrate_band(first_scores, forest_decisions, detector.threshold, args.max_flip_rate)
+
+    # Compare the cascade with the forest alone on the held-out CSV
+    X_holdout, y_holdout, _ = load_labeled_csv(args.holdout, features, args.label_column)
+    X_holdout = detector.scaler.transform(X_holdout)
+
+    forest_seconds, forest_scores = best_time(lambda: detector.model.predict_proba(X_holdout)[:, 1])
+    cascade_seconds, (scores, forwarded) = best_time(
+        lambda: cascade_scores(first_stage, detector.model, X_holdout, lower, upper)
+    )
+
+    forest_pred = (forest_scores >= detector.threshold).astype(int)
+    cascade_pred = (scores >= detector.threshold).astype(int)
+    forest_metrics = compute_metrics(y_holdout, forest_pred, forest_scores)
+    cascade_metrics = compute_metrics(y_holdout, cascade_pred, scores)
+
+    rows = len(y_holdout)
+    print(f"\nFirst stage: {type(first_stage).__name__}, band [{lower:.6f}, {upper:.6f}], "
+          f"threshold {detector.threshold:.6f}")
+    print(f"Held-out rows: {rows}, forwarded to forest: {forwarded.mean():.1%}, "
+          f"decisions changed: {int((forest_pred != cascade_pred).sum())}")
+    print(f"Throughput: forest {rows / forest_seconds:,.0f} rows/s, cascade {rows / cascade_seconds:,.0f} rows/s "
+          f"({forest_seconds / cascade_seconds:.2f}x)")
+    print(f"{'metric':<22}{'forest':>10}{'cascade':>10}{'delta':>10}")
+    for name in ('recall', 'false_positive_rate', 'precision', 'f1_score', 'accuracy'):
+        delta = cascade_metrics[name] - forest_metrics[name]
+        print(f"{name:<22}{forest_metrics[name]:>10.4f}{cascade_metrics[name]:>10.4f}{delta:>+10.4f}")
+
+    if not args.dry_run:
+        save_cascade(args.model_dir, first_stage, lower, upper, {
+            'max_flip_rate': args.max_flip_rate,
+            'holdout_forwarded_fraction': float(forwarded.mean()),
+            'holdout_speedup': forest_seconds / cascade_seconds,
+            'holdout_recall_delta': cascade_metrics['recall'] - forest_metrics['recall'],
+            'holdout_fpr_delta': cascade_metrics['false_positive_rate'] - forest_metrics['false_positive_rate']
+        })
+        print(f"\nCascade saved to {args.model_dir}; enable it with IntrusionDetector(model_dir, use_cascade=True)")
+
+if __name__ == '__main__':
+    main()
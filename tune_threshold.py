@@ -0,0 +1,140 @@
+"""
+Tune the decision threshold from one scoring pass over a labeled dataset.
+
+The dataset is scored chunk by chunk, the scores are sorted once and the
+full precision/recall/FPR curve is computed from cumulative counts. The
+tool prints the threshold with the highest recall under --max-fpr, the
+F1-optimal threshold and the current threshold for comparison. With
+--segment-feature it also learns one threshold per segment of that feature
+(default segments for destination_port: well-known, registered and
+dynamic ports), which IntrusionDetector(model_dir,
+use_segment_thresholds=True) applies at scoring time.
+
+Usage:
+    python tune_threshold.py --data labeled.csv --max-fpr 0.001 [--segment-feature destination_port] [--write]
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.data_processor import iter_labeled_chunks
+from utils.prediction import IntrusionDetector
+from utils.thresholds import (
+    best_f1_threshold, learn_segment_thresholds, recommend_threshold, save_segment_thresholds, threshold_curve
+)
+
+DEFAULT_EDGES = {'destination_port': [1024, 49152]}
+
+def describe(name, point):
+    if point is None:
+        print(f"{name:<28}no threshold meets the target")
+        return
+    print(f"{name:<28}{point['threshold']:>10.6f}{point['precision']:>11.4f}{point['recall']:>9.4f}"
+          f"{point['false_positive_rate']:>9.5f}{point['f1_score']:>9.4f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', required=True, help='Labeled CSV or Parquet dataset')
+    parser.add_argument('--model-dir', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models'))
+    parser.add_argument('--label-column', default='label')
+    parser.add_argument('--benign-label', default='BENIGN')
+    parser.add_argument('--chunksize', type=int, default=100000)
+    parser.add_argument('--max-fpr', type=float, default=0.001, help='Target false positive rate')
+    parser.add_argument('--segment-feature', help='Learn one threshold per segment of this feature')
+    parser.add_argument('--segment-edges', help='Comma-separated segment boundaries (raw feature units)')
+    parser.add_argument('--min-rows', type=int, default=1000, help='Rows needed to learn a segment threshold')
+    parser.add_argument('--curve-output', help='Write the full curve as CSV to this file')
+    parser.add_argument('--write', action='store_true',
+                        help='Save the recommended threshold (and segment thresholds) to the model directory')
+    args = parser.parse_args()
+
+    detector = IntrusionDetector(args.model_dir)
+    features = detector.selected_features
+    if args.segment_feature and args.segment_feature not in features:
+        parser.error("--segment-feature must be one of the model features")
+
+    # One scoring pass; only scores, labels and the segment column are kept
+    start = time.perf_counter()
+    scores, labels, segment_values = [], [], []
+    counts = {}
+    for X, y, _ in iter_labeled_chunks(args.data, features, args.label_column, args.benign_label, args.chunksize,
+                                       counts=counts):
+        scores.append(detector.model.predict_proba(detector.scaler.transform(X))[:, 1])
+        labels.append(y)
+        if args.segment_feature:
+            segment_values.append(X[args.segment_feature].to_numpy(dtype=np.float64))
+    scores, labels = np.concatenate(scores), np.concatenate(labels)
+    scoring_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    curve = threshold_curve(labels, scores)
+    curve_seconds = time.perf_counter() - start
+
+    print(f"\n{len(scores)} rows scored in {scoring_seconds:.2f}s; curve over "
+          f"{len(curve['thresholds'])} distinct thresholds in {curve_seconds * 1000:.1f} ms")
+    if counts['dropped_rows']:
+        print(f"{counts['dropped_rows']:,} rows with infinite or missing values dropped")
+    print(f"{'':<28}{'threshold':>10}{'precision':>11}{'recall':>9}{'fpr':>9}{'f1':>9}")
+    current = int(np.searchsorted(-curve['thresholds'], -detector.threshold, side='right')) - 1
+    describe('current', None if current < 0 else {
+        'threshold': detector.threshold,
+        'precision': float(curve['precision'][current]),
+        'recall': float(curve['recall'][current]),
+        'false_positive_rate': float(curve['false_positive_rate'][current]),
+        'f1_score': float(curve['f1_score'][current])
+    })
+    recommended = recommend_threshold(curve, args.max_fpr)
+    describe(f'recommended (fpr <= {args.max_fpr:g})', recommended)
+    describe('best f1', best_f1_threshold(curve))
+
+    if args.curve_output:
+        pd.DataFrame(curve).to_csv(args.curve_output, index=False)
+        print(f"Curve written to {args.curve_output}")
+
+    default_threshold = recommended['threshold'] if recommended else detector.threshold
+    thresholds = None
+    if args.segment_feature:
+        if args.segment_edges:
+            edges = sorted(float(edge) for edge in args.segment_edges.split(','))
+        else:
+            edges = DEFAULT_EDGES.get(args.segment_feature)
+            if edges is None:
+                parser.error("--segment-edges is required for this feature")
+        segment_values = np.concatenate(segment_values)
+        thresholds, details = learn_segment_thresholds(labels, scores, segment_values, edges,
+                                                       args.max_fpr, default_threshold, args.min_rows)
+
+        per_row = np.asarray(thresholds)[np.searchsorted(edges, segment_values, side='right')]
+        predictions = scores >= per_row
+        negatives = max(int(np.count_nonzero(labels == 0)), 1)
+        positives = max(int(np.count_nonzero(labels == 1)), 1)
+
+        bounds = [-np.inf] + list(edges) + [np.inf]
+        print(f"\nSegments of {args.segment_feature}:")
+        for detail in details:
+            low, high = bounds[detail['segment']], bounds[detail['segment'] + 1]
+            source = 'learned' if detail['learned'] else 'default'
+            print(f"  [{low:g}, {high:g}): {detail['rows']} rows, threshold {detail['threshold']:.6f} ({source})")
+        print(f"Segmented: recall {np.count_nonzero(predictions & (labels == 1)) / positives:.4f}, "
+              f"fpr {np.count_nonzero(predictions & (labels == 0)) / negatives:.5f}")
+
+    if args.write:
+        if recommended is None:
+            print("\nNothing written: no global threshold meets the target")
+            return
+        with open(os.path.join(args.model_dir, 'optimal_threshold.txt'), 'w') as f:
+            f.write(str(recommended['threshold']))
+        print(f"\nThreshold {recommended['threshold']:.6f} written to {args.model_dir}")
+        if thresholds is not None:
+            save_segment_thresholds(args.model_dir, args.segment_feature, edges, thresholds, {
+                'max_fpr': args.max_fpr,
+                'segments': details
+            })
+            print(f"Segment thresholds written to {args.model_dir}")
+
+if __name__ == '__main__':
+    main()
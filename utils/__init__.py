@@ -2,6 +2,29 @@
 from . import data_processor
 from . import prediction
 from . import database
+from . import alert_archive
+from . import streaming
+from . import alerts
+from . import cascade
+from . import anytime_forest
+from . import compaction
+from . import evaluation
+from . import thresholds
+from . import explain
+from . import ingest
+from . import admission
+from . import netflow
+from . import collector
+from . import packets
+from . import flow_table
+from . import sharding
+from . import sketches
+from . import correlation
+from . import heavy_hitters
+from . import prefilter
+from . import drift
+from . import scaling
+from . import traffic
 
 # Version information
 __version__ = '1.0.0'
\ No newline at end of file
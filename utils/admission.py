@@ -0,0 +1,326 @@
+"""
+Admission control and load shedding for the intrusion detection system.
+Flow volume spikes during an attack, exactly when the IDS must keep
+working. The admission controller sits in front of the scoring endpoints:
+each client has a token bucket refilled at a fixed number of rows per
+second, all requests share a budget of rows being scored at once, and work
+over either limit is refused immediately (429 or 503 with Retry-After)
+instead of queueing until workers time out. Under heavy load it can also
+switch to a degraded mode that scores only a sample of the rows from
+sources with no recent intrusions, while every row from a flagged source
+(a client, or a source IP when the data has one) is still scored.
+"""
+
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from .instrumentation import REGISTRY
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_CLIENT_RATE = 200000
+DEFAULT_CLIENT_BURST = 1000000
+DEFAULT_MAX_INFLIGHT_ROWS = 400000
+
+# Degraded mode starts when this share of the in-flight budget is in use
+DEFAULT_DEGRADE_AT = 0.5
+
+# Sources stay flagged this long after their last intrusion
+DEFAULT_FLAG_SECONDS = 600
+MAX_FLAGGED_IPS = 100000
+
+# Source IP columns of uploaded flows, as named by common flow exporters
+SOURCE_IP_COLUMNS = ('source_ip', 'src_ip', 'Source IP', ' Source IP')
+
+ADMISSION_REJECTED = REGISTRY.counter(
+    'ids_admission_rejected_total', 'Requests refused by admission control', ('reason',)
+)
+ADMISSION_SHED_ROWS = REGISTRY.counter(
+    'ids_admission_shed_rows_total', 'Rows left unscored by degraded-mode sampling'
+)
+ADMISSION_INFLIGHT_ROWS = REGISTRY.gauge(
+    'ids_admission_inflight_rows', 'Rows being scored by admitted requests'
+)
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a request is refused by admission control.
+    """
+
+    def __init__(self, message, status, retry_after):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+    def headers(self):
+        """
+        Get the response headers for the rejection.
+
+        Returns:
+            dict: Retry-After in whole seconds
+        """
+        return {'Retry-After': str(max(1, math.ceil(self.retry_after)))}
+
+class TokenBucket:
+    """
+    Row budget of one client, refilled continuously up to a burst size.
+
+    Rows are charged after they have been scored, so the balance can go
+    negative: a large upload is admitted while the balance is positive and
+    the client then waits until the debt has been paid back.
+    """
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now, cost=0):
+        """
+        Get how long until cost rows can be taken (0 if they can now).
+        """
+        self._refill(now)
+        required = min(cost, self.burst)
+        if self.tokens > 0 and self.tokens >= required:
+            return 0.0
+        return (max(required, 1) - self.tokens) / self.rate
+
+    def charge(self, rows, now):
+        self._refill(now)
+        self.tokens -= rows
+
+class AdmissionController:
+    """
+    Per-client rate limits, a global in-flight row budget and degraded-mode
+    sampling for the scoring endpoints.
+    """
+
+    def __init__(self, client_rate=DEFAULT_CLIENT_RATE, client_burst=DEFAULT_CLIENT_BURST,
+                 max_inflight_rows=DEFAULT_MAX_INFLIGHT_ROWS, sample_rate=None, degrade_at=DEFAULT_DEGRADE_AT,
+                 flag_seconds=DEFAULT_FLAG_SECONDS, clock=time.monotonic, seed=None):
+        """
+        Initialize the admission controller.
+
+        Args:
+            client_rate (float): Rows per second each client may submit
+            client_burst (float): Rows a client may submit at once after being idle
+            max_inflight_rows (int): Rows being scored at once across all requests
+            sample_rate (float, optional): Share of rows from unflagged sources
+                scored in degraded mode (None disables degraded mode)
+            degrade_at (float): Share of the in-flight budget in use at which
+                degraded mode starts
+            flag_seconds (float): Seconds a source stays flagged after an intrusion
+            clock (callable): Monotonic clock in seconds
+            seed (int, optional): Seed of the sampling generator
+        """
+        if sample_rate is not None and not 0 < sample_rate <= 1:
+            raise ValueError(f"Invalid sample rate: {sample_rate}")
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.max_inflight_rows = max_inflight_rows
+        self.sample_rate = sample_rate
+        self.degrade_at = degrade_at
+        self.flag_seconds = flag_seconds
+        self.clock = clock
+        self.rng = np.random.default_rng(seed)
+
+        self.lock = threading.Lock()
+        self.buckets = {}
+        self.inflight_rows = 0
+        self.flagged_clients = {}
+        self.flagged_ips = {}
+        self.counters = {'admitted': 0, 'rate_limited': 0, 'overloaded': 0, 'throttled': 0, 'shed_rows': 0,
+                         'sampled_batches': 0}
+
+    def _bucket(self, client, now):
+        bucket = self.buckets.get(client)
+        if bucket is None:
+            bucket = self.buckets[client] = TokenBucket(self.client_rate, self.client_burst, now)
+        return bucket
+
+    def admit(self, client, rows=0):
+        """
+        Admit a request or refuse it immediately.
+
+        Args:
+            client (str): Client identity (user or sensor)
+            rows (int): Rows charged up front; uploads of unknown size pass 0
+                and are charged as they are scored
+
+        Raises:
+            AdmissionRejected: 429 if the client is over its rate, 503 if the
+                in-flight row budget is used up
+        """
+        now = self.clock()
+        with self.lock:
+            if self.inflight_rows >= self.max_inflight_rows:
+                self.counters['overloaded'] += 1
+                ADMISSION_REJECTED.labels('overloaded').inc()
+                raise AdmissionRejected('Server is overloaded', 503, 1)
+
+            bucket = self._bucket(client, now)
+            wait = bucket.wait_time(now, rows)
+            if wait > 0:
+                self.counters['rate_limited'] += 1
+                ADMISSION_REJECTED.labels('rate_limited').inc()
+                raise AdmissionRejected('Rate limit exceeded', 429, wait)
+            if rows:
+                bucket.charge(rows, now)
+            self.counters['admitted'] += 1
+
+    def throttle(self, client):
+        """
+        Check the next batch of an admitted stream against the client's rate
+        and the in-flight row budget.
+
+        A stream is admitted once but charged batch by batch, so its client
+        is re-checked before each batch: over its rate the stream waits for
+        the balance to be paid back (at most one batch of rows, as the
+        balance was positive before it), over the budget it is ended.
+
+        Args:
+            client (str): Client identity
+
+        Returns:
+            float: Seconds to wait before scoring the batch (0 to score it now)
+
+        Raises:
+            AdmissionRejected: 503 if the in-flight row budget is used up
+        """
+        now = self.clock()
+        with self.lock:
+            if self.inflight_rows >= self.max_inflight_rows:
+                self.counters['overloaded'] += 1
+                ADMISSION_REJECTED.labels('overloaded').inc()
+                raise AdmissionRejected('Server is overloaded', 503, 1)
+
+            wait = self._bucket(client, now).wait_time(now)
+            if wait > 0:
+                self.counters['throttled'] += 1
+            return wait
+
+    @contextmanager
+    def scoring(self, rows):
+        """
+        Count rows against the in-flight budget while they are scored.
+
+        Args:
+            rows (int): Rows in the batch
+        """
+        with self.lock:
+            self.inflight_rows += rows
+            ADMISSION_INFLIGHT_ROWS.set(self.inflight_rows)
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.inflight_rows -= rows
+                ADMISSION_INFLIGHT_ROWS.set(self.inflight_rows)
+
+    def degraded(self):
+        """
+        Whether degraded-mode sampling is on.
+
+        Returns:
+            bool: True if sampling is enabled and the in-flight budget is
+                at least degrade_at in use
+        """
+        return self.sample_rate is not None and self.inflight_rows >= self.degrade_at * self.max_inflight_rows
+
+    def sample(self, client, data):
+        """
+        Choose the rows of a batch to score.
+
+        Called before the batch is counted by scoring(), so that degraded
+        mode is decided by the load of the other requests: a single large
+        upload on an idle server is scored in full.
+
+        Args:
+            client (str): Client identity
+            data (pandas.DataFrame): Rows of the batch
+
+        Returns:
+            numpy.ndarray: Boolean mask of the rows to score, or None to score
+                every row (not degraded, or the client is flagged)
+        """
+        if not self.degraded():
+            return None
+        now = self.clock()
+        with self.lock:
+            if self.flagged_clients.get(client, 0) > now:
+                return None
+            flagged_ips = [ip for ip, expires in self.flagged_ips.items() if expires > now]
+            keep = self.rng.random(len(data)) < self.sample_rate
+
+        column = next((name for name in SOURCE_IP_COLUMNS if name in data.columns), None)
+        if column is not None and flagged_ips:
+            keep |= data[column].isin(flagged_ips).to_numpy()
+
+        shed = int(len(keep) - np.count_nonzero(keep))
+        with self.lock:
+            self.counters['shed_rows'] += shed
+            self.counters['sampled_batches'] += 1
+        ADMISSION_SHED_ROWS.inc(shed)
+        return keep
+
+    def record(self, client, data, results, charge=True):
+        """
+        Charge a scored batch to its client and flag the sources of its intrusions.
+
+        Args:
+            client (str): Client identity
+            data (pandas.DataFrame): Rows of the batch
+            results (numpy.ndarray): Binary predictions
+            charge (bool): Charge the rows to the client's token bucket
+        """
+        now = self.clock()
+        intrusions = np.flatnonzero(results)
+        ips = []
+        if len(intrusions):
+            column = next((name for name in SOURCE_IP_COLUMNS if name in data.columns), None)
+            if column is not None:
+                ips = data[column].iloc[intrusions].unique().tolist()
+
+        with self.lock:
+            if charge:
+                self._bucket(client, now).charge(len(results), now)
+            if len(intrusions):
+                self.flagged_clients[client] = now + self.flag_seconds
+                if len(self.flagged_ips) + len(ips) > MAX_FLAGGED_IPS:
+                    self.flagged_ips = {ip: expires for ip, expires in self.flagged_ips.items() if expires > now}
+                for ip in ips[:MAX_FLAGGED_IPS - len(self.flagged_ips)]:
+                    self.flagged_ips[ip] = now + self.flag_seconds
+
+    def status(self):
+        """
+        Get the load and the shedding counters.
+
+        Returns:
+            dict: In-flight rows, degraded mode, flagged sources and counters
+        """
+        now = self.clock()
+        with self.lock:
+            return dict(
+                self.counters,
+                inflight_rows=self.inflight_rows,
+                max_inflight_rows=self.max_inflight_rows,
+                degraded=self.degraded(),
+                sample_rate=self.sample_rate,
+                flagged_clients=sum(1 for expires in self.flagged_clients.values() if expires > now),
+                flagged_ips=sum(1 for expires in self.flagged_ips.values() if expires > now)
+            )
@@ -0,0 +1,188 @@
+"""
+Columnar alert archives for the intrusion detection system.
+Alert partitions older than the retention window are written to compressed
+.npz files with one array per column: numeric columns as typed arrays,
+short text columns as fixed-width byte strings (so time, status and user
+filters are vectorized comparisons), the promoted detail fields as float
+columns and the details JSON as one UTF-8 buffer plus row offsets, decoded
+only for the rows a query returns.
+"""
+
+import json
+import logging
+import os
+
+import numpy as np
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+ALERT_COLUMNS = ('id', 'timestamp', 'source', 'confidence', 'is_resolved',
+                 'resolved_at', 'resolved_by', 'details', 'user_id')
+TEXT_COLUMNS = ('id', 'timestamp', 'source', 'resolved_at', 'resolved_by', 'user_id')
+
+def write_archive(path, rows, detail_columns=()):
+    """
+    Write alert rows to a compressed columnar archive.
+
+    Args:
+        path (str): Archive file path (.npz)
+        rows (list): Alert rows as tuples in ALERT_COLUMNS order, followed
+            by the detail_columns values
+        detail_columns (tuple): Promoted detail fields stored in the rows
+
+    Returns:
+        int: Size of the archive in bytes
+    """
+    try:
+        names = ALERT_COLUMNS + tuple(detail_columns)
+        columns = dict(zip(names, zip(*rows))) if rows else {name: () for name in names}
+
+        arrays = {
+            'confidence': np.asarray(columns['confidence'], dtype=np.float64),
+            'is_resolved': np.asarray(columns['is_resolved'], dtype=np.int8)
+        }
+        # NULL text is stored as an empty string
+        for name in TEXT_COLUMNS:
+            arrays[name] = np.array([(value or '').encode() for value in columns[name]], dtype=np.bytes_)
+
+        # NULL detail fields are stored as NaN
+        for name in detail_columns:
+            arrays[f'detail_{name}'] = np.array(
+                [np.nan if value is None else value for value in columns[name]], dtype=np.float64
+            )
+
+        details = [value.encode() for value in columns['details']]
+        arrays['details_offsets'] = np.cumsum([0] + [len(value) for value in details], dtype=np.int64)
+        arrays['details_data'] = np.frombuffer(b''.join(details), dtype=np.uint8)
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(temp_path, path)
+
+        logger.info(f"Archived {len(rows)} alerts to {path}")
+        return os.path.getsize(path)
+    except Exception as e:
+        logger.error(f"Error writing alert archive: {str(e)}")
+        raise
+
+def _text(value):
+    value = value.decode()
+    return value if value else None
+
+def _details(archive, index):
+    offsets = archive['details_offsets']
+    data = archive['details_data'].tobytes()
+    return [data[offsets[row]:offsets[row + 1]].decode() for row in index.tolist()]
+
+def _detail_values(archive, name, index):
+    if f'detail_{name}' in archive.files:
+        return archive[f'detail_{name}'][index]
+    # Archived before the field was promoted: read it from the details
+    return np.array([json.loads(details).get(name, np.nan) for details in _details(archive, index)], dtype=np.float64)
+
+def _matches(values, operator, value):
+    if operator == '=':
+        return values == value
+    if operator == 'in':
+        return np.isin(values, value)
+    if operator == '>=':
+        return values >= value
+    if operator == '<=':
+        return values <= value
+    raise ValueError(f"Invalid operator: {operator}")
+
+def _read_rows(archive, index, detail_columns=()):
+    details = _details(archive, index)
+    text = {name: archive[name][index] for name in TEXT_COLUMNS}
+    confidence = archive['confidence'][index].tolist()
+    is_resolved = archive['is_resolved'][index].tolist()
+    detail_values = [
+        [None if np.isnan(value) else value for value in _detail_values(archive, name, index).tolist()]
+        for name in detail_columns
+    ]
+
+    rows = []
+    for i in range(len(index)):
+        rows.append((
+            text['id'][i].decode(),
+            text['timestamp'][i].decode(),
+            text['source'][i].decode(),
+            confidence[i],
+            is_resolved[i],
+            _text(text['resolved_at'][i]),
+            _text(text['resolved_by'][i]),
+            details[i],
+            _text(text['user_id'][i])
+        ) + tuple(values[i] for values in detail_values))
+    return rows
+
+def read_archive_rows(path, detail_columns=()):
+    """
+    Read every row of an archive.
+
+    Args:
+        path (str): Archive file path
+        detail_columns (tuple): Promoted detail fields to append to each row
+
+    Returns:
+        list: Alert rows as tuples in ALERT_COLUMNS order, followed by the
+            detail_columns values
+    """
+    with np.load(path) as archive:
+        return _read_rows(archive, np.arange(len(archive['confidence'])), detail_columns)
+
+def query_archive(path, start_time=None, end_time=None, resolved=None, user_id=None, conditions=()):
+    """
+    Get the alerts of an archive that match the filters, newest first.
+
+    Args:
+        path (str): Archive file path
+        start_time (str, optional): Start timestamp
+        end_time (str, optional): End timestamp
+        resolved (bool, optional): Filter by resolved status
+        user_id (str, optional): Filter by user ID
+        conditions (list, optional): (column, operator, value) conditions on
+            confidence or promoted detail fields, as built by
+            utils.database.alert_conditions
+
+    Returns:
+        list: List of alert dictionaries, as returned by DatabaseManager.get_alerts
+    """
+    try:
+        with np.load(path) as archive:
+            timestamps = archive['timestamp']
+            mask = np.ones(len(timestamps), dtype=bool)
+            if start_time:
+                mask &= timestamps >= start_time.encode()
+            if end_time:
+                mask &= timestamps <= end_time.encode()
+            if resolved is not None:
+                mask &= archive['is_resolved'] == (1 if resolved else 0)
+            if user_id is not None:
+                mask &= archive['user_id'] == user_id.encode()
+            for column, operator, value in conditions:
+                candidates = np.flatnonzero(mask)
+                values = (archive['confidence'][candidates] if column == 'confidence'
+                          else _detail_values(archive, column, candidates))
+                mask[candidates] = _matches(values, operator, value)
+
+            index = np.flatnonzero(mask)
+            index = index[np.argsort(timestamps[index], kind='stable')[::-1]]
+            rows = _read_rows(archive, index)
+
+        alerts = []
+        for row in rows:
+            alert = dict(zip(ALERT_COLUMNS, row))
+            alert['details'] = json.loads(alert['details'])
+            alerts.append(alert)
+        return alerts
+    except Exception as e:
+        logger.error(f"Error querying alert archive: {str(e)}")
+        raise
@@ -0,0 +1,159 @@
+"""
+Bulk alert construction for the intrusion detection system.
+This module builds alerts for many intrusion rows at once, keeping them
+in columns (one timestamp per batch, sequential IDs, a details frame)
+instead of creating a dict per row with its own UUID and timestamp.
+"""
+
+import json
+import logging
+import uuid
+from datetime import datetime
+
+import numpy as np
+
+from .instrumentation import timed
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+class AlertBatch:
+    """
+    Columnar batch of alerts produced from one scored batch.
+    """
+
+    def __init__(self, ids, timestamp, source, confidence, details, explanations=None):
+        """
+        Initialize the alert batch.
+
+        Args:
+            ids (list): Alert IDs
+            timestamp (str): Timestamp shared by every alert in the batch
+            source (str): Alert source
+            confidence (numpy.ndarray): Confidence score per alert
+            details (pandas.DataFrame): Original data rows, one per alert
+            explanations (list, optional): Top contributing features per alert,
+                stored under 'explanation' in the alert details
+        """
+        self.ids = ids
+        self.timestamp = timestamp
+        self.source = source
+        self.confidence = confidence
+        self.details = details
+        self.explanations = explanations
+
+    def __len__(self):
+        return len(self.ids)
+
+    def details_json(self):
+        """
+        Serialize the details of every alert to JSON in one call.
+
+        Returns:
+            list: One JSON object string per alert
+        """
+        if len(self) == 0:
+            return []
+        details = self.details.to_json(orient='records', lines=True).rstrip('\n').split('\n')
+        if self.explanations is None:
+            return details
+        return [f'{row[:-1]},"explanation":{json.dumps(explanation)}}}'
+                for row, explanation in zip(details, self.explanations)]
+
+    def to_rows(self, detail_columns=()):
+        """
+        Get database rows for the batch.
+
+        Args:
+            detail_columns (tuple): Detail fields to append to each row
+                (None where the data has no such column)
+
+        Returns:
+            list: (id, timestamp, source, confidence, details_json, *details)
+                tuples
+        """
+        columns = [
+            self.ids,
+            [self.timestamp] * len(self),
+            [self.source] * len(self),
+            self.confidence.tolist(),
+            self.details_json()
+        ]
+        for name in detail_columns:
+            columns.append(self.details[name].tolist() if name in self.details.columns else [None] * len(self))
+        return list(zip(*columns))
+
+    def to_records(self):
+        """
+        Get the alerts as dictionaries in the shape used by the application.
+
+        Returns:
+            list: List of alert dictionaries
+        """
+        records = [
+            {
+                'id': alert_id,
+                'timestamp': self.timestamp,
+                'source': self.source,
+                'confidence': confidence,
+                'details': details
+            }
+            for alert_id, confidence, details in zip(
+                self.ids, self.confidence.tolist(), self.details.to_dict('records')
+            )
+        ]
+        if self.explanations is not None:
+            for record, explanation in zip(records, self.explanations):
+                record['details']['explanation'] = explanation
+        return records
+
+def build_alerts(data, predictions, confidence_scores, source, offset=0, X_scaled=None, explainer=None):
+    """
+    Build alerts for every intrusion row of a scored batch.
+
+    Alert IDs share one random batch prefix and end with the row's index in
+    the uploaded data, so they stay unique without generating a UUID per row.
+
+    Args:
+        data (pandas.DataFrame): Original rows of the batch
+        predictions (numpy.ndarray): Binary predictions (or boolean mask)
+        confidence_scores (numpy.ndarray): Confidence scores
+        source (str): Alert source
+        offset (int): Index of the batch's first row in the whole upload
+        X_scaled (numpy.ndarray, optional): Scaled rows of the batch, needed
+            for explanations
+        explainer (ForestExplainer, optional): Explains the intrusion rows
+
+    Returns:
+        AlertBatch: Alerts for the intrusion rows
+    """
+    try:
+        rows = np.flatnonzero(predictions)
+        prefix = uuid.uuid4().hex[:12]
+        ids = [f"{prefix}-{index}" for index in (rows + offset).tolist()]
+
+        # Only the intrusion rows are explained
+        explanations = None
+        if explainer is not None and X_scaled is not None:
+            with timed('explain', rows=len(rows)):
+                explanations = explainer.top_features(X_scaled[rows])
+
+        batch = AlertBatch(
+            ids=ids,
+            timestamp=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            source=source,
+            confidence=np.asarray(confidence_scores, dtype=np.float64)[rows],
+            details=data.iloc[rows],
+            explanations=explanations
+        )
+
+        if len(batch):
+            logger.info(f"Built {len(batch)} alerts from {source}")
+        return batch
+    except Exception as e:
+        logger.error(f"Error building alerts: {str(e)}")
+        raise
@@ -0,0 +1,168 @@
+"""
+Two-stage cascade scoring for the intrusion detection system.
+A cheap first-stage model scores every row; only rows whose first-stage
+score falls inside an uncertainty band around the decision threshold are
+sent to the RandomForest. This module trains and calibrates the first
+stage and loads/saves it next to the main model.
+"""
+
+import json
+import logging
+import os
+
+import joblib
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+from sklearn.tree import DecisionTreeClassifier
+
+from .instrumentation import REGISTRY, timed
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+CASCADE_MODEL_FILE = 'cascade_model.joblib'
+CASCADE_CONFIG_FILE = 'cascade_config.json'
+
+CASCADE_ROWS = REGISTRY.counter(
+    'ids_cascade_rows_total', 'Rows decided by each cascade stage', ('decided_by',)
+)
+
+def train_first_stage(X_scaled, y, kind='logistic', max_depth=4):
+    """
+    Train a cheap first-stage model on the selected features.
+
+    Args:
+        X_scaled (numpy.ndarray): Scaled feature data
+        y (numpy.ndarray): Binary labels
+        kind (str): 'logistic' or 'tree'
+        max_depth (int): Depth of the tree when kind is 'tree'
+
+    Returns:
+        Fitted classifier with predict_proba
+    """
+    if kind == 'logistic':
+        model = LogisticRegression(max_iter=1000)
+    elif kind == 'tree':
+        model = DecisionTreeClassifier(max_depth=max_depth, min_samples_leaf=20)
+    else:
+        raise ValueError(f"Invalid first-stage model: {kind}")
+
+    model.fit(X_scaled, y)
+    logger.info(f"First-stage {kind} model trained on {X_scaled.shape[0]} rows")
+    return model
+
+def calibrate_band(first_scores, forest_decisions, threshold, max_flip_rate=0.001):
+    """
+    Choose the uncertainty band of the first stage.
+
+    Rows scored below the band are declared benign and rows above it
+    intrusions without consulting the forest. The band is the narrowest
+    one for which at most max_flip_rate of the forest's intrusions fall
+    below it and at most max_flip_rate of its benign rows fall above it.
+
+    Args:
+        first_scores (numpy.ndarray): First-stage scores on calibration data
+        forest_decisions (numpy.ndarray): Forest decisions on the same rows
+        threshold (float): Forest decision threshold
+        max_flip_rate (float): Tolerated fraction of changed decisions per class
+
+    Returns:
+        tuple: (lower, upper) band edges with lower <= threshold <= upper
+
+    Raises:
+        ValueError: If max_flip_rate is not in [0, 1)
+    """
+    if not 0 <= max_flip_rate < 1:
+        raise ValueError(f"max_flip_rate must be at least 0 and below 1, got {max_flip_rate}")
+    first_scores = np.asarray(first_scores, dtype=np.float64)
+    forest_decisions = np.asarray(forest_decisions).astype(bool)
+
+    positives = first_scores[forest_decisions]
+    negatives = first_scores[~forest_decisions]
+
+    # Lower edge: rows strictly below it are decided benign
+    lower = threshold
+    if len(positives):
+        allowed = int(np.floor(max_flip_rate * len(positives)))
+        candidate = np.sort(positives)[allowed]
+        lower = min(lower, candidate)
+    else:
+        lower = min(lower, float(np.max(first_scores, initial=threshold)))
+
+    # Upper edge: rows strictly above it are decided intrusions
+    upper = threshold
+    if len(negatives):
+        allowed = int(np.floor(max_flip_rate * len(negatives)))
+        candidate = np.sort(negatives)[::-1][allowed]
+        upper = max(upper, candidate)
+    else:
+        upper = max(upper, float(np.min(first_scores, initial=threshold)))
+
+    logger.info(f"Cascade band calibrated: [{lower:.6f}, {upper:.6f}] around threshold {threshold:.6f}")
+    return float(lower), float(upper)
+
+def cascade_scores(first_stage, forest, X_scaled, lower, upper):
+    """
+    Score rows with the cascade.
+
+    Args:
+        first_stage: Fitted first-stage classifier
+        forest: Fitted RandomForest classifier
+        X_scaled (numpy.ndarray): Scaled feature data
+        lower (float): Lower edge of the uncertainty band
+        upper (float): Upper edge of the uncertainty band
+
+    Returns:
+        tuple: (confidence_scores, forwarded_mask) where confidence comes from
+            the forest for forwarded rows and from the first stage otherwise
+    """
+    with timed('cascade_first_stage', rows=X_scaled.shape[0]):
+        confidence_scores = first_stage.predict_proba(X_scaled)[:, 1]
+
+    forwarded = (confidence_scores >= lower) & (confidence_scores <= upper)
+    num_forwarded = int(np.count_nonzero(forwarded))
+    if num_forwarded:
+        with timed('predict_proba', rows=num_forwarded):
+            confidence_scores[forwarded] = forest.predict_proba(X_scaled[forwarded])[:, 1]
+
+    CASCADE_ROWS.labels('forest').inc(num_forwarded)
+    CASCADE_ROWS.labels('first_stage').inc(X_scaled.shape[0] - num_forwarded)
+
+    return confidence_scores, forwarded
+
+def save_cascade(model_dir, first_stage, lower, upper, details=None):
+    """
+    Save the first stage and its band next to the main model.
+
+    Args:
+        model_dir (str): Directory containing the model files
+        first_stage: Fitted first-stage classifier
+        lower (float): Lower edge of the uncertainty band
+        upper (float): Upper edge of the uncertainty band
+        details (dict, optional): Calibration details to record
+    """
+    joblib.dump(first_stage, os.path.join(model_dir, CASCADE_MODEL_FILE), compress=3)
+    config = {'lower': lower, 'upper': upper, 'model_type': type(first_stage).__name__}
+    config.update(details or {})
+    with open(os.path.join(model_dir, CASCADE_CONFIG_FILE), 'w') as f:
+        json.dump(config, f, indent=2)
+    logger.info(f"Cascade saved to {model_dir}")
+
+def load_cascade(model_dir):
+    """
+    Load the first stage and its band.
+
+    Args:
+        model_dir (str): Directory containing the model files
+
+    Returns:
+        tuple: (first_stage, lower, upper)
+    """
+    first_stage = joblib.load(os.path.join(model_dir, CASCADE_MODEL_FILE))
+    with open(os.path.join(model_dir, CASCADE_CONFIG_FILE), 'r') as f:
+        config = json.load(f)
+    return first_stage, float(config['lower']), float(config['upper'])
@@ -0,0 +1,342 @@
+"""
+NetFlow/IPFIX collector for the intrusion detection system.
+Routers and switches already summarize traffic into flow records, so the
+collector lets the IDS watch a network without capturing packets: it
+listens for NetFlow v5/v9 and IPFIX export packets on UDP, decodes them as
+they arrive, gathers the records into batches (by size or after a flush
+interval) and scores each batch with IntrusionDetector.predict on a worker
+thread, so receiving never waits for the model. Intrusions are stored as
+alerts with the flow's addresses and ports. When scoring falls behind,
+whole batches are dropped and counted rather than queued without bound.
+"""
+
+import asyncio
+import logging
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .alerts import build_alerts
+from .data_processor import scale_features
+from .instrumentation import REGISTRY, timed
+from .netflow import (NetflowDecoder, NetflowError, feature_availability, fill_unavailable, flow_features,
+                      format_addresses)
+from .prefilter import score_undecided
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 2055
+DEFAULT_BATCH_ROWS = 20000
+DEFAULT_FLUSH_SECONDS = 1.0
+# Batches waiting for the scorer before new ones are dropped
+DEFAULT_MAX_PENDING_BATCHES = 4
+RECEIVE_BUFFER_BYTES = 8 << 20
+
+NETFLOW_RECORDS = REGISTRY.counter('ids_netflow_records_total', 'Flow records decoded from export packets')
+NETFLOW_DROPPED = REGISTRY.counter('ids_netflow_dropped_records_total', 'Flow records dropped unscored',
+                                   ('reason',))
+NETFLOW_ERRORS = REGISTRY.counter('ids_netflow_decode_errors_total', 'Export packets that could not be decoded')
+
+class FlowCollector:
+    """
+    Decodes export packets, batches their records and scores the batches.
+    """
+
+    def __init__(self, detector, db=None, batch_rows=DEFAULT_BATCH_ROWS, flush_seconds=DEFAULT_FLUSH_SECONDS,
+                 max_pending_batches=DEFAULT_MAX_PENDING_BATCHES, source='NetFlow collector', correlator=None,
+                 heavy_hitters=None, prefilter=None):
+        """
+        Initialize the collector.
+
+        Args:
+            detector (IntrusionDetector): Loaded detector
+            db (DatabaseManager, optional): Alert store (None to only count intrusions)
+            batch_rows (int): Records scored together
+            flush_seconds (float): Longest a record waits for its batch to fill
+            max_pending_batches (int): Batches queued for scoring before
+                further batches are dropped
+            source (str): Alert source
+            correlator (CrossFlowDetector, optional): Also checks every batch
+                for port scans, host scans and floods
+            heavy_hitters (TrafficHeavyHitters, optional): Counts every batch
+                in the top talkers
+            prefilter (Prefilter, optional): Allowlist/blocklist rules that
+                decide records before they are scored
+        """
+        self.detector = detector
+        self.db = db
+        self.batch_rows = batch_rows
+        self.flush_seconds = flush_seconds
+        self.max_pending_batches = max_pending_batches
+        self.source = source
+        self.correlator = correlator
+        self.heavy_hitters = heavy_hitters
+        self.prefilter = prefilter
+        self.decoder = NetflowDecoder()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='netflow-scorer')
+
+        self.lock = threading.Lock()
+        self.pending = []
+        self.pending_rows = 0
+        self.pending_since = None
+        self.queued_batches = 0
+        self.futures = set()
+        self.availability = None
+        self.stats = {
+            'packets': 0, 'records': 0, 'decode_errors': 0, 'decode_seconds': 0.0,
+            'batches': 0, 'scored': 0, 'score_seconds': 0.0, 'intrusions': 0, 'dropped': 0,
+            'cross_flow_alerts': 0
+        }
+
+    def handle_packet(self, data, exporter):
+        """
+        Decode one export packet and queue its records.
+
+        Args:
+            data (bytes): UDP payload
+            exporter (str): Exporter address
+        """
+        start = time.perf_counter()
+        try:
+            records = self.decoder.decode(data, exporter)
+        except NetflowError as e:
+            self.stats['decode_errors'] += 1
+            NETFLOW_ERRORS.inc()
+            logger.debug(f"Error decoding export packet from {exporter}: {str(e)}")
+            return
+        self.stats['decode_seconds'] += time.perf_counter() - start
+        self.stats['packets'] += 1
+        self.stats['records'] += len(records)
+        NETFLOW_RECORDS.inc(len(records))
+
+        if len(records):
+            if not self.pending:
+                self.pending_since = time.monotonic()
+            self.pending.append(records)
+            self.pending_rows += len(records)
+            if self.pending_rows >= self.batch_rows:
+                self.flush()
+
+    def flush(self, force=False):
+        """
+        Hand the pending records to the scorer.
+
+        Args:
+            force (bool): Flush even if the batch is neither full nor due
+
+        Returns:
+            concurrent.futures.Future: Scoring of the batch, or None if
+                nothing was submitted
+        """
+        if not self.pending:
+            return None
+        due = time.monotonic() - self.pending_since >= self.flush_seconds
+        if not (force or due or self.pending_rows >= self.batch_rows):
+            return None
+        records = self.pending[0] if len(self.pending) == 1 else np.concatenate(self.pending)
+        self.pending, self.pending_rows = [], 0
+
+        with self.lock:
+            if self.queued_batches >= self.max_pending_batches:
+                self.stats['dropped'] += len(records)
+                NETFLOW_DROPPED.labels('overloaded').inc(len(records))
+                return None
+            self.queued_batches += 1
+        future = self.executor.submit(self._score_queued, records)
+        self.futures.add(future)
+        future.add_done_callback(self.futures.discard)
+        return future
+
+    def _score_queued(self, records):
+        try:
+            return self.score(records)
+        except Exception as e:
+            logger.error(f"Error scoring flow records: {str(e)}")
+        finally:
+            with self.lock:
+                self.queued_batches -= 1
+
+    def score(self, records):
+        """
+        Score a batch of flow records and store its intrusions as alerts.
+
+        Args:
+            records (numpy.ndarray): FLOW_DTYPE records
+
+        Returns:
+            tuple: (predictions, confidence_scores)
+        """
+        start = time.perf_counter()
+        detector = self.detector
+        with timed('netflow_features', rows=len(records)):
+            features = flow_features(records, detector.selected_features)
+        if self.availability is None:
+            self._report_availability(records)
+        X_scaled = scale_features(fill_unavailable(features, detector.scaler), detector.scaler, detector.float32)
+        rules = None
+        if self.prefilter is None:
+            predictions, confidence_scores = detector.predict(X_scaled)
+        else:
+            decisions, rules = self.prefilter.evaluate_records(records)
+            predictions, confidence_scores = score_undecided(decisions, detector.predict, X_scaled)
+
+        flagged = np.flatnonzero(predictions)
+        if len(flagged) and self.db is not None:
+            details = features.iloc[flagged].reset_index(drop=True)
+            details['source_ip'], details['destination_ip'] = format_addresses(records[flagged])
+            details['source_port'] = records['src_port'][flagged]
+            details['protocol'] = records['protocol'][flagged]
+            if rules is not None:
+                details['prefilter_rule'] = rules[flagged]
+            batch = build_alerts(details, np.ones(len(flagged), dtype=int),
+                                 np.asarray(confidence_scores)[flagged], self.source)
+            self.db.add_alerts(batch)
+
+        end_ms = records['end_ms'][np.isfinite(records['end_ms'])]
+        now = end_ms.max() / 1000.0 if len(end_ms) else None
+        if self.heavy_hitters is not None:
+            self.heavy_hitters.update(records['src_addr'], records['dst_addr'], records['dst_port'],
+                                      records['bytes'] + np.nan_to_num(records['rev_bytes']), now,
+                                      records['ip_version'])
+        cross_flow_alerts = 0
+        if self.correlator is not None:
+            cross = self.correlator.update(records, now=now)
+            if cross is not None:
+                cross_flow_alerts = len(cross)
+                if self.db is not None:
+                    self.db.add_alerts(cross)
+
+        with self.lock:
+            self.stats['cross_flow_alerts'] += cross_flow_alerts
+            self.stats['batches'] += 1
+            self.stats['scored'] += len(records)
+            self.stats['intrusions'] += len(flagged)
+            self.stats['score_seconds'] += time.perf_counter() - start
+        return predictions, confidence_scores
+
+    def _report_availability(self, records):
+        biflow = bool(np.isfinite(records['rev_packets']).any())
+        self.availability = feature_availability(self.detector.selected_features, biflow)
+        unavailable = [feature for feature, source in self.availability.items() if source == 'unavailable']
+        estimated = [feature for feature, source in self.availability.items() if source == 'estimated']
+        if unavailable:
+            logger.warning(f"{len(unavailable)} of {len(self.availability)} features are not in flow records "
+                           f"and are scored at their training mean: {', '.join(unavailable)}")
+        if estimated:
+            logger.info(f"Estimated from mean packet lengths: {', '.join(estimated)}")
+
+    def drain(self, timeout=None):
+        """
+        Score the pending records and wait for every queued batch.
+
+        Args:
+            timeout (float, optional): Seconds to wait at most
+        """
+        self.flush(force=True)
+        for future in list(self.futures):
+            future.exception(timeout)
+
+    def rates(self, previous=None, seconds=None):
+        """
+        Get decode and score rates.
+
+        Args:
+            previous (dict, optional): Earlier stats() snapshot; rates are then
+                over the interval since it
+            seconds (float, optional): Length of that interval
+
+        Returns:
+            dict: Received packets/s and records/s over the interval, decode
+                and score capacity (records per second of decode or scoring
+                time), totals and dropped records
+        """
+        current = self.snapshot()
+        delta = {key: current[key] - (previous or {}).get(key, 0) for key in current}
+        seconds = seconds or 1.0
+        return {
+            'packets_per_second': delta['packets'] / seconds,
+            'records_per_second': delta['records'] / seconds,
+            'scored_per_second': delta['scored'] / seconds,
+            'decode_capacity': delta['records'] / delta['decode_seconds'] if delta['decode_seconds'] else None,
+            'score_capacity': delta['scored'] / delta['score_seconds'] if delta['score_seconds'] else None,
+            'intrusions': delta['intrusions'],
+            'dropped': delta['dropped'],
+            'decode_errors': delta['decode_errors'],
+            'missing_template': self.decoder.stats['missing_template']
+        }
+
+    def snapshot(self):
+        """
+        Get a copy of the counters.
+
+        Returns:
+            dict: Packets, records, batches, scored rows, intrusions, dropped
+                records and time spent decoding and scoring
+        """
+        with self.lock:
+            return dict(self.stats)
+
+    async def serve(self, host='0.0.0.0', port=DEFAULT_PORT, report_seconds=10.0, duration=None):
+        """
+        Receive export packets until cancelled (or for duration seconds).
+
+        Args:
+            host (str): Listen address
+            port (int): UDP port
+            report_seconds (float): Log rates this often (0 to disable)
+            duration (float, optional): Stop after this many seconds
+        """
+        loop = asyncio.get_running_loop()
+        transport, _ = await loop.create_datagram_endpoint(lambda: _ExportProtocol(self), local_addr=(host, port))
+        sock = transport.get_extra_info('socket')
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER_BYTES)
+        except OSError:
+            pass
+        logger.info(f"Collecting NetFlow/IPFIX on {host}:{sock.getsockname()[1]}/udp")
+
+        started = last_report = time.monotonic()
+        previous = self.snapshot()
+        try:
+            while duration is None or time.monotonic() - started < duration:
+                await asyncio.sleep(min(self.flush_seconds, 0.25))
+                self.flush()
+                now = time.monotonic()
+                if report_seconds and now - last_report >= report_seconds:
+                    logger.info(format_rates(self.rates(previous, now - last_report)))
+                    previous, last_report = self.snapshot(), now
+        finally:
+            transport.close()
+            await loop.run_in_executor(None, self.drain)
+
+class _ExportProtocol(asyncio.DatagramProtocol):
+    def __init__(self, collector):
+        self.collector = collector
+
+    def datagram_received(self, data, addr):
+        self.collector.handle_packet(data, addr[0])
+
+def format_rates(rates):
+    """
+    Format collector rates for logging.
+
+    Args:
+        rates (dict): Rates returned by FlowCollector.rates
+
+    Returns:
+        str: One-line summary
+    """
+    decode = f"{rates['decode_capacity']:,.0f}" if rates['decode_capacity'] else '-'
+    score = f"{rates['score_capacity']:,.0f}" if rates['score_capacity'] else '-'
+    return (f"received {rates['packets_per_second']:,.0f} packets/s ({rates['records_per_second']:,.0f} flows/s), "
+            f"scored {rates['scored_per_second']:,.0f} flows/s; capacity: decode {decode} flows/s, "
+            f"score {score} flows/s; {rates['intrusions']} intrusions, {rates['dropped']} dropped, "
+            f"{rates['decode_errors']} decode errors, {rates['missing_template']} sets without template")
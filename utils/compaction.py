@@ -0,0 +1,187 @@
+"""
+Forest compaction for the intrusion detection system.
+This module shrinks the RandomForest either by selecting a subset of its
+trees (most decisive first) or by distilling it into a smaller, shallower
+forest trained on the original forest's decisions, keeping the smallest
+candidate whose metrics stay within a budget of the original model.
+"""
+
+import copy
+import io
+import logging
+import time
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from .anytime_forest import order_trees
+from .prediction import compute_metrics
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+def subset_forest(forest, tree_indices):
+    """
+    Build a forest made of a subset of another forest's trees.
+
+    Args:
+        forest: Fitted RandomForest classifier
+        tree_indices (list): Indices of the trees to keep
+
+    Returns:
+        RandomForestClassifier: Forest with only the selected trees
+    """
+    compact = copy.copy(forest)
+    compact.estimators_ = [forest.estimators_[i] for i in tree_indices]
+    compact.n_estimators = len(compact.estimators_)
+    return compact
+
+def forest_stats(forest, X_scaled):
+    """
+    Measure the size and speed of a forest.
+
+    Args:
+        forest: Fitted forest classifier
+        X_scaled (numpy.ndarray): Scaled rows used for the latency measurement
+
+    Returns:
+        dict: Trees, nodes, max depth, compressed size, load time and latency
+    """
+    buffer = io.BytesIO()
+    joblib.dump(forest, buffer, compress=3)
+    size = buffer.tell()
+
+    buffer.seek(0)
+    start = time.perf_counter()
+    joblib.load(buffer)
+    load_seconds = time.perf_counter() - start
+
+    timings = []
+    for _ in range(3):
+        start = time.perf_counter()
+        forest.predict_proba(X_scaled)
+        timings.append(time.perf_counter() - start)
+
+    single = X_scaled[:1]
+    start = time.perf_counter()
+    for _ in range(20):
+        forest.predict_proba(single)
+    single_seconds = (time.perf_counter() - start) / 20
+
+    return {
+        'n_estimators': len(forest.estimators_),
+        'node_count': int(sum(tree.tree_.node_count for tree in forest.estimators_)),
+        'max_depth': int(max(tree.tree_.max_depth for tree in forest.estimators_)),
+        'compressed_bytes': size,
+        'load_seconds': load_seconds,
+        'rows_per_second': X_scaled.shape[0] / min(timings),
+        'single_row_ms': single_seconds * 1000
+    }
+
+def within_budget(metrics, baseline, metric, max_drop):
+    """
+    Check that a candidate's metric is within budget of the baseline.
+
+    Args:
+        metrics (dict): Candidate metrics
+        baseline (dict): Baseline metrics
+        metric (str): Metric name
+        max_drop (float): Allowed drop (an increase for rates where lower is better)
+
+    Returns:
+        bool: Whether the candidate is acceptable
+    """
+    if metric in ('false_positive_rate', 'false_negative_rate'):
+        return metrics[metric] - baseline[metric] <= max_drop
+    return baseline[metric] - metrics[metric] <= max_drop
+
+def select_trees(forest, threshold, X_scaled, y, metric='f1_score', max_drop=0.001, order=None):
+    """
+    Find the fewest most-decisive trees that stay within the metric budget.
+
+    Args:
+        forest: Fitted RandomForest classifier
+        threshold (float): Decision threshold
+        X_scaled (numpy.ndarray): Scaled evaluation data
+        y (numpy.ndarray): Binary labels
+        metric (str): Metric the budget applies to
+        max_drop (float): Allowed drop of the metric
+        order (list, optional): Tree order from order_trees; computed on
+            X_scaled when not given
+
+    Returns:
+        tuple: (compact forest, its metrics), the kept trees being in
+            decisive-first order; (forest, baseline metrics) itself when
+            no smaller subset stays within the budget
+    """
+    if order is None:
+        order = order_trees(forest, X_scaled, threshold)
+    column = list(forest.classes_).index(1)
+    X32 = np.ascontiguousarray(X_scaled, dtype=np.float32)
+
+    # Running sum of tree probabilities lets every prefix be scored at once
+    sums = np.zeros(X32.shape[0])
+    baseline = compute_metrics(y, (forest.predict_proba(X_scaled)[:, 1] >= threshold).astype(int))
+    for k, tree_index in enumerate(order, start=1):
+        if k == len(order):
+            # Every tree kept: no reduction, the original forest is the answer
+            break
+        sums += forest.estimators_[tree_index].predict_proba(X32, check_input=False)[:, column]
+        scores = sums / k
+        metrics = compute_metrics(y, (scores >= threshold).astype(int), scores)
+        if within_budget(metrics, baseline, metric, max_drop):
+            logger.info(f"Tree selection kept {k} of {len(order)} trees")
+            return subset_forest(forest, order[:k]), metrics
+
+    return forest, baseline
+
+def distill_forest(forest, threshold, X_train, X_eval, y_eval, metric='f1_score', max_drop=0.001,
+                   n_estimators_grid=(10, 25, 50), max_depth_grid=(6, 10, 14, 18)):
+    """
+    Distill the forest into the smallest shallower forest within the metric budget.
+
+    Students are trained on the original forest's decisions over X_train, so
+    unlabeled traffic can be used for training; labels are only needed for
+    the evaluation rows.
+
+    Args:
+        forest: Fitted RandomForest classifier
+        threshold (float): Decision threshold of the original forest
+        X_train (numpy.ndarray): Scaled rows used to train the students
+        X_eval (numpy.ndarray): Scaled evaluation rows
+        y_eval (numpy.ndarray): Binary labels of the evaluation rows
+        metric (str): Metric the budget applies to
+        max_drop (float): Allowed drop of the metric
+        n_estimators_grid (tuple): Candidate numbers of trees
+        max_depth_grid (tuple): Candidate depth limits
+
+    Returns:
+        tuple: (student forest, its metrics, its threshold), or the original
+            forest when no student is within budget
+    """
+    teacher = (forest.predict_proba(X_train)[:, 1] >= threshold).astype(int)
+    baseline = compute_metrics(y_eval, (forest.predict_proba(X_eval)[:, 1] >= threshold).astype(int))
+
+    candidates = sorted(
+        ((n, d) for n in n_estimators_grid for d in max_depth_grid),
+        key=lambda nd: nd[0] * (2 ** nd[1])
+    )
+    for n_estimators, max_depth in candidates:
+        student = RandomForestClassifier(
+            n_estimators=n_estimators, max_depth=max_depth, n_jobs=-1, random_state=42
+        )
+        student.fit(X_train, teacher)
+        scores = student.predict_proba(X_eval)[:, 1]
+        # Students vote on the teacher's decisions, so 0.5 is their natural threshold
+        metrics = compute_metrics(y_eval, (scores >= 0.5).astype(int), scores)
+        logger.info(f"Distilled candidate: {n_estimators} trees, depth {max_depth}, {metric}={metrics[metric]:.4f}")
+        if within_budget(metrics, baseline, metric, max_drop):
+            student.set_params(n_jobs=forest.n_jobs)
+            return student, metrics, 0.5
+
+    return forest, baseline, threshold
@@ -0,0 +1,202 @@
+"""
+Cross-flow scan and flood detection for the intrusion detection system.
+The model judges each flow on its own, so a slow port scan or a flood
+spread over many ordinary-looking flows goes unnoticed. CrossFlowDetector
+watches the flows the collector and the flow tracker score and, within
+tumbling windows of window_seconds, estimates:
+
+- per source, the distinct destination ports (port scan) and distinct
+  destination hosts (host scan) it contacted, with VirtualHyperLogLog;
+- per destination, the flows it received (flood) with a CountMinSketch,
+  and the distinct sources sending them.
+
+A source or destination crossing a threshold raises one aggregated alert
+per window. Memory is fixed by the sketch sizes whatever the number of
+sources; sketches are cleared when a new window starts.
+"""
+
+import logging
+import math
+import time
+
+import numpy as np
+import pandas as pd
+
+from .alerts import build_alerts
+from .instrumentation import REGISTRY
+from .netflow import format_addresses
+from .sketches import CountMinSketch, VirtualHyperLogLog, hash64, hash_addresses
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW_SECONDS = 300.0
+DEFAULT_PORT_THRESHOLD = 100
+DEFAULT_HOST_THRESHOLD = 100
+DEFAULT_FLOOD_THRESHOLD = 20000
+# Alerts raised per window before further ones are only counted
+DEFAULT_MAX_ALERTS = 1000
+
+CROSS_FLOW_ALERTS = REGISTRY.counter('ids_cross_flow_alerts_total', 'Aggregated scan and flood alerts', ('kind',))
+
+class CrossFlowDetector:
+    """
+    Windowed port scan, host scan and flood detection over flow records.
+    """
+
+    def __init__(self, window_seconds=DEFAULT_WINDOW_SECONDS, port_threshold=DEFAULT_PORT_THRESHOLD,
+                 host_threshold=DEFAULT_HOST_THRESHOLD, flood_threshold=DEFAULT_FLOOD_THRESHOLD,
+                 registers=1 << 22, virtual_registers=128, cms_width=1 << 17, cms_depth=4,
+                 max_alerts=DEFAULT_MAX_ALERTS, source='Cross-flow detector'):
+        """
+        Initialize the detector.
+
+        Args:
+            window_seconds (float): Length of the tumbling windows
+            port_threshold (int): Distinct destination ports from one source
+                that make a port scan
+            host_threshold (int): Distinct destination hosts from one source
+                that make a host scan
+            flood_threshold (int): Flows to one destination that make a flood
+            registers (int): Shared registers of each distinct-count sketch
+            virtual_registers (int): Registers per source or destination
+            cms_width (int): Counters per row of the flow-count sketches
+            cms_depth (int): Rows of the flow-count sketches
+            max_alerts (int): Alerts raised per window
+            source (str): Alert source
+        """
+        self.window_seconds = window_seconds
+        self.thresholds = {'port scan': port_threshold, 'host scan': host_threshold, 'flood': flood_threshold}
+        self.max_alerts = max_alerts
+        self.source = source
+        self.ports = VirtualHyperLogLog(registers, virtual_registers, seed=1)
+        self.hosts = VirtualHyperLogLog(registers, virtual_registers, seed=2)
+        self.fan_in = VirtualHyperLogLog(registers, virtual_registers, seed=3)
+        # Flows per source bound its distinct counts: only heavy sources are estimated
+        self.source_flows = CountMinSketch(cms_width, cms_depth, seed=4)
+        self.destination_flows = CountMinSketch(cms_width, cms_depth, seed=5)
+        self.window_start = None
+        self.alerted = {kind: set() for kind in self.thresholds}
+        self.window_alerts = 0
+        self.stats = {'flows': 0, 'windows': 0, 'alerts': 0, 'suppressed': 0, 'update_seconds': 0.0}
+
+    @property
+    def nbytes(self):
+        """Memory held by the sketches, bytes."""
+        return sum(sketch.nbytes for sketch in
+                   (self.ports, self.hosts, self.fan_in, self.source_flows, self.destination_flows))
+
+    def _roll(self, now):
+        start = math.floor(now / self.window_seconds) * self.window_seconds
+        if self.window_start is None or start > self.window_start:
+            if self.window_start is not None:
+                for sketch in (self.ports, self.hosts, self.fan_in, self.source_flows, self.destination_flows):
+                    sketch.clear()
+                for keys in self.alerted.values():
+                    keys.clear()
+                self.window_alerts = 0
+            self.window_start = start
+            self.stats['windows'] += 1
+
+    def update(self, records, now=None):
+        """
+        Add flows and raise alerts for the thresholds they cross.
+
+        Args:
+            records (numpy.ndarray): Flow records with src_addr, dst_addr,
+                ip_version and dst_port fields (FLOW_DTYPE or flow table rows)
+            now (float, optional): Time of the flows, epoch seconds (default now)
+
+        Returns:
+            AlertBatch: Aggregated alerts, or None if no threshold was crossed
+        """
+        try:
+            if not len(records):
+                return None
+            start = time.perf_counter()
+            self._roll(time.time() if now is None else now)
+            sources = hash_addresses(records['src_addr'])
+            destinations = hash_addresses(records['dst_addr'])
+            self.ports.add(sources, hash64(records['dst_port']))
+            self.hosts.add(sources, destinations)
+            self.fan_in.add(destinations, sources)
+            self.source_flows.add(sources)
+            self.destination_flows.add(destinations)
+
+            found = []
+            keys, index = np.unique(sources, return_index=True)
+            heavy = self.source_flows.estimate(keys) >= min(self.thresholds['port scan'], self.thresholds['host scan'])
+            keys, index = keys[heavy], index[heavy]
+            for kind, sketch in (('port scan', self.ports), ('host scan', self.hosts)):
+                if len(keys):
+                    counts = sketch.estimate(keys)
+                    found.append(self._crossed(kind, keys, index, counts))
+            keys, index = np.unique(destinations, return_index=True)
+            flows = self.destination_flows.estimate(keys)
+            found.append(self._crossed('flood', keys, index, flows))
+
+            found = [item for item in found if item is not None]
+            batch = self._alerts(records, found) if found else None
+            self.stats['flows'] += len(records)
+            self.stats['update_seconds'] += time.perf_counter() - start
+            return batch
+        except Exception as e:
+            logger.error(f"Error updating cross-flow detector: {str(e)}")
+            raise
+
+    def _crossed(self, kind, keys, index, counts):
+        """Keys over the kind's threshold that have no alert in this window yet."""
+        over = np.flatnonzero(counts >= self.thresholds[kind])
+        alerted = self.alerted[kind]
+        over = [i for i in over.tolist() if int(keys[i]) not in alerted]
+        if not over:
+            return None
+        room = max(self.max_alerts - self.window_alerts, 0)
+        if len(over) > room:
+            self.stats['suppressed'] += len(over) - room
+            over = over[:room]
+            if not over:
+                return None
+        alerted.update(int(key) for key in keys[over])
+        self.window_alerts += len(over)
+        return kind, index[over], counts[over], keys[over]
+
+    def _alerts(self, records, found):
+        window_start = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.window_start))
+        frames = []
+        for kind, index, counts, keys in found:
+            sources, destinations = format_addresses(records[index])
+            frame = pd.DataFrame({'kind': kind, 'window_start': window_start,
+                                  'window_seconds': self.window_seconds, 'threshold': self.thresholds[kind]},
+                                 index=range(len(index)))
+            if kind == 'flood':
+                frame['destination_ip'] = destinations
+                frame['flows'] = np.round(counts).astype(np.int64)
+                frame['distinct_sources'] = np.round(self.fan_in.estimate(keys)).astype(np.int64)
+            else:
+                frame['source_ip'] = sources
+                frame['distinct_ports' if kind == 'port scan' else 'distinct_hosts'] = np.round(counts).astype(np.int64)
+            frames.append(frame)
+            CROSS_FLOW_ALERTS.labels(kind).inc(len(frame))
+            logger.warning(f"{kind.capitalize()}: {len(frame)} new in the window starting {window_start}")
+        details = pd.concat(frames, ignore_index=True)
+        for column in ('flows', 'distinct_sources', 'distinct_ports', 'distinct_hosts'):
+            if column in details.columns:
+                details[column] = details[column].astype('Int64')
+        self.stats['alerts'] += len(details)
+        # Threshold crossings are not probabilistic scores: confidence 1
+        return build_alerts(details, np.ones(len(details), dtype=int), np.ones(len(details)), self.source)
+
+    def snapshot(self):
+        """
+        Get a copy of the counters.
+
+        Returns:
+            dict: Flows seen, windows started, alerts raised and suppressed,
+                time spent and sketch memory
+        """
+        return dict(self.stats, window_start=self.window_start, sketch_bytes=self.nbytes)
@@ -13,6 +13,8 @@ from datetime import datetime
 from sklearn.preprocessing import StandardScaler
 from io import StringIO
 
+from .instrumentation import timed
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
@@ -59,7 +61,50 @@ def load_selected_features(model_dir):
         logger.error(f"Error loading selected features: {str(e)}")
         raise
 
-def process_csv_file(file_path, selected_features, scaler):
+def feature_dtypes(selected_features, float32=False):
+    """
+    Get the dtypes to parse the selected features with.
+    
+    Args:
+        selected_features (list): List of features to select
+        float32 (bool): Parse the features directly to float32
+        
+    Returns:
+        dict: Column dtypes for pandas.read_csv, or None to let pandas infer them
+    """
+    if not float32:
+        return None
+    return dict.fromkeys(selected_features, np.float32)
+
+def scale_features(X, scaler, float32=False):
+    """
+    Scale the selected features.
+    
+    In float32 mode the features are copied once into a float32 array and a
+    StandardScaler is applied in place on it, so no float64 copy of the batch
+    is ever made; the forest then receives the float32 array it uses internally.
+    
+    Args:
+        X (pandas.DataFrame): Selected features
+        scaler (StandardScaler): Scaler for feature normalization
+        float32 (bool): Scale in float32
+        
+    Returns:
+        numpy.ndarray: Scaled features
+    """
+    if not float32:
+        return scaler.transform(X)
+    
+    X_scaled = np.array(X, dtype=np.float32, order='C')
+    if isinstance(scaler, StandardScaler):
+        if scaler.with_mean:
+            X_scaled -= scaler.mean_.astype(np.float32)
+        if scaler.with_std:
+            X_scaled /= scaler.scale_.astype(np.float32)
+        return X_scaled
+    return scaler.transform(X_scaled).astype(np.float32, copy=False)
+
+def process_csv_file(file_path, selected_features, scaler, float32=False):
     """
     Process a CSV file containing network traffic data.
     
@@ -67,17 +112,21 @@ def process_csv_file(file_path, selected_features, scaler):
         file_path (str): Path to the CSV file
         selected_features (list): List of features to select
         scaler (StandardScaler): Scaler for feature normalization
+        float32 (bool): Parse and scale the features in float32
         
     Returns:
         tuple: (processed_data, original_data)
     """
     try:
         # Read CSV file
-        df = pd.read_csv(file_path)
+        with timed('parse') as stage:
+            df = pd.read_csv(file_path, dtype=feature_dtypes(selected_features, float32))
+            stage.rows = df.shape[0]
         logger.info(f"CSV file loaded successfully: {file_path}, {df.shape[0]} rows")
         
         # Validate features
-        missing_features = [f for f in selected_features if f not in df.columns]
+        with timed('validate'):
+            missing_features = [f for f in selected_features if f not in df.columns]
         if missing_features:
             raise ValueError(f"Missing required features in CSV: {missing_features}")
         
@@ -85,7 +134,8 @@ def process_csv_file(file_path, selected_features, scaler):
         X = df[selected_features]
         
         # Scale features
-        X_scaled = scaler.transform(X)
+        with timed('scale', rows=X.shape[0]):
+            X_scaled = scale_features(X, scaler, float32)
         
         logger.info(f"Data processed successfully: {X.shape[0]} rows, {X.shape[1]} features")
         return X_scaled, df
@@ -93,7 +143,176 @@ def process_csv_file(file_path, selected_features, scaler):
         logger.error(f"Error processing CSV file: {str(e)}")
         raise
 
-def process_csv_data(csv_data, selected_features, scaler):
+def iter_csv_chunks(file_path, selected_features, scaler, chunksize=100000, float32=False):
+    """
+    Process a CSV file containing network traffic data in chunks.
+
+    Args:
+        file_path (str): Path to the CSV file
+        selected_features (list): List of features to select
+        scaler (StandardScaler): Scaler for feature normalization
+        chunksize (int): Number of rows per chunk
+        float32 (bool): Parse and scale the features in float32
+
+    Yields:
+        tuple: (processed_data, original_data) for each chunk
+    """
+    try:
+        with timed('validate'):
+            is_valid, missing_features = validate_csv_headers(file_path, selected_features)
+        if not is_valid:
+            raise ValueError(f"Missing required features in CSV: {missing_features}")
+
+        rows = 0
+        reader = pd.read_csv(file_path, chunksize=chunksize, dtype=feature_dtypes(selected_features, float32))
+        while True:
+            with timed('parse') as stage:
+                df = next(reader, None)
+                if df is not None:
+                    stage.rows = df.shape[0]
+            if df is None:
+                break
+
+            with timed('scale', rows=df.shape[0]):
+                X_scaled = scale_features(df[selected_features], scaler, float32)
+            rows += df.shape[0]
+            yield X_scaled, df
+
+        logger.info(f"CSV file processed in chunks: {file_path}, {rows} rows")
+    except Exception as e:
+        logger.error(f"Error processing CSV file in chunks: {str(e)}")
+        raise
+
+def binarize_labels(labels, benign_label='BENIGN'):
+    """
+    Convert dataset labels to 0 (benign) / 1 (attack).
+
+    Args:
+        labels (pandas.Series): Numeric labels or attack names as in CICIDS2017
+        benign_label (str): Name used for benign traffic
+
+    Returns:
+        numpy.ndarray: Binary labels
+    """
+    if pd.api.types.is_numeric_dtype(labels):
+        return (labels.to_numpy() != 0).astype(int)
+    names = labels.astype(str).str.strip().str.upper()
+    return (names != benign_label.upper()).to_numpy().astype(int)
+
+def finite_rows(X):
+    """
+    Mark the rows whose feature values are all finite.
+
+    CICIDS exports contain 'Infinity' and missing values in the rate
+    features, which the scaler refuses.
+
+    Args:
+        X (pandas.DataFrame): Feature values
+
+    Returns:
+        numpy.ndarray: Boolean mask, True for rows without inf or NaN
+    """
+    return np.isfinite(X.to_numpy(dtype=np.float64)).all(axis=1)
+
+def load_labeled_csv(file_path, selected_features, label_column='label', benign_label='BENIGN',
+                     drop_incomplete=True):
+    """
+    Load a labeled CSV dataset (e.g. CICIDS2017) for training or evaluation.
+
+    Args:
+        file_path (str): Path to the CSV file
+        selected_features (list): List of features to select
+        label_column (str): Name of the label column
+        benign_label (str): Label value of benign traffic
+        drop_incomplete (bool): Drop rows with infinite or missing feature values
+
+    Returns:
+        tuple: (features DataFrame, binary labels, original labels Series)
+    """
+    try:
+        df = pd.read_csv(file_path, usecols=list(selected_features) + [label_column])
+        if drop_incomplete:
+            complete = finite_rows(df[selected_features])
+            if not complete.all():
+                logger.warning(f"Dropped {int(len(df) - complete.sum())} rows with infinite or missing "
+                               f"feature values from {file_path}")
+                df = df[complete].reset_index(drop=True)
+        labels = df[label_column]
+        y = binarize_labels(labels, benign_label)
+        logger.info(f"Labeled CSV loaded successfully: {file_path}, {df.shape[0]} rows, {int(y.sum())} attacks")
+        return df[selected_features], y, labels
+    except Exception as e:
+        logger.error(f"Error loading labeled CSV: {str(e)}")
+        raise
+
+def iter_column_chunks(file_path, columns, chunksize=100000):
+    """
+    Iterate over some columns of a CSV or Parquet dataset in chunks.
+    
+    Parquet files (.parquet/.pq) are read with pyarrow, which is only needed
+    for them.
+    
+    Args:
+        file_path (str): Path to the CSV or Parquet file
+        columns (list): Columns to read
+        chunksize (int): Number of rows per chunk
+        
+    Yields:
+        pandas.DataFrame: Each chunk
+    """
+    if file_path.lower().endswith(('.parquet', '.pq')):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("pyarrow is required to read Parquet datasets")
+        for batch in pq.ParquetFile(file_path).iter_batches(batch_size=chunksize, columns=list(columns)):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(file_path, usecols=list(columns), chunksize=chunksize)
+
+def iter_labeled_chunks(file_path, selected_features, label_column='label', benign_label='BENIGN', chunksize=100000,
+                        drop_incomplete=True, counts=None):
+    """
+    Iterate over a labeled CSV or Parquet dataset in chunks (see
+    iter_column_chunks).
+    
+    Args:
+        file_path (str): Path to the CSV or Parquet file
+        selected_features (list): List of features to select
+        label_column (str): Name of the label column
+        benign_label (str): Label value of benign traffic
+        chunksize (int): Number of rows per chunk
+        drop_incomplete (bool): Drop rows with infinite or missing feature values
+        counts (dict, optional): Filled with the 'rows' read and 'dropped_rows'
+        
+    Yields:
+        tuple: (features DataFrame, binary labels, original labels Series) for each chunk
+    """
+    columns = list(selected_features) + [label_column]
+    counts = {} if counts is None else counts
+    counts.update(rows=0, dropped_rows=0)
+    try:
+        for df in iter_column_chunks(file_path, columns, chunksize):
+            counts['rows'] += df.shape[0]
+            if drop_incomplete:
+                complete = finite_rows(df[selected_features])
+                if not complete.all():
+                    counts['dropped_rows'] += int(len(df) - complete.sum())
+                    df = df[complete]
+                    if df.empty:
+                        continue
+            labels = df[label_column]
+            yield df[selected_features], binarize_labels(labels, benign_label), labels
+        
+        if counts['dropped_rows']:
+            logger.warning(f"Dropped {counts['dropped_rows']} rows with infinite or missing feature values "
+                           f"from {file_path}")
+        logger.info(f"Labeled dataset read in chunks: {file_path}, {counts['rows']} rows")
+    except Exception as e:
+        logger.error(f"Error reading labeled dataset: {str(e)}")
+        raise
+
+def process_csv_data(csv_data, selected_features, scaler, float32=False):
     """
     Process CSV data from a string or bytes.
     
@@ -101,17 +320,21 @@ def process_csv_data(csv_data, selected_features, scaler):
         csv_data (str or bytes): CSV data
         selected_features (list): List of features to select
         scaler (StandardScaler): Scaler for feature normalization
+        float32 (bool): Parse and scale the features in float32
         
     Returns:
         tuple: (processed_data, original_data)
     """
     try:
         # Parse CSV data
-        df = pd.read_csv(StringIO(csv_data))
+        with timed('parse') as stage:
+            df = pd.read_csv(StringIO(csv_data), dtype=feature_dtypes(selected_features, float32))
+            stage.rows = df.shape[0]
         logger.info(f"CSV data parsed successfully: {df.shape[0]} rows")
         
         # Validate features
-        missing_features = [f for f in selected_features if f not in df.columns]
+        with timed('validate'):
+            missing_features = [f for f in selected_features if f not in df.columns]
         if missing_features:
             raise ValueError(f"Missing required features in CSV data: {missing_features}")
         
@@ -119,7 +342,8 @@ def process_csv_data(csv_data, selected_features, scaler):
         X = df[selected_features]
         
         # Scale features
-        X_scaled = scaler.transform(X)
+        with timed('scale', rows=X.shape[0]):
+            X_scaled = scale_features(X, scaler, float32)
         
         logger.info(f"Data processed successfully: {X.shape[0]} rows, {X.shape[1]} features")
         return X_scaled, df
@@ -127,7 +351,7 @@ def process_csv_data(csv_data, selected_features, scaler):
         logger.error(f"Error processing CSV data: {str(e)}")
         raise
 
-def process_packet_data(packet_data, selected_features, scaler):
+def process_packet_data(packet_data, selected_features, scaler, float32=False):
     """
     Process a single packet's data.
     
@@ -135,24 +359,28 @@ def process_packet_data(packet_data, selected_features, scaler):
         packet_data (dict): Dictionary with feature values
         selected_features (list): List of features to select
         scaler (StandardScaler): Scaler for feature normalization
+        float32 (bool): Scale the features in float32
         
     Returns:
         tuple: (processed_data, original_data)
     """
     try:
         # Validate features
-        missing_features = [f for f in selected_features if f not in packet_data]
+        with timed('validate'):
+            missing_features = [f for f in selected_features if f not in packet_data]
         if missing_features:
             raise ValueError(f"Missing required features in packet data: {missing_features}")
         
         # Convert to DataFrame with a single row
-        df = pd.DataFrame([packet_data])
+        with timed('parse', rows=1):
+            df = pd.DataFrame([packet_data])
         
         # Ensure proper order of features
         X = df[selected_features]
         
         # Scale features
-        X_scaled = scaler.transform(X)
+        with timed('scale', rows=1):
+            X_scaled = scale_features(X, scaler, float32)
         
         logger.info("Single packet data processed successfully")
         return X_scaled, df
@@ -1,16 +1,25 @@
 """
 Database operations for the intrusion detection system.
 This module handles the storage and retrieval of alerts, users,
-and system metrics.
+and system metrics. Alerts are partitioned by time into one table per day
+(or week); queries only touch the partitions overlapping their time range,
+and partitions older than the retention window can be moved to compressed
+columnar archives that stay queryable. A few alert detail fields (the
+destination port and TCP flag counts) are also copied into indexed columns
+at insert time so filters on them run in SQL.
 """
 
 import sqlite3
 import json
 import os
 import logging
-from datetime import datetime
+import threading
+from datetime import date, datetime, timedelta
 import uuid
 
+from .alert_archive import ALERT_COLUMNS, query_archive, read_archive_rows, write_archive
+from .instrumentation import timed
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
@@ -18,47 +27,149 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+PARTITION_INTERVALS = ('day', 'week')
+
+# Alert detail fields copied into indexed columns of every partition
+DETAIL_COLUMNS = ('destination_port', 'fwd_psh_flags', 'fin_flag_count',
+                  'psh_flag_count', 'ack_flag_count', 'urg_flag_count')
+
+ALERTS_TABLE_SQL = '''
+CREATE TABLE IF NOT EXISTS {table} (
+    id TEXT PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    source TEXT NOT NULL,
+    confidence REAL NOT NULL,
+    is_resolved INTEGER DEFAULT 0,
+    resolved_at TEXT,
+    resolved_by TEXT,
+    details TEXT NOT NULL,
+    user_id TEXT,
+    destination_port INTEGER,
+    fwd_psh_flags INTEGER,
+    fin_flag_count INTEGER,
+    psh_flag_count INTEGER,
+    ack_flag_count INTEGER,
+    urg_flag_count INTEGER,
+    FOREIGN KEY (user_id) REFERENCES users(id)
+)
+'''
+
+ALERT_SELECT = ', '.join(ALERT_COLUMNS)
+INSERT_COLUMNS = ('id', 'timestamp', 'source', 'confidence', 'details') + DETAIL_COLUMNS + ('user_id',)
+
+def alert_conditions(min_confidence=None, max_confidence=None, detail_filters=None):
+    """
+    Build alert filter conditions on confidence and promoted detail fields.
+    
+    Args:
+        min_confidence (float, optional): Minimum confidence
+        max_confidence (float, optional): Maximum confidence
+        detail_filters (dict, optional): Maps a DETAIL_COLUMNS field to a
+            value, a list of accepted values, or a (low, high) tuple of
+            inclusive bounds where None leaves a side open
+            
+    Returns:
+        list: (column, operator, value) conditions
+    """
+    conditions = []
+    if min_confidence is not None:
+        conditions.append(('confidence', '>=', float(min_confidence)))
+    if max_confidence is not None:
+        conditions.append(('confidence', '<=', float(max_confidence)))
+    
+    for column, value in (detail_filters or {}).items():
+        if column not in DETAIL_COLUMNS:
+            raise ValueError(f"Not a filterable detail field: {column}")
+        if isinstance(value, tuple):
+            low, high = value
+            if low is not None:
+                conditions.append((column, '>=', low))
+            if high is not None:
+                conditions.append((column, '<=', high))
+        elif isinstance(value, (list, set)):
+            conditions.append((column, 'in', sorted(value)))
+        else:
+            conditions.append((column, '=', value))
+    return conditions
+
+def partition_period(timestamp, interval='day'):
+    """
+    Get the alert partition holding a timestamp.
+
+    Args:
+        timestamp (str): ISO timestamp or date ('YYYY-MM-DD...')
+        interval (str): 'day' or 'week' (weeks start on Monday)
+
+    Returns:
+        tuple: (table name, period start, period end), the period as
+            'YYYY-MM-DD' dates with an exclusive end
+    """
+    start = date.fromisoformat(timestamp[:10])
+    if interval == 'week':
+        start -= timedelta(days=start.weekday())
+        end = start + timedelta(days=7)
+    else:
+        end = start + timedelta(days=1)
+    return f"alerts_{start:%Y%m%d}", start.isoformat(), end.isoformat()
+
 class DatabaseManager:
     """
     Class for managing database operations.
     """
     
-    def __init__(self, db_file='ids_database.db'):
+    def __init__(self, db_file='ids_database.db', partition_interval='day', archive_dir=None):
         """
         Initialize the database manager.
         
         Args:
             db_file (str): Path to the SQLite database file
+            partition_interval (str): Alert partition size, 'day' or 'week'.
+                A database keeps the interval it was created with
+            archive_dir (str, optional): Directory of archived partitions
+                (defaults to alert_archive/ next to the database file)
         """
+        if partition_interval not in PARTITION_INTERVALS:
+            raise ValueError(f"Invalid partition interval: {partition_interval}")
         self.db_file = db_file
-        self.conn = None
+        self.partition_interval = partition_interval
+        self.archive_dir = archive_dir or os.path.join(os.path.dirname(os.path.abspath(db_file)), 'alert_archive')
+        self.partition_tables = set()
+        self.local = threading.local()
         self.initialized = False
         
         self.initialize_db()
     
     def get_connection(self):
         """
-        Get a database connection.
+        Get the calling thread's database connection.
+        
+        SQLite connections cannot be shared between threads, so each thread
+        (request handler, job worker) opens its own.
         
         Returns:
             sqlite3.Connection: Database connection
         """
-        if self.conn is None:
-            self.conn = sqlite3.connect(self.db_file)
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=30)
             # Enable foreign keys
-            self.conn.execute("PRAGMA foreign_keys = ON")
+            conn.execute("PRAGMA foreign_keys = ON")
+            # Let readers proceed while another thread writes
+            conn.execute("PRAGMA journal_mode = WAL")
             # Configure row factory to return dictionaries
-            self.conn.row_factory = sqlite3.Row
+            conn.row_factory = sqlite3.Row
+            self.local.conn = conn
         
-        return self.conn
+        return conn
     
     def close_connection(self):
         """
-        Close the database connection.
+        Close the calling thread's database connection.
         """
-        if self.conn is not None:
-            self.conn.close()
-            self.conn = None
+        conn = getattr(self.local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self.local.conn = None
     
     def initialize_db(self):
         """
@@ -83,19 +194,20 @@ class DatabaseManager:
             )
             ''')
             
-            # Create alerts table
+            # Create the unpartitioned alerts table; alerts live in per-period
+            # partitions, this table only receives rows from older versions
+            cursor.execute(ALERTS_TABLE_SQL.format(table='alerts'))
+            
+            # Create the alert partition catalog
             cursor.execute('''
-            CREATE TABLE IF NOT EXISTS alerts (
-                id TEXT PRIMARY KEY,
-                timestamp TEXT NOT NULL,
-                source TEXT NOT NULL,
-                confidence REAL NOT NULL,
-                is_resolved INTEGER DEFAULT 0,
-                resolved_at TEXT,
-                resolved_by TEXT,
-                details TEXT NOT NULL,
-                user_id TEXT,
-                FOREIGN KEY (user_id) REFERENCES users(id)
+            CREATE TABLE IF NOT EXISTS alert_partitions (
+                name TEXT PRIMARY KEY,
+                period_start TEXT NOT NULL,
+                period_end TEXT NOT NULL,
+                is_live INTEGER DEFAULT 1,
+                archive_path TEXT,
+                archived_rows INTEGER DEFAULT 0,
+                archived_at TEXT
             )
             ''')
             
@@ -120,6 +232,24 @@ class DatabaseManager:
             )
             ''')
             
+            # Keep the partition interval the database was created with
+            cursor.execute("SELECT value FROM settings WHERE key = 'alert_partition_interval'")
+            row = cursor.fetchone()
+            if row is None:
+                cursor.execute(
+                    'INSERT INTO settings (key, value, description, updated_at) VALUES (?, ?, ?, ?)',
+                    ('alert_partition_interval', self.partition_interval,
+                     'Alert partition size', datetime.now().isoformat())
+                )
+            elif row['value'] != self.partition_interval:
+                logger.warning(f"Database uses {row['value']} alert partitions, ignoring {self.partition_interval}")
+                self.partition_interval = row['value']
+            
+            self._load_partition_tables(cursor)
+            for table in self.partition_tables:
+                self._add_detail_columns(cursor, table)
+            self._partition_unpartitioned_alerts(cursor)
+            
             conn.commit()
             self.initialized = True
             logger.info("Database initialized successfully")
@@ -127,6 +257,108 @@ class DatabaseManager:
             logger.error(f"Error initializing database: {str(e)}")
             raise
     
+    def _partition_unpartitioned_alerts(self, cursor):
+        """
+        Move rows of the unpartitioned alerts table into their partitions.
+        """
+        cursor.execute('SELECT DISTINCT substr(timestamp, 1, 10) AS day FROM alerts')
+        periods = {partition_period(row['day'], self.partition_interval) for row in cursor.fetchall()}
+        extracts = ', '.join(f"json_extract(details, '$.{column}')" for column in DETAIL_COLUMNS)
+        for table, start, end in periods:
+            self._ensure_partition(cursor, start)
+            cursor.execute(
+                f'''
+                INSERT INTO {table} ({ALERT_SELECT}, {', '.join(DETAIL_COLUMNS)})
+                SELECT {ALERT_SELECT}, {extracts} FROM alerts
+                WHERE substr(timestamp, 1, 10) >= ? AND substr(timestamp, 1, 10) < ?
+                ''',
+                (start, end)
+            )
+        if periods:
+            cursor.execute('DELETE FROM alerts')
+            logger.info(f"Moved existing alerts into {len(periods)} partitions")
+    
+    def _ensure_partition(self, cursor, timestamp):
+        """
+        Create the partition holding a timestamp if it does not exist.
+        
+        Returns:
+            str: Partition table name
+        """
+        table, start, end = partition_period(timestamp, self.partition_interval)
+        if table not in self.partition_tables:
+            cursor.execute(ALERTS_TABLE_SQL.format(table=table))
+            self._create_partition_indexes(cursor, table)
+            cursor.execute(
+                'INSERT OR IGNORE INTO alert_partitions (name, period_start, period_end) VALUES (?, ?, ?)',
+                (table, start, end)
+            )
+            # A partition archived earlier goes live again for late alerts
+            cursor.execute('UPDATE alert_partitions SET is_live = 1 WHERE name = ?', (table,))
+            self.partition_tables.add(table)
+        return table
+    
+    @staticmethod
+    def _create_partition_indexes(cursor, table):
+        """
+        Create a partition's indexes.
+        
+        Alerts are read newest first, so the port index and the flag indexes
+        keep their rows in time order and a LIMIT query stops early. Flag
+        indexes are partial: they only hold the rows with the flag set
+        (flag >= 1), which is the selective side of the filter.
+        """
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {table}_timestamp ON {table} (timestamp)')
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {table}_confidence ON {table} (confidence)')
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {table}_port ON {table} (destination_port, timestamp)')
+        for column in DETAIL_COLUMNS[1:]:
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS {table}_{column} ON {table} (timestamp) WHERE {column} >= 1')
+    
+    def _add_detail_columns(self, cursor, table):
+        """
+        Add the promoted detail columns to a partition created without them.
+        """
+        cursor.execute(f'PRAGMA table_info({table})')
+        existing = {row['name'] for row in cursor.fetchall()}
+        missing = [column for column in DETAIL_COLUMNS if column not in existing]
+        if not missing:
+            return
+        for column in missing:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} INTEGER')
+        cursor.execute(
+            f'UPDATE {table} SET ' + ', '.join(f"{column} = json_extract(details, '$.{column}')" for column in missing)
+        )
+        self._create_partition_indexes(cursor, table)
+        logger.info(f"Added detail columns to {table}")
+    
+    def _partitions(self, cursor, start_time=None, end_time=None, include_archived=False):
+        """
+        Get the catalog entries of the partitions overlapping a time range.
+        
+        Returns:
+            list: Partition dictionaries, newest first
+        """
+        query = 'SELECT * FROM alert_partitions WHERE (is_live = 1'
+        query += ' OR archive_path IS NOT NULL)' if include_archived else ')'
+        params = []
+        
+        if start_time:
+            query += ' AND period_end > ?'
+            params.append(start_time)
+        
+        if end_time:
+            query += ' AND period_start <= ?'
+            params.append(end_time)
+        
+        cursor.execute(query + ' ORDER BY period_start DESC', params)
+        return [dict(row) for row in cursor.fetchall()]
+    
+    @staticmethod
+    def _row_to_alert(row):
+        alert = dict(row)
+        alert['details'] = json.loads(alert['details'])
+        return alert
+    
     # User operations
     def add_user(self, email, name, password_hash):
         """
@@ -228,44 +460,139 @@ class DatabaseManager:
             if 'timestamp' not in alert_data:
                 alert_data['timestamp'] = datetime.now().isoformat()
             
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
             # Convert details to JSON string
-            details_json = json.dumps(alert_data.get('details', {}))
-            
-            cursor.execute(
-                '''
-                INSERT INTO alerts 
-                (id, timestamp, source, confidence, details, user_id) 
-                VALUES (?, ?, ?, ?, ?, ?)
-                ''',
-                (
-                    alert_data['id'],
-                    alert_data['timestamp'],
-                    alert_data['source'],
-                    alert_data['confidence'],
-                    details_json,
-                    user_id
-                )
+            details = alert_data.get('details', {})
+            details_json = json.dumps(details)
+            row = (
+                alert_data['id'],
+                alert_data['timestamp'],
+                alert_data['source'],
+                alert_data['confidence'],
+                details_json,
+                *(details.get(column) for column in DETAIL_COLUMNS),
+                user_id
             )
             
-            conn.commit()
+            with timed('db_write', rows=1):
+                self._insert_alert_rows({alert_data['timestamp'][:10]: [row]})
             logger.info(f"Alert added successfully: {alert_data['id']}")
             return alert_data['id']
         except Exception as e:
             logger.error(f"Error adding alert: {str(e)}")
             raise
     
-    def get_alerts(self, limit=100, offset=0, resolved=None, user_id=None):
+    def add_alerts(self, alerts, user_id=None):
+        """
+        Add many alerts to the database in a single transaction.
+
+        Args:
+            alerts (AlertBatch or list): Alert batch from utils.alerts.build_alerts,
+                or a list of alert dictionaries
+            user_id (str, optional): User ID associated with the alerts
+
+        Returns:
+            int: Number of alerts added
+        """
+        try:
+            if hasattr(alerts, 'to_rows'):
+                rows = [row + (user_id,) for row in alerts.to_rows(DETAIL_COLUMNS)]
+                partitions = {alerts.timestamp[:10]: rows}
+            else:
+                now = datetime.now().isoformat()
+                rows = [
+                    (
+                        alert.get('id') or str(uuid.uuid4()),
+                        alert.get('timestamp') or now,
+                        alert['source'],
+                        alert['confidence'],
+                        json.dumps(alert.get('details', {})),
+                        *(alert.get('details', {}).get(column) for column in DETAIL_COLUMNS),
+                        user_id
+                    )
+                    for alert in alerts
+                ]
+                partitions = {}
+                for row in rows:
+                    partitions.setdefault(row[1][:10], []).append(row)
+
+            if not rows:
+                return 0
+
+            with timed('db_write', rows=len(rows)):
+                self._insert_alert_rows(partitions)
+            logger.info(f"Alerts added successfully: {len(rows)}")
+            return len(rows)
+        except Exception as e:
+            logger.error(f"Error adding alerts: {str(e)}")
+            raise
+
+    def _insert_alert_rows(self, partitions):
+        """
+        Insert alert rows into their partitions in one transaction.
+        
+        The cache of live partition tables is per process, so a partition
+        dropped by archive_alerts.py in another process still looks live
+        here; on 'no such table' the cache is reloaded from the database
+        and the transaction retried once, recreating the partition.
+        
+        Args:
+            partitions (dict): Rows (INSERT_COLUMNS order) by partition day
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        for attempt in range(2):
+            try:
+                for partition_rows in partitions.values():
+                    table = self._ensure_partition(cursor, partition_rows[0][1])
+                    cursor.executemany(
+                        f'''
+                        INSERT INTO {table}
+                        ({', '.join(INSERT_COLUMNS)})
+                        VALUES ({', '.join('?' * len(INSERT_COLUMNS))})
+                        ''',
+                        partition_rows
+                    )
+                conn.commit()
+                return
+            except sqlite3.OperationalError as e:
+                if attempt or 'no such table' not in str(e):
+                    raise
+                conn.rollback()
+                logger.warning(f"Alert partition dropped by another process, reloading partitions: {str(e)}")
+                self._load_partition_tables(cursor)
+    
+    def _load_partition_tables(self, cursor):
+        """
+        Reload the cache of live partition tables from the database.
+        """
+        cursor.execute(
+            "SELECT name FROM alert_partitions WHERE is_live = 1 "
+            "AND name IN (SELECT name FROM sqlite_master WHERE type = 'table')"
+        )
+        self.partition_tables = {row['name'] for row in cursor.fetchall()}
+    
+    def get_alerts(self, limit=100, offset=0, resolved=None, user_id=None,
+                   start_time=None, end_time=None, include_archived=False,
+                   min_confidence=None, max_confidence=None, detail_filters=None):
         """
-        Get alerts from the database.
+        Get alerts from the database, newest first.
+        
+        Only the partitions overlapping the time range are queried, newest
+        first, stopping as soon as limit alerts have been found. Confidence
+        and detail filters are evaluated in SQL on indexed columns.
         
         Args:
             limit (int, optional): Maximum number of alerts to retrieve
             offset (int, optional): Number of alerts to skip
             resolved (bool, optional): Filter by resolved status
             user_id (str, optional): Filter by user ID
+            start_time (str, optional): Start timestamp
+            end_time (str, optional): End timestamp
+            include_archived (bool, optional): Also search archived partitions
+            min_confidence (float, optional): Minimum confidence
+            max_confidence (float, optional): Maximum confidence
+            detail_filters (dict, optional): Filters on DETAIL_COLUMNS fields,
+                see alert_conditions (e.g. {'destination_port': 22})
             
         Returns:
             list: List of alert dictionaries
@@ -274,7 +601,6 @@ class DatabaseManager:
             conn = self.get_connection()
             cursor = conn.cursor()
             
-            query = 'SELECT * FROM alerts'
             params = []
             
             # Build WHERE clause
@@ -288,22 +614,59 @@ class DatabaseManager:
                 where_clauses.append('user_id = ?')
                 params.append(user_id)
             
-            if where_clauses:
-                query += ' WHERE ' + ' AND '.join(where_clauses)
-            
-            # Add ORDER BY, LIMIT, and OFFSET
-            query += ' ORDER BY timestamp DESC LIMIT ? OFFSET ?'
-            params.extend([limit, offset])
+            if start_time:
+                where_clauses.append('timestamp >= ?')
+                params.append(start_time)
             
-            cursor.execute(query, params)
-            rows = cursor.fetchall()
+            if end_time:
+                where_clauses.append('timestamp <= ?')
+                params.append(end_time)
             
-            # Convert rows to dictionaries and parse details JSON
-            alerts = []
-            for row in rows:
-                alert = dict(row)
-                alert['details'] = json.loads(alert['details'])
-                alerts.append(alert)
+            conditions = alert_conditions(min_confidence, max_confidence, detail_filters)
+            for column, operator, value in conditions:
+                if operator == 'in':
+                    where_clauses.append(f"{column} IN ({', '.join('?' * len(value))})")
+                    params.extend(value)
+                else:
+                    where_clauses.append(f'{column} {operator} ?')
+                    params.append(value)
+            
+            where = ' WHERE ' + ' AND '.join(where_clauses) if where_clauses else ''
+            
+            with timed('db_read') as stage:
+                alerts = []
+                skip = offset
+                for partition in self._partitions(cursor, start_time, end_time, include_archived):
+                    wanted = limit - len(alerts)
+                    if wanted <= 0:
+                        break
+                    table = partition['name']
+                    
+                    if include_archived and partition['archive_path']:
+                        matches = query_archive(partition['archive_path'], start_time, end_time,
+                                                resolved, user_id, conditions)
+                        if partition['is_live']:
+                            # Late alerts that arrived after the partition was archived
+                            cursor.execute(f'SELECT {ALERT_SELECT} FROM {table}{where}', params)
+                            matches += [self._row_to_alert(row) for row in cursor.fetchall()]
+                            matches.sort(key=lambda alert: alert['timestamp'], reverse=True)
+                        alerts.extend(matches[skip:skip + wanted])
+                        skip = max(skip - len(matches), 0)
+                        continue
+                    
+                    cursor.execute(
+                        f'SELECT {ALERT_SELECT} FROM {table}{where} ORDER BY timestamp DESC LIMIT ? OFFSET ?',
+                        params + [wanted, skip]
+                    )
+                    rows = cursor.fetchall()
+                    if rows:
+                        skip = 0
+                    elif skip:
+                        # The whole partition was skipped
+                        cursor.execute(f'SELECT COUNT(*) FROM {table}{where}', params)
+                        skip -= cursor.fetchone()[0]
+                    alerts.extend(self._row_to_alert(row) for row in rows)
+                stage.rows = len(alerts)
             
             logger.info(f"Retrieved {len(alerts)} alerts")
             return alerts
@@ -315,6 +678,8 @@ class DatabaseManager:
         """
         Get an alert by ID.
         
+        Only live partitions are searched, newest first.
+        
         Args:
             alert_id (str): Alert ID
             
@@ -325,13 +690,11 @@ class DatabaseManager:
             conn = self.get_connection()
             cursor = conn.cursor()
             
-            cursor.execute('SELECT * FROM alerts WHERE id = ?', (alert_id,))
-            row = cursor.fetchone()
-            
-            if row:
-                alert = dict(row)
-                alert['details'] = json.loads(alert['details'])
-                return alert
+            for partition in self._partitions(cursor):
+                cursor.execute(f"SELECT {ALERT_SELECT} FROM {partition['name']} WHERE id = ?", (alert_id,))
+                row = cursor.fetchone()
+                if row:
+                    return self._row_to_alert(row)
             return None
         except Exception as e:
             logger.error(f"Error getting alert by ID: {str(e)}")
@@ -351,10 +714,13 @@ class DatabaseManager:
             conn = self.get_connection()
             cursor = conn.cursor()
             
-            cursor.execute(
-                'UPDATE alerts SET is_resolved = 1, resolved_at = ?, resolved_by = ? WHERE id = ?',
-                (now, resolved_by, alert_id)
-            )
+            for partition in self._partitions(cursor):
+                cursor.execute(
+                    f"UPDATE {partition['name']} SET is_resolved = 1, resolved_at = ?, resolved_by = ? WHERE id = ?",
+                    (now, resolved_by, alert_id)
+                )
+                if cursor.rowcount:
+                    break
             
             conn.commit()
             logger.info(f"Alert resolved: {alert_id}")
@@ -362,6 +728,123 @@ class DatabaseManager:
             logger.error(f"Error resolving alert: {str(e)}")
             raise
     
+    def count_alerts(self, start_time=None, end_time=None):
+        """
+        Count the live alerts in a time range.
+        
+        Args:
+            start_time (str, optional): Start timestamp
+            end_time (str, optional): End timestamp
+            
+        Returns:
+            int: Number of alerts
+        """
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            params = []
+            where_clauses = []
+            
+            if start_time:
+                where_clauses.append('timestamp >= ?')
+                params.append(start_time)
+            
+            if end_time:
+                where_clauses.append('timestamp <= ?')
+                params.append(end_time)
+            
+            where = ' WHERE ' + ' AND '.join(where_clauses) if where_clauses else ''
+            
+            total = 0
+            for partition in self._partitions(cursor, start_time, end_time):
+                cursor.execute(f"SELECT COUNT(*) FROM {partition['name']}{where}", params)
+                total += cursor.fetchone()[0]
+            return total
+        except Exception as e:
+            logger.error(f"Error counting alerts: {str(e)}")
+            raise
+    
+    def get_partitions(self):
+        """
+        Get the alert partitions with their row counts.
+        
+        Returns:
+            list: Partition dictionaries, newest first; 'rows' counts the
+                live table, 'archived_rows' the archive
+        """
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            partitions = self._partitions(cursor, include_archived=True)
+            for partition in partitions:
+                partition['rows'] = 0
+                if partition['is_live']:
+                    cursor.execute(f"SELECT COUNT(*) FROM {partition['name']}")
+                    partition['rows'] = cursor.fetchone()[0]
+            return partitions
+        except Exception as e:
+            logger.error(f"Error getting partitions: {str(e)}")
+            raise
+    
+    def archive_partitions(self, retention_days=30, now=None, vacuum=False):
+        """
+        Move alert partitions older than the retention window to archives.
+        
+        A partition is archived once its whole period ends before the
+        cutoff. Its rows are written to <archive_dir>/<partition>.npz, merged
+        with the partition's earlier archive if late alerts arrived since,
+        before the table is dropped. Archived alerts stay readable through
+        get_alerts(include_archived=True).
+        
+        Args:
+            retention_days (int): Days of alerts kept in the database
+            now (datetime, optional): Current time
+            vacuum (bool): Return the freed pages to the file system with VACUUM
+            
+        Returns:
+            list: One dictionary per archived partition (partition, rows, path, bytes)
+        """
+        try:
+            cutoff = ((now or datetime.now()) - timedelta(days=retention_days)).date().isoformat()
+            
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                'SELECT * FROM alert_partitions WHERE is_live = 1 AND period_end <= ? ORDER BY period_start',
+                (cutoff,)
+            )
+            archived = []
+            for partition in [dict(row) for row in cursor.fetchall()]:
+                table = partition['name']
+                cursor.execute(f"SELECT {ALERT_SELECT}, {', '.join(DETAIL_COLUMNS)} FROM {table} ORDER BY timestamp")
+                rows = [tuple(row) for row in cursor.fetchall()]
+                if partition['archive_path']:
+                    rows = read_archive_rows(partition['archive_path'], DETAIL_COLUMNS) + rows
+                
+                path = os.path.join(self.archive_dir, f'{table}.npz')
+                size = write_archive(path, rows, DETAIL_COLUMNS)
+                
+                cursor.execute(
+                    'UPDATE alert_partitions SET is_live = 0, archive_path = ?, archived_rows = ?, archived_at = ? WHERE name = ?',
+                    (path, len(rows), datetime.now().isoformat(), table)
+                )
+                cursor.execute(f'DROP TABLE {table}')
+                conn.commit()
+                self.partition_tables.discard(table)
+                archived.append({'partition': table, 'rows': len(rows), 'path': path, 'bytes': size})
+            
+            if vacuum and archived:
+                conn.execute('VACUUM')
+            
+            logger.info(f"Archived {len(archived)} alert partitions older than {cutoff}")
+            return archived
+        except Exception as e:
+            logger.error(f"Error archiving partitions: {str(e)}")
+            raise
+    
     # Metrics operations
     def add_metric(self, metric_type, value, details=None):
         """
@@ -627,6 +1110,9 @@ class DatabaseManager:
         """
         Get statistics about alerts.
         
+        Each live partition overlapping the time range is aggregated on its
+        own and the results are combined.
+        
         Args:
             start_time (str, optional): Start timestamp
             end_time (str, optional): End timestamp
@@ -638,16 +1124,6 @@ class DatabaseManager:
             conn = self.get_connection()
             cursor = conn.cursor()
             
-            query = '''
-            SELECT 
-                COUNT(*) as total,
-                SUM(CASE WHEN is_resolved = 1 THEN 1 ELSE 0 END) as resolved,
-                SUM(CASE WHEN is_resolved = 0 THEN 1 ELSE 0 END) as unresolved,
-                AVG(confidence) as avg_confidence,
-                COUNT(DISTINCT source) as source_count
-            FROM alerts
-            '''
-            
             params = []
             
             # Add time filters if provided
@@ -661,46 +1137,61 @@ class DatabaseManager:
                 where_clauses.append('timestamp <= ?')
                 params.append(end_time)
             
-            if where_clauses:
-                query += ' WHERE ' + ' AND '.join(where_clauses)
-            
-            cursor.execute(query, params)
-            row = cursor.fetchone()
+            where = ' WHERE ' + ' AND '.join(where_clauses) if where_clauses else ''
             
-            stats = dict(row)
+            total = resolved = 0
+            confidence_sum = 0.0
+            sources = {}
+            resolution_minutes = 0.0
+            resolution_count = 0
             
-            # Get source breakdown
-            source_query = '''
-            SELECT source, COUNT(*) as count
-            FROM alerts
-            '''
-            
-            if where_clauses:
-                source_query += ' WHERE ' + ' AND '.join(where_clauses)
-            
-            source_query += ' GROUP BY source ORDER BY count DESC'
-            
-            cursor.execute(source_query, params)
-            source_rows = cursor.fetchall()
-            
-            stats['sources'] = [dict(row) for row in source_rows]
-            
-            # Calculate resolution time for resolved alerts
-            if start_time or end_time:
-                resolution_query = '''
-                SELECT AVG(JULIANDAY(resolved_at) - JULIANDAY(timestamp)) * 24 * 60 as avg_resolution_minutes
-                FROM alerts
-                WHERE is_resolved = 1
-                '''
+            for partition in self._partitions(cursor, start_time, end_time):
+                table = partition['name']
                 
-                if where_clauses:
-                    resolution_query += ' AND ' + ' AND '.join(where_clauses)
+                cursor.execute(f'''
+                SELECT 
+                    COUNT(*) as total,
+                    SUM(CASE WHEN is_resolved = 1 THEN 1 ELSE 0 END) as resolved,
+                    SUM(confidence) as confidence_sum
+                FROM {table}{where}
+                ''', params)
+                row = cursor.fetchone()
+                total += row['total']
+                resolved += row['resolved'] or 0
+                confidence_sum += row['confidence_sum'] or 0.0
                 
-                cursor.execute(resolution_query, params)
-                resolution_row = cursor.fetchone()
+                # Get source breakdown
+                cursor.execute(f'SELECT source, COUNT(*) as count FROM {table}{where} GROUP BY source', params)
+                for source_row in cursor.fetchall():
+                    sources[source_row['source']] = sources.get(source_row['source'], 0) + source_row['count']
                 
-                if resolution_row and resolution_row['avg_resolution_minutes'] is not None:
-                    stats['avg_resolution_minutes'] = resolution_row['avg_resolution_minutes']
+                # Calculate resolution time for resolved alerts
+                if start_time or end_time:
+                    cursor.execute(f'''
+                    SELECT
+                        SUM(JULIANDAY(resolved_at) - JULIANDAY(timestamp)) * 24 * 60 as minutes,
+                        COUNT(JULIANDAY(resolved_at) - JULIANDAY(timestamp)) as count
+                    FROM {table}
+                    WHERE is_resolved = 1
+                    ''' + ''.join(' AND ' + clause for clause in where_clauses), params)
+                    resolution_row = cursor.fetchone()
+                    resolution_minutes += resolution_row['minutes'] or 0.0
+                    resolution_count += resolution_row['count']
+            
+            stats = {
+                'total': total,
+                'resolved': resolved if total else None,
+                'unresolved': total - resolved if total else None,
+                'avg_confidence': confidence_sum / total if total else None,
+                'source_count': len(sources),
+                'sources': [
+                    {'source': source, 'count': count}
+                    for source, count in sorted(sources.items(), key=lambda item: item[1], reverse=True)
+                ]
+            }
+            
+            if resolution_count:
+                stats['avg_resolution_minutes'] = resolution_minutes / resolution_count
             
             logger.info("Generated alert statistics")
             return stats
@@ -0,0 +1,382 @@
+"""
+Feature drift monitoring for the intrusion detection system.
+The model and scaler only work on traffic that looks like what they were
+fit on, and nothing else tells us when live traffic moves away from it.
+A reference profile, saved with the model by profile_features.py, holds
+one fixed-bin histogram per model feature, with bin edges at quantiles of
+the reference data. DriftMonitor counts the scored rows into the same bins
+(a uniform sample of at most sample_rows rows of larger batches; the
+proportions, not the totals, are compared) and compares each window of
+live traffic with the reference:
+
+- PSI (population stability index): sum over bins of
+  (live - reference) * ln(live / reference) proportions; below 0.1 is
+  usually read as stable, 0.1-0.25 as moderate and above 0.25 as
+  significant drift;
+- KS: the largest gap between the two cumulative distributions at the bin
+  edges (a lower bound of the two-sample Kolmogorov-Smirnov statistic).
+
+Every snapshot_seconds the scores of the window are stored in the metrics
+table (metric type 'feature_drift') and a new window starts.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from .instrumentation import REGISTRY
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+DRIFT_REFERENCE_FILE = 'drift_reference.json'
+DEFAULT_BINS = 20
+DEFAULT_SNAPSHOT_SECONDS = 300.0
+# Rows a window needs before its scores are stored
+DEFAULT_MIN_ROWS = 1000
+# Rows of a scored batch counted at most
+DEFAULT_SAMPLE_ROWS = 2000
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.25
+# Smallest bin proportion used in PSI, so empty bins do not make it infinite
+PSI_EPSILON = 1e-4
+
+FEATURE_DRIFT_PSI = REGISTRY.gauge('ids_feature_drift_psi', 'PSI of the last drift window per feature', ('feature',))
+FEATURE_DRIFT_MAX_PSI = REGISTRY.gauge('ids_feature_drift_max_psi', 'Largest feature PSI of the last drift window')
+
+class FeatureHistograms:
+    """
+    Fixed-bin histograms of several features.
+    """
+
+    def __init__(self, features, edges, counts=None, missing=None):
+        """
+        Initialize the histograms.
+
+        Args:
+            features (list): Feature names, in column order
+            edges (list): Increasing bin edges per feature; values below the
+                first edge fall in bin 0 and a value equal to an edge in the
+                bin above it (len(edges) + 1 bins)
+            counts (list, optional): Starting counts per feature
+            missing (list, optional): Starting NaN counts per feature
+        """
+        self.features = list(features)
+        self.edges = [np.asarray(e, dtype=np.float64) for e in edges]
+        sizes = [len(e) + 1 for e in self.edges]
+        # Edges padded with +inf into one (features, max edges) matrix: a
+        # value's bin is the number of edges <= it, counted for all features
+        # at once per edge column instead of one searchsorted per feature
+        self.edge_matrix = np.full((len(self.edges), max(sizes, default=1) - 1), np.inf)
+        for j, e in enumerate(self.edges):
+            self.edge_matrix[j, :len(e)] = e
+        # One flat counts array; feature j owns offsets[j]:offsets[j + 1]
+        self.offsets = np.concatenate([[0], np.cumsum(sizes)])
+        self.counts = np.zeros(self.offsets[-1], dtype=np.int64)
+        if counts is not None:
+            self.counts[:] = np.concatenate([np.asarray(c, dtype=np.int64) for c in counts])
+        self.missing = np.zeros(len(self.features), dtype=np.int64) if missing is None else \
+            np.asarray(missing, dtype=np.int64)
+        self.rows = int(self.feature_counts(0).sum() + self.missing[0]) if self.features else 0
+
+    @classmethod
+    def from_sample(cls, sample, features, bins=DEFAULT_BINS):
+        """
+        Empty histograms with edges at quantiles of a sample.
+
+        Args:
+            sample (pandas.DataFrame): Reference rows
+            features (list): Features to profile
+            bins (int): Bins per feature at most (discrete features get fewer)
+
+        Returns:
+            FeatureHistograms: Histograms with no counts
+        """
+        quantiles = np.linspace(0, 1, bins + 1)[1:-1]
+        edges = []
+        for feature in features:
+            values = pd.to_numeric(sample[feature], errors='coerce').to_numpy(dtype=np.float64)
+            values = values[np.isfinite(values)]
+            # The minimum as an edge separates values below everything seen
+            edges.append(np.unique(np.concatenate([values.min(keepdims=True), np.quantile(values, quantiles)]))
+                         if len(values) else np.zeros(0))
+        return cls(features, edges)
+
+    def feature_counts(self, index):
+        """Bin counts of one feature."""
+        return self.counts[self.offsets[index]:self.offsets[index + 1]]
+
+    def update(self, X):
+        """
+        Count rows.
+
+        Args:
+            X (numpy.ndarray or pandas.DataFrame): Raw (unscaled) feature
+                values; DataFrames are matched by column name, arrays must
+                be in feature order
+        """
+        if isinstance(X, pd.DataFrame):
+            X = X[self.features].to_numpy(dtype=np.float64)
+        X = np.asarray(X, dtype=np.float64)
+        if not len(X):
+            return
+        bins = np.zeros(X.shape, dtype=np.int16)
+        for column in self.edge_matrix.T:
+            bins += X >= column
+        # +inf is also >= the padding of features with fewer edges: keep it
+        # in the feature's top bin
+        bins = np.minimum(bins, np.diff(self.offsets) - 1) + self.offsets[:-1]
+        missing = np.isnan(X)
+        if missing.any():
+            self.missing += missing.sum(axis=0)
+            bins = bins[~missing]
+        self.counts += np.bincount(bins.ravel(), minlength=len(self.counts))
+        self.rows += len(X)
+
+    def empty_copy(self):
+        """Histograms with the same edges and no counts."""
+        return FeatureHistograms(self.features, self.edges)
+
+    def to_dict(self):
+        return {
+            'features': self.features,
+            'edges': [e.tolist() for e in self.edges],
+            'counts': [self.feature_counts(j).tolist() for j in range(len(self.features))],
+            'missing': self.missing.tolist(),
+            'rows': self.rows
+        }
+
+    @classmethod
+    def from_dict(cls, config):
+        return cls(config['features'], config['edges'], config['counts'], config.get('missing'))
+
+def compare_histograms(reference, current):
+    """
+    PSI and KS of each feature of current against reference.
+
+    Args:
+        reference (FeatureHistograms): Reference profile
+        current (FeatureHistograms): Live histograms with the same edges
+
+    Returns:
+        dict: {feature: {'psi', 'ks', 'missing'}}, missing being the share
+            of NaN values in current
+    """
+    scores = {}
+    for j, feature in enumerate(reference.features):
+        expected = reference.feature_counts(j).astype(np.float64)
+        observed = current.feature_counts(j).astype(np.float64)
+        if not expected.sum() or not observed.sum():
+            scores[feature] = {'psi': None, 'ks': None, 'missing': None}
+            continue
+        expected /= expected.sum()
+        observed /= observed.sum()
+        p = np.maximum(observed, PSI_EPSILON)
+        q = np.maximum(expected, PSI_EPSILON)
+        scores[feature] = {
+            'psi': float(np.sum((p - q) * np.log(p / q))),
+            'ks': float(np.max(np.abs(np.cumsum(observed) - np.cumsum(expected)))),
+            'missing': float(current.missing[j] / current.rows) if current.rows else 0.0
+        }
+    return scores
+
+def drift_level(psi):
+    """'stable', 'moderate' or 'significant' for a PSI value (None without data)."""
+    if psi is None:
+        return None
+    return 'significant' if psi >= PSI_SIGNIFICANT else 'moderate' if psi >= PSI_MODERATE else 'stable'
+
+def save_reference(model_dir, histograms, details=None):
+    """
+    Save a reference profile next to the model.
+
+    Args:
+        model_dir (str): Directory containing the model files
+        histograms (FeatureHistograms): Reference histograms
+        details (dict, optional): Provenance to record (data file, rows)
+    """
+    config = histograms.to_dict()
+    config['created'] = datetime.now().isoformat()
+    config.update(details or {})
+    with open(os.path.join(model_dir, DRIFT_REFERENCE_FILE), 'w') as f:
+        json.dump(config, f)
+    logger.info(f"Drift reference profile saved to {model_dir}")
+
+def load_reference(model_dir, selected_features=None):
+    """
+    Load the reference profile, if one was saved.
+
+    Args:
+        model_dir (str): Directory containing the model files
+        selected_features (list, optional): Model features; the profile
+            must cover them
+
+    Returns:
+        FeatureHistograms: The profile, or None when none was saved
+    """
+    path = os.path.join(model_dir, DRIFT_REFERENCE_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        reference = FeatureHistograms.from_dict(json.load(f))
+    if selected_features is not None:
+        missing = [feature for feature in selected_features if feature not in reference.features]
+        if missing:
+            raise ValueError(f"Drift reference does not cover the model features: {missing}")
+    return reference
+
+class DriftMonitor:
+    """
+    Windowed comparison of live feature histograms with a reference profile.
+    """
+
+    def __init__(self, reference, db=None, component='app', snapshot_seconds=DEFAULT_SNAPSHOT_SECONDS,
+                 min_rows=DEFAULT_MIN_ROWS, sample_rows=DEFAULT_SAMPLE_ROWS, seed=None):
+        """
+        Initialize the monitor.
+
+        Args:
+            reference (FeatureHistograms): Reference profile
+            db (DatabaseManager, optional): Metrics store for the window scores
+            component (str): Name stored with the scores
+            snapshot_seconds (float): Length of a window (0 to only store on
+                snapshot())
+            min_rows (int): Counted rows a window needs before its scores are stored;
+                smaller windows are extended
+            sample_rows (int): Rows of a batch counted at most (0 to count
+                every row); larger batches are sampled uniformly
+            seed (int, optional): Seed of the row sampling
+        """
+        self.reference = reference
+        self.db = db
+        self.component = component
+        self.snapshot_seconds = snapshot_seconds
+        self.min_rows = min_rows
+        self.sample_rows = sample_rows
+        self.rng = np.random.default_rng(seed)
+        self.window = reference.empty_copy()
+        self.window_start = time.time()
+        self.last = None
+        self.lock = threading.Lock()
+        self.stats = {'rows': 0, 'counted_rows': 0, 'batches': 0, 'windows': 0, 'update_seconds': 0.0}
+
+    def update(self, data):
+        """
+        Count the rows of a scored batch.
+
+        Args:
+            data (pandas.DataFrame or numpy.ndarray): Raw feature values
+                (DataFrames may have other columns too)
+        """
+        try:
+            start = time.perf_counter()
+            rows = len(data)
+            if isinstance(data, pd.DataFrame):
+                data = data[self.reference.features]
+            if self.sample_rows and rows > self.sample_rows:
+                with self.lock:
+                    sample = np.sort(self.rng.choice(rows, self.sample_rows, replace=False, shuffle=False))
+                data = data.iloc[sample] if isinstance(data, pd.DataFrame) else np.asarray(data)[sample]
+            if isinstance(data, pd.DataFrame):
+                data = data.to_numpy(dtype=np.float64)
+            with self.lock:
+                self.window.update(data)
+                self.stats['rows'] += rows
+                self.stats['counted_rows'] += len(data)
+                self.stats['batches'] += 1
+                self.stats['update_seconds'] += time.perf_counter() - start
+            self.maybe_snapshot()
+        except Exception as e:
+            logger.error(f"Error updating drift monitor: {str(e)}")
+            raise
+
+    def _report(self, window, window_start):
+        scores = compare_histograms(self.reference, window)
+        psi = [score['psi'] for score in scores.values() if score['psi'] is not None]
+        ks = [score['ks'] for score in scores.values() if score['ks'] is not None]
+        max_psi = max(psi) if psi else None
+        return {
+            'component': self.component,
+            'window_start': datetime.fromtimestamp(window_start).strftime('%Y-%m-%d %H:%M:%S'),
+            'rows': window.rows,
+            'max_psi': max_psi,
+            'max_ks': max(ks) if ks else None,
+            'level': drift_level(max_psi),
+            'drifted': sorted((feature for feature, score in scores.items()
+                               if score['psi'] is not None and score['psi'] >= PSI_MODERATE),
+                              key=lambda feature: -scores[feature]['psi']),
+            'features': scores
+        }
+
+    def report(self):
+        """
+        Compare the current window with the reference.
+
+        Returns:
+            dict: Window start and rows, per-feature PSI/KS/missing share,
+                largest PSI and KS, drift level and the drifted features
+        """
+        with self.lock:
+            return self._report(self.window, self.window_start)
+
+    def maybe_snapshot(self):
+        """Store the window's scores if it is snapshot_seconds old and has min_rows rows."""
+        if not self.snapshot_seconds:
+            return
+        with self.lock:
+            due = time.time() - self.window_start >= self.snapshot_seconds and self.window.rows >= self.min_rows
+        if due:
+            self.snapshot()
+
+    def snapshot(self):
+        """
+        Store the window's scores in the metrics table and start a new window.
+
+        The metric value is the largest feature PSI; the details hold report().
+
+        Returns:
+            dict: The report of the window that ended, or None if it had no rows
+        """
+        with self.lock:
+            window, window_start = self.window, self.window_start
+            if not window.rows:
+                return None
+            self.window = self.reference.empty_copy()
+            self.window_start = time.time()
+            self.stats['windows'] += 1
+        report = self._report(window, window_start)
+        self.last = report
+        for feature, score in report['features'].items():
+            if score['psi'] is not None:
+                FEATURE_DRIFT_PSI.labels(feature).set(score['psi'])
+        if report['max_psi'] is not None:
+            FEATURE_DRIFT_MAX_PSI.set(report['max_psi'])
+            if report['level'] != 'stable':
+                logger.warning(f"{report['level'].capitalize()} feature drift (max PSI {report['max_psi']:.3f}): "
+                               f"{', '.join(report['drifted'][:5])}")
+        if self.db is not None:
+            self.db.add_metric('feature_drift', report['max_psi'] or 0.0, report)
+        return report
+
+    def status(self):
+        """
+        Get the current window and the last stored one.
+
+        Returns:
+            dict: Current window summary (without per-feature scores), last
+                stored report and counters
+        """
+        current = self.report()
+        current.pop('features')
+        with self.lock:
+            return {'current': current, 'last': self.last, 'stats': dict(self.stats)}
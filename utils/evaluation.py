@@ -0,0 +1,195 @@
+"""
+Streaming evaluation of the intrusion detection model.
+Labeled datasets too large to hold in memory (e.g. the full CICIDS2017
+corpus) are scored chunk by chunk. Each chunk only adds to confusion
+counts, per-class score histograms (for the AUC) and per-label counts, so
+memory stays bounded by the chunk size, and chunks can be scored in
+parallel and their partial results merged.
+"""
+
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Score histogram resolution; the AUC error is at most half the fraction of
+# attack/benign pairs whose scores share a bin
+DEFAULT_BINS = 10000
+
+class StreamingEvaluator:
+    """
+    Accumulates evaluation counts over chunks of scored rows.
+    """
+
+    def __init__(self, bins=DEFAULT_BINS):
+        """
+        Initialize empty counts.
+
+        Args:
+            bins (int): Number of score histogram bins over [0, 1]
+        """
+        self.bins = bins
+        self.tp = self.fp = self.tn = self.fn = 0
+        self.positive_hist = np.zeros(bins, dtype=np.int64)
+        self.negative_hist = np.zeros(bins, dtype=np.int64)
+        self.label_counts = pd.DataFrame(columns=['rows', 'flagged'], dtype=np.int64)
+
+    def update(self, y_true, y_pred, y_scores, labels=None):
+        """
+        Add one chunk of scored rows.
+
+        Args:
+            y_true (numpy.ndarray): True binary labels
+            y_pred (numpy.ndarray): Predicted binary labels
+            y_scores (numpy.ndarray): Confidence scores
+            labels (pandas.Series, optional): Original labels (attack names)
+        """
+        y_true = np.asarray(y_true).astype(bool)
+        y_pred = np.asarray(y_pred).astype(bool)
+
+        self.tp += int(np.count_nonzero(y_true & y_pred))
+        self.fp += int(np.count_nonzero(~y_true & y_pred))
+        self.fn += int(np.count_nonzero(y_true & ~y_pred))
+        self.tn += int(np.count_nonzero(~y_true & ~y_pred))
+
+        bin_index = np.clip((np.asarray(y_scores, dtype=np.float64) * self.bins).astype(np.int64), 0, self.bins - 1)
+        self.positive_hist += np.bincount(bin_index[y_true], minlength=self.bins)
+        self.negative_hist += np.bincount(bin_index[~y_true], minlength=self.bins)
+
+        if labels is not None:
+            counts = pd.DataFrame({
+                'label': pd.Series(labels).astype(str).str.strip().to_numpy(),
+                'flagged': y_pred.astype(np.int64)
+            }).groupby('label')['flagged'].agg(rows='size', flagged='sum')
+            self.label_counts = counts.add(self.label_counts, fill_value=0).astype(np.int64)
+
+    def merge(self, other):
+        """
+        Add the counts of another evaluator.
+
+        Args:
+            other (StreamingEvaluator): Evaluator with the same number of bins
+        """
+        if other.bins != self.bins:
+            raise ValueError("Cannot merge evaluators with different histogram bins")
+        self.tp += other.tp
+        self.fp += other.fp
+        self.tn += other.tn
+        self.fn += other.fn
+        self.positive_hist += other.positive_hist
+        self.negative_hist += other.negative_hist
+        self.label_counts = other.label_counts.add(self.label_counts, fill_value=0).astype(np.int64)
+
+    def auc_roc(self):
+        """
+        Area under the ROC curve from the score histograms.
+
+        Pairs whose scores fall in the same bin count as ties.
+
+        Returns:
+            float: AUC, or None when only one class was seen
+        """
+        positives = int(self.positive_hist.sum())
+        negatives = int(self.negative_hist.sum())
+        if positives == 0 or negatives == 0:
+            return None
+        negatives_below = np.cumsum(self.negative_hist) - self.negative_hist
+        pairs = self.positive_hist * (negatives_below + 0.5 * self.negative_hist)
+        return float(pairs.sum() / (positives * negatives))
+
+    def metrics(self):
+        """
+        Compute the evaluation metrics reported for the model.
+
+        Returns:
+            dict: The compute_metrics metrics plus specificity and row count
+        """
+        tp, fp, tn, fn = self.tp, self.fp, self.tn, self.fn
+        rows = tp + fp + tn + fn
+        precision = tp / (tp + fp) if (tp + fp) else 0.0
+        recall = tp / (tp + fn) if (tp + fn) else 0.0
+        metrics = {
+            'rows': rows,
+            'accuracy': (tp + tn) / rows if rows else 0.0,
+            'precision': precision,
+            'recall': recall,
+            'f1_score': 2 * precision * recall / (precision + recall) if (precision + recall) else 0.0,
+            'false_positive_rate': fp / (fp + tn) if (fp + tn) else 0.0,
+            'false_negative_rate': fn / (fn + tp) if (fn + tp) else 0.0,
+            'specificity': tn / (tn + fp) if (tn + fp) else 0.0
+        }
+        auc = self.auc_roc()
+        if auc is not None:
+            metrics['auc_roc'] = auc
+        return metrics
+
+    def label_breakdown(self):
+        """
+        Per-label detection counts.
+
+        Returns:
+            dict: For each original label, its rows, the rows flagged as
+                intrusions and the flagged fraction (the detection rate for
+                attack labels, the false positive rate for benign traffic)
+        """
+        return {
+            label: {
+                'rows': int(row.rows),
+                'flagged': int(row.flagged),
+                'flagged_rate': row.flagged / row.rows if row.rows else 0.0
+            }
+            for label, row in self.label_counts.sort_index().iterrows()
+        }
+
+def evaluate_chunks(chunks, score_fn, workers=1, bins=DEFAULT_BINS):
+    """
+    Evaluate a model over chunks of labeled data.
+
+    With several workers, chunks are scored by a thread pool (the forest
+    releases the GIL while predicting); at most two chunks per worker are
+    in flight at once so memory stays bounded.
+
+    Args:
+        chunks (iterable): Iterable of (features, binary labels, original labels)
+        score_fn (callable): Function taking a features chunk and returning
+            (predictions, confidence_scores)
+        workers (int): Number of chunks scored at the same time
+        bins (int): Number of score histogram bins
+
+    Returns:
+        StreamingEvaluator: Accumulated counts over all chunks
+    """
+    def evaluate(X, y, labels):
+        partial = StreamingEvaluator(bins)
+        y_pred, y_scores = score_fn(X)
+        partial.update(y, y_pred, y_scores, labels)
+        return partial
+
+    evaluator = StreamingEvaluator(bins)
+    try:
+        if workers <= 1:
+            for X, y, labels in chunks:
+                evaluator.merge(evaluate(X, y, labels))
+            return evaluator
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            for X, y, labels in chunks:
+                pending.append(executor.submit(evaluate, X, y, labels))
+                if len(pending) >= 2 * workers:
+                    evaluator.merge(pending.popleft().result())
+            while pending:
+                evaluator.merge(pending.popleft().result())
+        return evaluator
+    except Exception as e:
+        logger.error(f"Error evaluating chunks: {str(e)}")
+        raise
@@ -0,0 +1,354 @@
+"""
+Packet-to-flow aggregation for the intrusion detection system.
+FlowTable turns parsed packets (utils.packets) into the CICFlowMeter-style
+features the model was trained on. Packets are processed a block at a time:
+they are grouped by flow with one sort, and per-flow counts, sums, sums of
+squares, minima and maxima of packet lengths and inter-arrival times are
+reduced with numpy and merged into columnar per-flow state. Those
+statistics merge exactly across blocks, so features do not depend on how
+the capture was cut into blocks.
+
+Flows are keyed by flow_hash, a symmetric hash of the 5-tuple: both
+directions of a connection get the same key, which is also what the
+sharded tracker (utils.sharding) uses to send them to the same worker.
+A flow ends at a RST, once both sides have sent a FIN, after idle_timeout
+seconds without packets or flow_timeout seconds after it started.
+"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+from .packets import TCP_ACK, TCP_FIN, TCP_PSH, TCP_RST, TCP_URG
+from .sketches import mix64
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# CICFlowMeter defaults: flows are cut after 120 s and gaps over 5 s count as idle
+DEFAULT_FLOW_TIMEOUT = 120.0
+DEFAULT_IDLE_TIMEOUT = 60.0
+DEFAULT_ACTIVITY_TIMEOUT = 5.0
+INITIAL_CAPACITY = 1 << 16
+
+STATS = ('n', 'sum', 'sq', 'min', 'max')
+STATE_DTYPE = np.dtype(
+    [('key', 'u8'), ('src_addr', 'V16'), ('dst_addr', 'V16'), ('ip_version', 'u1'),
+     ('src_port', 'u2'), ('dst_port', 'u2'), ('protocol', 'u1'),
+     ('first_ts', 'f8'), ('last_ts', 'f8'), ('fwd_last_ts', 'f8'), ('bwd_last_ts', 'f8'),
+     ('init_win_bwd', 'f8'), ('fin_fwd', '?'), ('fin_bwd', '?'), ('rst', '?')]
+    + [(f'{series}_{stat}', 'f8') for series in ('fwd_len', 'bwd_len', 'iat', 'fwd_iat', 'bwd_iat')
+       for stat in STATS]
+    + [(f'idle_{stat}', 'f8') for stat in ('n', 'sum', 'sq')]
+    + [(name, 'f8') for name in ('fin', 'psh', 'ack', 'urg', 'fwd_psh')]
+)
+
+def flow_hash(packets):
+    """
+    Symmetric 64-bit hash of each packet's 5-tuple.
+
+    Each endpoint (address, port) is hashed, and the two endpoint hashes are
+    combined in sorted order, so A->B and B->A packets get the same value.
+
+    Args:
+        packets (numpy.ndarray): PACKET_DTYPE records
+
+    Returns:
+        numpy.ndarray: uint64 flow keys
+    """
+    endpoints = []
+    for addr, port in (('src_addr', 'src_port'), ('dst_addr', 'dst_port')):
+        words = np.ascontiguousarray(packets[addr]).view('<u8').reshape(-1, 2)
+        ports = packets[port].astype(np.uint64) << np.uint64(32)
+        endpoints.append(mix64(words[:, 0] ^ mix64(words[:, 1] ^ ports)))
+    low, high = np.minimum(*endpoints), np.maximum(*endpoints)
+    return mix64(low ^ mix64(high + packets['protocol'].astype(np.uint64)))
+
+def _group_starts(sorted_keys):
+    return np.flatnonzero(np.concatenate([[True], sorted_keys[1:] != sorted_keys[:-1]]))
+
+def _merge_stats(state, prefix, slots, values, valid, groups, starts, count):
+    """Merge n/sum/sq/min/max of values (grouped and sorted by group) into state."""
+    weights = np.where(valid, values, 0.0)
+    state[f'{prefix}_n'][slots] += np.bincount(groups, valid, count)
+    state[f'{prefix}_sum'][slots] += np.bincount(groups, weights, count)
+    state[f'{prefix}_sq'][slots] += np.bincount(groups, weights * weights, count)
+    masked = np.where(valid, values, np.nan)
+    for stat, reduce in (('min', np.fmin), ('max', np.fmax)):
+        reduced = np.full(count, np.nan)
+        reduced[groups[starts]] = reduce.reduceat(masked, starts)
+        state[f'{prefix}_{stat}'][slots] = reduce(state[f'{prefix}_{stat}'][slots], reduced)
+
+def _mean(total, count):
+    return np.where(count > 0, total / np.maximum(count, 1), 0.0)
+
+def _std(total, squares, count):
+    """Sample standard deviation from sufficient statistics (0 below 2 values)."""
+    variance = (squares - total * total / np.maximum(count, 1)) / np.maximum(count - 1, 1)
+    return np.where(count > 1, np.sqrt(np.maximum(variance, 0.0)), 0.0)
+
+def flow_features(state):
+    """
+    Compute flow features from per-flow state.
+
+    Args:
+        state (numpy.ndarray): STATE_DTYPE rows
+
+    Returns:
+        pandas.DataFrame: CICFlowMeter-style features (durations and
+            inter-arrival times in microseconds, lengths are payload bytes)
+    """
+    s = state
+    with np.errstate(invalid='ignore', divide='ignore'):
+        fwd_n, bwd_n = s['fwd_len_n'], s['bwd_len_n']
+        total_n = fwd_n + bwd_n
+        total_sum = s['fwd_len_sum'] + s['bwd_len_sum']
+        total_sq = s['fwd_len_sq'] + s['bwd_len_sq']
+        duration = (s['last_ts'] - s['first_ts']) * 1e6
+        seconds = np.maximum(duration, 1.0) / 1e6
+        packet_std = _std(total_sum, total_sq, total_n)
+        features = {
+            'destination_port': s['dst_port'].astype(np.float64),
+            'flow_duration': duration,
+            'total_fwd_packets': fwd_n,
+            'total_backward_packets': bwd_n,
+            'total_length_of_fwd_packets': s['fwd_len_sum'],
+            'total_length_of_bwd_packets': s['bwd_len_sum'],
+            'fwd_packet_length_max': s['fwd_len_max'],
+            'fwd_packet_length_min': s['fwd_len_min'],
+            'fwd_packet_length_mean': _mean(s['fwd_len_sum'], fwd_n),
+            'fwd_packet_length_std': _std(s['fwd_len_sum'], s['fwd_len_sq'], fwd_n),
+            'bwd_packet_length_max': s['bwd_len_max'],
+            'bwd_packet_length_min': s['bwd_len_min'],
+            'bwd_packet_length_mean': _mean(s['bwd_len_sum'], bwd_n),
+            'bwd_packet_length_std': _std(s['bwd_len_sum'], s['bwd_len_sq'], bwd_n),
+            'flow_bytes/s': total_sum / seconds,
+            'flow_packets/s': total_n / seconds,
+            'flow_iat_mean': _mean(s['iat_sum'], s['iat_n']),
+            'flow_iat_std': _std(s['iat_sum'], s['iat_sq'], s['iat_n']),
+            'flow_iat_max': s['iat_max'],
+            'flow_iat_min': s['iat_min'],
+            'fwd_iat_total': s['fwd_iat_sum'],
+            'fwd_iat_mean': _mean(s['fwd_iat_sum'], s['fwd_iat_n']),
+            'fwd_iat_std': _std(s['fwd_iat_sum'], s['fwd_iat_sq'], s['fwd_iat_n']),
+            'fwd_iat_max': s['fwd_iat_max'],
+            'fwd_iat_min': s['fwd_iat_min'],
+            'bwd_iat_total': s['bwd_iat_sum'],
+            'bwd_iat_mean': _mean(s['bwd_iat_sum'], s['bwd_iat_n']),
+            'bwd_iat_std': _std(s['bwd_iat_sum'], s['bwd_iat_sq'], s['bwd_iat_n']),
+            'bwd_iat_max': s['bwd_iat_max'],
+            'bwd_iat_min': s['bwd_iat_min'],
+            'fwd_psh_flags': s['fwd_psh'],
+            'fwd_packets/s': fwd_n / seconds,
+            'bwd_packets/s': bwd_n / seconds,
+            'min_packet_length': np.fmin(s['fwd_len_min'], s['bwd_len_min']),
+            'max_packet_length': np.fmax(s['fwd_len_max'], s['bwd_len_max']),
+            'packet_length_mean': _mean(total_sum, total_n),
+            'packet_length_std': packet_std,
+            'packet_length_variance': packet_std * packet_std,
+            'fin_flag_count': s['fin'],
+            'psh_flag_count': s['psh'],
+            'ack_flag_count': s['ack'],
+            'urg_flag_count': s['urg'],
+            'down/up_ratio': _mean(bwd_n, fwd_n),
+            'average_packet_size': _mean(total_sum, total_n),
+            'idle_mean': _mean(s['idle_sum'], s['idle_n']),
+            'idle_std': _std(s['idle_sum'], s['idle_sq'], s['idle_n'])
+        }
+    features = pd.DataFrame(features).fillna(0.0)
+    # -1 when the responder never sent a packet, as in CICIDS2017
+    features['init_win_bytes_backward'] = s['init_win_bwd']
+    return features
+
+class FlowTable:
+    """
+    Per-flow state for a stream of packets, updated a block at a time.
+    """
+
+    def __init__(self, flow_timeout=DEFAULT_FLOW_TIMEOUT, idle_timeout=DEFAULT_IDLE_TIMEOUT,
+                 activity_timeout=DEFAULT_ACTIVITY_TIMEOUT, capacity=INITIAL_CAPACITY):
+        """
+        Initialize the flow table.
+
+        Args:
+            flow_timeout (float): Seconds after its first packet a flow is cut
+            idle_timeout (float): Seconds without packets after which a flow ends
+            activity_timeout (float): Gaps longer than this count as idle periods
+            capacity (int): Initial number of flow slots (grows as needed)
+        """
+        self.flow_timeout = flow_timeout
+        self.idle_timeout = idle_timeout
+        self.activity_timeout = activity_timeout
+        self.state = np.zeros(capacity, dtype=STATE_DTYPE)
+        self.used = np.zeros(capacity, dtype=bool)
+        self.free = list(range(capacity - 1, -1, -1))
+        self.index = {}
+        self.packets = 0
+        self.now = 0.0
+
+    def __len__(self):
+        return len(self.index)
+
+    def _allocate(self, count):
+        while len(self.free) < count:
+            capacity = len(self.state)
+            self.state = np.concatenate([self.state, np.zeros(capacity, dtype=STATE_DTYPE)])
+            self.used = np.concatenate([self.used, np.zeros(capacity, dtype=bool)])
+            self.free.extend(range(2 * capacity - 1, capacity - 1, -1))
+        slots = np.array(self.free[-count:][::-1], dtype=np.int64)
+        del self.free[-count:]
+        return slots
+
+    def _open(self, slots, keys, packets):
+        """Start flows at slots, initiated by packets."""
+        fresh = np.zeros(len(slots), dtype=STATE_DTYPE)
+        fresh['key'] = keys
+        for name in ('src_addr', 'dst_addr', 'ip_version', 'src_port', 'dst_port', 'protocol'):
+            fresh[name] = packets[name]
+        fresh['first_ts'] = packets['ts']
+        for name in ('last_ts', 'fwd_last_ts', 'bwd_last_ts'):
+            fresh[name] = np.nan
+        for series in ('fwd_len', 'bwd_len', 'iat', 'fwd_iat', 'bwd_iat'):
+            fresh[f'{series}_min'] = fresh[f'{series}_max'] = np.nan
+        fresh['init_win_bwd'] = -1
+        self.state[slots] = fresh
+        self.used[slots] = True
+        self.index.update(zip(keys.tolist(), slots.tolist()))
+
+    def update(self, packets, keys=None):
+        """
+        Add a block of packets (in capture order) to their flows.
+
+        Args:
+            packets (numpy.ndarray): PACKET_DTYPE records
+            keys (numpy.ndarray, optional): flow_hash of the packets, if
+                already computed
+
+        Returns:
+            tuple: Features and state rows of the flows that ended in this
+                block (see collect)
+        """
+        if len(packets) == 0:
+            return self.collect(np.zeros(0, dtype=np.int64))
+        if keys is None:
+            keys = flow_hash(packets)
+        unique, first, groups = np.unique(keys, return_index=True, return_inverse=True)
+        count = len(unique)
+        get = self.index.get
+        slots = np.fromiter((get(key, -1) for key in unique.tolist()), dtype=np.int64, count=count)
+        new = np.flatnonzero(slots < 0)
+        if len(new):
+            slots[new] = self._allocate(len(new))
+            self._open(slots[new], unique[new], packets[first[new]])
+
+        state = self.state
+        packet_slots = slots[groups]
+        forward = (packets['src_addr'] == state['src_addr'][packet_slots]) & \
+            (packets['src_port'] == state['src_port'][packet_slots])
+        ts = packets['ts']
+        lengths = packets['length'].astype(np.float64)
+        flags = packets['tcp_flags']
+
+        # Flow-level inter-arrival times and idle periods (grouped by flow)
+        order = np.argsort(groups, kind='stable')
+        sorted_groups = groups[order]
+        starts = _group_starts(sorted_groups)
+        sorted_ts = ts[order]
+        previous = np.concatenate([[np.nan], sorted_ts[:-1]])
+        previous[starts] = state['last_ts'][slots[sorted_groups[starts]]]
+        iat = (sorted_ts - previous) * 1e6
+        valid = ~np.isnan(iat)
+        _merge_stats(state, 'iat', slots, iat, valid, sorted_groups, starts, count)
+        idle = valid & (iat > self.activity_timeout * 1e6)
+        idle_values = np.where(idle, iat, 0.0)
+        state['idle_n'][slots] += np.bincount(sorted_groups, idle, count)
+        state['idle_sum'][slots] += np.bincount(sorted_groups, idle_values, count)
+        state['idle_sq'][slots] += np.bincount(sorted_groups, idle_values * idle_values, count)
+        ends = np.concatenate([starts[1:], [len(order)]]) - 1
+        state['last_ts'][slots[sorted_groups[ends]]] = sorted_ts[ends]
+
+        # Per-direction lengths and inter-arrival times
+        for backward, prefix in ((False, 'fwd'), (True, 'bwd')):
+            selected = np.flatnonzero(forward != backward)
+            if not len(selected):
+                continue
+            order = selected[np.argsort(groups[selected], kind='stable')]
+            sorted_groups = groups[order]
+            starts = _group_starts(sorted_groups)
+            sorted_ts = ts[order]
+            first_slots = slots[sorted_groups[starts]]
+            previous = np.concatenate([[np.nan], sorted_ts[:-1]])
+            previous[starts] = state[f'{prefix}_last_ts'][first_slots]
+            iat = (sorted_ts - previous) * 1e6
+            _merge_stats(state, f'{prefix}_iat', slots, iat, ~np.isnan(iat), sorted_groups, starts, count)
+            _merge_stats(state, f'{prefix}_len', slots, lengths[order], np.ones(len(order), dtype=bool),
+                         sorted_groups, starts, count)
+            ends = np.concatenate([starts[1:], [len(order)]]) - 1
+            state[f'{prefix}_last_ts'][slots[sorted_groups[ends]]] = sorted_ts[ends]
+            if backward:
+                unset = state['init_win_bwd'][first_slots] < 0
+                state['init_win_bwd'][first_slots[unset]] = packets['window'][order[starts]][unset]
+
+        # Flag counts and connection teardown
+        for name, flag in (('fin', TCP_FIN), ('psh', TCP_PSH), ('ack', TCP_ACK), ('urg', TCP_URG)):
+            state[name][slots] += np.bincount(groups, (flags & flag) > 0, count)
+        state['fwd_psh'][slots] += np.bincount(groups, forward & ((flags & TCP_PSH) > 0), count)
+        fin = (flags & TCP_FIN) > 0
+        state['fin_fwd'][slots] |= np.bincount(groups, forward & fin, count) > 0
+        state['fin_bwd'][slots] |= np.bincount(groups, ~forward & fin, count) > 0
+        state['rst'][slots] |= np.bincount(groups, (flags & TCP_RST) > 0, count) > 0
+
+        self.packets += len(packets)
+        self.now = max(self.now, float(ts.max()))
+        ended = slots[(state['fin_fwd'][slots] & state['fin_bwd'][slots]) | state['rst'][slots]]
+        return self.collect(np.union1d(ended, self.expired()))
+
+    def expired(self, now=None):
+        """
+        Get the slots of flows that timed out.
+
+        Args:
+            now (float, optional): Current capture time (default: the latest
+                packet seen)
+
+        Returns:
+            numpy.ndarray: Slots of flows idle for idle_timeout or open for
+                flow_timeout
+        """
+        now = self.now if now is None else now
+        state = self.state
+        timed_out = self.used & ((now - state['last_ts'] > self.idle_timeout) |
+                                 (now - state['first_ts'] > self.flow_timeout))
+        return np.flatnonzero(timed_out)
+
+    def collect(self, slots):
+        """
+        Close flows and compute their features.
+
+        Args:
+            slots (numpy.ndarray): Slots of the flows to close
+
+        Returns:
+            tuple: (features DataFrame, STATE_DTYPE rows of the flows with
+                their addresses, ports, protocol and first/last packet times)
+        """
+        rows = self.state[slots]
+        for key in rows['key'].tolist():
+            del self.index[key]
+        self.used[slots] = False
+        self.free.extend(slots.tolist())
+        return flow_features(rows), rows
+
+    def flush(self):
+        """
+        Close every open flow (end of capture).
+
+        Returns:
+            tuple: Features and state rows of all remaining flows (see collect)
+        """
+        return self.collect(np.flatnonzero(self.used))
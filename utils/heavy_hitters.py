@@ -0,0 +1,444 @@
+"""
+Top-talker (heavy hitter) tracking for the intrusion detection system.
+Exact per-source, per-destination and per-port counters grow with the
+traffic, so the top talkers are kept in Space-Saving summaries
+(Metwally et al., 2005) of fixed capacity: a key's count is never
+underestimated and is overestimated by at most its recorded error, and
+every key with more than total / capacity of the traffic is kept.
+
+Summaries are updated a batch at a time: the batch is aggregated per key
+with numpy, known keys are incremented, and new keys enter with the
+smallest count of a full summary as their error, as if the batch had been
+processed one flow at a time. For sliding windows each summary covers one
+bucket of bucket_seconds; a window query merges the buckets it spans.
+TrafficHeavyHitters tracks sources, destinations and destination ports by
+flows and by bytes, and periodically stores its top lists in the metrics
+table (metric type 'heavy_hitters').
+"""
+
+import ipaddress
+import logging
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from .sketches import hash64, hash_addresses
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_CAPACITY = 512
+DEFAULT_BUCKET_SECONDS = 60.0
+DEFAULT_BUCKETS = 60
+DEFAULT_WINDOWS = (60.0, 300.0, 3600.0)
+DEFAULT_SNAPSHOT_SECONDS = 60.0
+DIMENSIONS = ('source', 'destination', 'port')
+MEASURES = ('flows', 'bytes')
+
+class SpaceSaving:
+    """
+    Space-Saving summary of the heaviest keys, updated in batches.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        """
+        Initialize the summary.
+
+        Args:
+            capacity (int): Keys kept
+        """
+        self.capacity = capacity
+        self.keys = np.zeros(0, dtype=np.uint64)
+        self.counts = np.zeros(0)
+        self.errors = np.zeros(0)
+        self.total = 0.0
+
+    @property
+    def nbytes(self):
+        return self.keys.nbytes + self.counts.nbytes + self.errors.nbytes
+
+    def floor(self):
+        """Count of the smallest kept key once the summary is full (0 before)."""
+        return float(self.counts.min()) if len(self.keys) >= self.capacity else 0.0
+
+    def update(self, keys, weights=None):
+        """
+        Add weighted occurrences of keys.
+
+        Args:
+            keys (numpy.ndarray): uint64 keys
+            weights (numpy.ndarray, optional): Weight per occurrence (default 1)
+
+        Returns:
+            numpy.ndarray: Keys that entered the summary
+        """
+        if not len(keys):
+            return keys[:0]
+        unique, inverse = np.unique(keys, return_inverse=True)
+        sums = np.bincount(inverse, weights=weights, minlength=len(unique)).astype(np.float64)
+        self.total += float(sums.sum())
+
+        counts = self.counts.copy()
+        known = np.zeros(len(unique), dtype=bool)
+        if len(self.keys):
+            order = np.argsort(self.keys)
+            position = np.minimum(np.searchsorted(self.keys, unique, sorter=order), len(self.keys) - 1)
+            known = self.keys[order[position]] == unique
+            counts[order[position[known]]] += sums[known]
+
+        floor = self.floor()
+        fresh = ~known
+        keys = np.concatenate([self.keys, unique[fresh]])
+        counts = np.concatenate([counts, sums[fresh] + floor])
+        errors = np.concatenate([self.errors, np.full(int(fresh.sum()), floor)])
+        if len(keys) > self.capacity:
+            keep = np.argpartition(-counts, self.capacity - 1)[:self.capacity]
+            keys, counts, errors = keys[keep], counts[keep], errors[keep]
+        entered = np.isin(unique[fresh], keys)
+        self.keys, self.counts, self.errors = keys, counts, errors
+        return unique[fresh][entered]
+
+    def top(self, k):
+        """
+        Get the k heaviest keys.
+
+        Args:
+            k (int): Keys returned
+
+        Returns:
+            tuple: (keys, counts, errors), heaviest first
+        """
+        order = np.argsort(-self.counts, kind='stable')[:k]
+        return self.keys[order], self.counts[order], self.errors[order]
+
+    @staticmethod
+    def merge(summaries, capacity=None):
+        """
+        Merge summaries of disjoint traffic (for example consecutive buckets).
+
+        A key missing from a full summary may still have up to that
+        summary's floor there, which is added to its count and error, so
+        merged counts stay upper bounds.
+
+        Args:
+            summaries (list): SpaceSaving summaries
+            capacity (int, optional): Capacity of the result (default the largest)
+
+        Returns:
+            SpaceSaving: Merged summary
+        """
+        merged = SpaceSaving(capacity or max((summary.capacity for summary in summaries), default=DEFAULT_CAPACITY))
+        summaries = [summary for summary in summaries if len(summary.keys)]
+        if not summaries:
+            return merged
+        keys = np.unique(np.concatenate([summary.keys for summary in summaries]))
+        counts = np.zeros(len(keys))
+        errors = np.zeros(len(keys))
+        for summary in summaries:
+            position = np.searchsorted(keys, summary.keys)
+            present = np.zeros(len(keys), dtype=bool)
+            present[position] = True
+            counts[position] += summary.counts
+            errors[position] += summary.errors
+            floor = summary.floor()
+            counts[~present] += floor
+            errors[~present] += floor
+            merged.total += summary.total
+        if len(keys) > merged.capacity:
+            keep = np.argpartition(-counts, merged.capacity - 1)[:merged.capacity]
+            keys, counts, errors = keys[keep], counts[keep], errors[keep]
+        merged.keys, merged.counts, merged.errors = keys, counts, errors
+        return merged
+
+class SlidingHeavyHitters:
+    """
+    Space-Saving summaries over a ring of time buckets.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, bucket_seconds=DEFAULT_BUCKET_SECONDS, buckets=DEFAULT_BUCKETS):
+        """
+        Initialize the tracker.
+
+        Args:
+            capacity (int): Keys kept per bucket
+            bucket_seconds (float): Length of a bucket
+            buckets (int): Buckets kept (the longest window is
+                buckets * bucket_seconds)
+        """
+        self.capacity = capacity
+        self.bucket_seconds = bucket_seconds
+        self.ring = [None] * buckets
+        self.starts = [None] * buckets
+        self.latest = None
+
+    @property
+    def nbytes(self):
+        return sum(summary.nbytes for summary in self.ring if summary is not None)
+
+    def _bucket(self, now):
+        number = int(now // self.bucket_seconds)
+        if self.latest is not None:
+            # Late flows older than the ring count in its oldest bucket
+            number = max(number, self.latest - len(self.ring) + 1)
+        slot = number % len(self.ring)
+        if self.starts[slot] != number:
+            self.ring[slot] = SpaceSaving(self.capacity)
+            self.starts[slot] = number
+        self.latest = number if self.latest is None else max(self.latest, number)
+        return self.ring[slot]
+
+    def update(self, keys, weights=None, now=None):
+        """
+        Add weighted occurrences of keys at time now.
+
+        Returns:
+            numpy.ndarray: Keys that entered the bucket's summary
+        """
+        return self._bucket(time.time() if now is None else now).update(keys, weights)
+
+    def window(self, seconds, now=None):
+        """
+        Merge the buckets of the last seconds (whole buckets, the current one included).
+
+        Args:
+            seconds (float): Window length
+            now (float, optional): End of the window (default the latest update)
+
+        Returns:
+            SpaceSaving: Summary of the window
+        """
+        if self.latest is None:
+            return SpaceSaving(self.capacity)
+        last = self.latest if now is None else int(now // self.bucket_seconds)
+        first = last - max(int(np.ceil(seconds / self.bucket_seconds)), 1) + 1
+        return SpaceSaving.merge([summary for summary, start in zip(self.ring, self.starts)
+                                  if start is not None and first <= start <= last], self.capacity)
+
+def _format_address(raw, version=None):
+    # Without the IP version, zero-padded addresses are taken as IPv4
+    raw = bytes(raw)
+    v4 = version == 4 if version is not None else not any(raw[4:])
+    return str(ipaddress.IPv4Address(raw[:4]) if v4 else ipaddress.IPv6Address(raw))
+
+class TrafficHeavyHitters:
+    """
+    Top sources, destinations and destination ports by flows and bytes.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, bucket_seconds=DEFAULT_BUCKET_SECONDS, buckets=DEFAULT_BUCKETS,
+                 db=None, component='app', snapshot_seconds=DEFAULT_SNAPSHOT_SECONDS, windows=DEFAULT_WINDOWS,
+                 snapshot_k=10):
+        """
+        Initialize the tracker.
+
+        Args:
+            capacity (int): Keys kept per bucket, dimension and measure
+            bucket_seconds (float): Length of a bucket
+            buckets (int): Buckets kept
+            db (DatabaseManager, optional): Metrics store for the snapshots
+            component (str): Name stored with the snapshots
+            snapshot_seconds (float): Seconds between snapshots (0 to disable)
+            windows (tuple): Window lengths, seconds, of the snapshots
+            snapshot_k (int): Keys per top list in the snapshots
+        """
+        self.trackers = {(dimension, measure): SlidingHeavyHitters(capacity, bucket_seconds, buckets)
+                         for dimension in DIMENSIONS for measure in MEASURES}
+        self.labels = {dimension: {} for dimension in DIMENSIONS}
+        self.db = db
+        self.component = component
+        self.snapshot_seconds = snapshot_seconds
+        self.windows = windows
+        self.snapshot_k = snapshot_k
+        self.last_snapshot = time.monotonic()
+        self.lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        """Memory held by the summaries, bytes (labels not included)."""
+        return sum(tracker.nbytes for tracker in self.trackers.values())
+
+    @staticmethod
+    def _keys(values, versions=None):
+        """uint64 keys of addresses (V16, with their IP versions), ports (integers) or labels (strings)."""
+        values = np.asarray(values)
+        if values.dtype.kind == 'V':
+            keys = hash_addresses(values)
+            # An IPv4 address and the IPv6 address with the same leading bytes are different keys
+            return keys if versions is None else keys ^ hash64(versions)
+        if values.dtype.kind in 'iuf':
+            return values.astype(np.int64).astype(np.uint64)
+        return pd.util.hash_array(values.astype(str).astype(object))
+
+    def _label(self, dimension, values, keys, entered, versions=None):
+        """Remember how to display the keys that entered a summary."""
+        labels = self.labels[dimension]
+        for i in np.flatnonzero(np.isin(keys, entered)).tolist():
+            key = int(keys[i])
+            if key not in labels:
+                value = values[i]
+                version = None if versions is None else int(versions[i])
+                labels[key] = _format_address(value, version) if values.dtype.kind == 'V' else \
+                    int(value) if values.dtype.kind in 'iuf' else str(value)
+
+    def update(self, source=None, destination=None, port=None, flow_bytes=None, now=None, ip_version=None):
+        """
+        Count a batch of scored flows.
+
+        Args:
+            source (array-like, optional): Source address per flow (V16
+                addresses or strings)
+            destination (array-like, optional): Destination address per flow
+            port (array-like, optional): Destination port per flow
+            flow_bytes (array-like, optional): Bytes per flow (NaN counts as 0)
+            now (float, optional): Time of the flows, epoch seconds (default now)
+            ip_version (array-like, optional): IP version (4 or 6) per flow of
+                V16 addresses; without it, zero-padded addresses are taken as IPv4
+        """
+        try:
+            now = time.time() if now is None else now
+            if flow_bytes is not None:
+                flow_bytes = np.nan_to_num(np.asarray(flow_bytes, dtype=np.float64), nan=0.0, posinf=0.0)
+            if ip_version is not None:
+                ip_version = np.asarray(ip_version)
+            with self.lock:
+                for dimension, values in (('source', source), ('destination', destination), ('port', port)):
+                    if values is None or not len(values):
+                        continue
+                    values = np.asarray(values)
+                    versions = ip_version if values.dtype.kind == 'V' else None
+                    keys = self._keys(values, versions)
+                    entered = [self.trackers[(dimension, 'flows')].update(keys, None, now)]
+                    if flow_bytes is not None:
+                        entered.append(self.trackers[(dimension, 'bytes')].update(keys, flow_bytes, now))
+                    unique, first = np.unique(keys, return_index=True)
+                    self._label(dimension, values[first], unique, np.concatenate(entered),
+                                None if versions is None else versions[first])
+                self._prune_labels()
+            self.maybe_snapshot()
+        except Exception as e:
+            logger.error(f"Error updating heavy hitters: {str(e)}")
+            raise
+
+    def _prune_labels(self):
+        # Labels of keys no bucket keeps any more
+        for dimension, labels in self.labels.items():
+            limit = 4 * sum(len(tracker.ring) * tracker.capacity for (name, _), tracker in self.trackers.items()
+                            if name == dimension)
+            if len(labels) > limit:
+                kept = set()
+                for (name, _), tracker in self.trackers.items():
+                    if name == dimension:
+                        for summary in tracker.ring:
+                            if summary is not None:
+                                kept.update(summary.keys.tolist())
+                self.labels[dimension] = {key: label for key, label in labels.items() if key in kept}
+
+    def update_frame(self, data, now=None):
+        """
+        Count scored rows of CICIDS-shaped data (uploads, ingestion, manual input).
+
+        Ports come from destination_port, addresses from source_ip and
+        destination_ip when the data has them, and bytes are estimated as
+        packets (flow_packets/s x flow_duration) x packet_length_mean.
+
+        Args:
+            data (pandas.DataFrame): Scored rows
+            now (float, optional): Time of the flows (default now)
+        """
+        if not len(data):
+            return
+        columns = data.columns
+        flow_bytes = None
+        if {'flow_packets/s', 'flow_duration', 'packet_length_mean'} <= set(columns):
+            flow_bytes = (data['flow_packets/s'].to_numpy(dtype=np.float64)
+                          * data['flow_duration'].to_numpy(dtype=np.float64) / 1e6
+                          * data['packet_length_mean'].to_numpy(dtype=np.float64))
+        self.update(
+            source=data['source_ip'].to_numpy() if 'source_ip' in columns else None,
+            destination=data['destination_ip'].to_numpy() if 'destination_ip' in columns else None,
+            port=data['destination_port'].to_numpy() if 'destination_port' in columns else None,
+            flow_bytes=flow_bytes,
+            now=now
+        )
+
+    def top(self, dimension, measure='flows', k=10, window=300.0, now=None):
+        """
+        Get the top keys of a dimension over a window.
+
+        Args:
+            dimension (str): 'source', 'destination' or 'port'
+            measure (str): 'flows' or 'bytes'
+            k (int): Keys returned
+            window (float): Window length, seconds
+            now (float, optional): End of the window (default the latest update)
+
+        Returns:
+            dict: Window, total and top list ({key, count, error, share})
+        """
+        if dimension not in DIMENSIONS or measure not in MEASURES:
+            raise ValueError(f"Unknown dimension or measure: {dimension}, {measure}")
+        with self.lock:
+            summary = self.trackers[(dimension, measure)].window(window, now)
+            keys, counts, errors = summary.top(k)
+            labels = self.labels[dimension]
+            total = summary.total
+            items = [{'key': labels.get(key, key), 'count': count, 'error': error,
+                      'share': count / total if total else 0.0}
+                     for key, count, error in zip(keys.tolist(), counts.tolist(), errors.tolist())]
+        return {'dimension': dimension, 'measure': measure, 'window_seconds': window, 'total': total, 'top': items}
+
+    def report(self, k=10, windows=None):
+        """
+        Get every top list for several windows.
+
+        Args:
+            k (int): Keys per list
+            windows (tuple, optional): Window lengths (default the snapshot windows)
+
+        Returns:
+            dict: {window: {dimension: {measure: top list}}}
+        """
+        return {
+            str(int(window)): {
+                dimension: {measure: self.top(dimension, measure, k, window)['top'] for measure in MEASURES}
+                for dimension in DIMENSIONS
+            }
+            for window in (windows or self.windows)
+        }
+
+    def maybe_snapshot(self):
+        """Store a snapshot if snapshot_seconds have passed since the last one."""
+        if self.db is None or not self.snapshot_seconds:
+            return
+        with self.lock:
+            due = time.monotonic() - self.last_snapshot >= self.snapshot_seconds
+            if due:
+                self.last_snapshot = time.monotonic()
+        if due:
+            self.snapshot()
+
+    def snapshot(self):
+        """
+        Store the top lists in the metrics table.
+
+        The metric value is the number of flows in the shortest window; the
+        details hold the component name and report().
+
+        Returns:
+            str: Metric ID, or None without a database
+        """
+        self.last_snapshot = time.monotonic()
+        if self.db is None:
+            return None
+        shortest = min(self.windows)
+        flows = max(self.top(dimension, 'flows', 0, shortest)['total'] for dimension in DIMENSIONS)
+        return self.db.add_metric('heavy_hitters', flows, {
+            'component': self.component,
+            'report': self.report(self.snapshot_k)
+        })
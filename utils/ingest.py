@@ -0,0 +1,479 @@
+"""
+Bulk flow ingestion for the intrusion detection system.
+Sensors post compressed batches of flow records to /api/ingest. The body is
+decompressed and parsed as a stream into fixed-size batches of whole lines,
+so memory stays bounded by the batch size whatever the size of the upload,
+and each batch is scored as soon as it has been parsed.
+
+Accepted bodies (Content-Type):
+    text/csv              header line, then one flow per line
+    application/x-ndjson  one JSON object per line keyed by feature name, or
+                          the compact form: a JSON array of column names on
+                          the first line, then one JSON array of values per line
+Accepted Content-Encoding: identity, gzip and zstd (requires the zstandard
+package); concatenated gzip members and zstd frames are allowed, and a
+compressed body must end on a complete one.
+"""
+
+import csv
+import hmac
+import io
+import json
+import logging
+import operator
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from .admission import SOURCE_IP_COLUMNS
+from .instrumentation import REGISTRY, timed
+from .prefilter import DESTINATION_IP_COLUMNS, PORT_COLUMNS
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPES = {
+    'text/csv': 'csv',
+    'application/x-ndjson': 'ndjson',
+    'application/ndjson': 'ndjson',
+    'application/jsonl': 'ndjson'
+}
+CONTENT_ENCODINGS = ('identity', 'gzip', 'x-gzip', 'zstd')
+
+# Rows scored together; a batch may run over by the lines of one read
+DEFAULT_BATCH_ROWS = 50000
+READ_SIZE = 1 << 20
+# Decompressed bytes handled at a time, so a highly compressed body cannot
+# expand into one huge piece
+MAX_CHUNK_BYTES = 1 << 20
+MAX_LINE_BYTES = 1 << 20
+
+# Row indexes of flagged flows listed per batch summary (all are stored as alerts)
+FLAGGED_LIMIT = 100
+
+# Kept next to the features when the body has them: prefilter rules,
+# admission control and the top talkers match on addresses and ports
+ENDPOINT_COLUMNS = SOURCE_IP_COLUMNS + DESTINATION_IP_COLUMNS + PORT_COLUMNS
+
+INGEST_ROWS = REGISTRY.counter('ids_ingest_rows_total', 'Flow records ingested by sensor', ('sensor',))
+INGEST_INTRUSIONS = REGISTRY.counter(
+    'ids_ingest_intrusions_total', 'Ingested flow records flagged as intrusions', ('sensor',)
+)
+
+class IngestError(ValueError):
+    """The uploaded body cannot be decoded or parsed."""
+
+class UnsupportedEncoding(IngestError):
+    """The Content-Encoding is unknown or its codec is not installed."""
+
+def parse_tokens(spec):
+    """
+    Parse sensor tokens from a "name:token,name:token" string.
+
+    Args:
+        spec (str): Token specification (e.g. the IDS_INGEST_TOKENS variable)
+
+    Returns:
+        dict: Sensor name by token
+    """
+    tokens = {}
+    for entry in (spec or '').split(','):
+        name, sep, token = entry.strip().partition(':')
+        if not sep or not name or not token:
+            if entry.strip():
+                logger.warning(f"Ignoring malformed ingest token entry for '{name}'")
+            continue
+        tokens[token] = name
+    return tokens
+
+def authenticate(authorization, tokens):
+    """
+    Get the sensor a "Bearer <token>" Authorization header belongs to.
+
+    Every token is compared in constant time, so the response time does not
+    reveal how much of a token was right.
+
+    Args:
+        authorization (str): Authorization header value
+        tokens (dict): Sensor name by token, as returned by parse_tokens
+
+    Returns:
+        str: Sensor name, or None if the token is missing or unknown
+    """
+    scheme, _, presented = (authorization or '').partition(' ')
+    if scheme.lower() != 'bearer' or not presented:
+        return None
+    presented = presented.strip().encode()
+    sensor = None
+    for token, name in tokens.items():
+        if hmac.compare_digest(presented, token.encode()):
+            sensor = name
+    return sensor
+
+class _Identity:
+    def decode(self, stream, read_size, max_length):
+        while True:
+            chunk = stream.read(min(read_size, max_length))
+            if not chunk:
+                return
+            yield chunk
+
+class _Gzip:
+    """
+    Incremental gzip decoder that also accepts concatenated members.
+
+    Output comes in pieces of at most max_length bytes however well the
+    body compresses, and a body cut short (a dropped connection, a client
+    killed mid-upload) is an error rather than the rows decoded so far.
+    """
+
+    def decode(self, stream, read_size, max_length):
+        decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        received = False
+        while True:
+            data = stream.read(read_size)
+            if not data:
+                break
+            received = True
+            while True:
+                if decoder.eof:
+                    if not data:
+                        break
+                    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                out = decoder.decompress(data, max_length)
+                if out:
+                    yield out
+                if decoder.eof:
+                    data = decoder.unused_data
+                else:
+                    data = decoder.unconsumed_tail
+                    # A full piece may leave output pending inside zlib
+                    if not data and len(out) < max_length:
+                        break
+        if received and not decoder.eof:
+            raise IngestError("Truncated gzip body")
+
+class _ZstdFrames:
+    """
+    Walks the frame and block headers of a zstd stream, so the end of the
+    body can be checked to fall on a frame boundary (the zstandard stream
+    reader stops silently inside a truncated frame).
+    """
+
+    def __init__(self):
+        self.state = 'magic'
+        self.need = 4
+        self.header = b''
+        self.skip = 0
+        self.checksum = False
+
+    def feed(self, data):
+        data = memoryview(data)
+        pos = 0
+        while pos < len(data):
+            if self.skip:
+                step = min(self.skip, len(data) - pos)
+                self.skip -= step
+                pos += step
+                continue
+            take = min(self.need - len(self.header), len(data) - pos)
+            self.header += bytes(data[pos:pos + take])
+            pos += take
+            if len(self.header) == self.need:
+                header, self.header = self.header, b''
+                self._parse(int.from_bytes(header, 'little'))
+
+    def _parse(self, value):
+        if self.state == 'magic':
+            if value == 0xFD2FB528:
+                self.state, self.need = 'descriptor', 1
+            elif 0x184D2A50 <= value <= 0x184D2A5F:
+                self.state, self.need = 'skippable', 4
+            else:
+                raise IngestError("Invalid compressed body: not a zstd frame")
+        elif self.state == 'skippable':
+            self.skip = value
+            self.state, self.need = 'magic', 4
+        elif self.state == 'descriptor':
+            single_segment = value >> 5 & 1
+            self.checksum = bool(value >> 2 & 1)
+            # Window descriptor, dictionary ID and frame content size
+            self.skip = (1 - single_segment) + (0, 1, 2, 4)[value & 3] + \
+                ((single_segment, 2, 4, 8)[value >> 6])
+            self.state, self.need = 'block', 3
+        else:
+            block_type, size = value >> 1 & 3, value >> 3
+            if block_type == 3:
+                raise IngestError("Invalid compressed body: reserved zstd block type")
+            # RLE blocks hold one byte
+            self.skip = 1 if block_type == 1 else size
+            if value & 1:
+                self.skip += 4 if self.checksum else 0
+                self.state, self.need = 'magic', 4
+
+    def complete(self):
+        return self.state == 'magic' and not self.header and not self.skip
+
+class _FrameCheckedReader:
+    """Body reader that passes the compressed bytes through a _ZstdFrames walker."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.frames = _ZstdFrames()
+        self.received = False
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        if data:
+            self.received = True
+            self.frames.feed(data)
+        return data
+
+class _Zstd:
+    """
+    Incremental zstd decoder over concatenated frames, with output in pieces
+    of at most max_length bytes; a truncated body is an error.
+    """
+
+    def __init__(self, decompressor):
+        self.decompressor = decompressor
+
+    def decode(self, stream, read_size, max_length):
+        source = _FrameCheckedReader(stream)
+        reader = self.decompressor.stream_reader(source, read_size=read_size, read_across_frames=True)
+        while True:
+            out = reader.read(max_length)
+            if not out:
+                break
+            yield out
+        if source.received and not source.frames.complete():
+            raise IngestError("Truncated zstd body")
+
+def get_decompressor(encoding):
+    """
+    Get an incremental decompressor for a Content-Encoding.
+
+    Args:
+        encoding (str): Content-Encoding header value (None for identity)
+
+    Returns:
+        object: Decompressor whose decode(stream, read_size, max_length)
+            generator yields the decompressed body in bounded pieces
+
+    Raises:
+        UnsupportedEncoding: If the encoding is unknown or zstandard is missing
+    """
+    encoding = (encoding or 'identity').strip().lower()
+    if encoding not in CONTENT_ENCODINGS:
+        raise UnsupportedEncoding(f"Unsupported Content-Encoding: {encoding}")
+    if encoding == 'identity':
+        return _Identity()
+    if encoding in ('gzip', 'x-gzip'):
+        return _Gzip()
+    try:
+        import zstandard
+    except ImportError:
+        raise UnsupportedEncoding("zstandard is required for zstd-compressed uploads")
+    return _Zstd(zstandard.ZstdDecompressor())
+
+def iter_decompressed(stream, decompressor, read_size=READ_SIZE, max_chunk_bytes=MAX_CHUNK_BYTES):
+    """
+    Read and decompress a body incrementally.
+
+    Args:
+        stream (file-like): Request body
+        decompressor (object): Decompressor returned by get_decompressor
+        read_size (int): Compressed bytes read at a time
+        max_chunk_bytes (int): Largest piece of decompressed data yielded,
+            whatever the compression ratio
+
+    Yields:
+        bytes: Decompressed data
+    """
+    try:
+        yield from decompressor.decode(stream, read_size, max_chunk_bytes)
+    except zlib.error as e:
+        raise IngestError(f"Invalid compressed body: {str(e)}")
+    except Exception as e:
+        # zstandard raises its own ZstdError
+        if type(e).__name__ == 'ZstdError':
+            raise IngestError(f"Invalid compressed body: {str(e)}")
+        raise
+
+def iter_line_batches(chunks, batch_rows=DEFAULT_BATCH_ROWS, max_line_bytes=MAX_LINE_BYTES):
+    """
+    Regroup decompressed data into batches of whole lines.
+
+    Args:
+        chunks (iterable): Decompressed data
+        batch_rows (int): Lines per batch (a batch may run over by the lines
+            of one chunk)
+        max_line_bytes (int): Longest line accepted
+
+    Yields:
+        bytes: Complete lines, each terminated by a newline
+    """
+    pending, pending_lines, tail = [], 0, b''
+    for chunk in chunks:
+        cut = chunk.rfind(b'\n')
+        if cut < 0:
+            tail += chunk
+            if len(tail) > max_line_bytes:
+                raise IngestError(f"Line longer than {max_line_bytes} bytes")
+            continue
+
+        if tail and len(tail) + chunk.find(b'\n') > max_line_bytes:
+            raise IngestError(f"Line longer than {max_line_bytes} bytes")
+        lines = tail + chunk[:cut + 1]
+        tail = chunk[cut + 1:]
+        pending.append(lines)
+        pending_lines += lines.count(b'\n')
+        if pending_lines >= batch_rows:
+            yield b''.join(pending)
+            pending, pending_lines = [], 0
+
+    if tail.strip():
+        pending.append(tail + b'\n')
+    if pending:
+        yield b''.join(pending)
+
+def _json_loads():
+    # orjson parses flow objects about twice as fast as the json module
+    try:
+        import orjson
+        return orjson.loads
+    except ImportError:
+        return json.loads
+
+def _split_header(batch):
+    cut = batch.find(b'\n')
+    return batch[:cut].strip(), batch[cut + 1:]
+
+def _check_columns(columns, selected_features):
+    missing = [feature for feature in selected_features if feature not in columns]
+    if missing:
+        raise IngestError(f"Missing feature: {missing[0]}")
+
+def _endpoint_columns(columns, selected_features):
+    return [column for column in ENDPOINT_COLUMNS if column in columns and column not in selected_features]
+
+def _read_delimited(lines, columns, selected_features):
+    """Parse comma-separated value lines with the C CSV parser."""
+    keep = list(selected_features) + _endpoint_columns(columns, selected_features)
+    data = pd.read_csv(
+        io.BytesIO(lines), header=None, names=columns, usecols=keep,
+        dtype=dict.fromkeys(selected_features, np.float64),
+        # Compact NDJSON arrays separate values with ', ' and quote strings
+        skipinitialspace=True
+    )
+    return data[keep]
+
+def iter_flow_batches(stream, fmt, selected_features, decompressor=None, batch_rows=DEFAULT_BATCH_ROWS,
+                      read_size=READ_SIZE):
+    """
+    Decompress and parse an uploaded body into batches of flow features.
+
+    Args:
+        stream (file-like): Request body
+        fmt (str): 'csv' or 'ndjson'
+        selected_features (list): Features the model needs
+        decompressor (object, optional): Decompressor returned by
+            get_decompressor (None for an uncompressed body)
+        batch_rows (int): Rows per batch
+        read_size (int): Compressed bytes read at a time
+
+    Yields:
+        pandas.DataFrame: Selected features of each batch, in float64, followed
+            by the address and port columns (ENDPOINT_COLUMNS) the body has
+
+    Raises:
+        IngestError: If the body cannot be decoded, a record is invalid or a
+            feature value is infinite or missing
+    """
+    chunks = iter_decompressed(stream, decompressor or _Identity(), read_size)
+    loads = _json_loads()
+    getter = operator.itemgetter(*selected_features)
+    columns = None
+    compact = False
+    rows = 0
+
+    for batch in iter_line_batches(chunks, batch_rows):
+        try:
+            with timed('parse') as stage:
+                if columns is None:
+                    header, batch = _split_header(batch)
+                    if fmt == 'csv':
+                        columns = next(csv.reader([header.decode()]))
+                        _check_columns(columns, selected_features)
+                    elif header.startswith(b'['):
+                        # Compact NDJSON: column names, then arrays of values
+                        columns = loads(header)
+                        _check_columns(columns, selected_features)
+                        compact = True
+                    else:
+                        # The first line is already a record
+                        columns = selected_features
+                        batch = header + b'\n' + batch
+                    if not batch.strip():
+                        continue
+
+                if fmt == 'csv':
+                    data = _read_delimited(batch, columns, selected_features)
+                elif compact:
+                    # Without the brackets each line is a CSV row (flow values are flat)
+                    data = _read_delimited(batch.translate(None, b'[]'), columns, selected_features)
+                else:
+                    records = loads(b'[' + b','.join(line for line in batch.split(b'\n') if line.strip()) + b']')
+                    values = np.array(list(map(getter, records)), dtype=np.float64)
+                    data = pd.DataFrame(values.reshape(-1, len(selected_features)), columns=selected_features)
+                    for column in _endpoint_columns(records[0] if records else (), selected_features):
+                        data[column] = [record.get(column) for record in records]
+                stage.rows = data.shape[0]
+            # The scaler refuses inf and NaN (CICIDS exports write 'Infinity' in the rate features)
+            finite = np.isfinite(data[selected_features].to_numpy()).all(axis=1)
+            if not finite.all():
+                raise IngestError(f"Infinite or missing feature value in row {rows + int(np.argmin(finite))}")
+        except IngestError:
+            raise
+        except KeyError as e:
+            raise IngestError(f"Missing feature in the batch starting at row {rows}: {e.args[0]}")
+        except (ValueError, TypeError) as e:
+            raise IngestError(f"Invalid records in the batch starting at row {rows}: {str(e)}")
+
+        if len(data):
+            rows += len(data)
+            yield data
+
+def batch_summary(batch, offset, results, predictions, flagged_limit=FLAGGED_LIMIT):
+    """
+    Summarize one scored batch for the ingest response.
+
+    Args:
+        batch (int): Batch number
+        offset (int): Index of the batch's first row in the upload
+        results (numpy.ndarray): Binary predictions
+        predictions (numpy.ndarray): Confidence scores
+        flagged_limit (int): Flagged row indexes listed at most
+
+    Returns:
+        dict: Row and intrusion counts, rows left unscored by degraded mode
+            (NaN confidence), the highest confidence and the first flagged
+            row indexes
+    """
+    flagged = np.flatnonzero(results)
+    scored = predictions[~np.isnan(predictions)]
+    return {
+        'batch': batch,
+        'offset': offset,
+        'rows': int(len(results)),
+        'intrusions': int(len(flagged)),
+        'skipped': int(len(predictions) - len(scored)),
+        'max_confidence': float(scored.max()) if len(scored) else None,
+        'flagged': (flagged[:flagged_limit] + offset).tolist(),
+        'flagged_truncated': bool(len(flagged) > flagged_limit)
+    }
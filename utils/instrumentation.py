@@ -0,0 +1,341 @@
+"""
+Lightweight instrumentation for the intrusion detection system.
+This module provides in-process counters, gauges and fixed-bucket
+histograms, a context-manager timer for pipeline stages, and rendering
+of everything in the Prometheus text exposition format.
+"""
+
+import bisect
+import logging
+import threading
+import time
+from threading import get_ident
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Default histogram buckets
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+BATCH_SIZE_BUCKETS = (1, 10, 100, 1000, 10000, 100000, 1000000, 10000000)
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+class _Metric:
+    """
+    Base class for a metric family with optional labels.
+    """
+
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children = {}
+
+    def labels(self, *values, **kwargs):
+        """
+        Get the child metric for a set of label values.
+
+        Returns:
+            The child metric
+        """
+        if kwargs:
+            values = tuple(kwargs[name] for name in self.labelnames)
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _default(self):
+        return self.labels(*())
+
+    def render(self):
+        """
+        Render the metric family in the Prometheus text format.
+
+        Returns:
+            list: Lines of text
+        """
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for key, child in sorted(self._children.items()):
+            lines.extend(child.render(self.name, self.labelnames, key))
+        return lines
+
+class _CounterChild:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def render(self, name, labelnames, key):
+        return [f'{name}{_format_labels(labelnames, key)} {_format_value(self.value)}']
+
+class _GaugeChild(_CounterChild):
+    def set(self, value):
+        self.value = value
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def render(self, name, labelnames, key):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += count
+            labels = _format_labels(labelnames, key, ('le', _format_value(float(bound))))
+            lines.append(f'{name}_bucket{labels} {cumulative}')
+        labels = _format_labels(labelnames, key)
+        lines.append(f'{name}_sum{labels} {_format_value(self.sum)}')
+        lines.append(f'{name}_count{labels} {self.count}')
+        return lines
+
+class Counter(_Metric):
+    """
+    Monotonically increasing counter.
+    """
+
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+class Gauge(_Metric):
+    """
+    Value that can go up and down.
+    """
+
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value):
+        self._default().set(value)
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+    def dec(self, amount=1):
+        self._default().dec(amount)
+
+class Histogram(_Metric):
+    """
+    Fixed-bucket histogram.
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(float(b) for b in sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+class Registry:
+    """
+    Collection of metric families rendered together by /metrics.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _get_or_create(self, cls, name, documentation, labelnames, **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(name)
+                if metric is None:
+                    metric = cls(name, documentation, labelnames, **kwargs)
+                    self._metrics[name] = metric
+        if not isinstance(metric, cls):
+            raise ValueError(f"Metric {name} already registered as {metric.kind}")
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self):
+        """
+        Render every registered metric in the Prometheus text format.
+
+        Returns:
+            str: Exposition text
+        """
+        lines = []
+        for name in sorted(self._metrics):
+            lines.extend(self._metrics[name].render())
+        return '\n'.join(lines) + '\n'
+
+# Process-wide registry used by the application
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'ids_stage_duration_seconds', 'Time spent in each detection pipeline stage', ('stage',)
+)
+STAGE_ROWS = REGISTRY.counter(
+    'ids_stage_rows_total', 'Rows processed by each detection pipeline stage', ('stage',)
+)
+STAGE_ROWS_PER_SECOND = REGISTRY.gauge(
+    'ids_stage_rows_per_second', 'Throughput of the most recent batch in each stage', ('stage',)
+)
+BATCH_ROWS = REGISTRY.histogram(
+    'ids_batch_size_rows', 'Rows per batch entering each stage', ('stage',), buckets=BATCH_SIZE_BUCKETS
+)
+QUEUE_DEPTH = REGISTRY.gauge(
+    'ids_queue_depth', 'Items waiting in each work queue', ('queue',)
+)
+
+# Active stages per thread, only maintained while a profiler asks for them
+_stage_tracking = False
+_stage_stacks = {}
+
+def set_stage_tracking(enabled):
+    """
+    Turn per-thread tracking of the active timed() stages on or off.
+
+    Args:
+        enabled (bool): Whether timed() should record active stages
+    """
+    global _stage_tracking
+    _stage_tracking = enabled
+    if not enabled:
+        _stage_stacks.clear()
+
+def current_stage(thread_id):
+    """
+    Get the innermost timed() stage active in a thread.
+
+    Args:
+        thread_id (int): Thread identifier
+
+    Returns:
+        str: Stage name, or None when no stage is active or tracking is off
+    """
+    stack = _stage_stacks.get(thread_id)
+    return stack[-1] if stack else None
+
+class timed:
+    """
+    Context manager timing one pipeline stage.
+
+    Usage:
+        with timed('scale', rows=len(X)):
+            X_scaled = scaler.transform(X)
+    """
+
+    __slots__ = ('stage', 'rows', 'start', 'tracked')
+
+    def __init__(self, stage, rows=None):
+        self.stage = stage
+        self.rows = rows
+        self.start = 0.0
+        self.tracked = False
+
+    def __enter__(self):
+        if _stage_tracking:
+            _stage_stacks.setdefault(get_ident(), []).append(self.stage)
+            self.tracked = True
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        if self.tracked:
+            stack = _stage_stacks.get(get_ident())
+            if stack:
+                stack.pop()
+        STAGE_SECONDS.labels(self.stage).observe(elapsed)
+        if self.rows is not None:
+            observe_rows(self.stage, self.rows, elapsed)
+        return False
+
+def observe_rows(stage, rows, elapsed=None):
+    """
+    Record a batch size (and throughput when the elapsed time is known).
+
+    Args:
+        stage (str): Stage name
+        rows (int): Rows in the batch
+        elapsed (float, optional): Seconds the stage took
+    """
+    STAGE_ROWS.labels(stage).inc(rows)
+    BATCH_ROWS.labels(stage).observe(rows)
+    if elapsed:
+        STAGE_ROWS_PER_SECOND.labels(stage).set(rows / elapsed)
+
+def set_queue_depth(queue, depth):
+    """
+    Record the current depth of a work queue.
+
+    Args:
+        queue (str): Queue name
+        depth (int): Items currently waiting
+    """
+    QUEUE_DEPTH.labels(queue).set(depth)
+
+def render_metrics():
+    """
+    Render the process-wide registry for the /metrics endpoint.
+
+    Returns:
+        str: Prometheus text exposition
+    """
+    return REGISTRY.render()
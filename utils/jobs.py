@@ -0,0 +1,332 @@
+"""
+Background analysis jobs for the intrusion detection system.
+Large uploads are scored by a small pool of worker threads instead of the
+HTTP worker that received them. Each job streams its file through a chunk
+scorer, records progress as it goes and appends its results to a compact
+binary file on disk, so clients can poll for progress and page through
+the results once the job is done.
+"""
+
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .instrumentation import REGISTRY, set_queue_depth
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# One record per scored row: 9 bytes instead of a JSON object
+RESULT_DTYPE = np.dtype([('is_intrusion', 'u1'), ('confidence', '<f8')])
+RESULTS_FILE = 'results.bin'
+INTRUSIONS_FILE = 'intrusions.bin'
+
+# Job workers run at a lower CPU priority than request threads (Linux only)
+JOB_NICENESS = 10
+
+FINISHED_STATES = ('completed', 'failed', 'cancelled')
+
+JOBS_TOTAL = REGISTRY.counter('ids_jobs_total', 'Background jobs by final state', ('state',))
+JOB_ROWS = REGISTRY.counter('ids_job_rows_total', 'Rows scored by background jobs')
+
+class JobQueueFull(Exception):
+    """
+    Raised when no more jobs can be accepted.
+    """
+
+class Job:
+    """
+    State of one background analysis job.
+    """
+
+    def __init__(self, job_id, owner, file_path, result_dir):
+        """
+        Initialize the job.
+
+        Args:
+            job_id (str): Job identifier
+            owner (str): User who submitted the job
+            file_path (str): Uploaded CSV file
+            result_dir (str): Directory the results are written to
+        """
+        self.id = job_id
+        self.owner = owner
+        self.file_path = file_path
+        self.result_dir = result_dir
+        self.state = 'queued'
+        self.rows = 0
+        self.intrusions = 0
+        self.error = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.cancel_event = threading.Event()
+
+    def progress(self):
+        """
+        Get the job's progress.
+
+        Returns:
+            dict: State, rows processed, intrusions so far and rows/sec
+        """
+        elapsed = None
+        if self.started is not None:
+            elapsed = (self.finished or time.time()) - self.started
+        return {
+            'job_id': self.id,
+            'state': self.state,
+            'rows': self.rows,
+            'intrusions': self.intrusions,
+            'safe': self.rows - self.intrusions,
+            'rows_per_second': self.rows / elapsed if elapsed else 0.0,
+            'elapsed_seconds': elapsed,
+            'submitted': self.submitted,
+            'error': self.error
+        }
+
+class JobManager:
+    """
+    Bounded pool of worker threads running analysis jobs.
+    """
+
+    def __init__(self, score_chunks, results_dir, max_workers=1, max_pending=8, retention_seconds=3600):
+        """
+        Initialize the job manager.
+
+        Args:
+            score_chunks (callable): Function taking a CSV path and yielding
+                (predictions, confidence_scores) chunks
+            results_dir (str): Directory holding one results directory per job
+            max_workers (int): Jobs scored at the same time
+            max_pending (int): Jobs queued or running before submissions are refused
+            retention_seconds (int): How long finished jobs and their results are kept
+        """
+        self.score_chunks = score_chunks
+        self.results_dir = results_dir
+        self.max_pending = max_pending
+        self.retention_seconds = retention_seconds
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='ids-job', initializer=_lower_priority
+        )
+        os.makedirs(results_dir, exist_ok=True)
+
+    def submit(self, file_path, owner):
+        """
+        Queue a CSV file for analysis. The manager owns the file from now on.
+
+        Args:
+            file_path (str): Uploaded CSV file
+            owner (str): User submitting the job
+
+        Returns:
+            Job: The queued job
+        """
+        self.prune()
+        with self.lock:
+            pending = sum(1 for job in self.jobs.values() if job.state not in FINISHED_STATES)
+            if pending >= self.max_pending:
+                raise JobQueueFull(f"{pending} jobs are already pending")
+
+            job_id = uuid.uuid4().hex
+            job = Job(job_id, owner, file_path, os.path.join(self.results_dir, job_id))
+            self.jobs[job_id] = job
+            self._update_queue_depth()
+
+        self.executor.submit(self._run, job)
+        logger.info(f"Job {job_id} queued for {owner}")
+        return job
+
+    def get(self, job_id):
+        """
+        Get a job by ID.
+
+        Args:
+            job_id (str): Job identifier
+
+        Returns:
+            Job: The job, or None when unknown
+        """
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def list_jobs(self, owner=None):
+        """
+        List jobs, newest first.
+
+        Args:
+            owner (str, optional): Only list this user's jobs
+
+        Returns:
+            list: Jobs
+        """
+        with self.lock:
+            jobs = [job for job in self.jobs.values() if owner is None or job.owner == owner]
+        return sorted(jobs, key=lambda job: job.submitted, reverse=True)
+
+    def cancel(self, job_id):
+        """
+        Cancel a queued or running job. Results written so far are kept.
+
+        Args:
+            job_id (str): Job identifier
+
+        Returns:
+            bool: Whether the job was still pending
+        """
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.state in FINISHED_STATES:
+                return False
+            job.cancel_event.set()
+            dequeued = job.state == 'queued'
+            if dequeued:
+                # Never started: finish it now rather than when a worker frees up
+                job.state = 'cancelled'
+                job.finished = time.time()
+                JOBS_TOTAL.labels(job.state).inc()
+                self._update_queue_depth()
+        if dequeued and os.path.exists(job.file_path):
+            os.remove(job.file_path)
+        logger.info(f"Job {job_id} cancellation requested")
+        return True
+
+    def results(self, job_id, offset=0, limit=1000, intrusions_only=False):
+        """
+        Read one page of a job's results from disk.
+
+        Pages can be read while the job is running; they cover the rows
+        scored so far.
+
+        Args:
+            job_id (str): Job identifier
+            offset (int): First row (or first intrusion) of the page
+            limit (int): Maximum number of results in the page
+            intrusions_only (bool): Page through intrusion rows only
+
+        Returns:
+            list: Results in the /predict-file shape
+        """
+        job = self.get(job_id)
+        if job is None:
+            raise KeyError(job_id)
+
+        results_path = os.path.join(job.result_dir, RESULTS_FILE)
+        if not os.path.exists(results_path):
+            return []
+        available = os.path.getsize(results_path) // RESULT_DTYPE.itemsize
+        records = np.memmap(results_path, dtype=RESULT_DTYPE, mode='r', shape=(available,)) if available else None
+
+        if intrusions_only:
+            intrusions_path = os.path.join(job.result_dir, INTRUSIONS_FILE)
+            count = os.path.getsize(intrusions_path) // 8 if os.path.exists(intrusions_path) else 0
+            if offset >= count:
+                return []
+            indices = np.fromfile(intrusions_path, dtype='<i8', count=min(limit, count - offset), offset=offset * 8)
+            indices = indices[indices < available]
+        else:
+            indices = np.arange(offset, min(offset + limit, available))
+
+        if len(indices) == 0:
+            return []
+        page = records[indices]
+        return [{'index': i, 'is_intrusion': bool(flag), 'confidence': c}
+                for i, flag, c in zip(indices.tolist(), page['is_intrusion'].tolist(), page['confidence'].tolist())]
+
+    def prune(self):
+        """
+        Forget finished jobs older than the retention period and delete their results.
+        """
+        cutoff = time.time() - self.retention_seconds
+        with self.lock:
+            expired = [job for job in self.jobs.values()
+                       if job.state in FINISHED_STATES and job.finished is not None and job.finished < cutoff]
+            for job in expired:
+                del self.jobs[job.id]
+        for job in expired:
+            shutil.rmtree(job.result_dir, ignore_errors=True)
+
+    def shutdown(self):
+        """
+        Cancel all pending jobs and stop the workers.
+        """
+        for job in self.list_jobs():
+            self.cancel(job.id)
+        self.executor.shutdown(wait=True)
+
+    def _update_queue_depth(self):
+        set_queue_depth('jobs', sum(1 for job in self.jobs.values() if job.state == 'queued'))
+
+    def _run(self, job):
+        """
+        Score a job's file, appending results to disk chunk by chunk.
+        """
+        with self.lock:
+            if job.state != 'queued':
+                # Cancelled while waiting for a worker
+                return
+            job.state = 'running'
+            job.started = time.time()
+            self._update_queue_depth()
+
+        state = 'failed'
+        try:
+            os.makedirs(job.result_dir, exist_ok=True)
+            with open(os.path.join(job.result_dir, RESULTS_FILE), 'wb') as results_file, \
+                    open(os.path.join(job.result_dir, INTRUSIONS_FILE), 'wb') as intrusions_file:
+                for predictions, confidence_scores in self.score_chunks(job.file_path):
+                    records = np.empty(len(predictions), dtype=RESULT_DTYPE)
+                    records['is_intrusion'] = predictions
+                    records['confidence'] = confidence_scores
+                    hits = np.flatnonzero(predictions).astype('<i8') + job.rows
+
+                    # Intrusion indices only point at rows already on disk
+                    results_file.write(records.tobytes())
+                    results_file.flush()
+                    intrusions_file.write(hits.tobytes())
+                    intrusions_file.flush()
+
+                    job.rows += len(predictions)
+                    job.intrusions += len(hits)
+                    JOB_ROWS.inc(len(predictions))
+
+                    if job.cancel_event.is_set():
+                        state = 'cancelled'
+                        break
+                else:
+                    state = 'completed'
+            logger.info(f"Job {job.id} {state}: {job.rows} rows, {job.intrusions} intrusions")
+        except Exception as e:
+            state = 'failed'
+            job.error = str(e)
+            logger.error(f"Error running job {job.id}: {str(e)}")
+        finally:
+            # State and finish time change together, so prune() never sees a
+            # finished job without its finish time
+            with self.lock:
+                job.state = state
+                job.finished = time.time()
+                self._update_queue_depth()
+            JOBS_TOTAL.labels(job.state).inc()
+            if os.path.exists(job.file_path):
+                os.remove(job.file_path)
+
+def _lower_priority():
+    """
+    Lower the CPU priority of the calling worker thread where supported.
+    """
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), JOB_NICENESS)
+    except (AttributeError, OSError):
+        pass
@@ -0,0 +1,632 @@
+"""
+NetFlow v5/v9 and IPFIX decoding for the intrusion detection system.
+Export packets are decoded into numpy record arrays with one canonical
+layout (FLOW_DTYPE) whatever the version: v5 records and template-described
+v9/IPFIX data records are read with np.frombuffer over big-endian dtypes,
+so a packet costs a few numpy calls rather than a Python loop per field.
+Templates are cached per exporter, observation domain and template ID.
+
+Flow records only carry per-flow counters, so flow_features maps them onto
+the model's selected_features: some features are read directly, some are
+derived from the counters, and the per-packet statistics NetFlow does not
+export are returned as NaN and reported as unavailable. Encoders for the
+three formats are included for replay and load testing.
+"""
+
+import ipaddress
+import logging
+import struct
+import time
+
+import numpy as np
+import pandas as pd
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Canonical flow record; counters unknown to the exporter are NaN
+FLOW_DTYPE = np.dtype([
+    ('src_addr', 'V16'), ('dst_addr', 'V16'), ('ip_version', 'u1'),
+    ('src_port', 'u2'), ('dst_port', 'u2'), ('protocol', 'u1'), ('tcp_flags', 'u1'),
+    ('packets', 'f8'), ('bytes', 'f8'), ('rev_packets', 'f8'), ('rev_bytes', 'f8'),
+    ('start_ms', 'f8'), ('end_ms', 'f8'), ('min_length', 'f8'), ('max_length', 'f8')
+])
+
+V5_HEADER = struct.Struct('>HHIIIIBBH')
+V5_RECORD = np.dtype([
+    ('src_addr', '>u4'), ('dst_addr', '>u4'), ('next_hop', '>u4'), ('input', '>u2'), ('output', '>u2'),
+    ('packets', '>u4'), ('bytes', '>u4'), ('first', '>u4'), ('last', '>u4'),
+    ('src_port', '>u2'), ('dst_port', '>u2'), ('pad1', 'u1'), ('tcp_flags', 'u1'), ('protocol', 'u1'),
+    ('tos', 'u1'), ('src_as', '>u2'), ('dst_as', '>u2'), ('src_mask', 'u1'), ('dst_mask', 'u1'), ('pad2', '>u2')
+])
+V5_MAX_RECORDS = 30
+V9_HEADER = struct.Struct('>HHIIII')
+IPFIX_HEADER = struct.Struct('>HHIII')
+SET_HEADER = struct.Struct('>HH')
+
+# Information elements (the v9 field types share the IPFIX numbers)
+IE_OCTETS = 1
+IE_PACKETS = 2
+IE_PROTOCOL = 4
+IE_TCP_FLAGS = 6
+IE_SRC_PORT = 7
+IE_SRC_IPV4 = 8
+IE_DST_PORT = 11
+IE_DST_IPV4 = 12
+IE_END_UPTIME = 21
+IE_START_UPTIME = 22
+IE_MIN_LENGTH = 25
+IE_MAX_LENGTH = 26
+IE_SRC_IPV6 = 27
+IE_DST_IPV6 = 28
+IE_OCTETS_TOTAL = 85
+IE_PACKETS_TOTAL = 86
+IE_START_SECONDS = 150
+IE_END_SECONDS = 151
+IE_START_MS = 152
+IE_END_MS = 153
+VARIABLE_LENGTH = 65535
+REVERSE_PEN = 29305  # RFC 5103 biflow reverse elements
+
+# Canonical field <- information elements, first present wins
+# (enterprise 0 unless given as (enterprise, element))
+FIELD_ELEMENTS = {
+    'src_port': (IE_SRC_PORT,),
+    'dst_port': (IE_DST_PORT,),
+    'protocol': (IE_PROTOCOL,),
+    'tcp_flags': (IE_TCP_FLAGS,),
+    'packets': (IE_PACKETS, IE_PACKETS_TOTAL),
+    'bytes': (IE_OCTETS, IE_OCTETS_TOTAL),
+    'rev_packets': ((REVERSE_PEN, IE_PACKETS), (REVERSE_PEN, IE_PACKETS_TOTAL)),
+    'rev_bytes': ((REVERSE_PEN, IE_OCTETS), (REVERSE_PEN, IE_OCTETS_TOTAL)),
+    'min_length': (IE_MIN_LENGTH,),
+    'max_length': (IE_MAX_LENGTH,)
+}
+# (start, end, milliseconds per unit)
+TIME_ELEMENTS = ((IE_START_MS, IE_END_MS, 1), (IE_START_UPTIME, IE_END_UPTIME, 1), (IE_START_SECONDS, IE_END_SECONDS, 1000))
+
+class NetflowError(ValueError):
+    """The packet is not a valid NetFlow v5/v9 or IPFIX export packet."""
+
+class Template:
+    """
+    A v9/IPFIX data template compiled to a numpy record dtype.
+    """
+
+    def __init__(self, template_id, fields):
+        """
+        Args:
+            template_id (int): Template ID
+            fields (list): (enterprise, element, length) per field
+        """
+        self.template_id = template_id
+        self.fields = fields
+        self.variable = any(length == VARIABLE_LENGTH for _, _, length in fields)
+        self.record_length = sum(length for _, _, length in fields if length != VARIABLE_LENGTH)
+        self.names = {}
+        formats = []
+        for index, (enterprise, element, length) in enumerate(fields):
+            name = f'f{index}'
+            self.names.setdefault((enterprise, element), (name, length))
+            formats.append((name, f'>u{length}' if length in (1, 2, 4, 8) else f'V{length}'))
+        self.dtype = None if self.variable else np.dtype(formats)
+        # Records with variable-length fields are re-packed without them
+        # (no mapped element is variable-length)
+        self.fixed = Template(template_id, [field for field in fields if field[2] != VARIABLE_LENGTH]) \
+            if self.variable else self
+
+    def field(self, key):
+        if isinstance(key, int):
+            key = (0, key)
+        return self.names.get(key)
+
+def _uint(column, length):
+    """Integer values of a fixed-length field (reduced-size encodings included)."""
+    if length in (1, 2, 4, 8):
+        return column.astype(np.float64)
+    raw = np.frombuffer(column.tobytes(), dtype=np.uint8).reshape(-1, length).astype(np.float64)
+    return raw @ (256.0 ** np.arange(length - 1, -1, -1))
+
+def _pack_addresses(column, length):
+    """16-byte address values from 4-byte (IPv4) or 16-byte (IPv6) fields."""
+    raw = np.zeros((len(column), 16), dtype=np.uint8)
+    raw[:, :length] = np.frombuffer(column.tobytes(), dtype=np.uint8).reshape(-1, length)
+    return raw.view('V16').ravel()
+
+def _address_bytes(column):
+    return np.ascontiguousarray(column).view(np.uint8).reshape(-1, 16)
+
+class NetflowDecoder:
+    """
+    Decodes NetFlow v5, v9 and IPFIX packets into FLOW_DTYPE records.
+    """
+
+    def __init__(self):
+        self.templates = {}
+        self.options_templates = set()
+        self.stats = {'packets': 0, 'records': 0, 'templates': 0, 'missing_template': 0, 'errors': 0}
+
+    def decode(self, data, exporter=None):
+        """
+        Decode one export packet.
+
+        Args:
+            data (bytes): UDP payload
+            exporter (str, optional): Exporter address (templates are
+                cached per exporter)
+
+        Returns:
+            numpy.ndarray: FLOW_DTYPE records (data sets whose template has
+                not been received yet are dropped and counted)
+        """
+        try:
+            if len(data) < 4:
+                raise NetflowError("Packet too short")
+            version = int.from_bytes(data[:2], 'big')
+            if version == 5:
+                records = self._decode_v5(data)
+            elif version == 9:
+                records = self._decode_v9(data, exporter)
+            elif version == 10:
+                records = self._decode_ipfix(data, exporter)
+            else:
+                raise NetflowError(f"Unsupported NetFlow version: {version}")
+        except (NetflowError, struct.error, ValueError) as e:
+            self.stats['errors'] += 1
+            raise NetflowError(str(e))
+        self.stats['packets'] += 1
+        self.stats['records'] += len(records)
+        return records
+
+    def _decode_v5(self, data):
+        version, count, uptime, secs, nsecs, _, _, _, _ = V5_HEADER.unpack_from(data)
+        if count > V5_MAX_RECORDS or len(data) < V5_HEADER.size + count * V5_RECORD.itemsize:
+            raise NetflowError(f"Truncated v5 packet ({count} records, {len(data)} bytes)")
+        raw = np.frombuffer(data, dtype=V5_RECORD, count=count, offset=V5_HEADER.size)
+
+        records = np.zeros(count, dtype=FLOW_DTYPE)
+        records['src_addr'] = _pack_addresses(raw['src_addr'].astype('>u4'), 4)
+        records['dst_addr'] = _pack_addresses(raw['dst_addr'].astype('>u4'), 4)
+        records['ip_version'] = 4
+        for name in ('src_port', 'dst_port', 'protocol', 'tcp_flags', 'packets', 'bytes'):
+            records[name] = raw[name]
+        # First/last are in router uptime; rebase them on the export time
+        base = secs * 1000.0 + nsecs / 1e6 - uptime
+        records['start_ms'] = base + raw['first']
+        records['end_ms'] = base + raw['last']
+        for name in ('rev_packets', 'rev_bytes', 'min_length', 'max_length'):
+            records[name] = np.nan
+        return records
+
+    def _decode_v9(self, data, exporter):
+        version, count, uptime, secs, _, source_id = V9_HEADER.unpack_from(data)
+        return self._decode_sets(data, V9_HEADER.size, len(data), (exporter, 9, source_id), ipfix=False)
+
+    def _decode_ipfix(self, data, exporter):
+        version, length, export_time, _, domain = IPFIX_HEADER.unpack_from(data)
+        if length > len(data):
+            raise NetflowError(f"Truncated IPFIX message ({len(data)} of {length} bytes)")
+        return self._decode_sets(data, IPFIX_HEADER.size, length, (exporter, 10, domain), ipfix=True)
+
+    def _decode_sets(self, data, offset, end, domain, ipfix):
+        template_set, options_set = (2, 3) if ipfix else (0, 1)
+        parts = []
+        while offset + SET_HEADER.size <= end:
+            set_id, length = SET_HEADER.unpack_from(data, offset)
+            if length < SET_HEADER.size or offset + length > end:
+                raise NetflowError(f"Invalid set length {length} at offset {offset}")
+            body = data[offset + SET_HEADER.size:offset + length]
+            if set_id == template_set:
+                self._read_templates(body, domain, ipfix)
+            elif set_id == options_set:
+                self._read_options_templates(body, domain, ipfix)
+            elif set_id >= 256:
+                records = self._read_data(body, domain + (set_id,))
+                if records is not None:
+                    parts.append(records)
+            offset += length
+        if not parts:
+            return np.zeros(0, dtype=FLOW_DTYPE)
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def _field_specs(self, body, offset, count, ipfix):
+        fields = []
+        for _ in range(count):
+            element, length = SET_HEADER.unpack_from(body, offset)
+            offset += 4
+            enterprise = 0
+            if ipfix and element & 0x8000:
+                enterprise = int.from_bytes(body[offset:offset + 4], 'big')
+                element &= 0x7FFF
+                offset += 4
+            fields.append((enterprise, element, length))
+        return fields, offset
+
+    def _read_templates(self, body, domain, ipfix):
+        offset = 0
+        while offset + 4 <= len(body):
+            template_id, count = SET_HEADER.unpack_from(body, offset)
+            if template_id < 256:
+                break  # padding
+            fields, offset = self._field_specs(body, offset + 4, count, ipfix)
+            self.templates[domain + (template_id,)] = Template(template_id, fields)
+            self.options_templates.discard(domain + (template_id,))
+            self.stats['templates'] += 1
+
+    def _read_options_templates(self, body, domain, ipfix):
+        # Options data (sampling rates, interface tables) is not flow data:
+        # remember the IDs so their sets are skipped, not counted as missing
+        offset = 0
+        while offset + 6 <= len(body):
+            if ipfix:
+                template_id, count, _ = struct.unpack_from('>HHH', body, offset)
+                if template_id < 256:
+                    break
+                _, offset = self._field_specs(body, offset + 6, count, ipfix)
+            else:
+                template_id, scope_length, option_length = struct.unpack_from('>HHH', body, offset)
+                if template_id < 256:
+                    break
+                offset += 6 + scope_length + option_length
+            self.templates.pop(domain + (template_id,), None)
+            self.options_templates.add(domain + (template_id,))
+
+    def _read_data(self, body, key):
+        template = self.templates.get(key)
+        if template is None:
+            if key not in self.options_templates:
+                self.stats['missing_template'] += 1
+            return None
+        if template.variable:
+            raw = self._read_variable(body, template)
+        else:
+            count = len(body) // template.record_length if template.record_length else 0
+            raw = np.frombuffer(body, dtype=template.dtype, count=count)
+        return self._canonical(raw, template.fixed)
+
+    def _read_variable(self, body, template):
+        """Parse records with variable-length fields one by one, dropping those fields."""
+        rows = []
+        offset = 0
+        # Each variable-length value takes at least its 1-byte length prefix
+        minimum = template.record_length + sum(1 for _, _, length in template.fields if length == VARIABLE_LENGTH)
+        while offset + minimum <= len(body):
+            for _, _, length in template.fields:
+                if length == VARIABLE_LENGTH:
+                    length = body[offset]
+                    offset += 1
+                    if length == 255:
+                        length = int.from_bytes(body[offset:offset + 2], 'big')
+                        offset += 2
+                    offset += length
+                else:
+                    rows.append(body[offset:offset + length])
+                    offset += length
+            if offset > len(body):
+                raise NetflowError("Truncated variable-length record")
+        return np.frombuffer(b''.join(rows), dtype=template.fixed.dtype)
+
+    def _canonical(self, raw, template):
+        records = np.zeros(len(raw), dtype=FLOW_DTYPE)
+        for name, elements in FIELD_ELEMENTS.items():
+            for element in elements:
+                field = template.field(element)
+                if field is not None:
+                    records[name] = _uint(raw[field[0]], field[1])
+                    break
+            else:
+                if FLOW_DTYPE[name].kind == 'f':
+                    records[name] = np.nan
+
+        for src, dst, version in ((IE_SRC_IPV4, IE_DST_IPV4, 4), (IE_SRC_IPV6, IE_DST_IPV6, 6)):
+            src_field, dst_field = template.field(src), template.field(dst)
+            if src_field is not None and dst_field is not None:
+                records['src_addr'] = _pack_addresses(raw[src_field[0]], src_field[1])
+                records['dst_addr'] = _pack_addresses(raw[dst_field[0]], dst_field[1])
+                records['ip_version'] = version
+                break
+
+        records['start_ms'] = records['end_ms'] = time.time() * 1000.0
+        for start, end, scale in TIME_ELEMENTS:
+            start_field, end_field = template.field(start), template.field(end)
+            if start_field is not None and end_field is not None:
+                records['start_ms'] = _uint(raw[start_field[0]], start_field[1]) * scale
+                records['end_ms'] = _uint(raw[end_field[0]], end_field[1]) * scale
+                break
+        return records
+
+def format_addresses(records):
+    """
+    Format the source and destination addresses of flow records.
+
+    Args:
+        records (numpy.ndarray): FLOW_DTYPE records
+
+    Returns:
+        tuple: (source addresses, destination addresses) as lists of strings
+    """
+    result = []
+    for name in ('src_addr', 'dst_addr'):
+        raw = _address_bytes(records[name])
+        result.append([
+            str(ipaddress.IPv4Address(bytes(row[:4])) if version == 4 else ipaddress.IPv6Address(bytes(row)))
+            for row, version in zip(raw, records['ip_version'].tolist())
+        ])
+    return tuple(result)
+
+# How each selected feature is obtained from flow records:
+# 'exported' (read directly), 'derived' (computed from the counters),
+# 'biflow' (needs RFC 5103 reverse counters), 'estimated' (approximated by
+# the mean packet length unless min/max lengths are exported)
+FEATURE_SOURCES = {
+    'destination_port': 'exported',
+    'flow_duration': 'exported',
+    'fwd_packet_length_mean': 'derived',
+    'fwd_packet_length_max': 'estimated',
+    'fwd_packet_length_min': 'estimated',
+    'bwd_packet_length_max': 'biflow',
+    'bwd_packet_length_min': 'biflow',
+    'flow_packets/s': 'derived',
+    'flow_iat_mean': 'derived',
+    'fwd_iat_mean': 'derived',
+    'fwd_psh_flags': 'derived',
+    'bwd_packets/s': 'biflow',
+    'min_packet_length': 'estimated',
+    'max_packet_length': 'estimated',
+    'packet_length_mean': 'derived',
+    'fin_flag_count': 'derived',
+    'psh_flag_count': 'derived',
+    'ack_flag_count': 'derived',
+    'urg_flag_count': 'derived',
+    'down/up_ratio': 'biflow'
+}
+
+def feature_availability(selected_features, biflow=False):
+    """
+    Report how each selected feature is obtained from flow records.
+
+    Args:
+        selected_features (list): Features the model needs
+        biflow (bool): Whether the exporter sends reverse (backward) counters
+
+    Returns:
+        dict: Feature name -> 'exported', 'derived', 'estimated', 'biflow'
+            or 'unavailable' (per-packet statistics NetFlow does not carry;
+            biflow features are unavailable without reverse counters)
+    """
+    availability = {}
+    for feature in selected_features:
+        source = FEATURE_SOURCES.get(feature, 'unavailable')
+        if source == 'biflow' and not biflow:
+            source = 'unavailable'
+        availability[feature] = source
+    return availability
+
+def flow_features(records, selected_features):
+    """
+    Map flow records onto the model's selected features.
+
+    Args:
+        records (numpy.ndarray): FLOW_DTYPE records
+        selected_features (list): Features the model needs
+
+    Returns:
+        pandas.DataFrame: One row per record; features flow records cannot
+            provide (see feature_availability) are NaN
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fwd_packets = records['packets']
+        fwd_bytes = records['bytes']
+        bwd_packets = records['rev_packets']
+        bwd_bytes = records['rev_bytes']
+        total_packets = fwd_packets + np.nan_to_num(bwd_packets)
+        total_bytes = fwd_bytes + np.nan_to_num(bwd_bytes)
+
+        # Microseconds, as in CICFlowMeter; rates over at least 1 us
+        duration = np.maximum(records['end_ms'] - records['start_ms'], 0) * 1000.0
+        seconds = np.maximum(duration, 1.0) / 1e6
+        fwd_mean = np.where(fwd_packets > 0, fwd_bytes / fwd_packets, 0.0)
+        bwd_mean = np.where(bwd_packets > 0, bwd_bytes / bwd_packets, np.where(np.isnan(bwd_packets), np.nan, 0.0))
+        min_length = np.where(np.isnan(records['min_length']), fwd_mean, records['min_length'])
+        max_length = np.where(np.isnan(records['max_length']), fwd_mean, records['max_length'])
+        flags = records['tcp_flags']
+
+        columns = {
+            'destination_port': records['dst_port'].astype(np.float64),
+            'flow_duration': duration,
+            'fwd_packet_length_mean': fwd_mean,
+            'fwd_packet_length_max': max_length,
+            'fwd_packet_length_min': min_length,
+            'bwd_packet_length_max': bwd_mean,
+            'bwd_packet_length_min': bwd_mean,
+            'flow_packets/s': total_packets / seconds,
+            'flow_iat_mean': np.where(total_packets > 1, duration / (total_packets - 1), 0.0),
+            'fwd_iat_mean': np.where(fwd_packets > 1, duration / (fwd_packets - 1), 0.0),
+            'fwd_psh_flags': ((flags & 0x08) > 0).astype(np.float64),
+            'bwd_packets/s': bwd_packets / seconds,
+            'min_packet_length': min_length,
+            'max_packet_length': max_length,
+            'packet_length_mean': np.where(total_packets > 0, total_bytes / total_packets, 0.0),
+            'fin_flag_count': ((flags & 0x01) > 0).astype(np.float64),
+            'psh_flag_count': ((flags & 0x08) > 0).astype(np.float64),
+            'ack_flag_count': ((flags & 0x10) > 0).astype(np.float64),
+            'urg_flag_count': ((flags & 0x20) > 0).astype(np.float64),
+            'down/up_ratio': np.where(fwd_packets > 0, bwd_packets / fwd_packets, 0.0)
+        }
+    nan = np.full(len(records), np.nan)
+    return pd.DataFrame({feature: columns.get(feature, nan) for feature in selected_features})
+
+def fill_unavailable(features, scaler):
+    """
+    Replace unavailable (NaN) features by the scaler's mean, so they scale
+    to 0 and leave the decision to the features that are known.
+
+    Args:
+        features (pandas.DataFrame): Selected features from flow_features
+        scaler (StandardScaler): Scaler for feature normalization
+
+    Returns:
+        pandas.DataFrame: Features without NaN
+    """
+    return features.fillna(dict(zip(features.columns, scaler.mean_)))
+
+def generate_flow_records(num_flows, attack_share=0.01, seed=None, end_ms=None):
+    """
+    Generate IPv4 flow records for replay and load testing.
+
+    Benign flows go to common service ports and last up to a few seconds;
+    attack flows are port-scan like: one or two small packets with SYN set
+    to a random low port from a handful of sources.
+
+    Args:
+        num_flows (int): Number of records
+        attack_share (float): Share of attack records
+        seed (int, optional): Random seed
+        end_ms (float, optional): Latest flow end, epoch milliseconds (default now)
+
+    Returns:
+        tuple: (FLOW_DTYPE records, numpy.ndarray of 0/1 labels)
+    """
+    rng = np.random.default_rng(seed)
+    labels = (rng.random(num_flows) < attack_share).astype(int)
+    attack = labels == 1
+    records = np.zeros(num_flows, dtype=FLOW_DTYPE)
+    records['ip_version'] = 4
+
+    src = rng.integers(0x0A000001, 0x0A00FFFF, num_flows, dtype=np.uint32)
+    src[attack] = rng.integers(0xC0A86401, 0xC0A86410, int(attack.sum()), dtype=np.uint32)
+    dst = rng.integers(0xC0A80001, 0xC0A800FF, num_flows, dtype=np.uint32)
+    records['src_addr'] = _pack_addresses(src.astype('>u4'), 4)
+    records['dst_addr'] = _pack_addresses(dst.astype('>u4'), 4)
+
+    records['src_port'] = rng.integers(1024, 65536, num_flows)
+    records['dst_port'] = np.where(attack, rng.integers(1, 1024, num_flows),
+                                   rng.choice([80, 443, 53, 22, 8080, 3306], num_flows))
+    records['protocol'] = np.where(records['dst_port'] == 53, 17, 6)
+    packets = np.where(attack, rng.integers(1, 3, num_flows), rng.integers(2, 200, num_flows)).astype(np.float64)
+    records['packets'] = packets
+    records['bytes'] = packets * np.where(attack, 44, rng.integers(60, 1400, num_flows))
+    records['tcp_flags'] = np.where(attack, 0x02, 0x1B) * (records['protocol'] == 6)
+    duration = np.where(attack, rng.integers(0, 5, num_flows), rng.integers(10, 5000, num_flows))
+    records['end_ms'] = (time.time() * 1000.0 if end_ms is None else end_ms) - rng.integers(0, 1000, num_flows)
+    records['start_ms'] = records['end_ms'] - duration
+    for name in ('rev_packets', 'rev_bytes', 'min_length', 'max_length'):
+        records[name] = np.nan
+    return records, labels
+
+# Encoders, used by the replay tool and benchmarks to synthesize exports
+
+def _v4_addresses(records):
+    """Source and destination IPv4 addresses as big-endian integers."""
+    return tuple(np.ascontiguousarray(_address_bytes(records[name])[:, :4]).view('>u4').ravel()
+                 for name in ('src_addr', 'dst_addr'))
+
+def encode_v5(records, uptime_ms=3600000, sequence=0):
+    """
+    Encode IPv4 flow records as NetFlow v5 packets.
+
+    Args:
+        records (numpy.ndarray): FLOW_DTYPE records
+        uptime_ms (int): Router uptime at export
+        sequence (int): Flow sequence number of the first record
+
+    Returns:
+        list: Packets (bytes) of at most 30 records each
+    """
+    packets = []
+    for start in range(0, len(records), V5_MAX_RECORDS):
+        chunk = records[start:start + V5_MAX_RECORDS]
+        export_ms = float(np.nanmax(chunk['end_ms']))
+        raw = np.zeros(len(chunk), dtype=V5_RECORD)
+        raw['src_addr'], raw['dst_addr'] = _v4_addresses(chunk)
+        for name in ('src_port', 'dst_port', 'protocol', 'tcp_flags'):
+            raw[name] = chunk[name]
+        raw['packets'] = np.nan_to_num(chunk['packets'])
+        raw['bytes'] = np.nan_to_num(chunk['bytes'])
+        raw['first'] = np.clip(uptime_ms - (export_ms - chunk['start_ms']), 0, None)
+        raw['last'] = np.clip(uptime_ms - (export_ms - chunk['end_ms']), 0, None)
+        header = V5_HEADER.pack(5, len(chunk), uptime_ms, int(export_ms // 1000),
+                                int(export_ms % 1000) * 1000000, sequence + start, 0, 0, 0)
+        packets.append(header + raw.tobytes())
+    return packets
+
+# Template used by the v9/IPFIX encoders: (element, length)
+EXPORT_TEMPLATE = (
+    (IE_SRC_IPV4, 4), (IE_DST_IPV4, 4), (IE_SRC_PORT, 2), (IE_DST_PORT, 2), (IE_PROTOCOL, 1),
+    (IE_TCP_FLAGS, 1), (IE_PACKETS, 4), (IE_OCTETS, 8), (IE_MIN_LENGTH, 2), (IE_MAX_LENGTH, 2),
+    (IE_START_MS, 8), (IE_END_MS, 8)
+)
+EXPORT_TEMPLATE_ID = 256
+
+def _template_records(records):
+    template = Template(EXPORT_TEMPLATE_ID, [(0, element, length) for element, length in EXPORT_TEMPLATE])
+    raw = np.zeros(len(records), dtype=template.dtype)
+    names = {element: template.field(element)[0] for element, _ in EXPORT_TEMPLATE}
+    raw[names[IE_SRC_IPV4]], raw[names[IE_DST_IPV4]] = _v4_addresses(records)
+    for element, name in ((IE_SRC_PORT, 'src_port'), (IE_DST_PORT, 'dst_port'), (IE_PROTOCOL, 'protocol'),
+                          (IE_TCP_FLAGS, 'tcp_flags'), (IE_PACKETS, 'packets'), (IE_OCTETS, 'bytes'),
+                          (IE_START_MS, 'start_ms'), (IE_END_MS, 'end_ms')):
+        raw[names[element]] = np.nan_to_num(records[name])
+    mean_length = np.nan_to_num(records['bytes'] / np.maximum(records['packets'], 1))
+    for element, name in ((IE_MIN_LENGTH, 'min_length'), (IE_MAX_LENGTH, 'max_length')):
+        raw[names[element]] = np.where(np.isnan(records[name]), mean_length, records[name])
+    return raw
+
+def _encode_sets(records, header_fn, template_set_id, records_per_packet, template_every):
+    template_body = struct.pack('>HH', EXPORT_TEMPLATE_ID, len(EXPORT_TEMPLATE)) + b''.join(
+        struct.pack('>HH', element, length) for element, length in EXPORT_TEMPLATE
+    )
+    template_set = SET_HEADER.pack(template_set_id, SET_HEADER.size + len(template_body)) + template_body
+    raw = _template_records(records)
+
+    packets = []
+    for number, start in enumerate(range(0, len(records), records_per_packet)):
+        body = raw[start:start + records_per_packet].tobytes()
+        padding = (-len(body)) % 4
+        data_set = SET_HEADER.pack(EXPORT_TEMPLATE_ID, SET_HEADER.size + len(body) + padding) + body + b'\0' * padding
+        sets = (template_set if number % template_every == 0 else b'') + data_set
+        count = min(records_per_packet, len(records) - start) + (1 if number % template_every == 0 else 0)
+        export_ms = float(np.nanmax(records['end_ms'][start:start + records_per_packet]))
+        packets.append(header_fn(len(sets), count, export_ms, start) + sets)
+    return packets
+
+def encode_v9(records, source_id=0, records_per_packet=30, template_every=20, uptime_ms=3600000):
+    """
+    Encode IPv4 flow records as NetFlow v9 packets.
+
+    Args:
+        records (numpy.ndarray): FLOW_DTYPE records
+        source_id (int): Source ID (templates are scoped to it)
+        records_per_packet (int): Data records per packet
+        template_every (int): Resend the template every this many packets
+        uptime_ms (int): Router uptime at export
+
+    Returns:
+        list: Packets (bytes)
+    """
+    def header(length, count, export_ms, sequence):
+        return V9_HEADER.pack(9, count, uptime_ms, int(export_ms // 1000), sequence, source_id)
+    return _encode_sets(records, header, 0, records_per_packet, template_every)
+
+def encode_ipfix(records, domain=0, records_per_packet=30, template_every=20):
+    """
+    Encode IPv4 flow records as IPFIX messages.
+
+    Args:
+        records (numpy.ndarray): FLOW_DTYPE records
+        domain (int): Observation domain ID (templates are scoped to it)
+        records_per_packet (int): Data records per message
+        template_every (int): Resend the template every this many messages
+
+    Returns:
+        list: Messages (bytes)
+    """
+    def header(length, count, export_ms, sequence):
+        return IPFIX_HEADER.pack(10, IPFIX_HEADER.size + length, int(export_ms // 1000), sequence, domain)
+    return _encode_sets(records, header, 2, records_per_packet, template_every)
+
+ENCODERS = {5: encode_v5, 9: encode_v9, 10: encode_ipfix}
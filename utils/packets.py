@@ -0,0 +1,393 @@
+"""
+Vectorized packet header parsing for the intrusion detection system.
+Captures are read in large blocks; the pcap record headers are walked once
+to find the frames, and the Ethernet/IPv4/IPv6/TCP/UDP header fields of a
+whole block are then gathered with numpy index arithmetic into a
+PACKET_DTYPE array, so no Python code runs per header field. The reverse
+direction (write_packets) builds pcap files from PACKET_DTYPE arrays for
+replay tests and benchmarks.
+"""
+
+import logging
+import struct
+import time
+
+import numpy as np
+
+from .pcap import (ETHERTYPE_IPV4, ETHERTYPE_IPV6, ETHERTYPE_VLAN, GLOBAL_HEADER, LINKTYPE_ETHERNET,
+                   LINKTYPE_LINUX_SLL, LINKTYPE_RAW, MAGIC_MICROSECONDS, MAGIC_NANOSECONDS, SNAPLEN, PcapError)
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+PACKET_DTYPE = np.dtype([
+    ('ts', 'f8'), ('src_addr', 'V16'), ('dst_addr', 'V16'), ('ip_version', 'u1'),
+    ('src_port', 'u2'), ('dst_port', 'u2'), ('protocol', 'u1'), ('tcp_flags', 'u1'),
+    ('window', 'u2'), ('length', 'u2')
+])
+
+IPPROTO_TCP = 6
+IPPROTO_UDP = 17
+TCP_FIN = 0x01
+TCP_SYN = 0x02
+TCP_RST = 0x04
+TCP_PSH = 0x08
+TCP_ACK = 0x10
+TCP_URG = 0x20
+
+READ_BLOCK_BYTES = 1 << 20
+HEADER_SLACK = 64
+
+def _field(data, index, width):
+    """Big-endian unsigned integers of width bytes at each index."""
+    value = data[index].astype(np.uint32)
+    for i in range(1, width):
+        value = (value << 8) | data[index + i]
+    return value
+
+def parse_frames(data, offsets, lengths, timestamps, linktype=LINKTYPE_ETHERNET):
+    """
+    Parse the headers of many captured frames at once.
+
+    Args:
+        data (numpy.ndarray): uint8 buffer holding the frames
+        offsets (numpy.ndarray): Start of each frame in data
+        lengths (numpy.ndarray): Captured length of each frame
+        timestamps (numpy.ndarray): Capture time of each frame, seconds
+        linktype (int): Link type of the capture
+
+    Returns:
+        numpy.ndarray: PACKET_DTYPE records of the IPv4/IPv6 TCP and UDP
+            frames (other frames, fragments and truncated headers are skipped)
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    ends = offsets + np.asarray(lengths, dtype=np.int64)
+    # Header reads are clipped to the end of the last frame and invalid ones
+    # masked out below; they may run up to HEADER_SLACK bytes past it
+    bound = int(ends.max()) if len(ends) else 0
+    padded = data if len(data) >= bound + HEADER_SLACK else \
+        np.concatenate([data[:bound], np.zeros(HEADER_SLACK, dtype=np.uint8)])
+
+    if linktype == LINKTYPE_ETHERNET:
+        ethertype = _field(padded, offsets + 12, 2)
+        l3 = offsets + 14
+        vlan = np.isin(ethertype, ETHERTYPE_VLAN)
+        ethertype = np.where(vlan, _field(padded, offsets + 16, 2), ethertype)
+        l3 = np.where(vlan, l3 + 4, l3)
+    elif linktype == LINKTYPE_LINUX_SLL:
+        ethertype = _field(padded, offsets + 14, 2)
+        l3 = offsets + 16
+    elif linktype == LINKTYPE_RAW:
+        version = padded[offsets] >> 4
+        ethertype = np.where(version == 4, ETHERTYPE_IPV4, np.where(version == 6, ETHERTYPE_IPV6, 0))
+        l3 = offsets
+    else:
+        raise PcapError(f"Unsupported link type: {linktype}")
+    l3 = np.minimum(l3, bound)
+
+    ipv4 = (ethertype == ETHERTYPE_IPV4) & (padded[l3] >> 4 == 4)
+    ipv6 = (ethertype == ETHERTYPE_IPV6) & (padded[l3] >> 4 == 6)
+    ihl = (padded[l3] & 0x0F).astype(np.int64) * 4
+    fragment = ipv4 & ((_field(padded, l3 + 6, 2) & 0x3FFF) != 0)
+    protocol = np.where(ipv4, padded[l3 + 9], padded[l3 + 6])
+    ip_payload = np.where(ipv4, _field(padded, l3 + 2, 2).astype(np.int64) - ihl,
+                          _field(padded, l3 + 4, 2).astype(np.int64))
+    l4 = np.minimum(np.where(ipv4, l3 + ihl, l3 + 40), bound)
+    tcp = protocol == IPPROTO_TCP
+    udp = protocol == IPPROTO_UDP
+    l4_header = np.where(tcp, (padded[l4 + 12] >> 4).astype(np.int64) * 4, 8)
+
+    valid = (ipv4 | ipv6) & ~fragment & (tcp | udp) & (l4 + np.where(tcp, 20, 8) <= ends) & (ip_payload >= l4_header)
+    index = np.flatnonzero(valid)
+    l3, l4 = l3[index], l4[index]
+    ipv4, tcp = ipv4[index], tcp[index]
+
+    packets = np.zeros(len(index), dtype=PACKET_DTYPE)
+    packets['ts'] = np.asarray(timestamps, dtype=np.float64)[index]
+    packets['ip_version'] = np.where(ipv4, 4, 6)
+    for name, v4_offset, v6_offset in (('src_addr', 12, 8), ('dst_addr', 16, 24)):
+        start = np.where(ipv4, l3 + v4_offset, l3 + v6_offset)
+        raw = padded[start[:, None] + np.arange(16)]
+        raw[ipv4, 4:] = 0
+        packets[name] = np.ascontiguousarray(raw).view('V16').ravel()
+    packets['src_port'] = _field(padded, l4, 2)
+    packets['dst_port'] = _field(padded, l4 + 2, 2)
+    packets['protocol'] = protocol[index]
+    packets['tcp_flags'] = np.where(tcp, padded[l4 + 13], 0)
+    packets['window'] = np.where(tcp, _field(padded, l4 + 14, 2), 0)
+    packets['length'] = (ip_payload - l4_header)[index]
+    return packets
+
+def read_packets(path, block_bytes=READ_BLOCK_BYTES):
+    """
+    Read a pcap capture as blocks of parsed packets.
+
+    Args:
+        path (str): Capture file
+        block_bytes (int): Bytes read (and parsed) at a time
+
+    Yields:
+        numpy.ndarray: PACKET_DTYPE records, in capture order
+    """
+    with open(path, 'rb') as f:
+        header = f.read(GLOBAL_HEADER.size)
+        if len(header) < GLOBAL_HEADER.size:
+            raise PcapError(f"{path} is too short for a pcap capture")
+        for endian in '<>':
+            magic = struct.unpack(endian + 'I', header[:4])[0]
+            if magic in (MAGIC_MICROSECONDS, MAGIC_NANOSECONDS):
+                break
+        else:
+            raise PcapError(f"{path} is not a classic pcap capture (pcapng must be converted first)")
+        divisor = 1e9 if magic == MAGIC_NANOSECONDS else 1e6
+        linktype = struct.unpack(endian + 'I', header[20:24])[0] & 0x0FFFFFFF
+        caplen = struct.Struct(endian + 'I').unpack_from
+
+        # Frames are parsed in place: each block is read after the partial
+        # frame left over from the previous one, with room for header reads
+        buffer = bytearray(block_bytes + HEADER_SLACK)
+        view = memoryview(buffer)
+        tail = 0
+        while True:
+            if tail == block_bytes:
+                # A frame larger than the block: grow the buffer
+                view.release()
+                buffer.extend(bytes(block_bytes))
+                view = memoryview(buffer)
+                block_bytes *= 2
+            read = f.readinto(view[tail:block_bytes])
+            size = tail + read
+            # Only the record lengths are read in Python; the record headers
+            # are gathered with numpy once the frames have been located
+            records = []
+            offset = 0
+            while offset + 16 <= size:
+                end = offset + 16 + caplen(buffer, offset + 8)[0]
+                if end > size:
+                    break
+                records.append(offset)
+                offset = end
+            if records:
+                data = np.frombuffer(buffer, dtype=np.uint8)
+                starts = np.array(records, dtype=np.int64)
+                headers = data[starts[:, None] + np.arange(16)].view(endian + 'u4')
+                timestamps = headers[:, 0] + headers[:, 1] / divisor
+                yield parse_frames(data, starts + 16, headers[:, 2], timestamps, linktype)
+                del data
+            tail = size - offset
+            view[:tail] = view[offset:size]
+            if not read:
+                if tail:
+                    logger.warning(f"Truncated last frame in {path}")
+                return
+
+def capture_packets(interface, block_packets=4096, block_seconds=0.5, duration=None):
+    """
+    Capture packets from a network interface (Linux, needs CAP_NET_RAW).
+
+    Frames are received into one buffer and parsed a block at a time, after
+    block_packets frames, READ_BLOCK_BYTES or block_seconds, whichever
+    comes first.
+
+    Args:
+        interface (str): Interface name (for example eth0)
+        block_packets (int): Frames parsed together
+        block_seconds (float): Longest a frame waits for its block
+        duration (float, optional): Stop after this many seconds
+
+    Yields:
+        numpy.ndarray: PACKET_DTYPE records of each block
+    """
+    import socket
+
+    sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.ntohs(0x0003))
+    sock.bind((interface, 0))
+    sock.settimeout(block_seconds)
+    buffer = np.zeros(READ_BLOCK_BYTES + SNAPLEN + HEADER_SLACK, dtype=np.uint8)
+    view = memoryview(buffer)
+    offsets = np.zeros(block_packets, dtype=np.int64)
+    lengths = np.zeros(block_packets, dtype=np.int64)
+    timestamps = np.zeros(block_packets)
+    stop = None if duration is None else time.monotonic() + duration
+    try:
+        while stop is None or time.monotonic() < stop:
+            count, used = 0, 0
+            deadline = time.monotonic() + block_seconds
+            while count < block_packets and used <= READ_BLOCK_BYTES and time.monotonic() < deadline:
+                try:
+                    size = sock.recv_into(view[used:used + SNAPLEN])
+                except socket.timeout:
+                    break
+                offsets[count], lengths[count], timestamps[count] = used, size, time.time()
+                count += 1
+                used += size
+            if count:
+                yield parse_frames(buffer, offsets[:count], lengths[:count], timestamps[:count])
+    finally:
+        view.release()
+        sock.close()
+
+def write_packets(path, packets):
+    """
+    Write packets as Ethernet frames to a pcap capture.
+
+    Frames carry the parsed header fields and a zero-filled payload of the
+    packet's length, so read_packets returns the same records.
+
+    Args:
+        path (str): Capture file
+        packets (numpy.ndarray): PACKET_DTYPE records
+
+    Returns:
+        int: Bytes written
+    """
+    count = len(packets)
+    ipv4 = packets['ip_version'] == 4
+    tcp = packets['protocol'] == IPPROTO_TCP
+    l4_header = np.where(tcp, 20, 8)
+    l3_header = np.where(ipv4, 20, 40)
+    frame_lengths = 14 + l3_header + l4_header + packets['length'].astype(np.int64)
+    starts = np.concatenate([[0], np.cumsum(16 + frame_lengths)[:-1]])
+    out = np.zeros(int((16 + frame_lengths).sum()), dtype=np.uint8)
+
+    def put(positions, values, width):
+        values = np.asarray(values).astype(np.uint64)
+        for i in range(width):
+            out[positions + i] = (values >> np.uint64(8 * (width - 1 - i))) & np.uint64(0xFF)
+
+    def put_le(positions, values):
+        values = np.asarray(values).astype(np.uint64)
+        for i in range(4):
+            out[positions + i] = (values >> np.uint64(8 * i)) & np.uint64(0xFF)
+
+    seconds = np.floor(packets['ts'])
+    put_le(starts, seconds)
+    put_le(starts + 4, np.round((packets['ts'] - seconds) * 1e6) % 1000000)
+    put_le(starts + 8, frame_lengths)
+    put_le(starts + 12, frame_lengths)
+
+    frame = starts + 16
+    out[frame] = 0x02
+    out[frame + 5] = 0x02
+    out[frame + 6] = 0x02
+    out[frame + 11] = 0x01
+    put(frame + 12, np.where(ipv4, ETHERTYPE_IPV4, ETHERTYPE_IPV6), 2)
+
+    l3 = frame + 14
+    src = np.ascontiguousarray(packets['src_addr']).view(np.uint8).reshape(-1, 16)
+    dst = np.ascontiguousarray(packets['dst_addr']).view(np.uint8).reshape(-1, 16)
+    v4, v6 = np.flatnonzero(ipv4), np.flatnonzero(~ipv4)
+    out[l3[v4]] = 0x45
+    put(l3[v4] + 2, frame_lengths[v4] - 14, 2)
+    put(l3[v4] + 6, np.full(len(v4), 0x4000), 2)
+    out[l3[v4] + 8] = 64
+    out[l3[v4] + 9] = packets['protocol'][v4]
+    out[(l3[v4] + 12)[:, None] + np.arange(4)] = src[v4, :4]
+    out[(l3[v4] + 16)[:, None] + np.arange(4)] = dst[v4, :4]
+    out[l3[v6]] = 0x60
+    put(l3[v6] + 4, frame_lengths[v6] - 54, 2)
+    out[l3[v6] + 6] = packets['protocol'][v6]
+    out[l3[v6] + 7] = 64
+    out[(l3[v6] + 8)[:, None] + np.arange(16)] = src[v6]
+    out[(l3[v6] + 24)[:, None] + np.arange(16)] = dst[v6]
+
+    l4 = l3 + l3_header
+    put(l4, packets['src_port'], 2)
+    put(l4 + 2, packets['dst_port'], 2)
+    t, u = np.flatnonzero(tcp), np.flatnonzero(~tcp)
+    out[l4[t] + 12] = 0x50
+    out[l4[t] + 13] = packets['tcp_flags'][t]
+    put(l4[t] + 14, packets['window'][t], 2)
+    put(l4[u] + 4, 8 + packets['length'][u].astype(np.int64), 2)
+
+    with open(path, 'wb') as f:
+        f.write(GLOBAL_HEADER.pack(MAGIC_MICROSECONDS, 2, 4, 0, 0, SNAPLEN, LINKTYPE_ETHERNET))
+        f.write(out.tobytes())
+    return GLOBAL_HEADER.size + len(out)
+
+def _ipv4(values):
+    """16-byte address values from IPv4 integers."""
+    raw = np.zeros((len(values), 16), dtype=np.uint8)
+    raw[:, :4] = np.asarray(values, dtype='>u4').view(np.uint8).reshape(-1, 4)
+    return raw.view('V16').ravel()
+
+def generate_packets(num_flows, attack_share=0.01, seed=None, start=None, span=30.0, max_packets=40):
+    """
+    Generate the packets of bidirectional TCP connections for replay and load testing.
+
+    Benign connections to common service ports open with a handshake and
+    close with FIN in both directions; attack connections are port-scan
+    like: a SYN to a random low port from a handful of sources, answered
+    with RST. Packets are returned in timestamp order, connections
+    interleaved.
+
+    Args:
+        num_flows (int): Number of connections
+        attack_share (float): Share of attack connections
+        seed (int, optional): Random seed
+        start (float, optional): First connection start, epoch seconds (default now - span)
+        span (float): Seconds over which connections start
+        max_packets (int): Most packets in a benign connection
+
+    Returns:
+        tuple: (PACKET_DTYPE records, numpy.ndarray of connection index per
+            packet, numpy.ndarray of 0/1 labels per connection)
+    """
+    rng = np.random.default_rng(seed)
+    labels = (rng.random(num_flows) < attack_share).astype(int)
+    attack = labels == 1
+    counts = np.where(attack, 2, rng.integers(4, max(max_packets, 5), num_flows))
+    flow = np.repeat(np.arange(num_flows), counts)
+    first = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    position = np.arange(len(flow)) - first[flow]
+    last = position == counts[flow] - 1
+
+    # Handshake and FINs in order; the data packets in between alternate at random
+    backward = rng.random(len(flow)) < 0.45
+    backward[position == 0] = False
+    backward[position == 1] = True
+    backward[last] = True
+    backward[np.maximum(np.flatnonzero(last) - 1, 0)] = False
+    flags = np.where(backward, TCP_ACK | TCP_PSH, TCP_ACK)
+    flags[last] = TCP_FIN | TCP_ACK
+    flags[np.flatnonzero(last) - 1] = TCP_FIN | TCP_ACK
+    flags[position == 0] = TCP_SYN
+    flags[position == 1] = TCP_SYN | TCP_ACK
+    attack_packets = attack[flow]
+    flags[attack_packets & (position == 1)] = TCP_RST | TCP_ACK
+
+    begin = (time.time() - span if start is None else start) + rng.random(num_flows) * span
+    duration = np.where(attack, rng.random(num_flows) * 0.001, rng.exponential(2.0, num_flows))
+    gaps = rng.random(len(flow))
+    gaps[position == 0] = 0
+    offset = np.cumsum(gaps)
+    offset -= offset[first][flow]
+    total = offset[first + counts - 1]
+    ts = begin[flow] + offset / np.where(total > 0, total, 1)[flow] * duration[flow]
+
+    client = rng.integers(0x0A000001, 0x0A00FFFF, num_flows, dtype=np.uint32)
+    client[attack] = rng.integers(0xC0A86401, 0xC0A86410, int(attack.sum()), dtype=np.uint32)
+    server = rng.integers(0xC0A80001, 0xC0A800FF, num_flows, dtype=np.uint32)
+    client_port = rng.integers(1024, 65536, num_flows)
+    server_port = np.where(attack, rng.integers(1, 1024, num_flows), rng.choice([80, 443, 22, 8080, 3306], num_flows))
+
+    packets = np.zeros(len(flow), dtype=PACKET_DTYPE)
+    packets['ts'] = ts
+    packets['ip_version'] = 4
+    packets['protocol'] = IPPROTO_TCP
+    client_addr, server_addr = _ipv4(client)[flow], _ipv4(server)[flow]
+    packets['src_addr'] = np.where(backward, server_addr, client_addr)
+    packets['dst_addr'] = np.where(backward, client_addr, server_addr)
+    packets['src_port'] = np.where(backward, server_port[flow], client_port[flow])
+    packets['dst_port'] = np.where(backward, client_port[flow], server_port[flow])
+    packets['tcp_flags'] = flags
+    packets['window'] = np.where(attack_packets & backward, 0, rng.integers(1024, 65536, len(flow)))
+    handshake = (position < 2) | last | attack_packets
+    packets['length'] = np.where(handshake, 0, np.where(backward, rng.integers(100, 1400, len(flow)),
+                                                        rng.integers(0, 600, len(flow))))
+    order = np.argsort(ts, kind='stable')
+    return packets[order], flow[order], labels
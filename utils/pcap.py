@@ -0,0 +1,188 @@
+"""
+Classic libpcap file reading and writing for the intrusion detection system.
+Used to replay recorded traffic (for example NetFlow/IPFIX export packets
+captured with tcpdump -w) and to write synthesized captures. Only the
+classic pcap format is supported; convert pcapng captures with
+editcap -F pcap first.
+"""
+
+import logging
+import struct
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+
+MAGIC_MICROSECONDS = 0xa1b2c3d4
+MAGIC_NANOSECONDS = 0xa1b23c4d
+GLOBAL_HEADER = struct.Struct('<IHHiIII')
+RECORD_HEADER = struct.Struct('<IIII')
+SNAPLEN = 65535
+
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_IPV6 = 0x86dd
+ETHERTYPE_VLAN = (0x8100, 0x88a8)
+IPPROTO_UDP = 17
+
+class PcapError(ValueError):
+    """The file is not a readable classic pcap capture."""
+
+def read_pcap(path):
+    """
+    Read the frames of a pcap capture.
+
+    Args:
+        path (str): Capture file
+
+    Yields:
+        tuple: (timestamp in seconds, link type, frame bytes)
+
+    Raises:
+        PcapError: If the file is not a classic pcap capture
+    """
+    with open(path, 'rb') as f:
+        header = f.read(GLOBAL_HEADER.size)
+        if len(header) < GLOBAL_HEADER.size:
+            raise PcapError(f"{path} is too short for a pcap capture")
+        for endian in '<>':
+            magic = struct.unpack(endian + 'I', header[:4])[0]
+            if magic in (MAGIC_MICROSECONDS, MAGIC_NANOSECONDS):
+                break
+        else:
+            raise PcapError(f"{path} is not a classic pcap capture (pcapng must be converted first)")
+        divisor = 1e9 if magic == MAGIC_NANOSECONDS else 1e6
+        linktype = struct.unpack(endian + 'I', header[20:24])[0] & 0x0FFFFFFF
+        record = struct.Struct(endian + 'IIII')
+
+        while True:
+            data = f.read(record.size)
+            if len(data) < record.size:
+                return
+            seconds, fraction, captured, _ = record.unpack(data)
+            frame = f.read(captured)
+            if len(frame) < captured:
+                logger.warning(f"Truncated last frame in {path}")
+                return
+            yield seconds + fraction / divisor, linktype, frame
+
+def write_pcap(path, frames, linktype=LINKTYPE_ETHERNET):
+    """
+    Write frames to a pcap capture.
+
+    Args:
+        path (str): Capture file
+        frames (iterable): (timestamp in seconds, frame bytes) pairs
+        linktype (int): Link type of the frames
+
+    Returns:
+        int: Number of frames written
+    """
+    count = 0
+    with open(path, 'wb') as f:
+        f.write(GLOBAL_HEADER.pack(MAGIC_MICROSECONDS, 2, 4, 0, 0, SNAPLEN, linktype))
+        for timestamp, frame in frames:
+            seconds = int(timestamp)
+            f.write(RECORD_HEADER.pack(seconds, int(round((timestamp - seconds) * 1e6)) % 1000000,
+                                       len(frame), len(frame)))
+            f.write(frame)
+            count += 1
+    return count
+
+def network_layer(frame, linktype):
+    """
+    Strip the link-layer header of a frame.
+
+    Args:
+        frame (bytes): Frame as captured
+        linktype (int): Link type of the capture
+
+    Returns:
+        tuple: (ethertype, offset of the IP header), or None for other
+            link types and non-IP frames
+    """
+    if linktype == LINKTYPE_ETHERNET:
+        offset, ethertype = 14, int.from_bytes(frame[12:14], 'big')
+        while ethertype in ETHERTYPE_VLAN and len(frame) >= offset + 4:
+            ethertype = int.from_bytes(frame[offset + 2:offset + 4], 'big')
+            offset += 4
+    elif linktype == LINKTYPE_LINUX_SLL:
+        offset, ethertype = 16, int.from_bytes(frame[14:16], 'big')
+    elif linktype == LINKTYPE_RAW:
+        version = frame[0] >> 4 if frame else 0
+        offset, ethertype = 0, ETHERTYPE_IPV4 if version == 4 else ETHERTYPE_IPV6 if version == 6 else None
+    else:
+        return None
+    if ethertype not in (ETHERTYPE_IPV4, ETHERTYPE_IPV6):
+        return None
+    return ethertype, offset
+
+def udp_datagram(frame, linktype):
+    """
+    Extract the UDP datagram of a frame.
+
+    Args:
+        frame (bytes): Frame as captured
+        linktype (int): Link type of the capture
+
+    Returns:
+        tuple: (source address, destination port, payload), or None if the
+            frame is not an unfragmented UDP datagram
+    """
+    layer = network_layer(frame, linktype)
+    if layer is None:
+        return None
+    ethertype, offset = layer
+    if ethertype == ETHERTYPE_IPV4:
+        if len(frame) < offset + 20 or frame[offset + 9] != IPPROTO_UDP:
+            return None
+        if int.from_bytes(frame[offset + 6:offset + 8], 'big') & 0x3FFF:
+            return None  # fragment
+        source = '.'.join(str(octet) for octet in frame[offset + 12:offset + 16])
+        offset += (frame[offset] & 0x0F) * 4
+    else:
+        if len(frame) < offset + 40 or frame[offset + 6] != IPPROTO_UDP:
+            return None
+        source = ':'.join(frame[offset + 8 + i:offset + 10 + i].hex() for i in range(0, 16, 2))
+        offset += 40
+    if len(frame) < offset + 8:
+        return None
+    port = int.from_bytes(frame[offset + 2:offset + 4], 'big')
+    length = int.from_bytes(frame[offset + 4:offset + 6], 'big')
+    return source, port, frame[offset + 8:offset + max(length, 8)]
+
+def _checksum(data):
+    if len(data) % 2:
+        data += b'\0'
+    total = sum(struct.unpack(f'>{len(data) // 2}H', data))
+    while total >> 16:
+        total = (total & 0xFFFF) + (total >> 16)
+    return ~total & 0xFFFF
+
+def udp_frame(payload, source, destination, source_port, destination_port):
+    """
+    Build an Ethernet/IPv4/UDP frame (UDP checksum left at 0).
+
+    Args:
+        payload (bytes): UDP payload
+        source (str): Source IPv4 address
+        destination (str): Destination IPv4 address
+        source_port (int): Source port
+        destination_port (int): Destination port
+
+    Returns:
+        bytes: Frame
+    """
+    addresses = bytes(int(octet) for octet in source.split('.')) + \
+        bytes(int(octet) for octet in destination.split('.'))
+    ip = struct.pack('>BBHHHBBH', 0x45, 0, 28 + len(payload), 0, 0x4000, 64, IPPROTO_UDP, 0) + addresses
+    ip = ip[:10] + struct.pack('>H', _checksum(ip)) + ip[12:]
+    udp = struct.pack('>HHHH', source_port, destination_port, 8 + len(payload), 0)
+    ethernet = b'\x02\0\0\0\0\x02' + b'\x02\0\0\0\0\x01' + struct.pack('>H', ETHERTYPE_IPV4)
+    return ethernet + ip + udp + payload
@@ -14,6 +14,13 @@ from datetime import datetime
 import uuid
 from sklearn.ensemble import RandomForestClassifier
 
+from .anytime_forest import AnytimeForest, load_tree_order
+from .cascade import cascade_scores, load_cascade
+from .evaluation import DEFAULT_BINS, evaluate_chunks
+from .explain import DEFAULT_TOP_K, ForestExplainer
+from .thresholds import SEGMENT_THRESHOLDS_FILE, load_segment_thresholds
+from .instrumentation import timed
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
@@ -26,18 +33,40 @@ class IntrusionDetector:
     Class for loading and using the intrusion detection model.
     """
     
-    def __init__(self, model_dir):
+    def __init__(self, model_dir, use_cascade=False, use_early_exit=False, float32=False,
+                 use_segment_thresholds=False):
         """
         Initialize the intrusion detector.
         
         Args:
             model_dir (str): Directory containing the model files
+            use_cascade (bool): Score with the two-stage cascade trained by
+                train_cascade.py instead of sending every row to the forest
+            use_early_exit (bool): Stop evaluating trees once a row's decision
+                is settled (tree order from order_trees.py when available)
+            float32 (bool): Parse, scale and score files and packets in float32
+                (see check_float32_exactness)
+            use_segment_thresholds (bool): Threshold each row by its segment
+                (segment_thresholds.json from tune_threshold.py)
         """
+        if use_cascade and use_early_exit:
+            raise ValueError("Cascade and early-exit scoring cannot be combined")
+        if use_segment_thresholds and (use_cascade or use_early_exit):
+            raise ValueError("Segment thresholds cannot be combined with cascade or early-exit scoring")
+        
         self.model_dir = model_dir
         self.model = None
         self.scaler = None
         self.threshold = 0.5
         self.selected_features = []
+        self.use_cascade = use_cascade
+        self.cascade = None
+        self.use_early_exit = use_early_exit
+        self.anytime = None
+        self.float32 = float32
+        self.use_segment_thresholds = use_segment_thresholds
+        self.segment_thresholds = None
+        self.explainer = None
         
         self.load_model()
         
@@ -74,6 +103,23 @@ class IntrusionDetector:
                 self.model_info = f.read()
             logger.info(f"Model info loaded successfully")
             
+            # Load cascade first stage
+            if self.use_cascade:
+                self.cascade = load_cascade(self.model_dir)
+                logger.info(f"Cascade loaded successfully: band [{self.cascade[1]}, {self.cascade[2]}]")
+            
+            # Load segment thresholds
+            if self.use_segment_thresholds:
+                self.segment_thresholds = load_segment_thresholds(self.model_dir, self.selected_features, self.scaler)
+                if self.segment_thresholds is None:
+                    raise FileNotFoundError(f"No {SEGMENT_THRESHOLDS_FILE} in {self.model_dir}")
+                logger.info(f"Segment thresholds loaded for {self.segment_thresholds.feature}")
+            
+            # Prepare early-exit scoring
+            if self.use_early_exit:
+                self.anytime = AnytimeForest(self.model, self.threshold, load_tree_order(self.model_dir))
+                logger.info(f"Early-exit scoring enabled over {len(self.anytime.trees)} trees")
+            
         except Exception as e:
             logger.error(f"Error loading model: {str(e)}")
             raise
@@ -82,6 +128,8 @@ class IntrusionDetector:
         """
         Make predictions on scaled data.
         
+        float32 input is scored with float32 confidence scores and threshold.
+        
         Args:
             X_scaled (numpy.ndarray): Scaled feature data
             
@@ -90,10 +138,28 @@ class IntrusionDetector:
         """
         try:
             # Get confidence scores
-            confidence_scores = self.model.predict_proba(X_scaled)[:, 1]
+            if self.anytime is not None:
+                predictions, confidence_scores, _ = self.predict_with_early_exit(X_scaled)
+                logger.info(f"Predictions made successfully: {X_scaled.shape[0]} samples")
+                return predictions, confidence_scores
+            elif self.cascade is not None:
+                first_stage, lower, upper = self.cascade
+                confidence_scores, _ = cascade_scores(first_stage, self.model, X_scaled, lower, upper)
+            else:
+                with timed('predict_proba', rows=X_scaled.shape[0]):
+                    confidence_scores = self.model.predict_proba(X_scaled)[:, 1]
             
             # Apply threshold to get binary predictions
-            predictions = (confidence_scores >= self.threshold).astype(int)
+            with timed('threshold'):
+                if self.segment_thresholds is not None:
+                    threshold = self.segment_thresholds.lookup(X_scaled)
+                elif X_scaled.dtype == np.float32:
+                    threshold = np.float32(self.threshold)
+                else:
+                    threshold = self.threshold
+                if X_scaled.dtype == np.float32:
+                    confidence_scores = confidence_scores.astype(np.float32)
+                predictions = (confidence_scores >= threshold).astype(int)
             
             logger.info(f"Predictions made successfully: {X_scaled.shape[0]} samples")
             return predictions, confidence_scores
@@ -101,6 +167,85 @@ class IntrusionDetector:
             logger.error(f"Error making predictions: {str(e)}")
             raise
     
+    def predict_with_early_exit(self, X_scaled):
+        """
+        Make exact threshold decisions, evaluating only the trees needed per row.
+        
+        Args:
+            X_scaled (numpy.ndarray): Scaled feature data
+            
+        Returns:
+            tuple: (predictions, confidence_scores, partial) where partial flags
+                rows whose confidence is averaged over a subset of the trees
+        """
+        try:
+            if self.anytime is None:
+                self.anytime = AnytimeForest(self.model, self.threshold, load_tree_order(self.model_dir))
+            
+            predictions, confidence_scores, partial, _ = self.anytime.predict(X_scaled)
+            return predictions, confidence_scores, partial
+        except Exception as e:
+            logger.error(f"Error making early-exit predictions: {str(e)}")
+            raise
+    
+    def explain(self, X_scaled, k=DEFAULT_TOP_K):
+        """
+        Get the features contributing most to each row's confidence score.
+        
+        Args:
+            X_scaled (numpy.ndarray): Scaled feature data (e.g. only flagged rows)
+            k (int): Number of features per row
+            
+        Returns:
+            list: Per row, a list of {'feature', 'contribution'} dicts
+        """
+        try:
+            if self.explainer is None:
+                self.explainer = ForestExplainer(self.model, self.selected_features)
+            
+            with timed('explain', rows=X_scaled.shape[0]):
+                return self.explainer.top_features(X_scaled, k)
+        except Exception as e:
+            logger.error(f"Error explaining predictions: {str(e)}")
+            raise
+    
+    def check_float32_exactness(self, X):
+        """
+        Compare float32 scoring with the float64 path on raw feature data.
+        
+        Args:
+            X (pandas.DataFrame): Selected features, unscaled
+            
+        Returns:
+            dict: Number of rows, indices of rows whose decision differs
+                between the two paths, number of rows whose confidence moved
+                (a feature rounded across a split) and the largest confidence
+                difference
+        """
+        from .data_processor import scale_features
+        
+        try:
+            predictions64, confidence64 = self.predict(scale_features(X, self.scaler))
+            predictions32, confidence32 = self.predict(scale_features(X, self.scaler, float32=True))
+            
+            mismatches = np.flatnonzero(predictions64 != predictions32)
+            deltas = np.abs(confidence64 - confidence32)
+            max_delta = float(np.max(deltas, initial=0.0))
+            if len(mismatches):
+                logger.warning(f"float32 scoring changed {len(mismatches)} of {len(predictions64)} decisions")
+            else:
+                logger.info(f"float32 scoring matches float64 on {len(predictions64)} rows")
+            
+            return {
+                'rows': len(predictions64),
+                'mismatches': mismatches,
+                'confidence_changed': int(np.count_nonzero(deltas > 1e-6)),
+                'max_confidence_delta': max_delta
+            }
+        except Exception as e:
+            logger.error(f"Error checking float32 exactness: {str(e)}")
+            raise
+    
     def predict_file(self, file_path):
         """
         Predict intrusions in a CSV file.
@@ -115,19 +260,20 @@ class IntrusionDetector:
         
         try:
             # Process the file
-            X_scaled, original_data = process_csv_file(file_path, self.selected_features, self.scaler)
+            X_scaled, original_data = process_csv_file(file_path, self.selected_features, self.scaler, self.float32)
             
             # Make predictions
             predictions, confidence_scores = self.predict(X_scaled)
             
             # Create results
-            results = []
-            for i, (pred, conf) in enumerate(zip(predictions, confidence_scores)):
-                results.append({
-                    'index': i,
-                    'is_intrusion': bool(pred),
-                    'confidence': float(conf)
-                })
+            with timed('serialize', rows=len(predictions)):
+                results = []
+                for i, (pred, conf) in enumerate(zip(predictions, confidence_scores)):
+                    results.append({
+                        'index': i,
+                        'is_intrusion': bool(pred),
+                        'confidence': float(conf)
+                    })
             
             # Summary statistics
             total = len(predictions)
@@ -158,14 +304,17 @@ class IntrusionDetector:
         
         try:
             # Process the packet data
-            X_scaled, _ = process_packet_data(data_dict, self.selected_features, self.scaler)
+            X_scaled, _ = process_packet_data(data_dict, self.selected_features, self.scaler, self.float32)
             
             # Make predictions
-            _, confidence = self.predict(X_scaled)
+            prediction, confidence = self.predict(X_scaled)
             confidence = float(confidence[0])
             
-            # Apply threshold
-            is_intrusion = confidence >= self.threshold
+            # Thresholded by predict, in the precision of the scaled data
+            is_intrusion = bool(prediction[0])
+            threshold = self.threshold
+            if self.segment_thresholds is not None:
+                threshold = float(self.segment_thresholds.lookup(X_scaled)[0])
             
             # Create alert if intrusion
             alert = None
@@ -175,13 +324,13 @@ class IntrusionDetector:
                     'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
                     'source': 'Manual Input',
                     'confidence': confidence,
-                    'details': data_dict
+                    'details': dict(data_dict, explanation=self.explain(X_scaled)[0])
                 }
             
             return {
                 'is_intrusion': bool(is_intrusion),
                 'confidence': confidence,
-                'threshold': self.threshold,
+                'threshold': threshold,
                 'alert': alert
             }
         except Exception as e:
@@ -224,8 +373,6 @@ class IntrusionDetector:
         Returns:
             dict: Evaluation metrics
         """
-        from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score
-        
         try:
             # Scale the test data
             X_test_scaled = self.scaler.transform(X_test)
@@ -234,13 +381,7 @@ class IntrusionDetector:
             y_pred, y_scores = self.predict(X_test_scaled)
             
             # Calculate metrics
-            metrics = {
-                'accuracy': accuracy_score(y_test, y_pred),
-                'precision': precision_score(y_test, y_pred),
-                'recall': recall_score(y_test, y_pred),
-                'f1_score': f1_score(y_test, y_pred),
-                'auc_roc': roc_auc_score(y_test, y_scores)
-            }
+            metrics = compute_metrics(y_test, y_pred, y_scores)
             
             logger.info(f"Model evaluation completed: {metrics}")
             return metrics
@@ -248,6 +389,52 @@ class IntrusionDetector:
             logger.error(f"Error evaluating model: {str(e)}")
             raise
     
+    def evaluate_dataset(self, file_path, label_column='label', benign_label='BENIGN',
+                         chunksize=100000, workers=1, bins=DEFAULT_BINS):
+        """
+        Evaluate the model on a labeled CSV or Parquet dataset of any size.
+        
+        The dataset is streamed in chunks, so only a few chunks are in memory
+        at once; the AUC comes from score histograms (see utils.evaluation).
+        
+        Args:
+            file_path (str): Path to the labeled CSV or Parquet file
+            label_column (str): Name of the label column
+            benign_label (str): Label value of benign traffic
+            chunksize (int): Number of rows per chunk
+            workers (int): Number of chunks scored at the same time
+            bins (int): Number of score histogram bins
+            
+        Rows with infinite or missing feature values are dropped (and
+        counted in 'dropped_rows').
+        
+        Returns:
+            dict: Evaluation metrics, per-label breakdown and dropped row count
+        """
+        from .data_processor import iter_labeled_chunks, scale_features
+        
+        try:
+            counts = {}
+            chunks = iter_labeled_chunks(file_path, self.selected_features, label_column, benign_label, chunksize,
+                                         counts=counts)
+            evaluator = evaluate_chunks(
+                chunks,
+                lambda X: self.predict(scale_features(X, self.scaler, self.float32)),
+                workers,
+                bins
+            )
+            
+            metrics = evaluator.metrics()
+            logger.info(f"Dataset evaluation completed: {metrics}")
+            return {
+                'metrics': metrics,
+                'labels': evaluator.label_breakdown(),
+                'dropped_rows': counts['dropped_rows']
+            }
+        except Exception as e:
+            logger.error(f"Error evaluating dataset: {str(e)}")
+            raise
+    
     def get_model_info(self):
         """
         Get information about the model.
@@ -273,12 +460,44 @@ class IntrusionDetector:
             if hasattr(self.model, 'n_estimators'):
                 info_dict['n_estimators'] = self.model.n_estimators
             
+            if self.segment_thresholds is not None:
+                info_dict['segment_feature'] = self.segment_thresholds.feature
+                info_dict['segment_thresholds'] = self.segment_thresholds.thresholds.tolist()
+            
             logger.info(f"Model info retrieved successfully")
             return info_dict
         except Exception as e:
             logger.error(f"Error getting model info: {str(e)}")
             raise
 
+def compute_metrics(y_true, y_pred, y_scores=None):
+    """
+    Compute the evaluation metrics reported for the model.
+    
+    Args:
+        y_true (numpy.ndarray): True binary labels
+        y_pred (numpy.ndarray): Predicted binary labels
+        y_scores (numpy.ndarray, optional): Confidence scores for AUC
+        
+    Returns:
+        dict: Evaluation metrics
+    """
+    from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score, confusion_matrix
+    
+    tn, fp, fn, tp = confusion_matrix(y_true, y_pred, labels=[0, 1]).ravel()
+    metrics = {
+        'accuracy': accuracy_score(y_true, y_pred),
+        'precision': precision_score(y_true, y_pred, zero_division=0),
+        'recall': recall_score(y_true, y_pred, zero_division=0),
+        'f1_score': f1_score(y_true, y_pred, zero_division=0),
+        'false_positive_rate': float(fp / (fp + tn)) if (fp + tn) else 0.0,
+        'false_negative_rate': float(fn / (fn + tp)) if (fn + tp) else 0.0
+    }
+    if y_scores is not None and len(np.unique(y_true)) > 1:
+        metrics['auc_roc'] = roc_auc_score(y_true, y_scores)
+    
+    return metrics
+
 def predict_intrusion(data, model, scaler, threshold):
     """
     Predict whether the given network traffic data represents an intrusion.
@@ -0,0 +1,464 @@
+"""
+Allowlist and blocklist prefilter for the intrusion detection system.
+A large share of the traffic goes to known internal services and never
+needs the model, and some sources are known bad whatever their flows look
+like. Prefilter rules are checked before scoring:
+
+- allow rules: matching rows are reported safe (confidence 0) and are not
+  scored;
+- block rules: matching rows are reported as intrusions (confidence 1)
+  and are not scored. Block rules win over allow rules.
+
+A rule matches a flow when every condition it sets matches: 'source' and
+'destination' lists of addresses or CIDR prefixes (IPv4 or IPv6) and a
+'ports' list of destination ports or port ranges ("8000-8100"). Rules are
+compiled into sorted interval boundaries per field and a table of the
+rules covering each interval, so a batch is evaluated with one
+searchsorted per field whatever the number of prefixes and ports.
+
+Rules are stored as JSON in the settings table under 'prefilter_rules',
+for example:
+
+    [{"name": "internal-dns", "action": "allow", "destination": ["10.0.0.53"], "ports": [53]},
+     {"name": "backups", "action": "allow", "source": ["10.1.0.0/16"], "ports": ["8000-8100", 873]},
+     {"name": "known-bad", "action": "block", "source": ["203.0.113.0/24", "2001:db8::/32"]}]
+
+and are reloaded when the setting changes.
+"""
+
+import bisect
+import ipaddress
+import json
+import logging
+import socket
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from .admission import SOURCE_IP_COLUMNS
+from .instrumentation import REGISTRY
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+PREFILTER_SETTING = 'prefilter_rules'
+DEFAULT_RELOAD_SECONDS = 5.0
+
+# Row decisions
+PASS, ALLOW, BLOCK = 0, 1, 2
+ACTIONS = {'allow': ALLOW, 'block': BLOCK}
+FIELDS = ('source', 'destination', 'ports')
+
+DESTINATION_IP_COLUMNS = ('destination_ip', 'dst_ip', 'Destination IP', ' Destination IP')
+PORT_COLUMNS = ('destination_port', 'Destination Port', ' Destination Port')
+
+# Addresses are compared as 16-byte big-endian strings, IPv4 mapped into IPv6
+_V4_MAPPED = 0xFFFF << 32
+_V4_MAPPED_PREFIX = bytes(10) + b'\xff\xff'
+_ADDRESS_SPACE = 1 << 128
+_PORT_SPACE = 1 << 16
+
+PREFILTER_ROWS = REGISTRY.counter('ids_prefilter_rows_total', 'Rows decided by prefilter rules', ('decision',))
+PREFILTER_RULE_HITS = REGISTRY.counter('ids_prefilter_rule_hits_total', 'Rows matching each prefilter rule',
+                                       ('rule',))
+
+def _address_interval(value):
+    network = ipaddress.ip_network(str(value).strip(), strict=False)
+    offset = _V4_MAPPED if network.version == 4 else 0
+    return int(network.network_address) + offset, int(network.broadcast_address) + offset
+
+def _port_interval(value):
+    if isinstance(value, str) and '-' in value:
+        low, high = (int(part) for part in value.split('-', 1))
+    else:
+        low = high = int(value)
+    if not 0 <= low <= high < _PORT_SPACE:
+        raise ValueError(f"Invalid port or port range: {value}")
+    return low, high
+
+def _encode_addresses(values):
+    return np.array([value.to_bytes(16, 'big') for value in values], dtype='S16')
+
+def _encode_ports(values):
+    return np.array(values, dtype=np.int64)
+
+class _FieldIndex:
+    """
+    Sorted interval boundaries of one field and the rules covering each interval.
+    """
+
+    def __init__(self, intervals, constrained, space, encode):
+        """
+        Args:
+            intervals (list): (low, high, rule) tuples, bounds included
+            constrained (numpy.ndarray): Whether each rule sets this field
+            space (int): Size of the value space
+            encode (callable): Converts boundaries to the lookup dtype
+        """
+        points = sorted({low for low, _, _ in intervals} | {high + 1 for _, high, _ in intervals if high + 1 < space})
+        # Row k >= 1 covers [points[k - 1], points[k]); row 0 is below every
+        # interval and the last row is for missing values
+        self.table = np.zeros((len(points) + 2, len(constrained)), dtype=bool)
+        self.table[:, ~constrained] = True
+        for low, high, rule in intervals:
+            first = bisect.bisect_left(points, low) + 1
+            last = bisect.bisect_left(points, high + 1) + 1 if high + 1 < space else len(points) + 1
+            self.table[first:last, rule] = True
+        self.boundaries = encode(points)
+        self.missing = len(points) + 1
+        self.constrained = bool(constrained.any())
+
+    def lookup(self, values, valid):
+        """Rules matching each value (boolean rows x rules)."""
+        rows = np.searchsorted(self.boundaries, values, side='right')
+        if valid is not None:
+            rows = np.where(valid, rows, self.missing)
+        return self.table[rows]
+
+class RuleSet:
+    """
+    Compiled prefilter rules.
+    """
+
+    def __init__(self, rules):
+        """
+        Compile rules.
+
+        Args:
+            rules (list): Rule dicts with 'name', 'action' ('allow' or
+                'block') and at least one of 'source', 'destination'
+                (addresses or CIDR prefixes) and 'ports' (ports or
+                "low-high" ranges)
+
+        Raises:
+            ValueError: If a rule is invalid
+        """
+        if not isinstance(rules, list):
+            raise ValueError("Prefilter rules must be a list")
+        self.rules = rules
+        self.names = []
+        intervals = {field: [] for field in FIELDS}
+        constrained = {field: np.zeros(len(rules), dtype=bool) for field in FIELDS}
+        actions = []
+        for number, rule in enumerate(rules):
+            if not isinstance(rule, dict):
+                raise ValueError(f"Prefilter rule {number} is not an object")
+            name = str(rule.get('name', f'rule-{number}'))
+            if rule.get('action') not in ACTIONS:
+                raise ValueError(f"Prefilter rule {name}: action must be 'allow' or 'block'")
+            if not any(rule.get(field) for field in FIELDS):
+                raise ValueError(f"Prefilter rule {name} has no source, destination or ports")
+            for field in FIELDS:
+                values = rule.get(field)
+                if not values:
+                    continue
+                if not isinstance(values, list):
+                    values = [values]
+                parse = _port_interval if field == 'ports' else _address_interval
+                for value in values:
+                    intervals[field].append(parse(value) + (number,))
+                constrained[field][number] = True
+            self.names.append(name)
+            actions.append(ACTIONS[rule['action']])
+        self.actions = np.array(actions, dtype=np.int8)
+        self.indexes = {
+            field: _FieldIndex(intervals[field], constrained[field],
+                               _PORT_SPACE if field == 'ports' else _ADDRESS_SPACE,
+                               _encode_ports if field == 'ports' else _encode_addresses)
+            for field in FIELDS
+        }
+        self.labels = np.array(self.names + [None], dtype=object)
+
+    def __len__(self):
+        return len(self.names)
+
+    def constrains(self, field):
+        """Whether any rule sets this field."""
+        return self.indexes[field].constrained
+
+    def evaluate(self, rows, fields):
+        """
+        Decide rows.
+
+        Args:
+            rows (int): Number of rows
+            fields (dict): {field: (values, valid mask or None)} of the
+                fields the data has; a missing field matches no rule that
+                sets it
+
+        Returns:
+            tuple: (decisions, deciding rule index or -1, rows matched per rule)
+        """
+        match = np.ones((rows, len(self)), dtype=bool)
+        for field, index in self.indexes.items():
+            if not index.constrained:
+                continue
+            if field in fields:
+                match &= index.lookup(*fields[field])
+            else:
+                match &= index.table[index.missing]
+        blocking = match & (self.actions == BLOCK)
+        allowing = match & (self.actions == ALLOW)
+        blocked = blocking.any(axis=1)
+        allowed = allowing.any(axis=1) & ~blocked
+        decisions = np.where(blocked, BLOCK, np.where(allowed, ALLOW, PASS)).astype(np.int8)
+        # The first block rule, else the first allow rule, decides
+        deciding = np.where(blocked, blocking.argmax(axis=1), np.where(allowed, allowing.argmax(axis=1), -1))
+        return decisions, deciding, match.sum(axis=0)
+
+def _address_keys(values):
+    """16-byte keys of address strings; returns (keys, valid mask)."""
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+    keys = []
+    valid = np.zeros(len(uniques) + 1, dtype=bool)
+    for i, value in enumerate(uniques):
+        text = str(value).strip()
+        try:
+            keys.append(socket.inet_pton(socket.AF_INET6, text) if ':' in text
+                        else _V4_MAPPED_PREFIX + socket.inet_pton(socket.AF_INET, text))
+            valid[i] = True
+        except OSError:
+            keys.append(b'')
+    # Missing values (code -1) take the last, invalid entry
+    keys = np.array(keys + [b''], dtype='S16')
+    return keys[codes], valid[codes]
+
+def _record_address_keys(column, ip_version=None):
+    """16-byte keys of V16 address fields (IPv4 in the first 4 bytes)."""
+    raw = np.ascontiguousarray(column).view(np.uint8).reshape(-1, 16)
+    v4 = ip_version == 4 if ip_version is not None else ~raw[:, 4:].any(axis=1)
+    mapped = raw.copy()
+    mapped[v4] = 0
+    mapped[v4, 10:12] = 0xFF
+    mapped[v4, 12:] = raw[v4, :4]
+    return mapped.view('S16').ravel(), None
+
+def _port_keys(values):
+    values = pd.to_numeric(pd.Series(np.asarray(values)), errors='coerce').to_numpy(dtype=np.float64)
+    valid = np.isfinite(values) & (values >= 0) & (values < _PORT_SPACE)
+    return np.where(valid, values, 0).astype(np.int64), valid
+
+class Prefilter:
+    """
+    Allowlist and blocklist rules, hot-reloaded from the settings table.
+    """
+
+    def __init__(self, rules=None, db=None, setting=PREFILTER_SETTING, reload_seconds=DEFAULT_RELOAD_SECONDS):
+        """
+        Initialize the prefilter.
+
+        Args:
+            rules (list, optional): Rules to start with (see RuleSet)
+            db (DatabaseManager, optional): Settings store to load the rules
+                from and reload them when they change
+            setting (str): Settings key of the rules (JSON)
+            reload_seconds (float): Seconds between checks of the setting
+        """
+        self.rules = RuleSet(rules or [])
+        self.db = db
+        self.setting = setting
+        self.reload_seconds = reload_seconds
+        self.text = None
+        self.checked = None
+        self.lock = threading.Lock()
+        self.hits = {}
+        self.counters = {'rows': 0, 'allowed': 0, 'blocked': 0, 'reloads': 0, 'reload_errors': 0}
+        if db is not None:
+            self.reload(force=True)
+
+    def reload(self, force=False):
+        """
+        Load the rules from the settings table if they changed.
+
+        Invalid rules are logged and the current ones are kept.
+
+        Args:
+            force (bool): Check now instead of every reload_seconds
+
+        Returns:
+            bool: True if new rules were loaded
+        """
+        if self.db is None:
+            return False
+        now = time.monotonic()
+        with self.lock:
+            if not force and self.checked is not None and now - self.checked < self.reload_seconds:
+                return False
+            self.checked = now
+        text = self.db.get_setting(self.setting)
+        with self.lock:
+            if text == self.text:
+                return False
+            self.text = text
+            try:
+                self.rules = RuleSet(json.loads(text) if text else [])
+            except (ValueError, TypeError) as e:
+                self.counters['reload_errors'] += 1
+                logger.error(f"Invalid prefilter rules in settings, keeping the current ones: {str(e)}")
+                return False
+            self.counters['reloads'] += 1
+        logger.info(f"Loaded {len(self.rules)} prefilter rules")
+        return True
+
+    def save(self, rules):
+        """
+        Validate rules and store them in the settings table.
+
+        Args:
+            rules (list): Rule dicts (see RuleSet)
+
+        Raises:
+            ValueError: If a rule is invalid
+        """
+        RuleSet(rules)
+        self.db.set_setting(self.setting, json.dumps(rules), 'Prefilter allowlist and blocklist rules')
+        self.reload(force=True)
+
+    def evaluate(self, source=None, destination=None, port=None):
+        """
+        Decide rows from their addresses and destination ports.
+
+        Args:
+            source (tuple, optional): (16-byte keys, valid mask or None)
+            destination (tuple, optional): Same, for the destination
+            port (tuple, optional): (int64 ports, valid mask or None)
+
+        Returns:
+            tuple: (decisions, rules): PASS, ALLOW or BLOCK per row and the
+                name of the deciding rule (None for PASS)
+        """
+        self.reload()
+        rules = self.rules
+        fields = {field: values for field, values in zip(FIELDS, (source, destination, port)) if values is not None}
+        rows = len(next(iter(fields.values()))[0]) if fields else 0
+        if not len(rules) or not rows:
+            return np.zeros(rows, dtype=np.int8), np.full(rows, None, dtype=object)
+
+        decisions, deciding, hits = rules.evaluate(rows, fields)
+        allowed = int(np.count_nonzero(decisions == ALLOW))
+        blocked = int(np.count_nonzero(decisions == BLOCK))
+        with self.lock:
+            self.counters['rows'] += rows
+            self.counters['allowed'] += allowed
+            self.counters['blocked'] += blocked
+            for name, count in zip(rules.names, hits.tolist()):
+                if count:
+                    self.hits[name] = self.hits.get(name, 0) + count
+                    PREFILTER_RULE_HITS.labels(name).inc(count)
+        PREFILTER_ROWS.labels('allow').inc(allowed)
+        PREFILTER_ROWS.labels('block').inc(blocked)
+        return decisions, rules.labels[deciding]
+
+    def evaluate_frame(self, data):
+        """
+        Decide the rows of uploaded or ingested data.
+
+        Addresses come from source_ip/destination_ip (or the usual exporter
+        column names) and ports from destination_port; rules on a field the
+        data does not have never match.
+
+        Args:
+            data (pandas.DataFrame): Rows of the batch
+
+        Returns:
+            tuple: (decisions, rules) as evaluate()
+        """
+        try:
+            rules = self.rules
+            fields = {}
+            if len(rules) and len(data):
+                for field, names, keys in (('source', SOURCE_IP_COLUMNS, _address_keys),
+                                           ('destination', DESTINATION_IP_COLUMNS, _address_keys),
+                                           ('port', PORT_COLUMNS, _port_keys)):
+                    column = next((name for name in names if name in data.columns), None)
+                    if column is not None and rules.constrains('ports' if field == 'port' else field):
+                        fields[field] = keys(data[column].to_numpy())
+            if not fields:
+                self.reload()
+                return np.zeros(len(data), dtype=np.int8), np.full(len(data), None, dtype=object)
+            return self.evaluate(**fields)
+        except Exception as e:
+            logger.error(f"Error evaluating prefilter rules: {str(e)}")
+            raise
+
+    def evaluate_records(self, records):
+        """
+        Decide flow records (FLOW_DTYPE or flow table rows).
+
+        Args:
+            records (numpy.ndarray): Records with src_addr, dst_addr,
+                ip_version and dst_port fields
+
+        Returns:
+            tuple: (decisions, rules) as evaluate()
+        """
+        try:
+            rules = self.rules
+            if not len(rules) or not len(records):
+                self.reload()
+                return np.zeros(len(records), dtype=np.int8), np.full(len(records), None, dtype=object)
+            ip_version = records['ip_version'] if 'ip_version' in records.dtype.names else None
+            return self.evaluate(
+                source=_record_address_keys(records['src_addr'], ip_version) if rules.constrains('source') else None,
+                destination=_record_address_keys(records['dst_addr'], ip_version)
+                if rules.constrains('destination') else None,
+                port=(records['dst_port'].astype(np.int64), None)
+            )
+        except Exception as e:
+            logger.error(f"Error evaluating prefilter rules: {str(e)}")
+            raise
+
+    def add_counts(self, status):
+        """
+        Add the counters of another prefilter (for example a worker's).
+
+        Args:
+            status (dict): Its status()
+        """
+        with self.lock:
+            for key in ('rows', 'allowed', 'blocked'):
+                self.counters[key] += status[key]
+            for name, count in status['hits'].items():
+                self.hits[name] = self.hits.get(name, 0) + count
+
+    def status(self):
+        """
+        Get the rules and counters.
+
+        Returns:
+            dict: Rule count, rows seen, allowed and blocked, reloads and
+                rows matched per rule
+        """
+        with self.lock:
+            return dict(self.counters, rules=len(self.rules), hits=dict(self.hits))
+
+def score_undecided(decisions, score, *batch):
+    """
+    Score only the rows no rule decided.
+
+    Allowlisted rows are safe with confidence 0 and blocklisted rows are
+    intrusions with confidence 1.
+
+    Args:
+        decisions (numpy.ndarray): Decisions from a Prefilter
+        score (callable): Scores rows: score(*batch) -> (predictions,
+            confidence_scores)
+        *batch: Arrays or DataFrames of the rows, filtered alike
+
+    Returns:
+        tuple: (predictions, confidence_scores) of every row
+    """
+    undecided = decisions == PASS
+    if undecided.all():
+        return score(*batch)
+    predictions = (decisions == BLOCK).astype(int)
+    confidence_scores = predictions.astype(np.float64)
+    if undecided.any():
+        predictions[undecided], confidence_scores[undecided] = score(*(part[undecided] for part in batch))
+    return predictions, confidence_scores
@@ -0,0 +1,227 @@
+"""
+On-demand sampling profiler for the intrusion detection system.
+This module samples the Python stacks of the request threads serving a
+chosen route, for the next N requests or T seconds, and aggregates them
+into the collapsed-stack format read by flamegraph.pl and speedscope.
+While it is not armed the request hooks cost a single attribute check.
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from . import instrumentation
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Pipeline functions whose frames are tagged as stages in the output
+PIPELINE_STAGES = {
+    'process_csv_file',
+    'process_csv_data',
+    'process_packet_data',
+    'iter_csv_chunks',
+    'build_alerts',
+    'ForestExplainer.top_features',
+    'IntrusionDetector.predict',
+    'IntrusionDetector.predict_file',
+    'IntrusionDetector.predict_data',
+    'DatabaseManager.add_alert',
+    'DatabaseManager.add_alerts',
+    'DatabaseManager.get_alerts',
+}
+
+class SamplingProfiler:
+    """
+    Stack-sampling profiler armed for a limited number of requests or time.
+    """
+
+    def __init__(self):
+        """
+        Initialize the profiler in the disarmed state.
+        """
+        self.armed = False
+        self.route = None
+        self.remaining_requests = None
+        self.deadline = None
+        self.interval = 0.005
+        self.stacks = Counter()
+        self.samples = 0
+        self.requests_profiled = 0
+        self._threads = {}
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    def arm(self, route, max_requests=None, duration=None, interval=0.005):
+        """
+        Start profiling requests to a route.
+
+        Stacks collected by a previous run are discarded.
+
+        Args:
+            route (str): Request path to profile, e.g. '/predict-file'
+            max_requests (int, optional): Stop after this many requests
+            duration (float, optional): Stop after this many seconds
+            interval (float): Seconds between samples
+        """
+        if max_requests is None and duration is None:
+            raise ValueError("Either max_requests or duration is required")
+        if interval <= 0:
+            raise ValueError("Sampling interval must be positive")
+
+        with self._lock:
+            self.route = route
+            self.remaining_requests = max_requests
+            self.deadline = time.monotonic() + duration if duration is not None else None
+            self.interval = interval
+            self.stacks = Counter()
+            self.samples = 0
+            self.requests_profiled = 0
+            self._threads = {}
+            self.armed = True
+            self._generation += 1
+            generation = self._generation
+
+        instrumentation.set_stage_tracking(True)
+        # A sampler left over from a previous run exits when it sees the new generation
+        threading.Thread(target=self._run, args=(generation,), name='ids-profiler', daemon=True).start()
+        logger.info(f"Profiler armed for {route}: requests={max_requests}, seconds={duration}")
+
+    def disarm(self):
+        """
+        Stop profiling. Collected stacks are kept until the next arm().
+        """
+        with self._lock:
+            if not self.armed:
+                return
+            self.armed = False
+            self._threads = {}
+        instrumentation.set_stage_tracking(False)
+        logger.info(f"Profiler disarmed after {self.requests_profiled} requests, {self.samples} samples")
+
+    def begin_request(self, path):
+        """
+        Request hook: start sampling the current thread if the route matches.
+
+        Args:
+            path (str): Request path
+
+        Returns:
+            bool: Whether the request is being profiled
+        """
+        if not self.armed or path != self.route:
+            return False
+
+        with self._lock:
+            if not self.armed:
+                return False
+            if self.remaining_requests is not None:
+                if self.remaining_requests <= 0:
+                    return False
+                self.remaining_requests -= 1
+            self._threads[threading.get_ident()] = path
+        return True
+
+    def end_request(self):
+        """
+        Request hook: stop sampling the current thread.
+        """
+        if not self.armed:
+            return
+
+        done = False
+        with self._lock:
+            if self._threads.pop(threading.get_ident(), None) is not None:
+                self.requests_profiled += 1
+                done = self.remaining_requests == 0 and not self._threads
+        if done:
+            self.disarm()
+
+    def status(self):
+        """
+        Get the profiler state.
+
+        Returns:
+            dict: Profiler status
+        """
+        return {
+            'armed': self.armed,
+            'route': self.route,
+            'remaining_requests': self.remaining_requests,
+            'seconds_left': max(0.0, self.deadline - time.monotonic()) if self.armed and self.deadline else None,
+            'interval': self.interval,
+            'requests_profiled': self.requests_profiled,
+            'samples': self.samples,
+            'unique_stacks': len(self.stacks)
+        }
+
+    def collapsed(self):
+        """
+        Get the aggregated stacks in collapsed format.
+
+        Returns:
+            str: One 'frame;frame;...;frame count' line per unique stack
+        """
+        with self._lock:
+            items = sorted(self.stacks.items())
+        return ''.join(f"{stack} {count}\n" for stack, count in items)
+
+    def _run(self, generation):
+        while True:
+            with self._lock:
+                armed = self.armed and generation == self._generation
+                deadline = self.deadline
+            if not armed:
+                return
+            if deadline is not None and time.monotonic() >= deadline:
+                self.disarm()
+                return
+
+            self._sample()
+            time.sleep(self.interval)
+
+    def _sample(self):
+        with self._lock:
+            threads = dict(self._threads)
+        if not threads:
+            return
+
+        frames = sys._current_frames()
+        collected = []
+        for thread_id, root in threads.items():
+            frame = frames.get(thread_id)
+            if frame is None:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            labels.reverse()
+
+            stage = instrumentation.current_stage(thread_id)
+            prefix = [root, f"[timed:{stage}]"] if stage else [root]
+            collected.append(';'.join(prefix + labels))
+
+        with self._lock:
+            for stack in collected:
+                self.stacks[stack] += 1
+            self.samples += len(collected)
+
+def _frame_label(frame):
+    code = frame.f_code
+    name = getattr(code, 'co_qualname', code.co_name)
+    if name in PIPELINE_STAGES:
+        return f"[stage:{name}]"
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    # ';' separates frames and ' ' separates the count in collapsed stacks
+    return f"{module}:{name}".replace(';', ',').replace(' ', '_')
+
+# Process-wide profiler used by the application
+PROFILER = SamplingProfiler()
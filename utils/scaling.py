@@ -0,0 +1,251 @@
+"""
+Out-of-core fitting of the feature scaler.
+Training corpora such as the full CICIDS2017 export do not fit in memory,
+so the StandardScaler cannot simply be fit on a DataFrame of them. Each
+chunk of the dataset is reduced to per-feature counts, means and sums of
+squared deviations, and chunks (and the partitions read by separate worker
+processes) are merged with the parallel update of Chan, Golub and LeVeque,
+which stays accurate where a running sum of squares would cancel.
+
+Values that are not finite (the 'Infinity' and NaN entries CICIDS exports
+contain in the rate features) are ignored per feature, the same way
+StandardScaler ignores NaN, or with drop_incomplete whole rows containing
+any are dropped, as the usual dropna cleaning does. The fitted scaler has
+the attributes a StandardScaler fit in memory on the same cleaned data
+would have.
+"""
+
+import io
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.preprocessing import StandardScaler
+
+from .data_processor import iter_column_chunks
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+class StreamingMoments:
+    """
+    Per-feature count, mean and sum of squared deviations over chunks of rows.
+    """
+
+    def __init__(self, n_features):
+        """
+        Initialize empty moments.
+
+        Args:
+            n_features (int): Number of features
+        """
+        self.count = np.zeros(n_features, dtype=np.int64)
+        self.mean = np.zeros(n_features, dtype=np.float64)
+        self.m2 = np.zeros(n_features, dtype=np.float64)
+        self.rows = 0
+        self.nonfinite = np.zeros(n_features, dtype=np.int64)
+        self.dropped_rows = 0
+
+    def update(self, X, drop_incomplete=False):
+        """
+        Add one chunk of rows.
+
+        Args:
+            X (numpy.ndarray): Raw feature values, one column per feature
+            drop_incomplete (bool): Drop rows with any non-finite value
+                instead of ignoring those values per feature
+        """
+        # Column-major, so the sums below run along contiguous columns and
+        # numpy sums them pairwise (error growing with log n, not n)
+        X = np.array(X, dtype=np.float64, order='F')
+        finite = np.isfinite(X)
+        self.rows += len(X)
+        self.nonfinite += len(X) - finite.sum(axis=0)
+        if drop_incomplete:
+            complete = finite.all(axis=1)
+            self.dropped_rows += int(len(X) - np.count_nonzero(complete))
+            X, finite = np.asfortranarray(X[complete]), np.asfortranarray(finite[complete])
+        X[~finite] = 0.0
+        count = finite.sum(axis=0)
+        if not count.any():
+            return
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(count > 0, X.sum(axis=0) / count, 0.0)
+        deviations = X - mean
+        deviations[~finite] = 0.0
+        # The deviations sum to the rounding error of the mean; subtracting
+        # its share keeps features with a large offset accurate
+        correction = deviations.sum(axis=0)
+        deviations *= deviations
+        m2 = deviations.sum(axis=0) - correction * correction / np.maximum(count, 1)
+        self._combine(count, mean, m2)
+
+    def merge(self, other):
+        """
+        Add the moments of another accumulator.
+
+        Args:
+            other (StreamingMoments): Moments of the same features
+        """
+        self._combine(other.count, other.mean, other.m2)
+        self.rows += other.rows
+        self.nonfinite += other.nonfinite
+        self.dropped_rows += other.dropped_rows
+
+    def _combine(self, count, mean, m2):
+        # Chan et al.: the deviation of the two means, weighted by both counts
+        total = self.count + count
+        with np.errstate(invalid='ignore', divide='ignore'):
+            delta = mean - self.mean
+            share = np.where(total > 0, count / np.maximum(total, 1), 0.0)
+            self.m2 = self.m2 + m2 + delta * delta * self.count * share
+            self.mean = self.mean + delta * share
+        self.count = total
+
+    def variance(self):
+        """Population variance per feature (0 where nothing was counted)."""
+        return np.where(self.count > 0, self.m2 / np.maximum(self.count, 1), 0.0)
+
+    def to_scaler(self, features):
+        """
+        Build the StandardScaler these moments describe.
+
+        Args:
+            features (list): Feature names, in column order
+
+        Returns:
+            StandardScaler: Fitted scaler
+        """
+        scaler = StandardScaler()
+        scaler.feature_names_in_ = np.asarray(features, dtype=object)
+        scaler.n_features_in_ = len(features)
+        counts = self.count.astype(np.float64)
+        # StandardScaler keeps a single count when no feature had missing values
+        scaler.n_samples_seen_ = counts[0] if counts.min() == counts.max() else counts
+        scaler.mean_ = self.mean.copy()
+        scaler.var_ = self.variance()
+        # As StandardScaler: features constant up to rounding get a scale of 1
+        eps = np.finfo(np.float64).eps
+        constant = scaler.var_ <= counts * eps * scaler.var_ + (counts * scaler.mean_ * eps) ** 2
+        scaler.scale_ = np.where(constant, 1.0, np.sqrt(scaler.var_))
+        return scaler
+
+class _CSVRange(io.RawIOBase):
+    """
+    The header line of a CSV file followed by the lines starting within
+    [start, end), as a readable stream for pandas.
+    """
+
+    def __init__(self, file_path, start, end):
+        super().__init__()
+        self.file = open(file_path, 'rb')
+        self.pending = self.file.readline()
+        self.start = self._line_start(start)
+        self.end = self._line_start(end)
+        self.file.seek(self.start)
+
+    def _line_start(self, offset):
+        # First line starting at or after offset (a line starting exactly at
+        # offset belongs here, one crossing it to the previous range)
+        header_end = len(self.pending)
+        if offset <= header_end:
+            return header_end
+        self.file.seek(offset - 1)
+        self.file.readline()
+        return self.file.tell()
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.pending:
+            size = min(len(buffer), len(self.pending))
+            buffer[:size] = self.pending[:size]
+            self.pending = self.pending[size:]
+            return size
+        size = min(len(buffer), self.end - self.file.tell())
+        if size <= 0:
+            return 0
+        return self.file.readinto(memoryview(buffer)[:size])
+
+    def close(self):
+        self.file.close()
+        super().close()
+
+def _partitions(file_path, parts):
+    """Byte ranges (CSV) or row group lists (Parquet) for each worker."""
+    if file_path.lower().endswith(('.parquet', '.pq')):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("pyarrow is required to read Parquet datasets")
+        groups = np.arange(pq.ParquetFile(file_path).num_row_groups)
+        return [part.tolist() for part in np.array_split(groups, parts) if len(part)]
+    size = os.path.getsize(file_path)
+    bounds = np.linspace(0, size, parts + 1).astype(np.int64)
+    return list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+def _iter_partition(file_path, features, partition, chunksize):
+    if isinstance(partition, list):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(file_path).iter_batches(batch_size=chunksize, row_groups=partition,
+                                                            columns=list(features)):
+            yield batch.to_pandas()
+        return
+    import pandas as pd
+    with io.BufferedReader(_CSVRange(file_path, *partition), buffer_size=1 << 20) as stream:
+        yield from pd.read_csv(stream, usecols=list(features), chunksize=chunksize)
+
+def _fit_partition(file_path, features, partition, chunksize, drop_incomplete):
+    moments = StreamingMoments(len(features))
+    chunks = (iter_column_chunks(file_path, features, chunksize) if partition is None else
+              _iter_partition(file_path, features, partition, chunksize))
+    for chunk in chunks:
+        moments.update(chunk[features].to_numpy(dtype=np.float64), drop_incomplete)
+    return moments
+
+def fit_scaler(file_path, selected_features, chunksize=100000, workers=1, drop_incomplete=False):
+    """
+    Fit a StandardScaler on a CSV or Parquet dataset of any size.
+
+    With several workers, CSV files are split into byte ranges at line
+    boundaries (so quoted fields must not contain newlines) and Parquet
+    files into row groups, each read by its own process.
+
+    Args:
+        file_path (str): Path to the CSV or Parquet file
+        selected_features (list): Features to scale
+        chunksize (int): Number of rows per chunk
+        workers (int): Number of processes reading the dataset
+        drop_incomplete (bool): Drop rows with any non-finite feature value
+            instead of ignoring those values per feature
+
+    Returns:
+        tuple: (fitted StandardScaler, StreamingMoments)
+    """
+    features = list(selected_features)
+    try:
+        if workers <= 1:
+            moments = _fit_partition(file_path, features, None, chunksize, drop_incomplete)
+        else:
+            moments = StreamingMoments(len(features))
+            partitions = _partitions(file_path, workers)
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for partial in executor.map(_fit_partition, [file_path] * len(partitions),
+                                            [features] * len(partitions), partitions,
+                                            [chunksize] * len(partitions), [drop_incomplete] * len(partitions)):
+                    moments.merge(partial)
+        if not moments.count.all():
+            missing = [feature for feature, count in zip(features, moments.count) if not count]
+            raise ValueError(f"No finite values for: {', '.join(missing)}")
+        logger.info(f"Scaler fitted on {moments.rows} rows of {file_path} "
+                    f"({int(moments.nonfinite.sum())} non-finite values, {moments.dropped_rows} rows dropped)")
+        return moments.to_scaler(features), moments
+    except Exception as e:
+        logger.error(f"Error fitting scaler: {str(e)}")
+        raise
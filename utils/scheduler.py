@@ -0,0 +1,188 @@
+"""
+Priority scheduling of model inference for the intrusion detection system.
+Interactive requests, streaming sensors and bulk file analysis share the
+same CPU. The scheduler hands out a fixed number of inference slots in
+priority order and splits large batches into slices, so a bulk upload
+gives up its slot between slices and a waiting interactive request runs
+next instead of queueing behind the whole file.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from .instrumentation import REGISTRY, set_queue_depth
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Highest priority first
+PRIORITY_CLASSES = ('interactive', 'streaming', 'bulk')
+
+# Rows per slice (None: never split)
+DEFAULT_SLICE_ROWS = {'interactive': None, 'streaming': 10000, 'bulk': 2000}
+
+# Slices of a class running at the same time
+DEFAULT_MAX_CONCURRENCY = {'interactive': 4, 'streaming': 2, 'bulk': 1}
+
+# Batches of a class waiting for a slot before new ones are refused
+DEFAULT_MAX_QUEUED = {'interactive': 64, 'streaming': 32, 'bulk': 8}
+
+SCHEDULER_WAIT_SECONDS = REGISTRY.histogram(
+    'ids_scheduler_wait_seconds', 'Time inference slices waited for a slot', ('priority',)
+)
+SCHEDULER_REJECTED = REGISTRY.counter(
+    'ids_scheduler_rejected_total', 'Batches refused because their queue was full', ('priority',)
+)
+
+class SchedulerFull(Exception):
+    """
+    Raised when a priority class's queue is full.
+    """
+
+class InferenceScheduler:
+    """
+    Runs a predict function in priority order on a limited number of slots.
+    """
+
+    def __init__(self, predict_fn, slots=None, slice_rows=None, max_concurrency=None, max_queued=None):
+        """
+        Initialize the scheduler.
+
+        Args:
+            predict_fn (callable): Function taking scaled data and returning
+                a tuple of per-row arrays, e.g. IntrusionDetector.predict
+            slots (int, optional): Slices running at the same time across all
+                classes (defaults to the number of CPUs)
+            slice_rows (dict, optional): Rows per slice by priority class
+            max_concurrency (dict, optional): Running slices by priority class
+            max_queued (dict, optional): Waiting batches by priority class
+        """
+        self.predict_fn = predict_fn
+        self.slots = slots or os.cpu_count() or 1
+        self.slice_rows = dict(DEFAULT_SLICE_ROWS, **(slice_rows or {}))
+        self.max_concurrency = dict(DEFAULT_MAX_CONCURRENCY, **(max_concurrency or {}))
+        self.max_queued = dict(DEFAULT_MAX_QUEUED, **(max_queued or {}))
+
+        self.condition = threading.Condition()
+        self.free_slots = self.slots
+        self.running = dict.fromkeys(PRIORITY_CLASSES, 0)
+        self.waiting = {priority: deque() for priority in PRIORITY_CLASSES}
+        self.queued_batches = dict.fromkeys(PRIORITY_CLASSES, 0)
+
+    def predict(self, X_scaled, priority='interactive', timeout=None):
+        """
+        Run the predict function on a batch, slice by slice, in priority order.
+
+        Args:
+            X_scaled (numpy.ndarray): Scaled feature data
+            priority (str): Priority class of the caller
+            timeout (float, optional): Seconds to wait for each slot
+
+        Returns:
+            tuple: The predict function's result for the whole batch
+                ((decisions, scores), both empty, for an empty batch, which
+                is not run)
+        """
+        if priority not in PRIORITY_CLASSES:
+            raise ValueError(f"Invalid priority class: {priority}")
+        if X_scaled.shape[0] == 0:
+            return np.zeros(0, dtype=int), np.zeros(0, dtype=np.float64)
+
+        with self.condition:
+            if self.queued_batches[priority] >= self.max_queued[priority]:
+                SCHEDULER_REJECTED.labels(priority).inc()
+                raise SchedulerFull(f"Too many {priority} batches waiting")
+            self.queued_batches[priority] += 1
+
+        try:
+            num_rows = X_scaled.shape[0]
+            slice_rows = self.slice_rows[priority] or num_rows
+            parts = []
+            for start in range(0, num_rows, slice_rows):
+                self._acquire(priority, timeout)
+                try:
+                    parts.append(self.predict_fn(X_scaled[start:start + slice_rows]))
+                finally:
+                    self._release(priority)
+        finally:
+            with self.condition:
+                self.queued_batches[priority] -= 1
+
+        if len(parts) == 1:
+            return parts[0]
+        return tuple(np.concatenate(arrays) for arrays in zip(*parts))
+
+    def status(self):
+        """
+        Get the scheduler's current load.
+
+        Returns:
+            dict: Running slices and waiting batches by priority class
+        """
+        with self.condition:
+            return {
+                priority: {
+                    'running': self.running[priority],
+                    'waiting': len(self.waiting[priority]),
+                    'batches': self.queued_batches[priority]
+                }
+                for priority in PRIORITY_CLASSES
+            }
+
+    def _eligible(self, priority):
+        return bool(self.waiting[priority]) and self.running[priority] < self.max_concurrency[priority]
+
+    def _next_priority(self):
+        """
+        Priority class whose oldest waiting slice runs next, if a slot is free.
+        """
+        if self.free_slots <= 0:
+            return None
+        for priority in PRIORITY_CLASSES:
+            if self._eligible(priority):
+                return priority
+        return None
+
+    def _acquire(self, priority, timeout):
+        ticket = object()
+        start = time.perf_counter()
+        deadline = None if timeout is None else start + timeout
+        with self.condition:
+            queue = self.waiting[priority]
+            queue.append(ticket)
+            set_queue_depth(f'scheduler_{priority}', len(queue))
+            try:
+                while not (self._next_priority() == priority and queue[0] is ticket):
+                    remaining = None if deadline is None else deadline - time.perf_counter()
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError(f"No inference slot for {priority} work within {timeout}s")
+                    self.condition.wait(remaining)
+            except BaseException:
+                queue.remove(ticket)
+                set_queue_depth(f'scheduler_{priority}', len(queue))
+                self.condition.notify_all()
+                raise
+            queue.popleft()
+            set_queue_depth(f'scheduler_{priority}', len(queue))
+            self.running[priority] += 1
+            self.free_slots -= 1
+            if self.free_slots > 0:
+                # Another slot is free: the new head waiter (of this class or
+                # another) may run now rather than at the next release
+                self.condition.notify_all()
+        SCHEDULER_WAIT_SECONDS.labels(priority).observe(time.perf_counter() - start)
+
+    def _release(self, priority):
+        with self.condition:
+            self.running[priority] -= 1
+            self.free_slots += 1
+            self.condition.notify_all()
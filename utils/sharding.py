@@ -0,0 +1,381 @@
+"""
+Hash-sharded flow tracking for the intrusion detection system.
+One flow table on one core cannot keep up with a busy link, so the tracker
+splits the work across worker processes. The dispatcher parses packet
+blocks (utils.packets), computes the symmetric 5-tuple hash of every packet
+(utils.flow_table.flow_hash) and sends each worker the packets whose hash
+falls in its shard. Both directions of a connection hash alike, so each
+flow lives entirely in one worker's FlowTable and no state is shared
+between processes. Every worker loads its own IntrusionDetector, scores
+the flows that end in batches, and returns alert batches to the parent,
+which writes them to the shared alert store (SQLite has a single writer).
+A source's flows are spread over all shards, so scan and flood detection
+(utils.correlation) runs in the parent on the ended flows' addresses and
+ports, which the workers send back with their alerts.
+"""
+
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from numpy.lib.recfunctions import repack_fields
+
+from .alerts import build_alerts
+from .data_processor import scale_features
+from .flow_table import DEFAULT_FLOW_TIMEOUT, DEFAULT_IDLE_TIMEOUT, FlowTable, flow_hash
+from .netflow import fill_unavailable, format_addresses
+from .prefilter import Prefilter, RuleSet, score_undecided
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 2
+# Packets hashed and split together, and ended flows scored together
+DEFAULT_DISPATCH_PACKETS = 65536
+DEFAULT_BATCH_FLOWS = 20000
+# Blocks queued per worker before the dispatcher waits
+DEFAULT_QUEUE_BLOCKS = 8
+# Seconds a blocked put waits before checking that the worker is still alive
+PUT_TIMEOUT = 1.0
+# Flow fields sent back for cross-flow detection and top talkers
+ENDPOINT_FIELDS = ['src_addr', 'dst_addr', 'ip_version', 'dst_port', 'last_ts', 'fwd_len_sum', 'bwd_len_sum']
+
+def shard_of(keys, workers):
+    """
+    Get the shard of each flow key.
+
+    Args:
+        keys (numpy.ndarray): uint64 flow keys from flow_hash
+        workers (int): Number of shards
+
+    Returns:
+        numpy.ndarray: Shard index per key
+    """
+    # The high half, so shard choice and table slots use different bits
+    return ((keys >> np.uint64(32)) % np.uint64(workers)).astype(np.int64)
+
+def score_flows(detector, features, rows, source, prefilter=None):
+    """
+    Score ended flows and build alerts for the intrusions.
+
+    Args:
+        detector (IntrusionDetector): Loaded detector
+        features (pandas.DataFrame): Flow features from FlowTable
+        rows (numpy.ndarray): Flow state rows from FlowTable
+        source (str): Alert source
+        prefilter (Prefilter, optional): Rules deciding flows before scoring
+
+    Returns:
+        tuple: (number of intrusions, AlertBatch or None)
+    """
+    if not len(rows):
+        return 0, None
+    X = fill_unavailable(features.reindex(columns=detector.selected_features), detector.scaler)
+    X_scaled = scale_features(X, detector.scaler, detector.float32)
+    rules = None
+    if prefilter is None:
+        predictions, confidence_scores = detector.predict(X_scaled)
+    else:
+        decisions, rules = prefilter.evaluate_records(rows)
+        predictions, confidence_scores = score_undecided(decisions, detector.predict, X_scaled)
+    flagged = np.flatnonzero(predictions)
+    if not len(flagged):
+        return 0, None
+    details = X.iloc[flagged].reset_index(drop=True)
+    details['source_ip'], details['destination_ip'] = format_addresses(rows[flagged])
+    details['source_port'] = rows['src_port'][flagged]
+    details['protocol'] = rows['protocol'][flagged]
+    if rules is not None:
+        details['prefilter_rule'] = rules[flagged]
+    batch = build_alerts(details, np.ones(len(flagged), dtype=int), np.asarray(confidence_scores)[flagged], source)
+    return len(flagged), batch
+
+def _worker(shard, model_dir, inbox, outbox, options):
+    """Worker process: own flow table and detector, fed by the dispatcher."""
+    from .prediction import IntrusionDetector
+
+    logging.getLogger('utils.prediction').setLevel(logging.WARNING)
+    logging.getLogger('utils.alerts').setLevel(logging.WARNING)
+    try:
+        detector = IntrusionDetector(model_dir, float32=options['float32'])
+        table = FlowTable(flow_timeout=options['flow_timeout'], idle_timeout=options['idle_timeout'])
+        rules = options['prefilter_rules']
+        prefilter = Prefilter(rules) if rules is not None else None
+        stats = {'shard': shard, 'packets': 0, 'flows': 0, 'intrusions': 0, 'table_seconds': 0.0,
+                 'score_seconds': 0.0, 'max_open_flows': 0}
+        pending, pending_flows = [], 0
+
+        def score(parts):
+            start = time.perf_counter()
+            features = parts[0][0] if len(parts) == 1 else pd.concat([f for f, _ in parts])
+            rows = np.concatenate([r for _, r in parts])
+            intrusions, batch = score_flows(detector, features, rows, options['source'], prefilter)
+            stats['flows'] += len(rows)
+            stats['intrusions'] += intrusions
+            stats['score_seconds'] += time.perf_counter() - start
+            if batch is not None:
+                outbox.put(('alerts', shard, batch))
+            if options['endpoints']:
+                outbox.put(('flows', shard, repack_fields(rows[ENDPOINT_FIELDS])))
+
+        while True:
+            item = inbox.get()
+            if item is None:
+                break
+            if isinstance(item[0], str):
+                # ('rules', rules): the prefilter rules changed
+                prefilter.rules = RuleSet(item[1])
+                continue
+            packets, keys = item
+            start = time.perf_counter()
+            ended = table.update(packets, keys)
+            stats['table_seconds'] += time.perf_counter() - start
+            stats['packets'] += len(packets)
+            stats['max_open_flows'] = max(stats['max_open_flows'], len(table))
+            if len(ended[1]):
+                pending.append(ended)
+                pending_flows += len(ended[1])
+            if pending_flows >= options['batch_flows']:
+                score(pending)
+                pending, pending_flows = [], 0
+
+        start = time.perf_counter()
+        remaining = table.flush()
+        stats['table_seconds'] += time.perf_counter() - start
+        if len(remaining[1]):
+            pending.append(remaining)
+        if pending:
+            score(pending)
+        if prefilter is not None:
+            stats['prefilter'] = prefilter.status()
+        outbox.put(('done', shard, stats))
+    except Exception as e:
+        logger.error(f"Error in flow worker {shard}: {str(e)}")
+        outbox.put(('error', shard, str(e)))
+
+class ShardedFlowTracker:
+    """
+    Dispatches packets to flow-tracking worker processes by flow hash.
+    """
+
+    def __init__(self, model_dir, workers=DEFAULT_WORKERS, db=None, batch_flows=DEFAULT_BATCH_FLOWS,
+                 dispatch_packets=DEFAULT_DISPATCH_PACKETS, flow_timeout=DEFAULT_FLOW_TIMEOUT,
+                 idle_timeout=DEFAULT_IDLE_TIMEOUT, queue_blocks=DEFAULT_QUEUE_BLOCKS, float32=False,
+                 source='Flow tracker', correlator=None, heavy_hitters=None, prefilter=None):
+        """
+        Initialize the tracker.
+
+        Args:
+            model_dir (str): Model directory each worker loads
+            workers (int): Worker processes (shards)
+            db (DatabaseManager, optional): Shared alert store (None to only count)
+            batch_flows (int): Ended flows each worker scores together
+            dispatch_packets (int): Packets hashed and split together
+            flow_timeout (float): Seconds after which a flow is cut
+            idle_timeout (float): Seconds without packets after which a flow ends
+            queue_blocks (int): Blocks queued per worker before dispatch waits
+            float32 (bool): Score in float32
+            source (str): Alert source
+            correlator (CrossFlowDetector, optional): Checks the ended flows
+                of all shards for port scans, host scans and floods
+            heavy_hitters (TrafficHeavyHitters, optional): Counts the ended
+                flows of all shards in the top talkers (payload bytes)
+            prefilter (Prefilter, optional): Allowlist/blocklist rules the
+                workers check before scoring; reloaded here and sent to the
+                workers when they change
+        """
+        self.model_dir = model_dir
+        self.workers = workers
+        self.db = db
+        self.dispatch_packets = dispatch_packets
+        self.queue_blocks = queue_blocks
+        self.options = {'batch_flows': batch_flows, 'flow_timeout': flow_timeout, 'idle_timeout': idle_timeout,
+                        'float32': float32, 'source': source,
+                        'endpoints': correlator is not None or heavy_hitters is not None,
+                        'prefilter_rules': prefilter.rules.rules if prefilter is not None else None}
+        self.correlator = correlator
+        self.heavy_hitters = heavy_hitters
+        self.prefilter = prefilter
+        self.processes = []
+        self.inboxes = []
+        self.outbox = None
+        self.collector = None
+        self.pending = []
+        self.pending_packets = 0
+        self.shard_stats = {}
+        self.errors = []
+        self.alerts = 0
+        self.cross_flow_alerts = 0
+        self.stats = {'packets': 0, 'dispatch_seconds': 0.0, 'blocked_seconds': 0.0}
+
+    def start(self):
+        """Start the worker processes and the alert writer."""
+        context = multiprocessing.get_context()
+        self.outbox = context.Queue()
+        for shard in range(self.workers):
+            inbox = context.Queue(self.queue_blocks)
+            process = context.Process(target=_worker, args=(shard, self.model_dir, inbox, self.outbox, self.options),
+                                      name=f'flow-worker-{shard}', daemon=True)
+            process.start()
+            self.inboxes.append(inbox)
+            self.processes.append(process)
+        self.collector = threading.Thread(target=self._collect, name='flow-alert-writer', daemon=True)
+        self.collector.start()
+        self.started = time.perf_counter()
+
+    def _collect(self):
+        """Store the workers' alerts and pass their flows on until all are done."""
+        finished = 0
+        while finished < self.workers:
+            try:
+                kind, shard, payload = self.outbox.get(timeout=1)
+            except queue.Empty:
+                if not any(process.is_alive() for process in self.processes):
+                    break
+                continue
+            if kind == 'alerts':
+                self.alerts += len(payload)
+                if self.db is not None:
+                    self.db.add_alerts(payload)
+            elif kind == 'flows':
+                now = float(payload['last_ts'].max())
+                if self.heavy_hitters is not None:
+                    self.heavy_hitters.update(payload['src_addr'], payload['dst_addr'], payload['dst_port'],
+                                              payload['fwd_len_sum'] + payload['bwd_len_sum'], now,
+                                              payload['ip_version'])
+                if self.correlator is None:
+                    continue
+                batch = self.correlator.update(payload, now=now)
+                if batch is not None:
+                    self.cross_flow_alerts += len(batch)
+                    if self.db is not None:
+                        self.db.add_alerts(batch)
+            elif kind == 'done':
+                self.shard_stats[shard] = payload
+                if self.prefilter is not None and 'prefilter' in payload:
+                    self.prefilter.add_counts(payload['prefilter'])
+                finished += 1
+            else:
+                self.errors.append((shard, payload))
+                finished += 1
+
+    def submit(self, packets):
+        """
+        Queue packets (in capture order) for their shards.
+
+        Args:
+            packets (numpy.ndarray): PACKET_DTYPE records
+
+        Raises:
+            RuntimeError: If a worker has failed (close() still stops the others)
+        """
+        self.pending.append(packets)
+        self.pending_packets += len(packets)
+        if self.pending_packets >= self.dispatch_packets:
+            self._dispatch()
+
+    def _dispatch(self):
+        if not self.pending:
+            return
+        self._check_workers()
+        if self.prefilter is not None and self.prefilter.reload():
+            for shard in range(self.workers):
+                self._put(shard, ('rules', self.prefilter.rules.rules))
+        start = time.perf_counter()
+        packets = self.pending[0] if len(self.pending) == 1 else np.concatenate(self.pending)
+        self.pending, self.pending_packets = [], 0
+        keys = flow_hash(packets)
+        shards = shard_of(keys, self.workers)
+        # A stable sort keeps each shard's packets in capture order
+        order = np.argsort(shards, kind='stable')
+        bounds = np.searchsorted(shards[order], np.arange(self.workers + 1))
+        blocked = 0.0
+        for shard in range(self.workers):
+            index = order[bounds[shard]:bounds[shard + 1]]
+            if len(index):
+                waited = time.perf_counter()
+                self._put(shard, (packets[index], keys[index]))
+                blocked += time.perf_counter() - waited
+        self.stats['packets'] += len(packets)
+        self.stats['blocked_seconds'] += blocked
+        self.stats['dispatch_seconds'] += time.perf_counter() - start - blocked
+
+    def _worker_error(self, shard):
+        # The worker's error report may still be on its way to the collector
+        deadline = time.perf_counter() + PUT_TIMEOUT
+        while True:
+            for failed, error in self.errors:
+                if failed == shard:
+                    return error
+            if time.perf_counter() > deadline or not self.collector.is_alive():
+                return f"exited with code {self.processes[shard].exitcode}"
+            time.sleep(0.05)
+
+    def _check_workers(self):
+        """Raise if a worker has failed: its shard's packets cannot be tracked."""
+        for shard, process in enumerate(self.processes):
+            if not process.is_alive():
+                raise RuntimeError(f"Flow worker {shard} failed: {self._worker_error(shard)}")
+
+    def _put(self, shard, item):
+        """Queue an item for a worker, waiting while its inbox is full unless the worker dies."""
+        while True:
+            try:
+                self.inboxes[shard].put(item, timeout=PUT_TIMEOUT)
+                return
+            except queue.Full:
+                if not self.processes[shard].is_alive():
+                    raise RuntimeError(f"Flow worker {shard} failed: {self._worker_error(shard)}")
+
+    def close(self):
+        """
+        Flush the dispatcher, let every worker score its remaining flows and stop.
+
+        Returns:
+            dict: Totals (packets, flows, intrusions, alerts, seconds) and
+                per-shard statistics
+        """
+        try:
+            self._dispatch()
+        except RuntimeError:
+            # Reported below with the workers' errors
+            self.pending, self.pending_packets = [], 0
+        for shard in range(self.workers):
+            try:
+                self._put(shard, None)
+            except RuntimeError:
+                pass
+        self.collector.join()
+        for process in self.processes:
+            process.join()
+        for inbox in self.inboxes:
+            # Blocks left for a failed worker are never read: do not wait at
+            # exit for them to be flushed into its pipe
+            inbox.cancel_join_thread()
+        reported = {shard for shard, _ in self.errors}
+        for shard, process in enumerate(self.processes):
+            if process.exitcode and shard not in reported:
+                self.errors.append((shard, f"exited with code {process.exitcode}"))
+        seconds = time.perf_counter() - self.started
+        shards = [self.shard_stats[shard] for shard in sorted(self.shard_stats)]
+        if self.errors:
+            logger.error(f"Flow workers failed: {self.errors}")
+        return dict(
+            self.stats,
+            seconds=seconds,
+            workers=self.workers,
+            flows=sum(stats['flows'] for stats in shards),
+            intrusions=sum(stats['intrusions'] for stats in shards),
+            alerts=self.alerts,
+            cross_flow_alerts=self.cross_flow_alerts,
+            shards=shards,
+            errors=self.errors
+        )
@@ -0,0 +1,235 @@
+"""
+Fixed-memory probabilistic sketches for the intrusion detection system.
+The cross-flow detectors (utils.correlation) count, per source or
+destination, how many distinct ports and hosts it talked to and how many
+flows it received, for any number of sources. Exact per-key sets would
+grow with the traffic, so they use:
+
+- VirtualHyperLogLog: per-key distinct counts ("spread") from one shared
+  array of HyperLogLog registers. Each key uses virtual_registers
+  registers picked pseudo-randomly from the shared array; the noise added
+  by other keys sharing those registers is estimated from the whole array
+  and subtracted (Xiao et al., "Better with Fewer Bits", SIGMETRICS 2015).
+- CountMinSketch: per-key counts as the minimum over depth hashed counter
+  rows; never underestimates.
+
+Updates and queries take numpy arrays of uint64 hashes (see hash64 and
+hash_addresses) and run without Python loops over the items.
+"""
+
+import logging
+
+import numpy as np
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+_C1 = np.uint64(0xBF58476D1CE4E5B9)
+_C2 = np.uint64(0x94D049BB133111EB)
+_GOLDEN = 0x9E3779B97F4A7C15
+# Bits of the item hash used for the register value (exact in float64)
+RANK_BITS = 50
+_POWERS = 2.0 ** -np.arange(RANK_BITS + 2)
+
+def mix64(x):
+    """
+    splitmix64 finalizer (uint64 arithmetic wraps).
+
+    Args:
+        x (numpy.ndarray): uint64 values
+
+    Returns:
+        numpy.ndarray: Mixed uint64 values
+    """
+    x = x ^ (x >> np.uint64(30))
+    x = x * _C1
+    x = x ^ (x >> np.uint64(27))
+    x = x * _C2
+    return x ^ (x >> np.uint64(31))
+
+def hash64(values, seed=0):
+    """
+    64-bit hashes of integers.
+
+    Args:
+        values (numpy.ndarray): Integer values
+        seed (int): Hash seed
+
+    Returns:
+        numpy.ndarray: uint64 hashes
+    """
+    offset = np.uint64(_GOLDEN * (seed + 1) % (1 << 64))
+    return mix64(np.asarray(values).astype(np.uint64) + offset)
+
+def hash_addresses(column, seed=0):
+    """
+    64-bit hashes of 16-byte address values (IPv4 zero-padded, or IPv6).
+
+    Args:
+        column (numpy.ndarray): V16 address field
+        seed (int): Hash seed
+
+    Returns:
+        numpy.ndarray: uint64 hashes
+    """
+    words = np.ascontiguousarray(column).view('<u8').reshape(-1, 2)
+    return mix64(words[:, 0] ^ hash64(words[:, 1], seed))
+
+def _hll_estimate(inverse_sum, zeros, registers):
+    """HyperLogLog estimate with the small-range (linear counting) correction."""
+    alpha = 0.7213 / (1 + 1.079 / registers)
+    raw = alpha * registers * registers / inverse_sum
+    with np.errstate(divide='ignore'):
+        linear = registers * np.log(registers / np.maximum(zeros, 1))
+    return np.where((raw <= 2.5 * registers) & (zeros > 0), linear, raw)
+
+class VirtualHyperLogLog:
+    """
+    Per-key distinct counts in one shared array of HyperLogLog registers.
+    """
+
+    def __init__(self, registers=1 << 22, virtual_registers=128, seed=0):
+        """
+        Initialize the sketch.
+
+        Args:
+            registers (int): Shared registers (one byte each)
+            virtual_registers (int): Registers per key (power of two); the
+                relative error of an estimate is about 1.04 / sqrt of this
+            seed (int): Hash seed
+        """
+        if virtual_registers & (virtual_registers - 1):
+            raise ValueError("virtual_registers must be a power of two")
+        self.size = int(registers)
+        self.virtual = int(virtual_registers)
+        self.registers = np.zeros(self.size, dtype=np.uint8)
+        # Histogram of register values, kept up to date for the noise estimate
+        self.histogram = np.zeros(RANK_BITS + 2, dtype=np.int64)
+        self.histogram[0] = self.size
+        self.salts = hash64(np.arange(self.virtual), seed + 1)
+        self.seed = seed
+
+    @property
+    def nbytes(self):
+        return self.registers.nbytes + self.histogram.nbytes + self.salts.nbytes
+
+    def clear(self):
+        self.registers.fill(0)
+        self.histogram.fill(0)
+        self.histogram[0] = self.size
+
+    def _positions(self, keys, virtual_index):
+        return (mix64(keys ^ self.salts[virtual_index]) % np.uint64(self.size)).astype(np.int64)
+
+    def add(self, keys, items):
+        """
+        Record that each key was seen with the matching item.
+
+        Args:
+            keys (numpy.ndarray): uint64 key hashes (for example a source address)
+            items (numpy.ndarray): uint64 item hashes (for example a destination port)
+        """
+        if not len(keys):
+            return
+        items = mix64(items ^ np.uint64(self.seed))
+        virtual_index = (items % np.uint64(self.virtual)).astype(np.int64)
+        bits = (items >> np.uint64(64 - RANK_BITS)).astype(np.float64)
+        # Position of the highest set bit counted from the top, 1-based
+        rank = np.where(bits > 0, RANK_BITS + 1 - np.frexp(bits)[1], RANK_BITS + 1).astype(np.uint8)
+        positions = self._positions(keys, virtual_index)
+
+        # Largest rank per register, then only the registers that grow change
+        order = np.lexsort((rank, positions))
+        positions, rank = positions[order], rank[order]
+        last = np.flatnonzero(np.concatenate([positions[1:] != positions[:-1], [True]]))
+        positions, rank = positions[last], rank[last]
+        old = self.registers[positions]
+        grown = rank > old
+        if grown.any():
+            self.histogram -= np.bincount(old[grown], minlength=len(self.histogram))
+            self.histogram += np.bincount(rank[grown], minlength=len(self.histogram))
+            self.registers[positions[grown]] = rank[grown]
+
+    def total(self):
+        """
+        Estimate the distinct (key, item) pairs in the whole sketch.
+
+        Returns:
+            float: Estimate
+        """
+        return float(_hll_estimate((self.histogram * _POWERS).sum(), self.histogram[0], self.size))
+
+    def estimate(self, keys):
+        """
+        Estimate the distinct items seen with each key.
+
+        Args:
+            keys (numpy.ndarray): uint64 key hashes
+
+        Returns:
+            numpy.ndarray: Estimates (float64, noise-corrected, never negative)
+        """
+        m, size = self.virtual, self.size
+        values = self.registers[self._positions(np.asarray(keys)[:, None], np.arange(m)[None, :])]
+        own = _hll_estimate(_POWERS[values].sum(axis=1), (values == 0).sum(axis=1), m)
+        noise = self.total() * m / size
+        return np.maximum((own - noise) * size / (size - m), 0.0)
+
+class CountMinSketch:
+    """
+    Per-key counts in depth rows of width counters.
+    """
+
+    def __init__(self, width=1 << 18, depth=4, seed=0):
+        """
+        Initialize the sketch.
+
+        Args:
+            width (int): Counters per row; estimates exceed the true count by
+                at most e / width of the total with probability 1 - exp(-depth)
+            depth (int): Rows (independent hashes)
+            seed (int): Hash seed
+        """
+        self.width = int(width)
+        self.depth = int(depth)
+        self.counters = np.zeros((self.depth, self.width), dtype=np.float64)
+        self.seeds = [seed * self.depth + row for row in range(self.depth)]
+
+    @property
+    def nbytes(self):
+        return self.counters.nbytes
+
+    def clear(self):
+        self.counters.fill(0)
+
+    def _columns(self, keys, row):
+        return (hash64(keys, self.seeds[row]) % np.uint64(self.width)).astype(np.int64)
+
+    def add(self, keys, counts=None):
+        """
+        Add counts to keys.
+
+        Args:
+            keys (numpy.ndarray): uint64 key hashes
+            counts (numpy.ndarray, optional): Count per key (default 1 each)
+        """
+        if not len(keys):
+            return
+        for row in range(self.depth):
+            self.counters[row] += np.bincount(self._columns(keys, row), weights=counts, minlength=self.width)
+
+    def estimate(self, keys):
+        """
+        Estimate the count of each key.
+
+        Args:
+            keys (numpy.ndarray): uint64 key hashes
+
+        Returns:
+            numpy.ndarray: Estimates (upper bounds of the true counts)
+        """
+        return np.min([self.counters[row][self._columns(keys, row)] for row in range(self.depth)], axis=0)
@@ -0,0 +1,178 @@
+"""
+Streaming serialization of prediction results for the intrusion detection system.
+This module turns per-chunk score arrays into NDJSON or CSV text without
+building a Python dict per row, so large batch responses can be streamed
+to the client as soon as the first chunk has been scored.
+"""
+
+import json
+import logging
+
+import numpy as np
+import pandas as pd
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Output formats supported by /predict-file
+RESULT_FORMATS = ('json', 'ndjson', 'csv', 'intrusions')
+
+MIMETYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+def _results_frame(offset, predictions, confidence_scores):
+    """
+    Build a columnar results frame for one chunk.
+
+    Args:
+        offset (int): Row index of the first row in the chunk
+        predictions (numpy.ndarray): Binary predictions for the chunk
+        confidence_scores (numpy.ndarray): Confidence scores for the chunk
+
+    Returns:
+        pandas.DataFrame: Frame with index, is_intrusion and confidence columns
+    """
+    return pd.DataFrame({
+        'index': np.arange(offset, offset + len(predictions)),
+        'is_intrusion': np.asarray(predictions).astype(bool),
+        'confidence': np.asarray(confidence_scores, dtype=np.float64)
+    })
+
+def serialize_ndjson(offset, predictions, confidence_scores):
+    """
+    Serialize one chunk of results as newline-delimited JSON.
+
+    Args:
+        offset (int): Row index of the first row in the chunk
+        predictions (numpy.ndarray): Binary predictions for the chunk
+        confidence_scores (numpy.ndarray): Confidence scores for the chunk
+
+    Returns:
+        str: One JSON object per line, terminated by a newline
+    """
+    if len(predictions) == 0:
+        return ''
+    frame = _results_frame(offset, predictions, confidence_scores)
+    text = frame.to_json(orient='records', lines=True, double_precision=15)
+    return text if text.endswith('\n') else text + '\n'
+
+def serialize_csv(offset, predictions, confidence_scores, header=False):
+    """
+    Serialize one chunk of results as CSV.
+
+    Args:
+        offset (int): Row index of the first row in the chunk
+        predictions (numpy.ndarray): Binary predictions for the chunk
+        confidence_scores (numpy.ndarray): Confidence scores for the chunk
+        header (bool): Whether to emit the header row
+
+    Returns:
+        str: CSV text for the chunk
+    """
+    text = 'index,is_intrusion,confidence\n' if header else ''
+    if len(predictions) == 0:
+        return text
+
+    # pandas' C JSON writer formats floats far faster than to_csv does
+    confidence = pd.Series(np.asarray(confidence_scores, dtype=np.float64)).to_json(
+        orient='values', double_precision=15
+    )[1:-1].split(',')
+    indices = map(str, range(offset, offset + len(predictions)))
+    flags = np.where(np.asarray(predictions).astype(bool), '1', '0').tolist()
+    return text + '\n'.join(map(','.join, zip(indices, flags, confidence))) + '\n'
+
+def stream_results(chunks, fmt):
+    """
+    Stream scored chunks as NDJSON or CSV text.
+
+    The NDJSON stream ends with a single summary object so clients can
+    verify they received every row. Once streaming has started the status
+    code can no longer report a failure, so an error while scoring a later
+    chunk ends the stream with an error record instead: an
+    {"error": ..., "rows": ...} line for NDJSON, a '# error: ...' line for
+    CSV.
+
+    Args:
+        chunks (iterable): Iterable of (predictions, confidence_scores) tuples
+        fmt (str): Either 'ndjson' or 'csv'
+
+    Yields:
+        str: Serialized text, one piece per chunk
+    """
+    if fmt not in MIMETYPES:
+        raise ValueError(f"Unsupported streaming format: {fmt}")
+
+    offset = 0
+    intrusions = 0
+    header_sent = False
+    try:
+        for predictions, confidence_scores in chunks:
+            if fmt == 'ndjson':
+                text = serialize_ndjson(offset, predictions, confidence_scores)
+            else:
+                text = serialize_csv(offset, predictions, confidence_scores, header=not header_sent)
+                header_sent = True
+
+            offset += len(predictions)
+            intrusions += int(np.count_nonzero(predictions))
+            if text:
+                yield text
+    except Exception as e:
+        logger.error(f"Error streaming results after {offset} rows: {str(e)}")
+        if fmt == 'ndjson':
+            yield json.dumps({'error': str(e), 'rows': offset}) + '\n'
+        else:
+            message = ' '.join(str(e).split())
+            yield ('' if header_sent else serialize_csv(0, [], [], header=True)) + \
+                f"# error after {offset} rows: {message}\n"
+        return
+
+    if fmt == 'csv' and not header_sent:
+        yield serialize_csv(0, [], [], header=True)
+
+    if fmt == 'ndjson':
+        yield json.dumps({'summary': {
+            'total': offset,
+            'intrusions': intrusions,
+            'safe': offset - intrusions
+        }}) + '\n'
+
+    logger.info(f"Streamed {offset} results as {fmt}")
+
+def summarize_intrusions(chunks):
+    """
+    Collect summary counts and only the intrusion rows from scored chunks.
+
+    Args:
+        chunks (iterable): Iterable of (predictions, confidence_scores) tuples
+
+    Returns:
+        dict: Results dictionary in the /predict-file shape, where 'results'
+            holds intrusion rows only
+    """
+    total = 0
+    indices = []
+    confidences = []
+    for predictions, confidence_scores in chunks:
+        hits = np.flatnonzero(predictions)
+        indices.append(hits + total)
+        confidences.append(np.asarray(confidence_scores)[hits])
+        total += len(predictions)
+
+    if indices:
+        indices = np.concatenate(indices).tolist()
+        confidences = np.concatenate(confidences).astype(np.float64).tolist()
+
+    return {
+        'total': total,
+        'intrusions': len(indices),
+        'safe': total - len(indices),
+        'results': [{'index': i, 'is_intrusion': True, 'confidence': c}
+                    for i, c in zip(indices, confidences)]
+    }
@@ -0,0 +1,230 @@
+"""
+Decision threshold tuning for the intrusion detection system.
+From one scoring pass over a labeled dataset the scores are sorted once and
+the whole precision/recall/FPR curve is read off cumulative counts, so a
+threshold meeting a target false positive rate can be recommended without
+re-scoring. Thresholds can also be learned per segment of a feature (e.g.
+destination port ranges) and applied at scoring time with a searchsorted
+lookup on the already scaled feature column.
+"""
+
+import json
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from .data_processor import scale_features
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+SEGMENT_THRESHOLDS_FILE = 'segment_thresholds.json'
+
+def threshold_curve(y_true, scores):
+    """
+    Compute precision, recall and FPR at every distinct score threshold.
+
+    Args:
+        y_true (numpy.ndarray): True binary labels
+        scores (numpy.ndarray): Confidence scores
+
+    Returns:
+        dict: Arrays of thresholds (descending) and, for 'score >= threshold'
+            decisions, tp, fp, precision, recall, false_positive_rate and f1_score
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    y_true = np.asarray(y_true).astype(bool)
+
+    order = np.argsort(-scores, kind='stable')
+    sorted_scores = scores[order]
+    tp = np.cumsum(y_true[order])
+    fp = np.arange(1, len(order) + 1) - tp
+
+    # Last position of each distinct score: everything up to it is flagged
+    last = np.r_[np.flatnonzero(np.diff(sorted_scores)), len(order) - 1] if len(order) else np.array([], dtype=int)
+    tp, fp = tp[last], fp[last]
+    positives = int(np.count_nonzero(y_true))
+    negatives = len(y_true) - positives
+
+    precision = tp / np.maximum(tp + fp, 1)
+    recall = tp / positives if positives else np.zeros(len(tp))
+    with np.errstate(invalid='ignore'):
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+    return {
+        'thresholds': sorted_scores[last],
+        'tp': tp,
+        'fp': fp,
+        'precision': precision,
+        'recall': recall,
+        'false_positive_rate': fp / negatives if negatives else np.zeros(len(fp)),
+        'f1_score': f1
+    }
+
+def recommend_threshold(curve, max_fpr):
+    """
+    Lowest threshold (highest recall) whose false positive rate is at most max_fpr.
+
+    Args:
+        curve (dict): Output of threshold_curve
+        max_fpr (float): Target false positive rate
+
+    Returns:
+        dict: Threshold and its precision, recall, FPR and F1, or None when
+            even the highest threshold exceeds max_fpr
+    """
+    fpr = curve['false_positive_rate']
+    index = int(np.searchsorted(fpr, max_fpr, side='right')) - 1
+    if index < 0:
+        return None
+    return _curve_point(curve, index)
+
+def best_f1_threshold(curve):
+    """
+    Threshold maximizing the F1 score.
+
+    Args:
+        curve (dict): Output of threshold_curve
+
+    Returns:
+        dict: Threshold and its precision, recall, FPR and F1
+    """
+    return _curve_point(curve, int(np.argmax(curve['f1_score'])))
+
+def _curve_point(curve, index):
+    return {
+        'threshold': float(curve['thresholds'][index]),
+        'precision': float(curve['precision'][index]),
+        'recall': float(curve['recall'][index]),
+        'false_positive_rate': float(curve['false_positive_rate'][index]),
+        'f1_score': float(curve['f1_score'][index])
+    }
+
+def learn_segment_thresholds(y_true, scores, segment_values, edges, max_fpr, default_threshold, min_rows=1000):
+    """
+    Learn one threshold per segment of a feature.
+
+    Segment i holds the rows with edges[i-1] <= value < edges[i]. Segments
+    with fewer than min_rows rows, or whose FPR target cannot be met, keep
+    the default threshold.
+
+    Args:
+        y_true (numpy.ndarray): True binary labels
+        scores (numpy.ndarray): Confidence scores
+        segment_values (numpy.ndarray): Raw (unscaled) feature values
+        edges (list): Increasing segment boundaries
+        max_fpr (float): Target false positive rate within each segment
+        default_threshold (float): Threshold of small or unreachable segments
+        min_rows (int): Rows needed to learn a segment's threshold
+
+    Returns:
+        tuple: (thresholds, per-segment details)
+    """
+    y_true = np.asarray(y_true)
+    scores = np.asarray(scores)
+    segment = np.searchsorted(np.asarray(edges, dtype=np.float64), segment_values, side='right')
+
+    thresholds = []
+    details = []
+    for index in range(len(edges) + 1):
+        mask = segment == index
+        rows = int(np.count_nonzero(mask))
+        point = None
+        if rows >= min_rows:
+            point = recommend_threshold(threshold_curve(y_true[mask], scores[mask]), max_fpr)
+        threshold = point['threshold'] if point else default_threshold
+        thresholds.append(threshold)
+        details.append({'segment': index, 'rows': rows, 'learned': point is not None, 'threshold': threshold})
+    return thresholds, details
+
+def save_segment_thresholds(model_dir, feature, edges, thresholds, details=None):
+    """
+    Save per-segment thresholds next to the model.
+
+    Args:
+        model_dir (str): Directory containing the model files
+        feature (str): Segmenting feature
+        edges (list): Increasing segment boundaries in raw feature units
+        thresholds (list): One threshold per segment (len(edges) + 1)
+        details (dict, optional): Tuning details to record
+    """
+    if len(thresholds) != len(edges) + 1:
+        raise ValueError("Need one threshold per segment")
+    config = {'feature': feature, 'edges': [float(e) for e in edges], 'thresholds': [float(t) for t in thresholds]}
+    config.update(details or {})
+    with open(os.path.join(model_dir, SEGMENT_THRESHOLDS_FILE), 'w') as f:
+        json.dump(config, f, indent=2)
+    logger.info(f"Segment thresholds saved to {model_dir}")
+
+class SegmentThresholds:
+    """
+    Per-row threshold lookup on scaled feature data.
+    """
+
+    def __init__(self, feature, edges, thresholds, selected_features, scaler):
+        """
+        Initialize the lookup.
+
+        The segment edges are mapped through the scaler once, with the same
+        arithmetic as the float64 and float32 pipelines, so rows are looked
+        up on their already scaled feature column and a value equal to an
+        edge always lands in the segment above it.
+
+        Args:
+            feature (str): Segmenting feature
+            edges (list): Increasing segment boundaries in raw feature units
+            thresholds (list): One threshold per segment
+            selected_features (list): Model features, in column order
+            scaler: Fitted per-feature scaler
+        """
+        if feature not in selected_features:
+            raise ValueError(f"Segment feature is not a model feature: {feature}")
+        if len(thresholds) != len(edges) + 1:
+            raise ValueError("Need one threshold per segment")
+
+        self.feature = feature
+        self.column = selected_features.index(feature)
+        raw = pd.DataFrame(np.zeros((len(edges), len(selected_features))), columns=selected_features)
+        raw[feature] = np.asarray(edges, dtype=np.float64)
+        self.scaled_edges = np.asarray(scale_features(raw, scaler))[:, self.column]
+        self.scaled_edges32 = scale_features(raw, scaler, float32=True)[:, self.column]
+        self.thresholds = np.asarray(thresholds, dtype=np.float64)
+        self.thresholds32 = self.thresholds.astype(np.float32)
+
+    def lookup(self, X_scaled):
+        """
+        Get each row's threshold.
+
+        Args:
+            X_scaled (numpy.ndarray): Scaled feature data
+
+        Returns:
+            numpy.ndarray: Thresholds, in the precision of X_scaled
+        """
+        if X_scaled.dtype == np.float32:
+            return self.thresholds32[np.searchsorted(self.scaled_edges32, X_scaled[:, self.column], side='right')]
+        return self.thresholds[np.searchsorted(self.scaled_edges, X_scaled[:, self.column], side='right')]
+
+def load_segment_thresholds(model_dir, selected_features, scaler):
+    """
+    Load per-segment thresholds, if they were saved.
+
+    Args:
+        model_dir (str): Directory containing the model files
+        selected_features (list): Model features, in column order
+        scaler: Fitted per-feature scaler
+
+    Returns:
+        SegmentThresholds: The lookup, or None when no thresholds were saved
+    """
+    path = os.path.join(model_dir, SEGMENT_THRESHOLDS_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        config = json.load(f)
+    return SegmentThresholds(config['feature'], config['edges'], config['thresholds'], selected_features, scaler)
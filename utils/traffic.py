@@ -0,0 +1,512 @@
+"""
+Synthetic CICIDS-shaped traffic for load testing.
+Flows are drawn from a mixture of traffic profiles (benign web, DNS and
+bulk transfers; DDoS, port scan and SSH/FTP brute force attacks). Each
+profile only draws the primitives of its flows (packet counts in both
+directions, duration, mean payload lengths and how far the lengths and
+gaps spread, flags, server window), all profiles at once with per-flow
+parameter arrays, and the CICFlowMeter features are then derived from
+those primitives, so the usual relationships hold in every row:
+
+- min <= mean <= max for packet lengths and inter-arrival times, with a
+  standard deviation (variance) the min, mean and max allow;
+- the rates are the packet counts over the duration and down/up_ratio the
+  backward over forward count; per-direction statistics are 0 (lengths,
+  gaps) or -1 (init_win_bytes_backward) for a direction without packets;
+- UDP flows carry no TCP flags, single-gap statistics have no spread.
+
+flow_packets() turns generated flows into PACKET_DTYPE packets (with the
+same counts, duration, addresses and ports) for pcap captures of the
+packet path.
+"""
+
+import logging
+import socket
+import time
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from .packets import (IPPROTO_TCP, IPPROTO_UDP, PACKET_DTYPE, TCP_ACK, TCP_FIN, TCP_PSH, TCP_RST, TCP_SYN,
+                      TCP_URG, _ipv4)
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# CICFlowMeter features the generator produces (the model's selected features)
+FEATURES = (
+    'destination_port', 'flow_duration', 'fwd_packet_length_max', 'fwd_packet_length_min',
+    'fwd_packet_length_mean', 'bwd_packet_length_max', 'bwd_packet_length_min', 'flow_packets/s',
+    'flow_iat_mean', 'flow_iat_std', 'flow_iat_max', 'fwd_iat_mean', 'fwd_iat_std', 'fwd_iat_min',
+    'bwd_iat_std', 'bwd_iat_max', 'bwd_iat_min', 'fwd_psh_flags', 'bwd_packets/s', 'min_packet_length',
+    'max_packet_length', 'packet_length_mean', 'packet_length_variance', 'fin_flag_count', 'psh_flag_count',
+    'ack_flag_count', 'urg_flag_count', 'down/up_ratio', 'init_win_bytes_backward', 'idle_std'
+)
+# Flow identity columns written with the features (address columns only
+# with addresses=True)
+FLOW_COLUMNS = ('source_ip', 'destination_ip', 'source_port', 'protocol', 'total_fwd_packets',
+                'total_backward_packets')
+
+MAX_PAYLOAD = 1460
+# Flows are cut at the flow tracker's flow timeout
+MAX_DURATION_US = 119e6
+ACTIVITY_TIMEOUT_US = 5e6
+
+# Per profile: CICIDS label, protocol, destination ports and weights (None:
+# any port, mostly below 1024), packet counts (forward lognormal median and
+# sigma, backward/forward ratio median and sigma, backward bounds), duration
+# in microseconds (median, sigma), mean payload per direction (median,
+# sigma), spread of lengths and gaps around their means (0-1), FIN/PSH/URG
+# probabilities, server windows, and the source address pool
+PROFILES = {
+    'web': {
+        'label': 'BENIGN', 'protocol': IPPROTO_TCP, 'ports': [443, 80, 8080], 'port_weights': [0.6, 0.3, 0.1],
+        'fwd_packets': (8, 0.9), 'bwd_ratio': (1.2, 0.4), 'bwd_packets': (1, 5000),
+        'duration': (2e6, 1.8), 'fwd_length': (90, 1.0), 'bwd_length': (700, 0.7), 'spread': 0.9,
+        'fin': 0.85, 'psh': 0.9, 'urg': 0.005, 'windows': [29200, 28960, 65535, 14600, 235],
+        'sources': ('10.0.0.0', 65534)
+    },
+    'dns': {
+        'label': 'BENIGN', 'protocol': IPPROTO_UDP, 'ports': [53], 'port_weights': [1.0],
+        'fwd_packets': (1.2, 0.3), 'bwd_ratio': (1.0, 0.1), 'bwd_packets': (1, 4),
+        'duration': (3e4, 1.2), 'fwd_length': (38, 0.3), 'bwd_length': (110, 0.6), 'spread': 0.3,
+        'fin': 0.0, 'psh': 0.0, 'urg': 0.0, 'windows': [-1],
+        'sources': ('10.0.0.0', 65534)
+    },
+    'bulk': {
+        'label': 'BENIGN', 'protocol': IPPROTO_TCP, 'ports': [22, 445, 3306, 873], 'port_weights': [0.4, 0.3, 0.2, 0.1],
+        'fwd_packets': (150, 1.2), 'bwd_ratio': (0.8, 0.5), 'bwd_packets': (1, 100000),
+        'duration': (2e7, 1.2), 'fwd_length': (900, 0.5), 'bwd_length': (200, 1.0), 'spread': 1.0,
+        'fin': 0.9, 'psh': 1.0, 'urg': 0.0, 'windows': [65535, 29200, 8192],
+        'sources': ('10.0.0.0', 65534)
+    },
+    'ddos': {
+        'label': 'DDoS', 'protocol': IPPROTO_TCP, 'ports': [80], 'port_weights': [1.0],
+        'fwd_packets': (3, 0.5), 'bwd_ratio': (0.8, 0.6), 'bwd_packets': (0, 20),
+        'duration': (1.5e5, 2.0), 'fwd_length': (8, 0.8), 'bwd_length': (1500, 0.9), 'spread': 0.6,
+        'fin': 0.3, 'psh': 0.6, 'urg': 0.0, 'windows': [229, 256, 29200],
+        'sources': ('172.16.0.0', 500)
+    },
+    'portscan': {
+        'label': 'PortScan', 'protocol': IPPROTO_TCP, 'ports': None, 'port_weights': None,
+        'fwd_packets': (1, 0.3), 'bwd_ratio': (0.9, 0.2), 'bwd_packets': (0, 1),
+        'duration': (60, 1.0), 'fwd_length': (0, 0.0), 'bwd_length': (0, 0.0), 'spread': 0.0,
+        'fin': 0.0, 'psh': 0.0, 'urg': 0.0, 'windows': [0],
+        'sources': ('192.168.10.200', 3)
+    },
+    'ssh-patator': {
+        'label': 'SSH-Patator', 'protocol': IPPROTO_TCP, 'ports': [22], 'port_weights': [1.0],
+        'fwd_packets': (16, 0.2), 'bwd_ratio': (1.4, 0.1), 'bwd_packets': (1, 100),
+        'duration': (3e6, 0.5), 'fwd_length': (60, 0.3), 'bwd_length': (80, 0.3), 'spread': 0.9,
+        'fin': 0.9, 'psh': 1.0, 'urg': 0.0, 'windows': [247, 29200],
+        'sources': ('192.168.10.210', 2)
+    },
+    'ftp-patator': {
+        'label': 'FTP-Patator', 'protocol': IPPROTO_TCP, 'ports': [21], 'port_weights': [1.0],
+        'fwd_packets': (9, 0.2), 'bwd_ratio': (1.5, 0.1), 'bwd_packets': (1, 100),
+        'duration': (5e6, 0.6), 'fwd_length': (12, 0.3), 'bwd_length': (30, 0.3), 'spread': 0.8,
+        'fin': 0.9, 'psh': 1.0, 'urg': 0.0, 'windows': [227, 29200],
+        'sources': ('192.168.10.220', 2)
+    },
+}
+DEFAULT_MIX = {'web': 0.55, 'dns': 0.2, 'bulk': 0.05, 'ddos': 0.1, 'portscan': 0.06, 'ssh-patator': 0.02,
+               'ftp-patator': 0.02}
+# Servers flows go to (attacks pick a few of them)
+SERVER_BASE, SERVER_COUNT = '192.168.0.0', 254
+
+def parse_mix(text):
+    """
+    Parse a traffic mix such as 'web=0.7,ddos=0.2,portscan=0.1'.
+
+    Args:
+        text (str): Comma-separated profile=weight pairs
+
+    Returns:
+        dict: Weights per profile, summing to 1
+    """
+    mix = {}
+    for item in text.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in PROFILES:
+            raise ValueError(f"Unknown traffic profile '{name}' (profiles: {', '.join(PROFILES)})")
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise ValueError(f"Invalid weight for '{name}': {weight!r}")
+        if mix[name] < 0:
+            raise ValueError(f"Negative weight for '{name}'")
+    total = sum(mix.values())
+    if total <= 0:
+        raise ValueError("The traffic mix needs a positive weight")
+    return {name: weight / total for name, weight in mix.items()}
+
+@lru_cache(maxsize=None)
+def _address_pool(base, size):
+    """Dotted IPv4 strings of the size addresses after base."""
+    first = int.from_bytes(socket.inet_aton(base), 'big') + 1
+    return np.array([socket.inet_ntoa((first + i).to_bytes(4, 'big')) for i in range(size)], dtype=object)
+
+def _lognormal(rng, median, sigma):
+    return median * np.exp(sigma * rng.standard_normal(len(median)))
+
+def _length_triple(rng, mean, spread, count, upper):
+    """
+    Whole-byte (min, mean, max) lengths of count packets around per-row means.
+
+    The min and max leave the other count - 2 packets room to reach the
+    mean within them, so one packet has min = mean = max and two have the
+    mean halfway.
+    """
+    n = np.maximum(count, 1)
+    low = mean * (1 - spread * rng.random(len(mean)))
+    high = mean + (upper - mean) * spread * rng.random(len(mean)) ** 2
+    high = np.minimum(high, n * mean - (n - 1) * low)
+    low = np.rint(np.maximum(low, n * mean - (n - 1) * high))
+    high = np.maximum(np.rint(high), low)
+    mean = np.clip(mean, ((n - 1) * low + high) / n, (low + (n - 1) * high) / n)
+    return low, mean, high
+
+def _bounded_std(rng, low, mean, high, share):
+    """A standard deviation the min, mean and max allow (Bhatia-Davis bound), times share."""
+    return np.sqrt(np.maximum((high - mean) * (mean - low), 0.0)) * share * rng.random(len(mean))
+
+def _gaps(rng, span, count, spread):
+    """(mean, min, max, std) of count - 1 gaps over span; zeros below two packets."""
+    gaps = np.maximum(count - 1, 1)
+    mean = span / gaps
+    low = mean * (1 - spread * rng.random(len(mean)))
+    high = mean + (span - mean) * spread * rng.random(len(mean)) ** 3
+    # The other gaps are at least the min; with two gaps the max is the rest
+    high = np.where(gaps == 2, span - low, np.minimum(high, span - (gaps - 1) * low))
+    single = count == 2
+    low, high = np.where(single, mean, low), np.where(single, mean, high)
+    std = _bounded_std(rng, low, mean, high, 0.8)
+    present = count >= 2
+    return tuple(np.where(present, values, 0.0) for values in (mean, low, high, std))
+
+def generate_flows(num_flows, mix=None, seed=None, addresses=True):
+    """
+    Generate CICIDS-shaped flows from a mixture of traffic profiles.
+
+    Args:
+        num_flows (int): Number of flows
+        mix (dict, optional): Weight per profile name (default DEFAULT_MIX)
+        seed (int, optional): Random seed
+        addresses (bool): Include the source_ip and destination_ip columns
+
+    Returns:
+        pandas.DataFrame: FEATURES, FLOW_COLUMNS and the CICIDS label
+    """
+    try:
+        mix = DEFAULT_MIX if mix is None else mix
+        names = [name for name, weight in mix.items() if weight > 0]
+        weights = np.array([mix[name] for name in names], dtype=np.float64)
+        profiles = [PROFILES[name] for name in names]
+        rng = np.random.default_rng(seed)
+        kind = rng.choice(len(names), num_flows, p=weights / weights.sum())
+
+        def param(key, index=None):
+            values = [profile[key] if index is None else profile[key][index] for profile in profiles]
+            return np.asarray(values, dtype=np.float64)[kind]
+
+        # Destination ports, per profile (scans: any port, mostly well-known ones)
+        port = np.empty(num_flows, dtype=np.int64)
+        window = np.empty(num_flows, dtype=np.int64)
+        source = np.empty(num_flows, dtype=object)
+        for k, profile in enumerate(profiles):
+            rows = np.flatnonzero(kind == k)
+            if profile['ports'] is None:
+                port[rows] = np.where(rng.random(len(rows)) < 0.8, rng.integers(1, 1024, len(rows)),
+                                      rng.integers(1024, 65536, len(rows)))
+            else:
+                port[rows] = rng.choice(profile['ports'], len(rows), p=profile['port_weights'])
+            window[rows] = rng.choice(profile['windows'], len(rows))
+            if addresses:
+                pool = _address_pool(*profile['sources'])
+                source[rows] = pool[rng.integers(0, len(pool), len(rows))]
+        tcp = param('protocol') == IPPROTO_TCP
+
+        # Packet counts, duration and payload means
+        fwd = np.maximum(np.rint(_lognormal(rng, param('fwd_packets', 0), param('fwd_packets', 1))), 1)
+        bwd = np.rint(fwd * _lognormal(rng, param('bwd_ratio', 0), param('bwd_ratio', 1)))
+        bwd = np.clip(bwd, param('bwd_packets', 0), param('bwd_packets', 1))
+        # Every flow has at least two packets (a lone SYN is retransmitted)
+        fwd = np.where(fwd + bwd < 2, 2, fwd)
+        total = fwd + bwd
+        duration = np.clip(np.rint(_lognormal(rng, param('duration', 0), param('duration', 1))), 1, MAX_DURATION_US)
+        spread = param('spread')
+        fwd_mean = np.clip(_lognormal(rng, param('fwd_length', 0), param('fwd_length', 1)), 0, MAX_PAYLOAD)
+        bwd_mean = np.clip(_lognormal(rng, param('bwd_length', 0), param('bwd_length', 1)), 0, MAX_PAYLOAD)
+        fwd_min, fwd_mean, fwd_max = _length_triple(rng, fwd_mean, spread, fwd, MAX_PAYLOAD)
+        bwd_min, bwd_mean, bwd_max = _length_triple(rng, bwd_mean, spread, bwd, MAX_PAYLOAD)
+        has_bwd = bwd > 0
+        bwd_mean, bwd_min, bwd_max = (np.where(has_bwd, values, 0.0) for values in (bwd_mean, bwd_min, bwd_max))
+
+        # Whole-flow lengths: the spread between the two directions, plus
+        # some of what is left within the min/max bound
+        packet_mean = (fwd * fwd_mean + bwd * bwd_mean) / total
+        packet_min = np.where(has_bwd, np.minimum(fwd_min, bwd_min), fwd_min)
+        packet_max = np.maximum(fwd_max, bwd_max)
+        between = (fwd * (fwd_mean - packet_mean) ** 2 + bwd * (bwd_mean - packet_mean) ** 2) / total
+        bound = np.maximum((packet_max - packet_mean) * (packet_mean - packet_min), between)
+        within = np.where((fwd > 1) | (bwd > 1), rng.random(num_flows) * spread, 0.0)
+        variance = between + (bound - between) * within
+
+        # Gaps: the whole flow, and each direction over part of the duration
+        flow_iat_mean, _, flow_iat_max, flow_iat_std = _gaps(rng, duration, total, spread)
+        fwd_span = duration * np.where(has_bwd, 0.5 + 0.5 * rng.random(num_flows), 1.0)
+        fwd_iat_mean, fwd_iat_min, _, fwd_iat_std = _gaps(rng, fwd_span, fwd, spread)
+        _, bwd_iat_min, bwd_iat_max, bwd_iat_std = _gaps(rng, duration * (0.5 + 0.5 * rng.random(num_flows)),
+                                                         bwd, spread)
+        idle_std = np.where(duration > 2 * ACTIVITY_TIMEOUT_US,
+                            duration * 0.1 * rng.random(num_flows), 0.0)
+
+        # Flags: TCP only; PSH needs a payload
+        payload = (fwd_max > 0) | (bwd_max > 0)
+        fin = tcp & (rng.random(num_flows) < param('fin'))
+        psh = tcp & payload & (rng.random(num_flows) < param('psh'))
+        data = {
+            'destination_port': port,
+            'flow_duration': duration.astype(np.int64),
+            'fwd_packet_length_max': fwd_max,
+            'fwd_packet_length_min': fwd_min,
+            'fwd_packet_length_mean': fwd_mean,
+            'bwd_packet_length_max': bwd_max,
+            'bwd_packet_length_min': bwd_min,
+            'flow_packets/s': total * 1e6 / duration,
+            'flow_iat_mean': flow_iat_mean,
+            'flow_iat_std': flow_iat_std,
+            'flow_iat_max': flow_iat_max,
+            'fwd_iat_mean': fwd_iat_mean,
+            'fwd_iat_std': fwd_iat_std,
+            'fwd_iat_min': fwd_iat_min,
+            'bwd_iat_std': bwd_iat_std,
+            'bwd_iat_max': bwd_iat_max,
+            'bwd_iat_min': bwd_iat_min,
+            'fwd_psh_flags': (psh & (fwd_max > 0)).astype(np.int64),
+            'bwd_packets/s': bwd * 1e6 / duration,
+            'min_packet_length': packet_min,
+            'max_packet_length': packet_max,
+            'packet_length_mean': packet_mean,
+            'packet_length_variance': variance,
+            'fin_flag_count': fin.astype(np.int64),
+            'psh_flag_count': psh.astype(np.int64),
+            'ack_flag_count': (tcp & (window != 0) & (total > 2)).astype(np.int64),
+            'urg_flag_count': (tcp & (rng.random(num_flows) < param('urg'))).astype(np.int64),
+            'down/up_ratio': np.floor(bwd / fwd).astype(np.int64),
+            'init_win_bytes_backward': np.where(tcp & has_bwd, window, -1),
+            'idle_std': idle_std,
+        }
+        # Attacks go to a few servers, benign flows to all of them
+        frame = pd.DataFrame(data)
+        if addresses:
+            attack = np.array([profile['label'] != 'BENIGN' for profile in profiles])[kind]
+            server = np.where(attack, rng.integers(0, 4, num_flows), rng.integers(0, SERVER_COUNT, num_flows))
+            frame['source_ip'] = source
+            frame['destination_ip'] = _address_pool(SERVER_BASE, SERVER_COUNT)[server]
+        frame['source_port'] = rng.integers(1024, 65536, num_flows)
+        frame['protocol'] = np.where(tcp, IPPROTO_TCP, IPPROTO_UDP)
+        frame['total_fwd_packets'] = fwd.astype(np.int64)
+        frame['total_backward_packets'] = bwd.astype(np.int64)
+        frame['label'] = np.array([profile['label'] for profile in profiles], dtype=object)[kind]
+        return frame
+    except Exception as e:
+        logger.error(f"Error generating traffic: {str(e)}")
+        raise
+
+def flow_packets(flows, seed=None, start=None, span=60.0):
+    """
+    Synthesize the packets of generated flows.
+
+    Each flow gets its forward and backward packet counts, duration,
+    addresses and ports; payloads are drawn between the flow's per-direction
+    min and max lengths. TCP flows open with SYN (answered by SYN-ACK, or
+    RST-ACK from a zero window), carry PSH on payloads and, when the flow
+    has a FIN, close with a FIN in each direction. Packets are returned in
+    timestamp order, flows interleaved.
+
+    Args:
+        flows (pandas.DataFrame): Rows of generate_flows (with addresses)
+        seed (int, optional): Random seed
+        start (float, optional): First flow start, epoch seconds (default now - span)
+        span (float): Seconds over which flows start
+
+    Returns:
+        tuple: (PACKET_DTYPE records, numpy.ndarray of flow row per packet)
+    """
+    try:
+        rng = np.random.default_rng(seed)
+        num_flows = len(flows)
+        fwd = flows['total_fwd_packets'].to_numpy(dtype=np.int64)
+        bwd = flows['total_backward_packets'].to_numpy(dtype=np.int64)
+        counts = fwd + bwd
+        flow = np.repeat(np.arange(num_flows), counts)
+        first = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        position = np.arange(len(flow)) - first[flow]
+
+        # Directions: forward first, then the answer, the rest shuffled per flow
+        head = np.minimum(bwd, 1)
+        backward = np.zeros(len(flow), dtype=bool)
+        rest = position >= 1 + head[flow]
+        order = np.lexsort((rng.random(len(flow)), flow))
+        # Rank of each remaining packet among its flow's remaining packets
+        rest_rank = np.empty(len(flow), dtype=np.int64)
+        shuffled = order[rest[order]]
+        rest_first = np.concatenate([[0], np.cumsum(np.maximum(counts - 1 - head, 0))[:-1]])
+        rest_rank[shuffled] = np.arange(len(shuffled)) - rest_first[flow[shuffled]]
+        backward[rest] = rest_rank[rest] < (bwd - head)[flow[rest]]
+        backward[(position == 1) & (head[flow] == 1)] = True
+
+        # Timestamps: random gaps scaled to the flow duration
+        begin = (time.time() - span if start is None else start) + rng.random(num_flows) * span
+        duration = flows['flow_duration'].to_numpy(dtype=np.float64) / 1e6
+        gaps = rng.exponential(1.0, len(flow))
+        gaps[position == 0] = 0
+        offset = np.cumsum(gaps)
+        offset -= offset[first][flow]
+        last = first + counts - 1
+        ts = begin[flow] + offset / np.where(offset[last] > 0, offset[last], 1)[flow] * duration[flow]
+
+        # Payloads within each direction's min and max
+        low = np.where(backward, flows['bwd_packet_length_min'].to_numpy()[flow],
+                       flows['fwd_packet_length_min'].to_numpy()[flow])
+        high = np.where(backward, flows['bwd_packet_length_max'].to_numpy()[flow],
+                        flows['fwd_packet_length_max'].to_numpy()[flow])
+        length = np.rint(low + (high - low) * rng.random(len(flow))).astype(np.int64)
+
+        tcp = (flows['protocol'].to_numpy() == IPPROTO_TCP)[flow]
+        window = flows['init_win_bytes_backward'].to_numpy(dtype=np.int64)[flow]
+        flags = np.where(length > 0, TCP_ACK | TCP_PSH, TCP_ACK)
+        flags[position == 0] = TCP_SYN
+        answer = (position == 1) & backward
+        flags[answer] = np.where(window[answer] == 0, TCP_RST | TCP_ACK, TCP_SYN | TCP_ACK)
+        length[(position == 0) | answer] = np.where(tcp[(position == 0) | answer], 0,
+                                                    length[(position == 0) | answer])
+        urg = flows['urg_flag_count'].to_numpy()[flow] > 0
+        flags[urg & (position == 2)] |= TCP_URG
+        # FIN on the last packet of each direction
+        fin = flows['fin_flag_count'].to_numpy()[flow] > 0
+        direction_last = np.zeros(len(flow), dtype=bool)
+        for direction in (False, True):
+            rows = np.flatnonzero(backward == direction)
+            if len(rows):
+                ends = np.flatnonzero(np.diff(np.append(flow[rows], -1)) != 0)
+                direction_last[rows[ends]] = True
+        flags[fin & direction_last & (position > 1)] |= TCP_FIN
+        flags = np.where(tcp, flags, 0)
+
+        client = _parse_addresses(flows['source_ip'].to_numpy())[flow]
+        server = _parse_addresses(flows['destination_ip'].to_numpy())[flow]
+        client_port = flows['source_port'].to_numpy()[flow]
+        server_port = flows['destination_port'].to_numpy()[flow]
+
+        packets = np.zeros(len(flow), dtype=PACKET_DTYPE)
+        packets['ts'] = ts
+        packets['ip_version'] = 4
+        packets['protocol'] = flows['protocol'].to_numpy()[flow]
+        packets['src_addr'] = np.where(backward, server, client)
+        packets['dst_addr'] = np.where(backward, client, server)
+        packets['src_port'] = np.where(backward, server_port, client_port)
+        packets['dst_port'] = np.where(backward, client_port, server_port)
+        packets['tcp_flags'] = flags
+        packets['window'] = np.where(tcp, np.where(backward & (position == 1), np.maximum(window, 0),
+                                                   rng.integers(1024, 65536, len(flow))), 0)
+        packets['length'] = length
+        order = np.argsort(ts, kind='stable')
+        return packets[order], flow[order]
+    except Exception as e:
+        logger.error(f"Error synthesizing packets: {str(e)}")
+        raise
+
+def _parse_addresses(text):
+    """16-byte address values of dotted IPv4 strings, parsing each distinct one once."""
+    codes, unique = pd.factorize(text)
+    values = np.array([int.from_bytes(socket.inet_aton(value), 'big') for value in unique], dtype=np.uint32)
+    return _ipv4(values)[codes]
+
+def _number_layout(values, places):
+    """(scaled integer, whole part, fraction, whole digits) of a numeric column."""
+    scaled = np.rint(np.abs(values.astype(np.float64)) * 10 ** places).astype(np.int64)
+    whole, fraction = np.divmod(scaled, 10 ** places)
+    return scaled, whole, fraction, len(str(int(whole.max(initial=0))))
+
+def _put_digits(out, row, values, width, pad=True):
+    """ASCII digits of non-negative integers into out[row:row + width] (NUL for leading zeros if pad)."""
+    rest = values
+    # One scalar division per digit position (numpy divides by a scalar fast)
+    for k in range(width - 1, -1, -1):
+        quotient = rest // 10
+        digit = (rest - quotient * 10 + ord('0')).astype(np.uint8)
+        if pad and k < width - 1:
+            digit[values < 10 ** (width - 1 - k)] = 0
+        out[row + k] = digit
+        rest = quotient
+
+def encode_csv(frame, decimals=3, header=True):
+    """
+    Encode a frame of numbers and strings as CSV, without Python code per row.
+
+    Every field is laid out in a fixed-width byte matrix (digits from
+    integer arithmetic on whole columns, strings from the table of each
+    column's distinct values) with NUL padding, and the padding is dropped
+    in one pass. Floats get at most decimals decimal places, without
+    trailing zeros; values must be finite and strings must not need quoting.
+
+    Args:
+        frame (pandas.DataFrame): Numeric and string columns
+        decimals (int): Decimal places of float columns
+        header (bool): Start with the header line
+
+    Returns:
+        bytes: CSV text
+    """
+    head = (','.join(map(str, frame.columns)) + '\n').encode() if header else b''
+    if not len(frame) or not frame.columns.size:
+        return head
+    fields = []
+    for column in frame.columns:
+        values = frame[column].to_numpy()
+        if values.dtype.kind in 'iufb':
+            places = decimals if values.dtype.kind == 'f' else 0
+            scaled, whole, fraction, digits = _number_layout(values, places)
+            fields.append(('number', values, scaled, whole, fraction, digits, places))
+        else:
+            codes, unique = pd.factorize(values)
+            table = np.array([str(value).encode() for value in unique], dtype=bytes)
+            width = max(table.dtype.itemsize, 1)
+            fields.append(('text', codes, np.frombuffer(table.tobytes(), dtype=np.uint8).reshape(-1, width)))
+    width = sum(1 + (1 + field[5] + (1 + field[6] if field[6] else 0) if field[0] == 'number' else field[2].shape[1])
+                for field in fields)
+
+    # Field-major (one contiguous row per character position), transposed once at the end
+    out = np.zeros((width, len(frame)), dtype=np.uint8)
+    row = 0
+    for field in fields:
+        if field[0] == 'number':
+            _, values, scaled, whole, fraction, digits, places = field
+            out[row] = np.where((values < 0) & (scaled > 0), ord('-'), 0)
+            _put_digits(out, row + 1, whole, digits)
+            row += 1 + digits
+            if places:
+                # The point and the fraction digits, without trailing zeros
+                out[row] = np.where(fraction == 0, 0, ord('.'))
+                _put_digits(out, row + 1, fraction, places, pad=False)
+                for k in range(places):
+                    out[row + 1 + k][fraction % 10 ** (places - k) == 0] = 0
+                row += 1 + places
+        else:
+            _, codes, table = field
+            for j in range(table.shape[1]):
+                out[row + j] = table[:, j][codes]
+            row += table.shape[1]
+        out[row] = ord(',')
+        row += 1
+    out[row - 1] = ord('\n')
+    matrix = out.T.copy()
+    return head + matrix[matrix != 0].tobytes()